@@ -143,6 +143,26 @@ class AdapterManager:
                 self._current_adapter = None
                 self.logger.info("Adapter unloaded")
     
+    def invalidate(self, adapter_name: Optional[str] = None):
+        """
+        Esquece adapters em cache para que sejam relidos do disco
+        
+        Chamado quando outro processo grava novos pesos (ex: sono); o
+        próximo load_adapter_for_generation recarrega o adapter.
+        
+        Args:
+            adapter_name: Adapter invalidado (None = todos)
+        """
+        names = [adapter_name] if adapter_name else list(set(self._loaded_adapters) | set(self._loaded_models))
+        for name in names:
+            self._loaded_adapters.pop(name, None)
+            self._loaded_models.pop(name, None)
+        
+        if adapter_name is None or self._current_adapter == adapter_name:
+            self._current_adapter = None
+        
+        self.logger.info(f"Adapter cache invalidated: {adapter_name or 'all'}")
+    
     def list_adapters(self) -> list:
         """Lista todos os adapters disponíveis"""
         adapters = []
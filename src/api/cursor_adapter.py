@@ -41,6 +41,7 @@ class ChatCompletionRequest(BaseModel):
     temperature: Optional[float] = 0.7
     max_tokens: Optional[int] = 8192
     stream: Optional[bool] = False
+    user: Optional[str] = None  # Campo `user` da API OpenAI: isola o histórico por usuário
 
 
 class ChatCompletionChoice(BaseModel):
@@ -96,7 +97,8 @@ def create_cursor_adapter_app() -> FastAPI:
             result = sys.process_query(
                 query=query,
                 project_path=None,  # Cursor já fornece contexto de código
-                file_path=None
+                file_path=None,
+                user_id=request.user
             )
             
             response_text = result.get('response', '')
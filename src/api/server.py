@@ -17,14 +17,17 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+import asyncio
 import uvicorn
 import json
 
 from src.main import initialize_system, NpllmSystem
+from src.storage.async_postgres import AsyncPostgreSQLStorage
 from src.utils.logging import get_logger
 
 app = FastAPI(
@@ -44,13 +47,15 @@ app.add_middleware(
 
 # Sistema global (inicializado no startup)
 system: Optional[NpllmSystem] = None
+# Armazenamento assíncrono para endpoints que só acessam o banco (database.driver = "psycopg")
+async_storage: Optional[AsyncPostgreSQLStorage] = None
 logger = get_logger("npllm_api")
 
 
 @app.on_event("startup")
 async def startup_event():
     """Inicializa sistema no startup"""
-    global system
+    global system, async_storage
     logger.info("Initializing npllm system...")
     try:
         system = initialize_system()
@@ -58,12 +63,36 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Error initializing system: {e}")
         raise
+    
+    # Schema já foi criado pelo armazenamento síncrono (backend sqlite usa só o thread pool)
+    db_config = system.config.database
+    if db_config.backend == "postgres" and db_config.driver == "psycopg":
+        try:
+            async_storage = AsyncPostgreSQLStorage()
+            await async_storage.open()
+        except ImportError as e:
+            logger.warning(f"{e}; serving storage endpoints from the thread pool")
+            async_storage = None
+    
+    # Troca de versão de embedding em outro processo: o storage síncrono relê a
+    # dimensão ativa (primeiro assinante) e o assíncrono a copia
+    if async_storage and system.storage.invalidation:
+        system.storage.invalidation.subscribe(["embedding_versions"], _sync_async_embedding_dim)
+
+
+def _sync_async_embedding_dim(scope: str, payload: Dict[str, Any]):
+    """Copia a dimensão de embedding ativa para o storage assíncrono"""
+    if async_storage:
+        async_storage.embedding_dim = system.storage.embedding_dim
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Fecha sistema no shutdown"""
-    global system
+    global system, async_storage
+    if async_storage:
+        await async_storage.close()
+        async_storage = None
     if system:
         logger.info("Closing npllm system...")
         system.close()
@@ -76,6 +105,7 @@ class QueryRequest(BaseModel):
     project_path: Optional[str] = None
     file_path: Optional[str] = None
     course_context: Optional[int] = None
+    user_id: Optional[str] = None  # Histórico (RAG) isolado por usuário
 
 
 class QueryResponse(BaseModel):
@@ -90,6 +120,7 @@ class FeedbackRequest(BaseModel):
     user_reaction: str
     user_action: Optional[str] = None  # "accept", "edit", "delete", "ignore"
     explicit_feedback: Optional[float] = None
+    user_id: Optional[str] = None
 
 
 class CourseCreateRequest(BaseModel):
@@ -107,6 +138,8 @@ class CourseResponse(BaseModel):
     source_path: str
     status: str
     created_at: str
+    content_chunks: int = 0
+    concepts_learned: int = 0
 
 
 class CourseStatusResponse(BaseModel):
@@ -128,6 +161,52 @@ class ValidationRequest(BaseModel):
     validation_threshold: float = 0.75
 
 
+async def _embed_query(query: str):
+    """
+    Embedding de uma query sem bloquear o event loop
+    
+    Com micro-batching, aguarda o Future do lote direto no event loop (sem
+    ocupar uma thread do pool); sem ele, gera o embedding no thread pool.
+    """
+    batcher = system.content_processor.batcher
+    if batcher is not None:
+        return await asyncio.wrap_future(batcher.submit(query))
+    return await run_in_threadpool(system.content_processor.generate_embedding, query)
+
+
+async def _search_course_context(course_id: int, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+    """
+    Busca chunks do curso sem bloquear o event loop
+    
+    O embedding é gerado fora do event loop (_embed_query); a busca usa o
+    armazenamento assíncrono quando disponível.
+    """
+    if async_storage is None:
+        return await run_in_threadpool(system.search_course_context, course_id, query, top_k=top_k)
+    
+    query_embedding = await _embed_query(query)
+    if system.config.rag.hybrid_search:
+        return await async_storage.search_course_content_hybrid(
+            course_id,
+            query,
+            query_embedding,
+            top_k=top_k
+        )
+    return await async_storage.search_course_content(course_id, query_embedding, top_k=top_k)
+
+
+async def _get_course_status(course_id: int) -> Dict[str, Any]:
+    """Status do curso (mesmo formato de CourseManager.get_course_status)"""
+    if async_storage is None:
+        return await run_in_threadpool(system.get_course_status, course_id)
+    
+    status = await async_storage.get_course_status(course_id)
+    if not status:
+        raise ValueError(f"Course {course_id} not found")
+    
+    return status
+
+
 # Endpoints
 
 @app.get("/")
@@ -146,7 +225,9 @@ async def health():
     if not system:
         raise HTTPException(status_code=503, detail="System not initialized")
     
-    status = system.get_system_status()
+    status = await run_in_threadpool(system.get_system_status)
+    if async_storage is not None:
+        status["async_storage_metrics"] = async_storage.get_metrics()
     return status
 
 
@@ -172,7 +253,8 @@ async def query_direct(request: QueryRequest):
         # Modelo direto - sem limite de tokens (resposta completa)
         import time
         start_time = time.time()
-        response = system.base_model.generate(
+        response = await run_in_threadpool(
+            system.base_model.generate,
             request.query,
             max_length=8192,  # Sem limite - resposta completa
             stream=False
@@ -228,12 +310,9 @@ async def process_query(request: QueryRequest, stream: bool = False):
                 if request.course_context:
                     yield f"data: {json.dumps({'type': 'status', 'stage': 'context', 'message': 'Buscando contexto do curso...'})}\n\n"
                     try:
-                        from src.learning.content_processor import ContentProcessor
-                        processor = ContentProcessor()
-                        query_embedding = processor.generate_embedding(query_text)
-                        relevant_chunks = system.storage.search_course_content(
+                        relevant_chunks = await _search_course_context(
                             request.course_context,
-                            query_embedding,
+                            query_text,
                             top_k=3
                         )
                         if relevant_chunks:
@@ -248,7 +327,8 @@ async def process_query(request: QueryRequest, stream: bool = False):
                 
                 # Status: Selecionando adapter
                 yield f"data: {json.dumps({'type': 'status', 'stage': 'adapter_selection', 'message': 'Selecionando adapter apropriado...'})}\n\n"
-                adapter_name = system.selector.select(
+                adapter_name = await run_in_threadpool(
+                    system.selector.select,
                     file_path=request.file_path,
                     project_structure={"path": request.project_path} if request.project_path else None
                 )
@@ -259,8 +339,9 @@ async def process_query(request: QueryRequest, stream: bool = False):
                 if adapter_name and adapter_name != "default":
                     yield f"data: {json.dumps({'type': 'status', 'stage': 'adapter_loading', 'message': f'Carregando adapter {adapter_name}...'})}\n\n"
                     try:
-                        adapter_loaded = system.adapter_manager.load_adapter_for_generation(
-                            adapter_name, 
+                        adapter_loaded = await run_in_threadpool(
+                            system.adapter_manager.load_adapter_for_generation,
+                            adapter_name,
                             system.base_model
                         )
                         if adapter_loaded:
@@ -281,7 +362,9 @@ async def process_query(request: QueryRequest, stream: bool = False):
                 # Gera resposta completa (sem streaming real)
                 # IMPORTANTE: stream=False para garantir retorno de string, não generator
                 logger.info(f"Calling base_model.generate() with stream=False, query_length={len(query_text)}")
-                response = system.base_model.generate(query_text, max_length=8192, stream=False)
+                response = await run_in_threadpool(
+                    system.base_model.generate, query_text, max_length=8192, stream=False
+                )
                 logger.info(f"base_model.generate() returned type: {type(response)}, value_preview: {str(response)[:100] if response else 'None'}")
                 
                 # Garantir que response é string, não generator
@@ -324,11 +407,13 @@ async def process_query(request: QueryRequest, stream: bool = False):
             # Modo normal (não-streaming)
             logger.info(f"Processing query (non-streaming): {request.query[:50]}...")
             try:
-                result = system.process_query(
+                result = await run_in_threadpool(
+                    system.process_query,
                     query=request.query,
                     project_path=request.project_path,
                     file_path=request.file_path,
-                    course_context=request.course_context
+                    course_context=request.course_context,
+                    user_id=request.user_id
                 )
                 logger.info(f"process_query() returned result with keys: {list(result.keys())}")
                 logger.info(f"result['response'] type: {type(result.get('response'))}, length: {len(result.get('response', '')) if isinstance(result.get('response'), str) else 'N/A'}")
@@ -388,12 +473,14 @@ async def capture_feedback(request: FeedbackRequest):
             }
             user_action = action_map.get(request.user_action)
         
-        system.capture_feedback(
+        await run_in_threadpool(
+            system.capture_feedback,
             query=request.query,
             response=request.response,
             user_reaction=request.user_reaction,
             user_action=user_action,
-            explicit_feedback=request.explicit_feedback
+            explicit_feedback=request.explicit_feedback,
+            user_id=request.user_id
         )
         
         return {"status": "success", "message": "Feedback captured"}
@@ -418,7 +505,8 @@ async def create_course(request: CourseCreateRequest):
         raise HTTPException(status_code=503, detail="System not initialized")
     
     try:
-        course = system.create_course(
+        course = await run_in_threadpool(
+            system.create_course,
             name=request.name,
             description=request.description,
             source_type=request.source_type,
@@ -444,7 +532,10 @@ async def list_courses():
         raise HTTPException(status_code=503, detail="System not initialized")
     
     try:
-        courses = system.list_courses()
+        if async_storage is not None:
+            courses = await async_storage.get_all_courses()
+        else:
+            courses = await run_in_threadpool(system.list_courses)
         return [CourseResponse(**course) for course in courses]
     
     except Exception as e:
@@ -467,7 +558,7 @@ async def get_course_status(course_id: int):
         raise HTTPException(status_code=503, detail="System not initialized")
     
     try:
-        status = system.get_course_status(course_id)
+        status = await _get_course_status(course_id)
         return CourseStatusResponse(**status)
     
     except ValueError as e:
@@ -492,7 +583,7 @@ async def start_course_learning(course_id: int):
         raise HTTPException(status_code=503, detail="System not initialized")
     
     try:
-        result = system.start_course_learning(course_id)
+        result = await run_in_threadpool(system.start_course_learning, course_id)
         return result
     
     except Exception as e:
@@ -515,7 +606,10 @@ async def get_course_concepts(course_id: int):
         raise HTTPException(status_code=503, detail="System not initialized")
     
     try:
-        concepts = system.get_course_concepts(course_id)
+        if async_storage is not None:
+            concepts = await async_storage.get_learned_concepts(course_id)
+        else:
+            concepts = await run_in_threadpool(system.get_course_concepts, course_id)
         return {"course_id": course_id, "concepts": concepts}
     
     except Exception as e:
@@ -544,14 +638,15 @@ async def validate_course(course_id: int, request: Optional[ValidationRequest] =
             request = ValidationRequest()
         
         if request.automatic:
-            result = system.validate_course(
+            result = await run_in_threadpool(
+                system.validate_course,
                 course_id,
                 automatic=True,
                 num_questions=request.num_questions,
                 validation_threshold=request.validation_threshold
             )
         else:
-            result = system.validate_course(course_id, automatic=False)
+            result = await run_in_threadpool(system.validate_course, course_id, automatic=False)
         
         return result
     
@@ -575,7 +670,7 @@ async def trigger_sleep(force: bool = False):
         raise HTTPException(status_code=503, detail="System not initialized")
     
     try:
-        result = system.trigger_sleep(force=force)
+        result = await run_in_threadpool(system.trigger_sleep, force=force)
         # Garantir que retorna dict
         if result is None:
             result = {"status": "completed", "message": "Sleep consolidation completed"}
@@ -600,7 +695,7 @@ async def get_status():
         raise HTTPException(status_code=503, detail="System not initialized")
     
     try:
-        return system.get_system_status()
+        return await run_in_threadpool(system.get_system_status)
     
     except Exception as e:
         logger.error(f"Error getting status: {e}")
@@ -3,11 +3,15 @@ Content Processor
 Processes and structures collected content
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
+from src.models.embedding_backends import DEFAULT_PROVIDER
+from src.models.embedding_batcher import EmbeddingMicroBatcher
+from src.models.embedding_cache import EmbeddingCache
+from src.models.embedding_registry import EmbeddingModelRegistry, get_embedding_registry
 from src.utils.logging import get_logger
+from src.utils.hashing import content_hash
 
 
 class ContentProcessor:
@@ -16,59 +20,183 @@ class ContentProcessor:
     Processa e estrutura conteúdo coletado
     """
     
-    def __init__(self, embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+        batch_size: int = 32,
+        device: str = "cpu",
+        provider: str = DEFAULT_PROVIDER,
+        registry: Optional[EmbeddingModelRegistry] = None,
+        cache: Optional[EmbeddingCache] = None
+    ):
         """
         Inicializa processador de conteúdo
         
+        O modelo não é carregado aqui: vem do registro de modelos do
+        processo no primeiro uso (ou em warm_up), e é compartilhado com
+        outros processadores do mesmo modelo e device.
+        
         Args:
             embedding_model: Modelo para geração de embeddings
+            batch_size: Textos por chamada ao modelo (embeddings.batch_size)
+            device: Device do modelo (embeddings.device)
+            provider: Backend do modelo (embeddings.provider, ex: sentence_transformers_int8)
+            registry: Registro de modelos (padrão: o global do processo)
+            cache: Cache de embeddings consultado antes do modelo (opcional)
         """
         self.logger = get_logger(self.__class__.__name__)
         self.embedding_model_name = embedding_model
-        self.embedding_model = SentenceTransformer(embedding_model)
+        self.batch_size = batch_size
+        self.device = device
+        self.provider = provider
+        self.registry = registry or get_embedding_registry()
+        self.cache = cache
+        self.batcher: Optional[EmbeddingMicroBatcher] = None
         self.logger.info(f"Content processor initialized with model: {embedding_model}")
     
+    @property
+    def embedding_model(self):
+        """Modelo de embedding (EmbeddingModelInterface, carregado sob demanda pelo registro)"""
+        return self.registry.get(self.embedding_model_name, self.device, self.provider)
+    
+    @property
+    def cache_namespace(self) -> str:
+        """Chave do modelo no cache (backends diferentes geram vetores diferentes)"""
+        if self.provider == DEFAULT_PROVIDER:
+            return self.embedding_model_name
+        return f"{self.embedding_model_name}#{self.provider}"
+    
+    def warm_up(self):
+        """Carrega o modelo agora, em vez de na primeira requisição"""
+        self.registry.warm_up([self.embedding_model_name], self.device, self.provider)
+    
+    def enable_micro_batching(self, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        Agrupa chamadas concorrentes a generate_embedding em lotes
+        
+        Args:
+            max_batch_size: Máximo de textos por lote
+            max_wait_ms: Espera máxima por outros textos após o primeiro
+        """
+        self.batcher = EmbeddingMicroBatcher(self.generate_embeddings, max_batch_size, max_wait_ms)
+    
     def process_content(
         self,
         content: str,
         course_id: int,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding_lookup: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None
     ) -> List[Dict[str, Any]]:
         """
         Processa conteúdo e retorna chunks processados
         
+        Equivale a process_documents com um único documento.
+        
         Args:
             content: Conteúdo a processar
             course_id: ID do curso
             metadata: Metadados adicionais
+            embedding_lookup: Função hash -> embedding para hashes já armazenados
+                (ex: PostgreSQLStorage.get_embeddings_by_hash)
         
         Returns:
             Lista de chunks processados
         """
-        self.logger.info(f"Processing content for course {course_id}")
+        return self.process_documents(
+            [{"content": content, "metadata": metadata}],
+            course_id,
+            embedding_lookup=embedding_lookup
+        )
+    
+    def process_documents(
+        self,
+        documents: List[Dict[str, Any]],
+        course_id: int,
+        embedding_lookup: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Processa vários documentos e retorna os chunks de todos eles
+        
+        Cada chunk recebe um `content_hash`; chunks cujo hash já tem embedding
+        (no banco, via `embedding_lookup`, ou repetidos entre documentos)
+        reaproveitam o embedding. Os demais são codificados juntos, em lotes
+        de `batch_size`, em vez de uma chamada ao modelo por chunk.
+        
+        Os embeddings ficam em uma única matriz float32 (n_chunks, dim)
+        contígua; o `embedding` de cada chunk é uma linha (view) dessa
+        matriz, entregue ao store_course_content_bulk sem cópias por linha.
+        
+        Args:
+            documents: Documentos com `content` e opcionalmente `metadata`
+            course_id: ID do curso
+            embedding_lookup: Função hash -> embedding para hashes já armazenados
+                (ex: PostgreSQLStorage.get_embeddings_by_hash)
         
-        # Chunking
-        chunks = self.chunk_content(content, chunk_size=512)
+        Returns:
+            Lista de chunks processados, na ordem dos documentos
+        """
+        self.logger.info(f"Processing {len(documents)} documents for course {course_id}")
         
-        # Processa cada chunk
+        # Chunking de todos os documentos
         processed_chunks = []
-        for idx, chunk in enumerate(chunks):
-            # Extrai metadados
-            chunk_metadata = self.extract_metadata(chunk, metadata)
-            
-            # Gera embedding
-            embedding = self.embedding_model.encode(chunk, convert_to_numpy=True)
-            
-            processed_chunks.append({
-                "content": chunk,
-                "chunk_index": idx,
-                "metadata": chunk_metadata,
-                "embedding": embedding
-            })
-        
-        self.logger.info(f"Processed {len(processed_chunks)} chunks")
+        for document in documents:
+            for idx, chunk in enumerate(self.chunk_content(document["content"], chunk_size=512)):
+                processed_chunks.append({
+                    "content": chunk,
+                    "content_hash": content_hash(chunk),
+                    "chunk_index": idx,
+                    "metadata": self.extract_metadata(chunk, document.get("metadata"))
+                })
+        
+        if not processed_chunks:
+            return []
+        
+        # Um embedding por conteúdo distinto
+        texts = {}
+        for chunk in processed_chunks:
+            texts.setdefault(chunk["content_hash"], chunk["content"])
+        unique_hashes = list(texts)
+        
+        # Embeddings já conhecidos por hash
+        known_embeddings = embedding_lookup(unique_hashes) if embedding_lookup else {}
+        missing = [h for h in unique_hashes if known_embeddings.get(h) is None]
+        
+        encoded = self.generate_embeddings([texts[h] for h in missing]) if missing else None
+        dim = encoded.shape[1] if encoded is not None else len(known_embeddings[unique_hashes[0]])
+        
+        unique_embeddings = np.empty((len(unique_hashes), dim), dtype=np.float32)
+        rows = {chunk_hash: row for row, chunk_hash in enumerate(unique_hashes)}
+        for chunk_hash in unique_hashes:
+            embedding = known_embeddings.get(chunk_hash)
+            if embedding is not None:
+                unique_embeddings[rows[chunk_hash]] = embedding
+        if encoded is not None:
+            unique_embeddings[[rows[h] for h in missing]] = encoded
+        
+        # Matriz contígua na ordem dos chunks (chunks repetidos repetem a linha)
+        embeddings = unique_embeddings[[rows[chunk["content_hash"]] for chunk in processed_chunks]]
+        for chunk, embedding in zip(processed_chunks, embeddings):
+            chunk["embedding"] = embedding
+        
+        self.logger.info(
+            f"Processed {len(processed_chunks)} chunks "
+            f"({len(missing)} encoded, {len(processed_chunks) - len(missing)} embeddings reused)"
+        )
         return processed_chunks
     
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Codifica textos em lotes de `batch_size`
+        
+        Args:
+            texts: Lista de textos
+        
+        Returns:
+            Array float32 contíguo (n, dim)
+        """
+        embeddings = self.embedding_model.encode(texts, batch_size=self.batch_size)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+    
     def chunk_content(
         self,
         content: str,
@@ -153,7 +281,10 @@ class ContentProcessor:
     
     def generate_embedding(self, text: str) -> np.ndarray:
         """
-        Gera embedding para um texto
+        Gera embedding para um texto (via cache, se configurado)
+        
+        Com micro-batching, o texto é agrupado com os de outras threads
+        chamando ao mesmo tempo.
         
         Args:
             text: Texto
@@ -161,5 +292,56 @@ class ContentProcessor:
         Returns:
             Embedding vetorial
         """
-        return self.embedding_model.encode(text, convert_to_numpy=True)
-
+        if self.batcher is not None:
+            return self.batcher.embed(text)
+        return self.generate_embeddings([text])[0]
+    
+    def generate_embeddings(
+        self,
+        texts: List[str],
+        embedding_lookup: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None
+    ) -> np.ndarray:
+        """
+        Gera embeddings para vários textos, em lotes de `batch_size`
+        
+        Com cache, só textos ausentes dele passam pelo modelo (e entram no
+        cache). `embedding_lookup` é consultado antes do modelo para os
+        textos que o cache não tem, ex: chunks já armazenados no banco.
+        
+        Args:
+            texts: Lista de textos
+            embedding_lookup: Função hash -> embedding para hashes já armazenados
+        
+        Returns:
+            Array float32 (n, dim) com embeddings
+        """
+        if not texts or (self.cache is None and embedding_lookup is None):
+            return self.encode_batch(texts)
+        
+        if self.cache is not None:
+            found = self.cache.get_many(self.cache_namespace, texts)
+        else:
+            found = [None] * len(texts)
+        
+        # Embeddings já armazenados (por content_hash do texto original)
+        missing = [i for i, embedding in enumerate(found) if embedding is None]
+        if missing and embedding_lookup:
+            hashes = [content_hash(texts[i]) for i in missing]
+            stored = embedding_lookup(list(dict.fromkeys(hashes)))
+            for i, chunk_hash in zip(missing, hashes):
+                found[i] = stored.get(chunk_hash)
+        
+        # Textos novos: um embedding por texto distinto
+        new_texts = list(dict.fromkeys(texts[i] for i, embedding in enumerate(found) if embedding is None))
+        if new_texts:
+            encoded = self.encode_batch(new_texts)
+            by_text = dict(zip(new_texts, encoded))
+            found = [by_text[text] if embedding is None else embedding for text, embedding in zip(texts, found)]
+        
+        embeddings = np.empty((len(texts), len(found[0])), dtype=np.float32)
+        for row, embedding in enumerate(found):
+            embeddings[row] = embedding
+        
+        if self.cache is not None and missing:
+            self.cache.put_many(self.cache_namespace, [texts[i] for i in missing], embeddings[missing])
+        return embeddings
@@ -97,25 +97,12 @@ class CourseManager:
         Returns:
             Status e informações do curso
         """
-        course = self.storage.get_course(course_id)
-        if not course:
+        # Contadores de chunks e conceitos são mantidos na própria linha do curso
+        status = self.storage.get_course_status(course_id)
+        if not status:
             raise ValueError(f"Course {course_id} not found")
         
-        # Conta conteúdo processado
-        content_count = self.storage.get_course_content_count(course_id)
-        
-        # Conta conceitos aprendidos
-        concepts_count = self.storage.get_learned_concepts_count(course_id)
-        
-        return {
-            "id": course["id"],
-            "name": course["name"],
-            "status": course["status"],
-            "content_chunks": content_count,
-            "concepts_learned": concepts_count,
-            "created_at": course["created_at"],
-            "updated_at": course.get("updated_at")
-        }
+        return status
     
     def start_course(self, course_id: int) -> Dict[str, Any]:
         """
@@ -6,7 +6,6 @@ Uses LLM as judge and semantic similarity
 
 import numpy as np
 from typing import List, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer
 
 from src.utils.logging import get_logger
 
@@ -30,9 +29,13 @@ class CourseValidator:
         self.base_model = base_model
         self.storage = storage
         self.content_processor = content_processor
-        self.embedding_model = content_processor.embedding_model
         self.logger.info("Course validator initialized")
     
+    @property
+    def embedding_model(self):
+        """Modelo de embedding do ContentProcessor (registro compartilhado)"""
+        return self.content_processor.embedding_model
+    
     def validate_course(
         self,
         course_id: int,
@@ -61,16 +64,30 @@ class CourseValidator:
                 "message": "Could not generate validation questions"
             }
         
-        # 2. Responde cada pergunta usando conhecimento do curso
+        # 2. Busca contexto de todas as perguntas em uma única consulta
+        query_embeddings = self.content_processor.generate_embeddings(
+            [question_data['question'] for question_data in questions]
+        )
+        contexts = self.storage.search_course_content_batch(
+            course_id,
+            query_embeddings,
+            top_k=3
+        )
+        
+        # 3. Responde cada pergunta usando conhecimento do curso
         validation_results = []
         total_score = 0.0
         
-        for question_data in questions:
+        for question_data, relevant_chunks in zip(questions, contexts):
             question = question_data['question']
             expected_content = question_data['content']
             
             # Responde usando conhecimento do curso
-            response = self._answer_with_course_context(question, course_id)
+            response = self._answer_with_course_context(
+                question,
+                course_id,
+                relevant_chunks=relevant_chunks
+            )
             
             # Valida resposta
             validation_score = self._validate_answer(
@@ -227,7 +244,8 @@ Question:"""
     def _answer_with_course_context(
         self,
         question: str,
-        course_id: int
+        course_id: int,
+        relevant_chunks: Optional[List[Dict[str, Any]]] = None
     ) -> str:
         """
         Responde pergunta usando conhecimento do curso
@@ -235,17 +253,19 @@ Question:"""
         Args:
             question: Pergunta
             course_id: ID do curso
+            relevant_chunks: Chunks já recuperados (opcional, evita nova busca)
         
         Returns:
             Resposta gerada
         """
         # Busca conteúdo relevante do curso
-        query_embedding = self.content_processor.generate_embedding(question)
-        relevant_chunks = self.storage.search_course_content(
-            course_id,
-            query_embedding,
-            top_k=3
-        )
+        if relevant_chunks is None:
+            query_embedding = self.content_processor.generate_embedding(question)
+            relevant_chunks = self.storage.search_course_content(
+                course_id,
+                query_embedding,
+                top_k=3
+            )
         
         # Monta contexto
         context = ""
@@ -308,9 +328,11 @@ Question:"""
             Score de similaridade (0.0 a 1.0)
         """
         try:
-            # Gera embeddings
-            answer_embedding = self.embedding_model.encode(answer, convert_to_numpy=True)
-            expected_embedding = self.embedding_model.encode(expected_content, convert_to_numpy=True)
+            # Gera embeddings (o chunk esperado já tem embedding no banco)
+            answer_embedding, expected_embedding = self.content_processor.generate_embeddings(
+                [answer, expected_content],
+                embedding_lookup=self.storage.get_embeddings_by_hash
+            )
             
             # Calcula similaridade de cosseno
             similarity = np.dot(answer_embedding, expected_embedding) / (
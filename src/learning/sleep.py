@@ -22,7 +22,11 @@ class SleepSystem:
         fine_tuning,
         emotional_analyzer=None,
         implicit_feedback=None,
-        inactivity_threshold_minutes: int = 30
+        inactivity_threshold_minutes: int = 30,
+        feedback_batch_size: int = 1000,
+        max_feedbacks_per_chunk: int = 10000,
+        db_maintenance: bool = False,
+        maintenance_time_budget_seconds: Optional[float] = None
     ):
         """
         Inicializa sistema de sono
@@ -34,6 +38,10 @@ class SleepSystem:
             emotional_analyzer: Analisador emocional (opcional)
             implicit_feedback: Sistema de feedback implícito (opcional)
             inactivity_threshold_minutes: Limite de inatividade em minutos
+            feedback_batch_size: Tamanho do lote na leitura de feedbacks
+            max_feedbacks_per_chunk: Feedbacks por rodada de treino (limita a memória da consolidação)
+            db_maintenance: Executa a manutenção do banco ao fim da consolidação
+            maintenance_time_budget_seconds: Tempo máximo da manutenção (padrão: storage)
         """
         self.logger = get_logger(self.__class__.__name__)
         self.storage = storage
@@ -42,6 +50,10 @@ class SleepSystem:
         self.emotional_analyzer = emotional_analyzer
         self.implicit_feedback = implicit_feedback
         self.inactivity_threshold = timedelta(minutes=inactivity_threshold_minutes)
+        self.feedback_batch_size = feedback_batch_size
+        self.max_feedbacks_per_chunk = max_feedbacks_per_chunk
+        self.db_maintenance = db_maintenance
+        self.maintenance_time_budget = maintenance_time_budget_seconds
         self.last_activity: Optional[datetime] = None
         self.logger.info(f"Sleep system initialized (threshold: {inactivity_threshold_minutes} minutes)")
     
@@ -66,13 +78,14 @@ class SleepSystem:
         """
         Consolida conhecimento durante sono
         
-        Processo:
-        1. Detecta inatividade
-        2. Extrai feedback do PostgreSQL
-        3. Filtra apenas positivo (score > 0.7)
-        4. Mistura exemplos antigos com novos (replay)
-        5. Fine-tuning tradicional incremental
-        6. Atualiza LoRA Adapters
+        Processo (em blocos de até max_feedbacks_per_chunk feedbacks):
+        1. Extrai feedback positivo (score > 0.7) criado após a última consolidação
+        2. Mistura exemplos antigos com novos (replay)
+        3. Fine-tuning tradicional incremental
+        4. Avança a marca d'água da consolidação até o último feedback do bloco
+        5. Atualiza LoRA Adapters
+        6. Aplica a retenção de feedback (partições antigas viram important_examples)
+        7. Manutenção do banco, se habilitada (ANALYZE, REINDEX de índices inchados)
         
         Returns:
             Dicionário com resultados da consolidação
@@ -86,49 +99,76 @@ class SleepSystem:
         self.logger.info("Starting sleep consolidation...")
         
         try:
-            # 1. Extrai feedback do PostgreSQL
-            all_feedbacks = self.storage.get_all_feedbacks()
-            self.logger.info(f"Extracted {len(all_feedbacks)} feedbacks from storage")
+            watermark = self.storage.get_consolidation_watermark()
+            after_id = watermark["last_feedback_id"]
+            old_examples = None
+            feedbacks_processed = 0
+            dataset_size = 0
+            fine_tuning_result = None
+            last_feedback = None
             
-            # 2. Filtra apenas positivo (score > 0.7)
-            positive_feedbacks = [
-                f for f in all_feedbacks
-                if f.get('score', 0) > 0.7
-            ]
-            self.logger.info(f"Filtered {len(positive_feedbacks)} positive feedbacks")
+            while True:
+                # 1. Extrai o próximo bloco de feedback positivo (filtro e marca d'água no SQL)
+                chunk = self._next_feedback_chunk(after_id)
+                self.logger.info(f"Extracted {len(chunk)} positive feedbacks after ID {after_id}")
+                if not chunk:
+                    break
+                
+                # 2. Replay: mistura exemplos antigos com novos
+                if old_examples is None:
+                    old_examples = self.storage.get_important_examples()
+                    
+                    # Adiciona exemplos de cursos validados
+                    course_examples = self._get_course_examples()
+                    if course_examples:
+                        self.logger.info(f"Adding {len(course_examples)} examples from validated courses")
+                        old_examples.extend(course_examples)
+                
+                dataset = self.replay.mix_examples(old_examples, chunk)
+                self.logger.info(f"Created dataset with {len(dataset)} examples (replay)")
+                
+                # 3. Fine-tuning tradicional incremental
+                fine_tuning_result = self.fine_tuning.train_incremental(dataset)
+                feedbacks_processed += len(chunk)
+                dataset_size += len(dataset)
+                if fine_tuning_result.get("status") == "error":
+                    break
+                self.logger.info("Fine-tuning completed")
+                
+                # 4. Avança marca d'água apenas se o treinamento do bloco não falhou
+                last_feedback = chunk[-1]
+                self.storage.update_consolidation_watermark(
+                    last_feedback_id=last_feedback["id"],
+                    last_created_at=last_feedback.get("created_at")
+                )
+                after_id = last_feedback["id"]
+                
+                # Bloco incompleto: não há mais feedback; usuário de volta: o resto fica para o próximo sono
+                if len(chunk) < self.max_feedbacks_per_chunk or not self.is_inactive():
+                    break
             
-            if len(positive_feedbacks) == 0:
+            if feedbacks_processed == 0:
                 return {
                     "status": "no_data",
-                    "message": "No positive feedbacks to consolidate"
+                    "message": "No positive feedbacks to consolidate",
+                    "feedback_retention": self._apply_feedback_retention(),
+                    "db_maintenance": self._run_db_maintenance()
                 }
             
-            # 3. Replay: mistura exemplos antigos com novos
-            old_examples = self.storage.get_important_examples()
-            
-            # Adiciona exemplos de cursos validados
-            course_examples = self._get_course_examples()
-            if course_examples:
-                self.logger.info(f"Adding {len(course_examples)} examples from validated courses")
-                old_examples.extend(course_examples)
-            
-            dataset = self.replay.mix_examples(old_examples, positive_feedbacks)
-            self.logger.info(f"Created dataset with {len(dataset)} examples (replay)")
-            
-            # 4. Fine-tuning tradicional incremental
-            fine_tuning_result = self.fine_tuning.train_incremental(dataset)
-            self.logger.info("Fine-tuning completed")
-            
             # 5. Atualiza LoRA Adapters
             update_result = self.fine_tuning.update_adapters()
             self.logger.info("Adapters updated")
+            self._notify_adapters_updated()
             
             return {
                 "status": "success",
-                "feedbacks_processed": len(positive_feedbacks),
-                "dataset_size": len(dataset),
+                "feedbacks_processed": feedbacks_processed,
+                "last_feedback_id": last_feedback["id"] if last_feedback else None,
+                "dataset_size": dataset_size,
                 "fine_tuning": fine_tuning_result,
-                "adapters_updated": update_result
+                "adapters_updated": update_result,
+                "feedback_retention": self._apply_feedback_retention(),
+                "db_maintenance": self._run_db_maintenance()
             }
         
         except Exception as e:
@@ -138,6 +178,95 @@ class SleepSystem:
                 "message": str(e)
             }
     
+    def _next_feedback_chunk(self, after_id: int) -> List[Dict[str, Any]]:
+        """
+        Lê o próximo bloco de feedback positivo após a marca d'água
+        
+        O gerador é fechado antes do treino para liberar o cursor e a conexão.
+        
+        Args:
+            after_id: Último ID já consolidado
+        
+        Returns:
+            Até max_feedbacks_per_chunk feedbacks em ordem de ID
+        """
+        chunk = []
+        batches = self.storage.iter_feedback_batches(
+            score_threshold=0.7,
+            after_id=after_id,
+            batch_size=min(self.feedback_batch_size, self.max_feedbacks_per_chunk)
+        )
+        try:
+            for batch in batches:
+                chunk.extend(batch)
+                if len(chunk) >= self.max_feedbacks_per_chunk:
+                    break
+        finally:
+            close = getattr(batches, "close", None)
+            if close:
+                close()
+        return chunk[:self.max_feedbacks_per_chunk]
+    
+    def _notify_adapters_updated(self):
+        """
+        Avisa os outros processos que os adapters em disco mudaram
+        
+        Falhas não interrompem a consolidação.
+        """
+        try:
+            self.storage.notify_invalidation("adapters")
+        except Exception as e:
+            self.logger.warning(f"Error notifying adapter update: {e}")
+    
+    def _apply_feedback_retention(self) -> Optional[Dict[str, Any]]:
+        """
+        Mantém as partições de feedback (criação antecipada e retenção)
+        
+        Falhas não interrompem a consolidação.
+        
+        Returns:
+            Resultado da manutenção ou None em caso de erro
+        """
+        try:
+            result = self.storage.maintain_feedback_partitions()
+            if result["partitions_dropped"]:
+                self.logger.info(
+                    f"Feedback retention dropped {len(result['partitions_dropped'])} partitions, "
+                    f"rolled up {result['rows_rolled_up']} examples"
+                )
+            return result
+        except Exception as e:
+            self.logger.warning(f"Error applying feedback retention: {e}")
+            return None
+    
+    def _run_db_maintenance(self) -> Optional[Dict[str, Any]]:
+        """
+        Manutenção do banco na janela de inatividade
+        
+        Limitada pelo tempo e interrompida assim que record_activity()
+        registrar a volta do usuário. Falhas não interrompem a consolidação.
+        
+        Returns:
+            Resultado da manutenção ou None se desabilitada ou em caso de erro
+        """
+        if not self.db_maintenance:
+            return None
+        
+        activity_at_start = self.last_activity
+        try:
+            result = self.storage.run_maintenance(
+                time_budget_seconds=self.maintenance_time_budget,
+                should_abort=lambda: self.last_activity != activity_at_start
+            )
+            self.logger.info(
+                f"Database maintenance analyzed {len(result['analyzed'])} tables, "
+                f"reindexed {len(result['reindexed'])} indexes in {result['elapsed_seconds']}s"
+            )
+            return result
+        except Exception as e:
+            self.logger.warning(f"Error running database maintenance: {e}")
+            return None
+    
     def trigger_manual(self) -> Dict[str, Any]:
         """
         Aciona consolidação manualmente (sem verificar inatividade)
@@ -159,23 +288,8 @@ class SleepSystem:
             Lista de exemplos de cursos
         """
         try:
-            # Obtém todos os cursos validados
-            all_courses = self.storage.get_all_courses()
-            validated_courses = [
-                c for c in all_courses
-                if c.get('status') == 'validated'
-            ]
-            
-            # Coleta exemplos de cada curso
-            course_examples = []
-            for course in validated_courses:
-                examples = self.storage.get_course_examples_for_replay(
-                    course['id'],
-                    limit=limit // len(validated_courses) if validated_courses else limit
-                )
-                course_examples.extend(examples)
-            
-            return course_examples[:limit]
+            # Cota por curso e expansão dos exemplos são feitas no banco
+            return self.storage.get_validated_course_examples(limit=limit)
         
         except Exception as e:
             self.logger.warning(f"Error getting course examples: {e}")
@@ -9,11 +9,16 @@ import sys
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 
+import numpy as np
+
 from src.models.base_model import CodeLlamaBaseModel
 from src.models.api_model import APIModel
 from src.adapters.selector import AdapterSelector
 from src.adapters.manager import AdapterManager
 from src.storage.postgres import PostgreSQLStorage
+from src.storage.sqlite import SQLiteStorage
+from src.storage.feedback_buffer import FeedbackWriteBuffer
+from src.storage.reindex import EmbeddingReindexJob
 from src.feedback.emotional import EmotionalAnalyzer
 from src.feedback.implicit import ImplicitFeedback, UserAction
 from src.learning.sleep import SleepSystem
@@ -26,6 +31,7 @@ from src.generation.architectural import ArchitecturalGenerator
 from src.learning.course_manager import CourseManager, CourseStatus
 from src.data_collection.content_collector import ContentCollector
 from src.learning.content_processor import ContentProcessor
+from src.models.embedding_cache import EmbeddingCache
 from src.learning.course_learner import CourseLearner
 from src.learning.course_validator import CourseValidator
 
@@ -72,9 +78,13 @@ class NpllmSystem:
         self.logger.info("Initializing adapter manager...")
         self.adapter_manager = AdapterManager(self.base_model)
         
-        # 4. PostgreSQL Storage
-        self.logger.info("Initializing PostgreSQL storage...")
-        self.storage = PostgreSQLStorage()
+        # 4. Storage (PostgreSQL + pgvector ou SQLite local)
+        if self.config.database.backend == "sqlite":
+            self.logger.info("Initializing SQLite storage...")
+            self.storage = SQLiteStorage()
+        else:
+            self.logger.info("Initializing PostgreSQL storage...")
+            self.storage = PostgreSQLStorage()
         
         # 5. Análise Emocional
         self.logger.info("Initializing emotional analyzer...")
@@ -99,7 +109,9 @@ class NpllmSystem:
             replay=self.replay,
             fine_tuning=self.fine_tuning,
             emotional_analyzer=self.emotional_analyzer,
-            implicit_feedback=self.implicit_feedback
+            implicit_feedback=self.implicit_feedback,
+            db_maintenance=self.config.database.maintenance,
+            maintenance_time_budget_seconds=self.config.database.maintenance_time_budget_seconds
         )
         
         # 10. Análise Arquitetural
@@ -122,10 +134,46 @@ class NpllmSystem:
         self.logger.info("Initializing course system...")
         self.course_manager = CourseManager(self.storage)
         self.content_collector = ContentCollector()
-        self.content_processor = ContentProcessor()
+        # Queries precisam do mesmo modelo da versão de embedding ativa no banco
+        active_embedding = self.storage.get_active_embedding_version()
+        cache_config = self.config.embeddings.cache
+        self.embedding_cache = None
+        if cache_config.enabled:
+            self.embedding_cache = EmbeddingCache(
+                memory_capacity=cache_config.memory_capacity,
+                disk_path=cache_config.path if cache_config.disk_capacity > 0 else None,
+                disk_capacity=cache_config.disk_capacity
+            )
+        if active_embedding:
+            self.content_processor = self._create_content_processor(active_embedding["model"])
+        else:
+            self.content_processor = self._create_content_processor()
+        if self.config.embeddings.warm_up:
+            self.content_processor.warm_up()
+        self.embedding_reindex_job = None
         self.course_learner = CourseLearner(self.base_model, self.storage)
         self.course_validator = CourseValidator(self.base_model, self.storage, self.content_processor)
         
+        # 15. Buffer de feedback (write-behind)
+        self.feedback_buffer = None
+        buffer_config = self.config.feedback.buffer
+        if buffer_config.enabled:
+            self.logger.info("Initializing feedback write buffer...")
+            self.feedback_buffer = FeedbackWriteBuffer(
+                self.storage,
+                embed_fn=self.content_processor.generate_embeddings,
+                max_size=buffer_config.max_size,
+                batch_size=buffer_config.batch_size,
+                flush_interval=buffer_config.flush_interval_seconds,
+                spill_path=buffer_config.spill_path,
+                fsync=buffer_config.fsync
+            )
+        
+        # 16. Invalidação de caches entre processos (LISTEN/NOTIFY)
+        if self.config.database.backend != "sqlite" and self.config.database.invalidation:
+            self.logger.info("Starting cache invalidation listener...")
+            self._subscribe_invalidation(self.storage.start_invalidation_listener())
+        
         self.logger.info("npllm system initialized successfully")
     
     def process_query(
@@ -201,7 +249,8 @@ class NpllmSystem:
         response: str,
         user_reaction: str,
         user_action: Optional[UserAction] = None,
-        explicit_feedback: Optional[float] = None
+        explicit_feedback: Optional[float] = None,
+        user_id: Optional[str] = None
     ):
         """
         Captura feedback do usuário
@@ -213,6 +262,7 @@ class NpllmSystem:
             user_reaction: Reação do usuário (texto)
             user_action: Ação do usuário (aceitar/editar/deletar)
             explicit_feedback: Feedback explícito (opcional)
+            user_id: Usuário dono do feedback (isola o histórico por usuário)
         """
         self.logger.info("Capturing user feedback...")
         
@@ -232,15 +282,17 @@ class NpllmSystem:
         # 3. Integração 70% implícito + 30% emocional
         total_score = 0.7 * implicit_score + 0.3 * emotional_score
         
-        # 4. Armazena no PostgreSQL (direto, sem buffer)
+        # 4. Armazena no PostgreSQL (em lote via buffer, se habilitado)
         adapter_name = getattr(self, '_last_adapter_name', None)
-        self.storage.store_feedback(
+        store = self.feedback_buffer.add if self.feedback_buffer else self.storage.store_feedback
+        store(
             prompt=query,  # Prompt original
             response=response,
             score=total_score,
             implicit_score=implicit_score,
             emotional_score=emotional_score,
-            context=adapter_name
+            context=adapter_name,
+            user_id=user_id
         )
         
         self.logger.info(f"Feedback stored (score: {total_score:.2f})")
@@ -284,6 +336,11 @@ class NpllmSystem:
             force: Se True, força consolidação mesmo se sistema estiver ativo
         """
         self.logger.info("Triggering sleep consolidation...")
+        
+        # Consolidação lê feedbacks do banco: grava os pendentes antes
+        if self.feedback_buffer:
+            self.feedback_buffer.flush()
+        
         if force:
             return self.sleep.trigger_manual()
         else:
@@ -353,31 +410,28 @@ class NpllmSystem:
         else:
             raise ValueError(f"Unknown source type: {course['source_type']}")
         
-        # Processa e armazena conteúdo
-        total_chunks = 0
-        for doc in documents:
-            processed_chunks = self.content_processor.process_content(
-                content=doc['content'],
-                course_id=course_id,
-                metadata={
-                    'title': doc.get('title', ''),
-                    'type': doc.get('type', 'unknown'),
-                    'url': doc.get('url'),
-                    'file_path': doc.get('file_path')
+        # Processa conteúdo de todos os documentos (embeddings em lote)
+        course_chunks = self.content_processor.process_documents(
+            [
+                {
+                    'content': doc['content'],
+                    'metadata': {
+                        'title': doc.get('title', ''),
+                        'type': doc.get('type', 'unknown'),
+                        'url': doc.get('url'),
+                        'file_path': doc.get('file_path')
+                    }
                 }
-            )
-            
-            # Armazena cada chunk
-            for chunk in processed_chunks:
-                self.storage.store_course_content(
-                    course_id=course_id,
-                    title=chunk['metadata'].get('title', ''),
-                    content=chunk['content'],
-                    chunk_index=chunk['chunk_index'],
-                    metadata=chunk['metadata'],
-                    embedding=chunk['embedding']
-                )
-                total_chunks += 1
+                for doc in documents
+            ],
+            course_id=course_id,
+            embedding_lookup=self.storage.get_embeddings_by_hash
+        )
+        
+        # Armazena todos os chunks em lote (uma única transação); chunks já
+        # armazenados no curso são referenciados, não duplicados
+        content_ids = self.storage.store_course_content_bulk(course_id, course_chunks)
+        total_chunks = len(content_ids)
         
         self.logger.info(f"Stored {total_chunks} content chunks")
         
@@ -464,7 +518,8 @@ class NpllmSystem:
         query: str,
         project_path: str = None,
         file_path: str = None,
-        course_context: Optional[int] = None
+        course_context: Optional[int] = None,
+        user_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Processa query do usuário
@@ -480,6 +535,7 @@ class NpllmSystem:
             project_path: Caminho do projeto (opcional)
             file_path: Caminho do arquivo (opcional)
             course_context: ID do curso para contexto (opcional)
+            user_id: Usuário da query; o histórico (RAG) vem só das conversas dele
         
         Returns:
             Resposta com metadados
@@ -496,11 +552,21 @@ class NpllmSystem:
             query_embedding = self.content_processor.generate_embedding(query)
             
             # Busca feedbacks similares (histórico de conversas)
-            similar_feedbacks = self.storage.search_similar(
-                query_embedding=query_embedding,
-                top_k=3,
-                min_score=0.7
-            )
+            if self.config.rag.hybrid_search:
+                similar_feedbacks = self.storage.search_similar_hybrid(
+                    query_text=query,
+                    query_embedding=query_embedding,
+                    top_k=3,
+                    min_score=0.7,
+                    user_id=user_id
+                )
+            else:
+                similar_feedbacks = self.storage.search_similar(
+                    query_embedding=query_embedding,
+                    top_k=3,
+                    min_score=0.7,
+                    user_id=user_id
+                )
             
             if similar_feedbacks:
                 history_context = "\n\nRelevant conversation history:\n"
@@ -517,8 +583,9 @@ class NpllmSystem:
         if course_context:
             try:
                 # Busca conteúdo relevante do curso
-                relevant_chunks = self.storage.search_course_content(
+                relevant_chunks = self.search_course_context(
                     course_context,
+                    query,
                     query_embedding,
                     top_k=3
                 )
@@ -576,6 +643,159 @@ class NpllmSystem:
         
         return result
     
+    def search_course_context(
+        self,
+        course_id: int,
+        query: str,
+        query_embedding: Optional[np.ndarray] = None,
+        top_k: int = 3
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca chunks do curso relevantes para a query
+        
+        Usa busca híbrida (full-text + vetorial) se `rag.hybrid_search`
+        estiver habilitado; caso contrário, apenas similaridade semântica.
+        
+        Args:
+            course_id: ID do curso
+            query: Texto da query
+            query_embedding: Embedding da query (gerado se não fornecido)
+            top_k: Número de chunks
+        
+        Returns:
+            Lista de chunks relevantes
+        """
+        if query_embedding is None:
+            query_embedding = self.content_processor.generate_embedding(query)
+        
+        if self.config.rag.hybrid_search:
+            return self.storage.search_course_content_hybrid(
+                course_id,
+                query,
+                query_embedding,
+                top_k=top_k
+            )
+        
+        return self.storage.search_course_content(
+            course_id,
+            query_embedding,
+            top_k=top_k
+        )
+    
+    def start_embedding_reindex(
+        self,
+        version: str,
+        model: str,
+        batch_size: int = 256,
+        background: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Troca o modelo de embedding sem downtime (re-indexação blue-green)
+        
+        Cria a versão (ou retoma uma versão em construção), re-gera os
+        embeddings com o novo modelo e, após a ativação no banco, passa a
+        usar o novo modelo nas queries e na ingestão.
+        
+        Args:
+            version: Nome da nova versão (ex: 'v2')
+            model: Modelo sentence-transformers da nova versão
+            batch_size: Linhas por lote
+            background: Se True, executa em uma thread
+        
+        Returns:
+            Status do job de re-indexação
+        """
+        if self.embedding_reindex_job and self.embedding_reindex_job.state in ("embedding", "indexing", "activating"):
+            raise RuntimeError(f"Embedding re-index {self.embedding_reindex_job.version} already running")
+        
+        processor = self._create_content_processor(model)
+        dim = processor.embedding_model.get_embedding_dim()
+        
+        existing = {v["name"]: v for v in self.storage.get_embedding_versions()}
+        if version not in existing:
+            self.storage.create_embedding_version(version, model, dim)
+        elif existing[version]["model"] != model or existing[version]["status"] == "active":
+            raise ValueError(f"Embedding version {version} already exists")
+        
+        self.embedding_reindex_job = EmbeddingReindexJob(
+            self.storage,
+            version,
+            processor.generate_embeddings,
+            batch_size=batch_size,
+            on_activated=lambda: self._use_content_processor(processor)
+        )
+        if background:
+            self.embedding_reindex_job.start()
+            return self.embedding_reindex_job.get_status()
+        return self.embedding_reindex_job.run()
+    
+    def _create_content_processor(self, model: Optional[str] = None) -> ContentProcessor:
+        """
+        Cria um ContentProcessor com a configuração de embeddings
+        
+        O modelo vem do registro do processo (carregado uma vez, sob demanda);
+        todos os processadores compartilham o cache de embeddings.
+        
+        Args:
+            model: Modelo de embedding (None = padrão do ContentProcessor)
+        """
+        embeddings_config = self.config.embeddings
+        kwargs = {"embedding_model": model} if model else {}
+        processor = ContentProcessor(
+            batch_size=embeddings_config.batch_size,
+            device=embeddings_config.device,
+            provider=embeddings_config.provider,
+            cache=self.embedding_cache,
+            **kwargs
+        )
+        
+        batching_config = embeddings_config.micro_batching
+        if batching_config.enabled:
+            processor.enable_micro_batching(batching_config.max_batch_size, batching_config.max_wait_ms)
+        return processor
+    
+    def _use_content_processor(self, processor: ContentProcessor):
+        """Passa a gerar embeddings com outro processador (após troca de versão)"""
+        previous = self.content_processor
+        self.content_processor = processor
+        self.course_validator.content_processor = processor
+        if self.feedback_buffer:
+            self.feedback_buffer.embed_fn = processor.generate_embeddings
+        
+        # Libera o micro-batcher e a memória do modelo anterior
+        if previous.batcher is not None:
+            previous.batcher.stop()
+        if previous.embedding_model_name != processor.embedding_model_name:
+            previous.registry.unload(previous.embedding_model_name, previous.device, previous.provider)
+        self.logger.info(f"Using embedding model {processor.embedding_model_name}")
+    
+    def _subscribe_invalidation(self, listener):
+        """
+        Liga os caches deste processo aos eventos de invalidação
+        
+        Mudanças em cursos, conteúdo ou conceitos limpam o cache de respostas;
+        adapters regravados são relidos do disco; uma troca de versão de
+        embedding feita por outro processo troca o ContentProcessor.
+        
+        Args:
+            listener: InvalidationListener do storage
+        """
+        listener.subscribe(
+            ["courses", "course_content", "learned_concepts"],
+            lambda scope, payload: self.base_model.clear_cache()
+        )
+        listener.subscribe(
+            ["adapters"],
+            lambda scope, payload: self.adapter_manager.invalidate(payload.get("adapter"))
+        )
+        listener.subscribe(["embedding_versions"], self._on_embedding_version_changed)
+    
+    def _on_embedding_version_changed(self, scope: str, payload: Dict[str, Any]):
+        """Carrega o modelo da versão de embedding ativa se ela mudou"""
+        active = self.storage.get_active_embedding_version()
+        if active and active["model"] != self.content_processor.embedding_model_name:
+            self._use_content_processor(self._create_content_processor(active["model"]))
+    
     def get_system_status(self) -> Dict[str, Any]:
         """
         Retorna status do sistema
@@ -587,12 +807,23 @@ class NpllmSystem:
             },
             "sleep_system": self.sleep.get_status(),
             "storage_status": "connected" if self.storage else "disconnected",
+            "storage_metrics": self.storage.get_metrics() if self.storage else None,
+            "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None,
+            "embedding_batcher": self.content_processor.batcher.get_stats() if self.content_processor.batcher else None,
             "courses_count": len(self.list_courses())
         }
     
     def close(self):
         """Fecha sistema"""
         self.logger.info("Closing npllm system...")
+        if getattr(self, 'embedding_reindex_job', None):
+            self.embedding_reindex_job.stop(timeout=30)
+        if getattr(self, 'feedback_buffer', None):
+            self.feedback_buffer.close()
+        if getattr(self, 'content_processor', None) and self.content_processor.batcher:
+            self.content_processor.batcher.stop()
+        if getattr(self, 'embedding_cache', None):
+            self.embedding_cache.close()
         if hasattr(self, 'storage') and self.storage:
             self.storage.close()
         if hasattr(self, 'base_model') and self.base_model and hasattr(self.base_model, 'unload_model'):
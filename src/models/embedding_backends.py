@@ -0,0 +1,108 @@
+"""
+Embedding backends
+Implementações de EmbeddingModelInterface escolhidas por embeddings.provider
+"""
+
+from typing import Callable, Dict, List
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from src.models.interfaces import EmbeddingModelInterface
+from src.utils.logging import get_logger
+
+
+DEFAULT_PROVIDER = "sentence_transformers"
+
+
+class SentenceTransformerEmbedding(EmbeddingModelInterface):
+    """Modelo SentenceTransformer em float32"""
+    
+    def __init__(self, model_name: str, device: str = "cpu"):
+        """
+        Args:
+            model_name: Nome do modelo (ex: sentence-transformers/all-MiniLM-L6-v2)
+            device: Device do modelo
+        """
+        self.logger = get_logger(self.__class__.__name__)
+        self.model_name = model_name
+        self.device = device
+        self.model = SentenceTransformer(model_name, device=device)
+    
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Gera embeddings para textos
+        
+        Args:
+            texts: Lista de textos
+            batch_size: Textos por forward pass
+        
+        Returns:
+            Array float32 contíguo (n, dim)
+        """
+        embeddings = self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True)
+        return np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+    
+    def get_embedding_dim(self) -> int:
+        """Retorna dimensão dos embeddings"""
+        return self.model.get_sentence_embedding_dimension()
+    
+    def get_model_name(self) -> str:
+        """Retorna nome do modelo"""
+        return self.model_name
+
+
+class QuantizedSentenceTransformerEmbedding(SentenceTransformerEmbedding):
+    """
+    SentenceTransformer com quantização dinâmica int8 (só CPU)
+    
+    As camadas Linear do transformer passam a usar pesos int8 e ativações
+    quantizadas em tempo de execução; o restante (embeddings, LayerNorm,
+    pooling) continua em float32. Os vetores diferem pouco dos do modelo
+    float32 (similaridade de cosseno tipicamente acima de 0.99), então
+    continuam compatíveis com os embeddings já armazenados.
+    """
+    
+    def __init__(self, model_name: str, device: str = "cpu"):
+        """
+        Args:
+            model_name: Nome do modelo
+            device: Device do modelo (precisa ser "cpu")
+        """
+        if device != "cpu":
+            raise ValueError(f"int8 embedding backend only runs on CPU, got device '{device}'")
+        
+        super().__init__(model_name, device)
+        torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        self.logger.info(f"Quantized embedding model {model_name} to int8")
+
+
+# embeddings.provider -> backend
+EMBEDDING_PROVIDERS: Dict[str, Callable[[str, str], EmbeddingModelInterface]] = {
+    "sentence_transformers": SentenceTransformerEmbedding,
+    "sentence_transformers_int8": QuantizedSentenceTransformerEmbedding,
+}
+
+
+def create_embedding_model(
+    model_name: str,
+    device: str = "cpu",
+    provider: str = DEFAULT_PROVIDER
+) -> EmbeddingModelInterface:
+    """
+    Cria o backend de embedding de um provider
+    
+    Args:
+        model_name: Nome do modelo
+        device: Device do modelo
+        provider: Chave de EMBEDDING_PROVIDERS (embeddings.provider)
+    
+    Returns:
+        Modelo de embedding
+    """
+    if provider not in EMBEDDING_PROVIDERS:
+        raise ValueError(
+            f"Unknown embedding provider '{provider}' "
+            f"(expected one of: {', '.join(EMBEDDING_PROVIDERS)})"
+        )
+    return EMBEDDING_PROVIDERS[provider](model_name, device)
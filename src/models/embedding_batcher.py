@@ -0,0 +1,160 @@
+"""
+Embedding micro-batcher
+Agrupa embeddings de requisições concorrentes em um único forward pass
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+from src.utils.logging import get_logger
+
+
+class EmbeddingMicroBatcher:
+    """
+    Micro-batching de embeddings entre threads
+    
+    Cada submit() enfileira um texto e devolve um Future. Uma thread
+    dedicada pega o primeiro texto da fila e espera até `max_wait_ms` por
+    outros (ou até juntar `max_batch_size`), então gera os embeddings do
+    lote em uma única chamada a `embed_fn` e resolve cada Future com a sua
+    linha. Sob carga, N requisições simultâneas viram um forward pass com
+    batch N em vez de N passes com batch 1; sem concorrência, o custo é no
+    máximo `max_wait_ms` por texto.
+    
+    Chamadores síncronos usam embed(); código asyncio pode aguardar
+    asyncio.wrap_future(submit(texto)) sem ocupar uma thread do pool.
+    """
+    
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        """
+        Args:
+            embed_fn: Função textos -> array (n, dim) (ex: ContentProcessor.generate_embeddings)
+            max_batch_size: Máximo de textos por lote
+            max_wait_ms: Espera máxima, a partir do primeiro texto, por outros textos
+        """
+        self.logger = get_logger(self.__class__.__name__)
+        self.embed_fn = embed_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        
+        self.batches = 0
+        self.texts = 0
+        self.largest_batch = 0
+    
+    def submit(self, text: str) -> Future:
+        """
+        Enfileira um texto
+        
+        Depois de stop(), o embedding é gerado na própria thread do chamador.
+        
+        Args:
+            text: Texto
+        
+        Returns:
+            Future com o embedding (dim,)
+        """
+        future: Future = Future()
+        with self._lock:
+            if not self._stopped:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+                self._queue.put((text, future))
+                return future
+        
+        future.set_running_or_notify_cancel()
+        self._resolve([text], [future])
+        return future
+    
+    def embed(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Gera o embedding de um texto (bloqueia até o lote ser processado)
+        
+        Args:
+            text: Texto
+            timeout: Espera máxima em segundos
+        
+        Returns:
+            Embedding (dim,)
+        """
+        return self.submit(text).result(timeout)
+    
+    def stop(self, timeout: float = 5.0):
+        """Processa os textos já enfileirados e para a thread"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+        
+        if thread is not None:
+            thread.join(timeout)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Lotes processados e tamanho médio/máximo"""
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0
+        }
+    
+    def _run(self):
+        """Laço da thread: monta lotes e os processa até a sentinela de parada"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            # Futures cancelados enquanto esperavam saem do lote
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._resolve([text for text, _ in batch], [future for _, future in batch])
+    
+    def _resolve(self, texts: List[str], futures: List[Future]):
+        """Gera os embeddings do lote e resolve os Futures"""
+        try:
+            embeddings = self.embed_fn(texts)
+        except Exception as e:
+            self.logger.warning(f"Embedding batch of {len(texts)} texts failed: {e}")
+            for future in futures:
+                future.set_exception(e)
+            return
+        
+        self.batches += 1
+        self.texts += len(texts)
+        self.largest_batch = max(self.largest_batch, len(texts))
+        for future, embedding in zip(futures, embeddings):
+            future.set_result(embedding)
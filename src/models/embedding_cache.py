@@ -0,0 +1,354 @@
+"""
+Embedding cache
+LRU in-memory tier plus memory-mapped on-disk tier, keyed by (model, text hash)
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from src.utils.logging import get_logger
+
+
+# Cabeçalho do arquivo em disco: última sequência gravada (u8), alinhado em 64 bytes
+DISK_HEADER_SIZE = 64
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza espaços (textos que só diferem em espaços têm a mesma chave)"""
+    return " ".join(text.split())
+
+
+def text_key(text: str) -> bytes:
+    """SHA-256 (32 bytes) do texto normalizado"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+
+
+class DiskEmbeddingTier:
+    """
+    Anel de registros (hash, sequência, vetor) em um arquivo mapeado em memória
+    
+    O arquivo tem capacidade fixa; ao encher, o registro mais antigo é
+    sobrescrito (FIFO). O cabeçalho guarda a última sequência gravada e o
+    registro de sequência n fica no slot (n - 1) % capacity, então todos os
+    processos que usam o arquivo avançam o mesmo anel. O índice hash -> slot
+    fica em memória e é reconstruído do arquivo ao abrir.
+    
+    Vários processos (ex: workers da API) podem compartilhar o arquivo:
+    put() aloca o slot e grava o registro sob lock exclusivo (flock em
+    `<arquivo>.lock`) e get() lê sob lock compartilhado. Um slot
+    sobrescrito por outro processo vira um miss; entradas gravadas por
+    outros processos só são vistas após reabrir o arquivo. Sem fcntl
+    (Windows), o arquivo não deve ser compartilhado entre processos.
+    """
+    
+    def __init__(self, path: str, dim: int, capacity: int):
+        """
+        Args:
+            path: Caminho do arquivo
+            dim: Dimensão dos vetores
+            capacity: Número de registros do arquivo
+        """
+        self.logger = get_logger(self.__class__.__name__)
+        self.path = Path(path)
+        self.dim = dim
+        self.capacity = capacity
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.path.with_name(self.path.name + ".lock"), "ab")
+        
+        dtype = np.dtype([("key", "u1", (32,)), ("seq", "<u8"), ("vector", "<f4", (dim,))])
+        size = DISK_HEADER_SIZE + capacity * dtype.itemsize
+        with self._file_lock(exclusive=True):
+            if self.path.exists() and self.path.stat().st_size != size:
+                self.logger.info(f"Embedding cache file {self.path.name} has a different layout, recreating")
+                self.path.unlink()
+            with open(self.path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            self._header = np.memmap(self.path, dtype="<u8", mode="r+", shape=(1,))
+            self._records = np.memmap(
+                self.path, dtype=dtype, mode="r+", offset=DISK_HEADER_SIZE, shape=(capacity,)
+            )
+            
+            # Slots em uso (seq > 0), do mais antigo ao mais novo
+            seqs = np.array(self._records["seq"])
+            used = np.flatnonzero(seqs)
+            used = used[np.argsort(seqs[used], kind="stable")]
+            self._slots: Dict[bytes, int] = {self._records["key"][slot].tobytes(): int(slot) for slot in used}
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        """
+        Lê o vetor de um hash
+        
+        Args:
+            key: Hash do texto
+        
+        Returns:
+            Cópia do vetor ou None
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        
+        with self._file_lock(exclusive=False):
+            record = self._records[slot]
+            if not record["seq"] or record["key"].tobytes() != key:
+                # Sobrescrito por outro processo
+                del self._slots[key]
+                return None
+            return np.array(record["vector"], dtype=np.float32)
+    
+    def put(self, key: bytes, vector: np.ndarray) -> bool:
+        """
+        Grava um vetor no próximo slot do anel
+        
+        Args:
+            key: Hash do texto
+            vector: Vetor (dim,)
+        
+        Returns:
+            True se um registro antigo foi descartado
+        """
+        with self._file_lock(exclusive=True):
+            slot = self._slots.get(key)
+            if slot is not None and self._records["seq"][slot] and self._records["key"][slot].tobytes() == key:
+                return False
+            
+            seq = int(self._header[0]) + 1
+            slot = (seq - 1) % self.capacity
+            record = self._records[slot]
+            evicted = bool(record["seq"])
+            if evicted:
+                old_key = record["key"].tobytes()
+                if self._slots.get(old_key) == slot:
+                    del self._slots[old_key]
+            
+            # seq = 0 durante a escrita: um crash no meio deixa o slot vazio
+            record["seq"] = 0
+            record["vector"] = vector
+            record["key"] = np.frombuffer(key, dtype=np.uint8)
+            record["seq"] = seq
+            self._header[0] = seq
+        
+        self._slots[key] = slot
+        return evicted
+    
+    def flush(self):
+        """Grava páginas alteradas no disco"""
+        self._header.flush()
+        self._records.flush()
+    
+    def close(self):
+        """Grava e libera o mapeamento"""
+        self.flush()
+        del self._header
+        del self._records
+        self._lock_file.close()
+    
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Lock entre processos (compartilhado para leitura, exclusivo para escrita)"""
+        if fcntl is None:
+            yield
+            return
+        
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+
+class EmbeddingCache:
+    """
+    Cache de embeddings por (modelo, hash do texto normalizado)
+    
+    Duas camadas: um LRU em memória (`memory_capacity` vetores) e, se
+    `disk_path` estiver definido, um arquivo mapeado em memória por modelo
+    (`disk_capacity` vetores, descarte FIFO) que sobrevive a reinícios.
+    Escritas vão para as duas camadas; um acerto em disco é promovido ao
+    LRU. Os vetores devolvidos são somente leitura.
+    """
+    
+    def __init__(
+        self,
+        memory_capacity: int = 10000,
+        disk_path: Optional[str] = None,
+        disk_capacity: int = 100000
+    ):
+        """
+        Args:
+            memory_capacity: Vetores no LRU em memória
+            disk_path: Diretório dos arquivos em disco (None = só memória)
+            disk_capacity: Vetores por arquivo em disco (por modelo)
+        """
+        self.logger = get_logger(self.__class__.__name__)
+        self.memory_capacity = memory_capacity
+        self.disk_path = Path(disk_path) if disk_path else None
+        self.disk_capacity = disk_capacity
+        
+        self._lock = threading.RLock()
+        self._memory: "OrderedDict[Tuple[str, bytes], np.ndarray]" = OrderedDict()
+        self._disk: Dict[str, DiskEmbeddingTier] = {}
+        
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+    
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Busca embeddings de vários textos
+        
+        Args:
+            model: Nome do modelo de embedding
+            texts: Textos
+        
+        Returns:
+            Embedding (somente leitura) ou None para cada texto
+        """
+        results = []
+        with self._lock:
+            disk = self._disk_tier(model)
+            for text in texts:
+                key = (model, text_key(text))
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                else:
+                    vector = disk.get(key[1]) if disk is not None else None
+                    if vector is not None:
+                        vector.flags.writeable = False
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+                    else:
+                        self.misses += 1
+                results.append(vector)
+        return results
+    
+    def put_many(self, model: str, texts: Sequence[str], embeddings: np.ndarray):
+        """
+        Armazena embeddings de vários textos
+        
+        Args:
+            model: Nome do modelo de embedding
+            texts: Textos
+            embeddings: Array (n, dim)
+        """
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if not len(texts):
+            return
+        
+        with self._lock:
+            disk = self._disk_tier(model, dim=embeddings.shape[1])
+            for text, embedding in zip(texts, embeddings):
+                key = (model, text_key(text))
+                vector = np.array(embedding, dtype=np.float32)
+                vector.flags.writeable = False
+                self._remember(key, vector)
+                if disk is not None and disk.put(key[1], vector):
+                    self.disk_evictions += 1
+    
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """Busca o embedding de um texto"""
+        return self.get_many(model, [text])[0]
+    
+    def put(self, model: str, text: str, embedding: np.ndarray):
+        """Armazena o embedding de um texto"""
+        self.put_many(model, [text], np.asarray(embedding)[None, :])
+    
+    def clear(self, model: Optional[str] = None):
+        """
+        Esvazia o LRU em memória (os arquivos em disco são mantidos)
+        
+        Args:
+            model: Limpa apenas este modelo (None = todos)
+        """
+        with self._lock:
+            for key in [key for key in self._memory if model is None or key[0] == model]:
+                del self._memory[key]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores de acerto/erro e ocupação"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions,
+                "memory_size": len(self._memory),
+                "memory_capacity": self.memory_capacity,
+                "disk_size": sum(len(disk) for disk in self._disk.values()),
+                "disk_capacity": self.disk_capacity
+            }
+    
+    def flush(self):
+        """Grava os arquivos em disco"""
+        with self._lock:
+            for disk in self._disk.values():
+                disk.flush()
+    
+    def close(self):
+        """Grava e fecha os arquivos em disco"""
+        with self._lock:
+            for disk in self._disk.values():
+                disk.close()
+            self._disk.clear()
+    
+    def _remember(self, key: Tuple[str, bytes], vector: np.ndarray):
+        """Insere no LRU, descartando o menos usado se cheio"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_capacity:
+            self._memory.popitem(last=False)
+            self.memory_evictions += 1
+    
+    def _disk_tier(self, model: str, dim: Optional[int] = None) -> Optional[DiskEmbeddingTier]:
+        """
+        Arquivo em disco do modelo (aberto sob demanda)
+        
+        Sem `dim`, abre um arquivo existente do modelo, se houver; com
+        `dim`, cria o arquivo se necessário.
+        """
+        if self.disk_path is None or self.disk_capacity <= 0:
+            return None
+        
+        disk = self._disk.get(model)
+        if disk is not None and (dim is None or disk.dim == dim):
+            return disk
+        
+        slug = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        if dim is None:
+            pattern = re.compile(rf"{re.escape(slug)}\.(\d+)\.emb")
+            existing = sorted(
+                (path for path in self.disk_path.glob("*.emb") if pattern.fullmatch(path.name)),
+                key=lambda path: path.stat().st_mtime
+            )
+            if not existing:
+                return None
+            dim = int(pattern.fullmatch(existing[-1].name).group(1))
+        
+        if disk is not None:
+            disk.close()
+        disk = DiskEmbeddingTier(self.disk_path / f"{slug}.{dim}.emb", dim, self.disk_capacity)
+        self._disk[model] = disk
+        self.logger.info(f"Opened embedding cache {disk.path.name} ({len(disk)} vectors)")
+        return disk
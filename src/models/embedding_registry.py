@@ -0,0 +1,105 @@
+"""
+Embedding model registry
+Carrega cada modelo de embedding uma única vez por processo, sob demanda
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.models.embedding_backends import DEFAULT_PROVIDER, create_embedding_model
+from src.utils.logging import get_logger
+
+
+class EmbeddingModelRegistry:
+    """
+    Registro de modelos de embedding compartilhado pelo processo
+    
+    Modelos são indexados por (nome, device, provider) e carregados na primeira vez
+    que alguém os pede. O carregamento usa um lock por chave: threads que
+    pedem o mesmo modelo esperam um único carregamento, e modelos
+    diferentes carregam em paralelo. Depois de carregado, get() não toma
+    lock nenhum.
+    """
+    
+    def __init__(self, loader: Optional[Callable[[str, str, str], Any]] = None):
+        """
+        Args:
+            loader: Função (nome, device, provider) -> modelo (padrão: create_embedding_model)
+        """
+        self.logger = get_logger(self.__class__.__name__)
+        self._loader = loader or create_embedding_model
+        self._models: Dict[Tuple[str, str, str], Any] = {}
+        self._key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, model_name: str, device: str = "cpu", provider: str = DEFAULT_PROVIDER) -> Any:
+        """
+        Obtém um modelo, carregando-o se ainda não estiver em memória
+        
+        Args:
+            model_name: Nome do modelo (ex: sentence-transformers/all-MiniLM-L6-v2)
+            device: Device do modelo
+            provider: Backend (embeddings.provider)
+        
+        Returns:
+            Modelo carregado (EmbeddingModelInterface)
+        """
+        key = (model_name, device, provider)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                self.logger.info(f"Loading embedding model {model_name} on {device} ({provider})")
+                model = self._loader(model_name, device, provider)
+                self._models[key] = model
+        return model
+    
+    def warm_up(self, model_names: List[str], device: str = "cpu", provider: str = DEFAULT_PROVIDER):
+        """
+        Carrega modelos antecipadamente (ex: no startup da API)
+        
+        Args:
+            model_names: Modelos a carregar
+            device: Device dos modelos
+            provider: Backend dos modelos
+        """
+        for model_name in model_names:
+            self.get(model_name, device, provider)
+    
+    def is_loaded(self, model_name: str, device: str = "cpu", provider: str = DEFAULT_PROVIDER) -> bool:
+        """Modelo já está em memória"""
+        return (model_name, device, provider) in self._models
+    
+    def unload(self, model_name: str, device: str = "cpu", provider: str = DEFAULT_PROVIDER):
+        """
+        Remove um modelo do registro (ex: após a troca de versão de embedding)
+        
+        Quem ainda o pedir depois disso causa um novo carregamento.
+        """
+        with self._lock:
+            if self._models.pop((model_name, device, provider), None) is not None:
+                self.logger.info(f"Unloaded embedding model {model_name} on {device}")
+    
+    def loaded_models(self) -> List[Tuple[str, str, str]]:
+        """Chaves (nome, device, provider) dos modelos em memória"""
+        return list(self._models)
+
+
+_registry_instance: Optional[EmbeddingModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_embedding_registry() -> EmbeddingModelRegistry:
+    """Get global embedding model registry"""
+    global _registry_instance
+    if _registry_instance is None:
+        with _registry_lock:
+            if _registry_instance is None:
+                _registry_instance = EmbeddingModelRegistry()
+    return _registry_instance
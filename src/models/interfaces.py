@@ -5,6 +5,7 @@ Permite trocar implementações facilmente
 
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
+import numpy as np
 import torch
 
 
@@ -12,7 +13,7 @@ class EmbeddingModelInterface(ABC):
     """Interface para modelos de embedding (plugável)"""
     
     @abstractmethod
-    def encode(self, texts: List[str], batch_size: int = 32) -> torch.Tensor:
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
         """
         Gera embeddings para textos
         
@@ -21,7 +22,7 @@ class EmbeddingModelInterface(ABC):
             batch_size: Tamanho do batch para processamento
         
         Returns:
-            Tensor com embeddings [num_texts, embedding_dim]
+            Array float32 com embeddings [num_texts, embedding_dim]
         """
         pass
     
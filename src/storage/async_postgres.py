@@ -0,0 +1,1262 @@
+"""
+Async PostgreSQL + pgvector storage
+Non-blocking storage for the API server (psycopg 3 async pool)
+"""
+
+import json
+import uuid
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+import numpy as np
+
+try:
+    from psycopg_pool import AsyncConnectionPool, PoolTimeout
+    from pgvector.psycopg import register_vector_async
+except ImportError:
+    AsyncConnectionPool = None
+    PoolTimeout = None
+    register_vector_async = None
+
+from src.storage.postgres import VectorSearchMixin, EMBEDDING_DIM_QUERY
+from src.storage.instrumentation import StorageMetrics, AsyncInstrumentedPool, instrumented
+from src.utils.config import get_config
+from src.utils.logging import get_logger
+from src.utils.hashing import content_hash
+
+
+@instrumented
+class AsyncPostgreSQLStorage(VectorSearchMixin):
+    """
+    Interface assíncrona para PostgreSQL + pgvector
+    
+    Espelha os métodos de leitura, escrita e busca de PostgreSQLStorage como
+    corrotinas, para que o servidor FastAPI não bloqueie o event loop
+    enquanto espera o banco. Schema, migrações e manutenção (partições,
+    índices por contexto, marca d'água do sono) continuam no armazenamento
+    síncrono, que é inicializado antes.
+    """
+    
+    def __init__(self):
+        """Configura o pool assíncrono (aberto em open())"""
+        if AsyncConnectionPool is None:
+            raise ImportError(
+                "Async storage requires psycopg 3: pip install 'psycopg[binary]' psycopg-pool"
+            )
+        
+        self.logger = get_logger(self.__class__.__name__)
+        self.config = get_config()
+        db_config = self.config.database
+        
+        self.connection_params = {
+            "host": db_config.host,
+            "port": db_config.port,
+            "dbname": db_config.database,
+            "user": db_config.user,
+            "password": db_config.password
+        }
+        
+        self._configure_vector_search(self.config)
+        self.pgvector_version: Tuple[int, ...] = (0,)
+        
+        # Latência por método e espera no pool (getconn aguarda até o timeout do pool)
+        self.metrics = StorageMetrics(enabled=db_config.metrics)
+        self.pool = AsyncInstrumentedPool(
+            AsyncConnectionPool(
+                kwargs=self.connection_params,
+                min_size=max(1, min(db_config.pool_min_idle, db_config.pool_size)),
+                max_size=db_config.pool_size + db_config.max_overflow,
+                timeout=db_config.pool_timeout,
+                max_lifetime=db_config.pool_recycle or float("inf"),
+                check=AsyncConnectionPool.check_connection if db_config.pool_pre_ping else None,
+                configure=register_vector_async,
+                open=False
+            ),
+            self.metrics,
+            exhausted_errors=(PoolTimeout,)
+        )
+    
+    async def open(self):
+        """Abre o pool e detecta a versão do pgvector"""
+        await self.pool.open()
+        
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = await cursor.fetchone()
+            self.pgvector_version = tuple(int(part) for part in str(row[0]).split("."))
+        except Exception:
+            self.pgvector_version = (0,)
+        finally:
+            await self._release(conn, cursor)
+        
+        # Dimensão da versão de embedding ativa (schema criado pelo backend síncrono)
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute(EMBEDDING_DIM_QUERY)
+            self._set_embedding_dim(await cursor.fetchone())
+        except Exception:
+            self._set_embedding_dim(None)
+        finally:
+            await self._release(conn, cursor)
+        
+        self._resolve_vector_storage()
+        self.logger.info("Async PostgreSQL storage initialized")
+    
+    async def _release(self, conn, cursor=None):
+        """Fecha o cursor, encerra transação pendente e devolve a conexão ao pool"""
+        if cursor is not None:
+            await cursor.close()
+        if not conn.closed:
+            await conn.rollback()
+        await self.pool.putconn(conn)
+    
+    async def _apply_search_settings(self, cursor, top_k: int):
+        """
+        Ajusta parâmetros HNSW da transação atual para uma busca filtrada
+        
+        Args:
+            cursor: Cursor da transação da busca
+            top_k: Número de resultados desejados
+        """
+        for statement, params in self._search_settings(top_k):
+            await cursor.execute(statement, params)
+    
+    @staticmethod
+    def _isoformat(value: Any) -> Any:
+        """Converte datetime para string ISO (como em PostgreSQLStorage)"""
+        if value and hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+    
+    async def store_feedback(
+        self,
+        prompt: str,
+        response: str,
+        score: float,
+        implicit_score: Optional[float] = None,
+        emotional_score: Optional[float] = None,
+        context: Optional[str] = None,
+        embedding: Optional[np.ndarray] = None,
+        user_id: Optional[str] = None
+    ) -> int:
+        """
+        Armazena feedback no banco
+        
+        Args:
+            prompt: Prompt original
+            response: Resposta gerada
+            score: Score total (0.7 * implícito + 0.3 * emocional)
+            implicit_score: Score implícito
+            emotional_score: Score emocional
+            context: Contexto (ex: 'python', 'odoo')
+            embedding: Embedding vetorial (opcional)
+            user_id: Usuário dono do feedback (opcional)
+        
+        Returns:
+            ID do feedback armazenado
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                INSERT INTO feedback (
+                    prompt, response, score, implicit_score, emotional_score, context, embedding, user_id
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (prompt, response, score, implicit_score, emotional_score, context, embedding, user_id))
+            
+            feedback_id = (await cursor.fetchone())[0]
+            await conn.commit()
+            
+            self.logger.debug(f"Feedback stored with ID: {feedback_id}")
+            return feedback_id
+        
+        except Exception as e:
+            self.logger.error(f"Error storing feedback: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def get_all_feedbacks(self) -> List[Dict[str, Any]]:
+        """
+        Retorna todos os feedbacks
+        
+        Returns:
+            Lista de feedbacks
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT id, prompt, response, score, implicit_score, emotional_score, context, created_at
+                FROM feedback
+                ORDER BY created_at DESC
+            """)
+            
+            feedbacks = []
+            for row in await cursor.fetchall():
+                feedbacks.append({
+                    "id": row[0],
+                    "prompt": row[1],
+                    "response": row[2],
+                    "score": row[3],
+                    "implicit_score": row[4],
+                    "emotional_score": row[5],
+                    "context": row[6],
+                    "created_at": row[7]
+                })
+            
+            return feedbacks
+        
+        except Exception as e:
+            self.logger.error(f"Error getting feedbacks: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def iter_feedback_batches(
+        self,
+        score_threshold: float = 0.7,
+        after_id: int = 0,
+        batch_size: int = 1000
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Percorre feedbacks positivos em lotes com cursor server-side
+        
+        Args:
+            score_threshold: Score mínimo (exclusivo)
+            after_id: Retorna apenas feedbacks com ID maior que este
+            batch_size: Número de linhas por lote
+        
+        Yields:
+            Listas de até `batch_size` feedbacks, em ordem de ID
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor(name=f"feedback_stream_{uuid.uuid4().hex}")
+        try:
+            await cursor.execute("""
+                SELECT id, prompt, response, score, implicit_score, emotional_score, context, created_at
+                FROM feedback
+                WHERE id > %s AND score > %s
+                ORDER BY id
+            """, (after_id, score_threshold))
+            
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                
+                yield [
+                    {
+                        "id": row[0],
+                        "prompt": row[1],
+                        "response": row[2],
+                        "score": row[3],
+                        "implicit_score": row[4],
+                        "emotional_score": row[5],
+                        "context": row[6],
+                        "created_at": row[7]
+                    }
+                    for row in rows
+                ]
+        
+        except Exception as e:
+            self.logger.error(f"Error streaming feedbacks: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def get_important_examples(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Retorna exemplos importantes para replay
+        
+        Args:
+            limit: Número máximo de exemplos
+        
+        Returns:
+            Lista de exemplos importantes
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT id, prompt, response, score, context, created_at
+                FROM important_examples
+                ORDER BY score DESC, created_at DESC
+                LIMIT %s
+            """, (limit,))
+            
+            examples = []
+            for row in await cursor.fetchall():
+                examples.append({
+                    "id": row[0],
+                    "prompt": row[1],
+                    "response": row[2],
+                    "score": row[3],
+                    "context": row[4],
+                    "created_at": row[5]
+                })
+            
+            return examples
+        
+        except Exception as e:
+            self.logger.error(f"Error getting important examples: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def add_important_example(
+        self,
+        prompt: str,
+        response: str,
+        score: float,
+        context: Optional[str] = None,
+        embedding: Optional[np.ndarray] = None
+    ):
+        """
+        Adiciona exemplo importante para replay
+        
+        Args:
+            prompt: Prompt original
+            response: Resposta gerada
+            score: Score do exemplo
+            context: Contexto
+            embedding: Embedding vetorial
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                INSERT INTO important_examples (prompt, response, score, context, embedding)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (prompt, response, score, context, embedding))
+            
+            await conn.commit()
+            self.logger.debug("Important example added")
+        
+        except Exception as e:
+            self.logger.error(f"Error adding important example: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def search_similar(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        context: Optional[str] = None,
+        min_score: float = 0.7,
+        user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca feedbacks similares por embedding
+        
+        Args:
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+            context: Filtrar por contexto (opcional)
+            min_score: Score mínimo
+            user_id: Buscar só no histórico do usuário (None = todos)
+        
+        Returns:
+            Lista de feedbacks similares
+        """
+        where = self._feedback_filter(context, user_id)
+        
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await self._apply_search_settings(cursor, top_k)
+            await cursor.execute(self._knn_query(
+                columns="t.id, t.prompt, t.response, t.score, t.context",
+                table="feedback",
+                where=where,
+                query="%(query)s::vector",
+                limit="%(top_k)s"
+            ), {
+                "query": np.asarray(query_embedding, dtype=np.float32),
+                "min_score": min_score,
+                "context": context,
+                "user_id": user_id,
+                "top_k": top_k
+            })
+            
+            results = []
+            for row in await cursor.fetchall():
+                results.append({
+                    "id": row[0],
+                    "prompt": row[1],
+                    "response": row[2],
+                    "score": row[3],
+                    "context": row[4],
+                    "similarity": float(row[5])
+                })
+            
+            # Iterative scan "relaxed_order" pode retornar fora de ordem
+            results.sort(key=lambda r: r["similarity"], reverse=True)
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"Error searching similar: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def search_similar_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 5,
+        context: Optional[str] = None,
+        min_score: float = 0.7,
+        user_id: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Busca feedbacks similares para várias queries em um único statement
+        
+        Args:
+            query_embeddings: Array (n, 384) com embeddings das queries
+            top_k: Número de resultados por query
+            context: Filtrar por contexto (opcional)
+            min_score: Score mínimo
+            user_id: Buscar só no histórico do usuário (None = todos)
+        
+        Returns:
+            Lista com n listas de feedbacks similares (na ordem das queries)
+        """
+        queries = self._as_query_batch(query_embeddings)
+        if not queries:
+            return []
+        
+        where = self._feedback_filter(context, user_id)
+        
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await self._apply_search_settings(cursor, top_k)
+            knn = self._knn_query(
+                columns="t.id, t.prompt, t.response, t.score, t.context",
+                table="feedback",
+                where=where,
+                query="q.embedding",
+                limit="%(top_k)s"
+            )
+            await cursor.execute(f"""
+                SELECT q.ord, r.id, r.prompt, r.response, r.score, r.context, r.similarity
+                FROM unnest(%(queries)s::vector[]) WITH ORDINALITY AS q(embedding, ord)
+                CROSS JOIN LATERAL ({knn}) r
+                ORDER BY q.ord, r.similarity DESC
+            """, {
+                "queries": queries,
+                "min_score": min_score,
+                "context": context,
+                "user_id": user_id,
+                "top_k": top_k
+            })
+            
+            results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+            for row in await cursor.fetchall():
+                results[row[0] - 1].append({
+                    "id": row[1],
+                    "prompt": row[2],
+                    "response": row[3],
+                    "score": row[4],
+                    "context": row[5],
+                    "similarity": float(row[6])
+                })
+            
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"Error in batch similar search: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def search_similar_hybrid(
+        self,
+        query_text: str,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        context: Optional[str] = None,
+        min_score: float = 0.7,
+        user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca feedbacks combinando full-text e similaridade semântica (RRF)
+        
+        Args:
+            query_text: Texto da query (para o ranking lexical)
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+            context: Filtrar por contexto (opcional)
+            min_score: Score mínimo
+            user_id: Buscar só no histórico do usuário (None = todos)
+        
+        Returns:
+            Lista de feedbacks ordenada por `rrf_score`
+        """
+        where = self._feedback_filter(context, user_id)
+        candidates = max(self.hybrid_candidates, top_k)
+        
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await self._apply_search_settings(cursor, candidates)
+            await cursor.execute(self._hybrid_query(
+                columns="t.id, t.prompt, t.response, t.score, t.context",
+                table="feedback",
+                where=where
+            ), {
+                "query": np.asarray(query_embedding, dtype=np.float32),
+                "query_text": query_text,
+                "min_score": min_score,
+                "context": context,
+                "user_id": user_id,
+                "candidates": candidates,
+                "rrf_k": self.rrf_k,
+                "top_k": top_k
+            })
+            
+            results = []
+            for row in await cursor.fetchall():
+                results.append({
+                    "id": row[0],
+                    "prompt": row[1],
+                    "response": row[2],
+                    "score": row[3],
+                    "context": row[4],
+                    "similarity": float(row[5]) if row[5] is not None else 0.0,
+                    "rrf_score": float(row[6])
+                })
+            
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"Error in hybrid similar search: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def store_course(
+        self,
+        name: str,
+        description: str,
+        source_type: str,
+        source_path: str
+    ) -> int:
+        """
+        Armazena um novo curso
+        
+        Args:
+            name: Nome do curso
+            description: Descrição do curso
+            source_type: Tipo de fonte ('url', 'file', 'directory', 'text')
+            source_path: Caminho/URL da fonte
+        
+        Returns:
+            ID do curso criado
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                INSERT INTO courses (name, description, source_type, source_path)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+            """, (name, description, source_type, source_path))
+            
+            course_id = (await cursor.fetchone())[0]
+            await conn.commit()
+            
+            self.logger.debug(f"Course stored with ID: {course_id}")
+            return course_id
+        
+        except Exception as e:
+            self.logger.error(f"Error storing course: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def get_course(self, course_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Obtém um curso por ID
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Dicionário com informações do curso ou None
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT id, name, description, source_type, source_path, status, created_at, updated_at
+                FROM courses
+                WHERE id = %s
+            """, (course_id,))
+            
+            row = await cursor.fetchone()
+            if not row:
+                return None
+            
+            return {
+                "id": row[0],
+                "name": row[1],
+                "description": row[2],
+                "source_type": row[3],
+                "source_path": row[4],
+                "status": row[5],
+                "created_at": self._isoformat(row[6]),
+                "updated_at": self._isoformat(row[7]) if row[7] else None
+            }
+        
+        except Exception as e:
+            self.logger.error(f"Error getting course: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def get_all_courses(self) -> List[Dict[str, Any]]:
+        """
+        Retorna todos os cursos
+        
+        Returns:
+            Lista de cursos
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT id, name, description, source_type, source_path, status, created_at, updated_at,
+                       content_chunks, concepts_learned
+                FROM courses
+                ORDER BY created_at DESC
+            """)
+            
+            courses = []
+            for row in await cursor.fetchall():
+                courses.append({
+                    "id": row[0],
+                    "name": row[1],
+                    "description": row[2],
+                    "source_type": row[3],
+                    "source_path": row[4],
+                    "status": row[5],
+                    "created_at": self._isoformat(row[6]),
+                    "updated_at": self._isoformat(row[7]) if row[7] else None,
+                    "content_chunks": row[8],
+                    "concepts_learned": row[9]
+                })
+            
+            return courses
+        
+        except Exception as e:
+            self.logger.error(f"Error getting all courses: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def get_course_status(self, course_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Obtém status de um curso com contadores de chunks e conceitos
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Dicionário com status do curso ou None
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT id, name, status, content_chunks, concepts_learned, created_at, updated_at
+                FROM courses
+                WHERE id = %s
+            """, (course_id,))
+            
+            row = await cursor.fetchone()
+            if not row:
+                return None
+            
+            return {
+                "id": row[0],
+                "name": row[1],
+                "status": row[2],
+                "content_chunks": row[3],
+                "concepts_learned": row[4],
+                "created_at": self._isoformat(row[5]),
+                "updated_at": self._isoformat(row[6]) if row[6] else None
+            }
+        
+        except Exception as e:
+            self.logger.error(f"Error getting course status: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def update_course_status(self, course_id: int, status: str):
+        """
+        Atualiza status de um curso
+        
+        Args:
+            course_id: ID do curso
+            status: Novo status
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                UPDATE courses
+                SET status = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (status, course_id))
+            
+            await conn.commit()
+            self.logger.debug(f"Course {course_id} status updated to {status}")
+        
+        except Exception as e:
+            self.logger.error(f"Error updating course status: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def store_course_content(
+        self,
+        course_id: int,
+        title: str,
+        content: str,
+        chunk_index: int,
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding: Optional[np.ndarray] = None
+    ) -> int:
+        """
+        Armazena conteúdo de um curso
+        
+        Args:
+            course_id: ID do curso
+            title: Título do chunk
+            content: Conteúdo do chunk
+            chunk_index: Índice do chunk
+            metadata: Metadados adicionais (JSON)
+            embedding: Embedding vetorial
+        
+        Returns:
+            ID do conteúdo armazenado (ou do chunk idêntico já existente no curso)
+        """
+        chunk_hash = content_hash(content)
+        
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                WITH inserted AS (
+                    INSERT INTO course_content (
+                        course_id, title, content, chunk_index, metadata, embedding, content_hash
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (content_hash, course_id) DO NOTHING
+                    RETURNING id
+                )
+                SELECT id FROM inserted
+                UNION ALL
+                SELECT id FROM course_content WHERE content_hash = %s AND course_id = %s
+                LIMIT 1
+            """, (
+                course_id,
+                title,
+                content,
+                chunk_index,
+                json.dumps(metadata) if metadata else None,
+                embedding,
+                chunk_hash,
+                chunk_hash,
+                course_id
+            ))
+            
+            content_id = (await cursor.fetchone())[0]
+            await conn.commit()
+            
+            self.logger.debug(f"Course content stored with ID: {content_id}")
+            return content_id
+        
+        except Exception as e:
+            self.logger.error(f"Error storing course content: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def store_course_content_bulk(
+        self,
+        course_id: int,
+        chunks: List[Dict[str, Any]]
+    ) -> List[int]:
+        """
+        Armazena vários chunks de um curso em uma única transação
+        
+        Usa executemany em pipeline (psycopg 3), sem um round trip por chunk.
+        Chunks cujo conteúdo já existe no curso não são inseridos de novo; o
+        ID existente é retornado.
+        
+        Args:
+            course_id: ID do curso
+            chunks: Chunks processados (content, chunk_index, metadata, embedding
+                e opcionalmente title e content_hash; sem title, usa metadata['title'])
+        
+        Returns:
+            IDs dos conteúdos (na ordem dos chunks)
+        """
+        if not chunks:
+            return []
+        
+        rows = []
+        for chunk in chunks:
+            metadata = chunk.get('metadata')
+            title = chunk.get('title')
+            if title is None:
+                title = (metadata or {}).get('title', '')
+            chunk_hash = chunk.get('content_hash') or content_hash(chunk['content'])
+            rows.append((
+                course_id,
+                title,
+                chunk['content'],
+                chunk['chunk_index'],
+                json.dumps(metadata) if metadata else None,
+                chunk.get('embedding'),
+                chunk_hash,
+                chunk_hash,
+                course_id
+            ))
+        
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.executemany("""
+                WITH inserted AS (
+                    INSERT INTO course_content (
+                        course_id, title, content, chunk_index, metadata, embedding, content_hash
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (content_hash, course_id) DO NOTHING
+                    RETURNING id
+                )
+                SELECT id FROM inserted
+                UNION ALL
+                SELECT id FROM course_content WHERE content_hash = %s AND course_id = %s
+                LIMIT 1
+            """, rows, returning=True)
+            
+            content_ids = []
+            while True:
+                content_ids.append((await cursor.fetchone())[0])
+                if not cursor.nextset():
+                    break
+            await conn.commit()
+            
+            self.logger.debug(f"Stored {len(content_ids)} course content chunks for course {course_id}")
+            return content_ids
+        
+        except Exception as e:
+            self.logger.error(f"Error storing course content in bulk: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def get_course_content(self, course_id: int) -> List[Dict[str, Any]]:
+        """
+        Obtém todo o conteúdo de um curso
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Lista de chunks de conteúdo
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT id, title, content, chunk_index, metadata, created_at
+                FROM course_content
+                WHERE course_id = %s
+                ORDER BY chunk_index ASC
+            """, (course_id,))
+            
+            content = []
+            for row in await cursor.fetchall():
+                content.append({
+                    "id": row[0],
+                    "title": row[1],
+                    "content": row[2],
+                    "chunk_index": row[3],
+                    "metadata": self._load_json(row[4]),
+                    "created_at": row[5]
+                })
+            
+            return content
+        
+        except Exception as e:
+            self.logger.error(f"Error getting course content: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def get_course_content_count(self, course_id: int) -> int:
+        """
+        Conta número de chunks de conteúdo de um curso
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Número de chunks
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT COUNT(*) FROM course_content
+                WHERE course_id = %s
+            """, (course_id,))
+            
+            return (await cursor.fetchone())[0]
+        
+        except Exception as e:
+            self.logger.error(f"Error counting course content: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def search_course_content(
+        self,
+        course_id: int,
+        query_embedding: np.ndarray,
+        top_k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca conteúdo de curso por similaridade semântica
+        
+        Args:
+            course_id: ID do curso
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+        
+        Returns:
+            Lista de chunks similares
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await self._apply_search_settings(cursor, top_k)
+            await cursor.execute(self._knn_query(
+                columns="t.id, t.title, t.content, t.chunk_index, t.metadata",
+                table="course_content",
+                where="t.course_id = %(course_id)s AND t.embedding IS NOT NULL",
+                query="%(query)s::vector",
+                limit="%(top_k)s"
+            ), {
+                "query": np.asarray(query_embedding, dtype=np.float32),
+                "course_id": course_id,
+                "top_k": top_k
+            })
+            
+            results = []
+            for row in await cursor.fetchall():
+                results.append({
+                    "id": row[0],
+                    "title": row[1],
+                    "content": row[2],
+                    "chunk_index": row[3],
+                    "metadata": self._load_json(row[4]),
+                    "similarity": float(row[5])
+                })
+            
+            results.sort(key=lambda r: r["similarity"], reverse=True)
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"Error searching course content: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def search_course_content_batch(
+        self,
+        course_id: int,
+        query_embeddings: np.ndarray,
+        top_k: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Busca conteúdo de curso para várias queries em um único statement
+        
+        Args:
+            course_id: ID do curso
+            query_embeddings: Array (n, 384) com embeddings das queries
+            top_k: Número de resultados por query
+        
+        Returns:
+            Lista com n listas de chunks similares (na ordem das queries)
+        """
+        queries = self._as_query_batch(query_embeddings)
+        if not queries:
+            return []
+        
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await self._apply_search_settings(cursor, top_k)
+            knn = self._knn_query(
+                columns="t.id, t.title, t.content, t.chunk_index, t.metadata",
+                table="course_content",
+                where="t.course_id = %(course_id)s AND t.embedding IS NOT NULL",
+                query="q.embedding",
+                limit="%(top_k)s"
+            )
+            await cursor.execute(f"""
+                SELECT q.ord, r.id, r.title, r.content, r.chunk_index, r.metadata, r.similarity
+                FROM unnest(%(queries)s::vector[]) WITH ORDINALITY AS q(embedding, ord)
+                CROSS JOIN LATERAL ({knn}) r
+                ORDER BY q.ord, r.similarity DESC
+            """, {
+                "queries": queries,
+                "course_id": course_id,
+                "top_k": top_k
+            })
+            
+            results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+            for row in await cursor.fetchall():
+                results[row[0] - 1].append({
+                    "id": row[1],
+                    "title": row[2],
+                    "content": row[3],
+                    "chunk_index": row[4],
+                    "metadata": self._load_json(row[5]),
+                    "similarity": float(row[6])
+                })
+            
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"Error in batch course content search: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def search_course_content_hybrid(
+        self,
+        course_id: int,
+        query_text: str,
+        query_embedding: np.ndarray,
+        top_k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca conteúdo de curso combinando full-text e similaridade semântica (RRF)
+        
+        Args:
+            course_id: ID do curso
+            query_text: Texto da query (para o ranking lexical)
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+        
+        Returns:
+            Lista de chunks ordenada por `rrf_score`
+        """
+        candidates = max(self.hybrid_candidates, top_k)
+        
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await self._apply_search_settings(cursor, candidates)
+            await cursor.execute(self._hybrid_query(
+                columns="t.id, t.title, t.content, t.chunk_index, t.metadata",
+                table="course_content",
+                where="t.course_id = %(course_id)s"
+            ), {
+                "query": np.asarray(query_embedding, dtype=np.float32),
+                "query_text": query_text,
+                "course_id": course_id,
+                "candidates": candidates,
+                "rrf_k": self.rrf_k,
+                "top_k": top_k
+            })
+            
+            results = []
+            for row in await cursor.fetchall():
+                results.append({
+                    "id": row[0],
+                    "title": row[1],
+                    "content": row[2],
+                    "chunk_index": row[3],
+                    "metadata": self._load_json(row[4]),
+                    "similarity": float(row[5]) if row[5] is not None else 0.0,
+                    "rrf_score": float(row[6])
+                })
+            
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"Error in hybrid course content search: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def store_learned_concept(
+        self,
+        course_id: int,
+        concept_name: str,
+        description: str,
+        examples: Optional[List[Dict[str, Any]]] = None,
+        patterns: Optional[List[Dict[str, Any]]] = None,
+        confidence: float = 0.5
+    ) -> int:
+        """
+        Armazena um conceito aprendido de um curso
+        
+        Args:
+            course_id: ID do curso
+            concept_name: Nome do conceito
+            description: Descrição do conceito
+            examples: Lista de exemplos
+            patterns: Lista de padrões
+            confidence: Confiança no conceito (0.0 a 1.0)
+        
+        Returns:
+            ID do conceito armazenado
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                INSERT INTO learned_concepts (course_id, concept_name, description, examples, patterns, confidence)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (
+                course_id,
+                concept_name,
+                description,
+                json.dumps(examples) if examples else None,
+                json.dumps(patterns) if patterns else None,
+                confidence
+            ))
+            
+            concept_id = (await cursor.fetchone())[0]
+            await conn.commit()
+            
+            self.logger.debug(f"Learned concept stored with ID: {concept_id}")
+            return concept_id
+        
+        except Exception as e:
+            self.logger.error(f"Error storing learned concept: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def get_learned_concepts(self, course_id: int) -> List[Dict[str, Any]]:
+        """
+        Obtém todos os conceitos aprendidos de um curso
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Lista de conceitos aprendidos
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT id, concept_name, description, examples, patterns, confidence, created_at
+                FROM learned_concepts
+                WHERE course_id = %s
+                ORDER BY confidence DESC, created_at DESC
+            """, (course_id,))
+            
+            concepts = []
+            for row in await cursor.fetchall():
+                concepts.append({
+                    "id": row[0],
+                    "concept_name": row[1],
+                    "description": row[2],
+                    "examples": self._load_json(row[3]),
+                    "patterns": self._load_json(row[4]),
+                    "confidence": row[5],
+                    "created_at": row[6]
+                })
+            
+            return concepts
+        
+        except Exception as e:
+            self.logger.error(f"Error getting learned concepts: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    async def get_learned_concepts_count(self, course_id: int) -> int:
+        """
+        Conta número de conceitos aprendidos de um curso
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Número de conceitos
+        """
+        conn = await self.pool.getconn()
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT COUNT(*) FROM learned_concepts
+                WHERE course_id = %s
+            """, (course_id,))
+            
+            return (await cursor.fetchone())[0]
+        
+        except Exception as e:
+            self.logger.error(f"Error counting learned concepts: {e}")
+            raise
+        
+        finally:
+            await self._release(conn, cursor)
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Métricas de latência por método e do pool de conexões
+        
+        Returns:
+            Snapshot de StorageMetrics
+        """
+        return self.metrics.snapshot()
+    
+    def reset_metrics(self):
+        """Zera as métricas"""
+        self.metrics.reset()
+    
+    async def close(self):
+        """Fecha pool de conexões"""
+        await self.pool.close()
+        self.logger.info("Async PostgreSQL storage closed")
@@ -0,0 +1,264 @@
+"""
+Memory export
+Arrow IPC / Parquet snapshots of feedback, examples and course memory for offline training
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from src.storage.postgres import EXPORT_COLUMNS, VECTOR_TABLES
+from src.utils.logging import get_logger
+
+
+# Extensão dos arquivos por formato
+EXPORT_FORMATS = {
+    "arrow": ".arrow",
+    "parquet": ".parquet"
+}
+
+# Linhas por lote lido do banco (e por row group no Parquet)
+EXPORT_BATCH_SIZE = 10000
+
+
+def _require_pyarrow():
+    """Falha com instrução de instalação quando o pyarrow não está disponível"""
+    if pa is None:
+        raise ImportError("Memory export requires pyarrow: pip install pyarrow")
+
+
+def export_schema(table: str, embedding_dim: int) -> "pa.Schema":
+    """
+    Schema Arrow de uma tabela exportada
+    
+    Args:
+        table: Tabela de EXPORT_COLUMNS
+        embedding_dim: Dimensão da coluna `embedding` (tabelas de VECTOR_TABLES)
+    
+    Returns:
+        Schema com as colunas de EXPORT_COLUMNS e, se houver, `embedding`
+        como fixed_size_list<float32>[embedding_dim]
+    """
+    _require_pyarrow()
+    types = {
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+        "json": pa.string(),
+        "timestamp": pa.timestamp("us")
+    }
+    fields = [pa.field(name, types[kind]) for name, kind in EXPORT_COLUMNS[table]]
+    if table in VECTOR_TABLES:
+        fields.append(pa.field("embedding", pa.list_(pa.float32(), embedding_dim)))
+    return pa.schema(fields, metadata={"table": table})
+
+
+def export_memory(
+    storage,
+    output_dir: str,
+    tables: Optional[List[str]] = None,
+    format: str = "arrow",
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Exporta tabelas da memória para arquivos Arrow IPC ou Parquet
+    
+    Os lotes de storage.iter_export_batches são gravados conforme chegam,
+    então a memória usada é a de um lote, qualquer que seja o tamanho da
+    tabela. Cada arquivo é gravado em `<nome>.tmp` e renomeado no fim: um
+    arquivo exportado nunca fica pela metade.
+    
+    Args:
+        storage: PostgreSQLStorage ou SQLiteStorage
+        output_dir: Diretório dos arquivos (`<tabela>.arrow` ou `<tabela>.parquet`)
+        tables: Tabelas exportadas (padrão: todas de EXPORT_COLUMNS)
+        format: "arrow" (IPC sem compressão, lido com memory map) ou "parquet" (zstd)
+        batch_size: Linhas por lote
+    
+    Returns:
+        Tabela -> {"path", "rows"}
+    """
+    _require_pyarrow()
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {format} (expected one of {sorted(EXPORT_FORMATS)})")
+    
+    logger = get_logger("MemoryExport")
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    
+    result = {}
+    for table in tables or list(EXPORT_COLUMNS):
+        if table not in EXPORT_COLUMNS:
+            raise ValueError(f"Unknown export table: {table}")
+        
+        schema = export_schema(table, storage.embedding_dim)
+        path = output / f"{table}{EXPORT_FORMATS[format]}"
+        temp_path = path.with_name(path.name + ".tmp")
+        
+        rows = 0
+        if format == "parquet":
+            writer = pq.ParquetWriter(str(temp_path), schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_file(str(temp_path), schema)
+        try:
+            for columns, embeddings, valid in storage.iter_export_batches(table, batch_size=batch_size):
+                batch = _record_batch(schema, columns, embeddings, valid)
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        except BaseException:
+            writer.close()
+            temp_path.unlink(missing_ok=True)
+            raise
+        writer.close()
+        temp_path.replace(path)
+        
+        result[table] = {"path": str(path), "rows": rows}
+        logger.info(f"Exported {rows} rows from {table} to {path}")
+    
+    return result
+
+
+def _record_batch(
+    schema: "pa.Schema",
+    columns: Dict[str, tuple],
+    embeddings: Optional[np.ndarray],
+    valid: Optional[np.ndarray]
+) -> "pa.RecordBatch":
+    """Monta um RecordBatch a partir de um lote colunar do storage"""
+    arrays = []
+    for field in schema:
+        if field.name == "embedding":
+            dim = field.type.list_size
+            values = pa.array(np.ascontiguousarray(embeddings, dtype=np.float32).reshape(-1))
+            arrays.append(pa.FixedSizeListArray.from_arrays(values, dim, mask=pa.array(~valid)))
+        else:
+            arrays.append(pa.array(columns[field.name], type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class MemoryExportReader:
+    """
+    Leitor de um arquivo exportado por export_memory
+    
+    Arquivos `.arrow` são mapeados em memória: os lotes (e as matrizes de
+    embeddings de embeddings()) são vistas sobre o arquivo, sem cópia, então
+    iterar milhões de exemplos não cria objetos Python nem carrega o
+    arquivo na RAM; o sistema operacional pagina o que for lido.
+    Arquivos `.parquet` são descomprimidos lote a lote.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Abre o arquivo
+        
+        Args:
+            path: Arquivo `.arrow` ou `.parquet`
+        """
+        _require_pyarrow()
+        self.path = Path(path)
+        self._source = None
+        
+        if self.path.suffix == EXPORT_FORMATS["parquet"]:
+            self._parquet = pq.ParquetFile(str(self.path), memory_map=True)
+            self.schema = self._parquet.schema_arrow
+            self.num_rows = self._parquet.metadata.num_rows
+        else:
+            self._source = pa.memory_map(str(self.path), "r")
+            self._parquet = None
+            self._ipc = pa.ipc.open_file(self._source)
+            self.schema = self._ipc.schema
+            self.num_rows = sum(
+                self._ipc.get_batch(i).num_rows for i in range(self._ipc.num_record_batches)
+            )
+    
+    @property
+    def table(self) -> str:
+        """Tabela de origem (metadado do schema)"""
+        return (self.schema.metadata or {}).get(b"table", b"").decode()
+    
+    def iter_batches(
+        self,
+        columns: Optional[List[str]] = None,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> Iterator["pa.RecordBatch"]:
+        """
+        Itera o arquivo em RecordBatches
+        
+        Args:
+            columns: Colunas lidas (padrão: todas)
+            batch_size: Linhas por lote
+        
+        Yields:
+            RecordBatches de até batch_size linhas
+        """
+        if self._parquet is not None:
+            yield from self._parquet.iter_batches(batch_size=batch_size, columns=columns)
+            return
+        
+        for i in range(self._ipc.num_record_batches):
+            batch = self._ipc.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            for start in range(0, batch.num_rows, batch_size):
+                yield batch.slice(start, batch_size)
+    
+    def iter_embeddings(self, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Itera IDs e embeddings, pulando linhas sem embedding
+        
+        Args:
+            batch_size: Linhas por lote
+        
+        Yields:
+            (ids, embeddings): arrays (n,) int64 e (n, dim) float32
+        """
+        for batch in self.iter_batches(columns=["id", "embedding"], batch_size=batch_size):
+            column = batch.column("embedding")
+            ids = batch.column("id").to_numpy()
+            embeddings = self.embeddings(batch)
+            if column.null_count:
+                present = ~column.is_null().to_numpy(zero_copy_only=False)
+                ids, embeddings = ids[present], embeddings[present]
+            yield ids, embeddings
+    
+    @staticmethod
+    def embeddings(batch: "pa.RecordBatch") -> np.ndarray:
+        """
+        Coluna `embedding` de um lote como matriz NumPy
+        
+        Em arquivos `.arrow` é uma vista sobre o arquivo mapeado (somente
+        leitura, sem cópia). Linhas sem embedding vêm zeradas.
+        
+        Args:
+            batch: Lote de iter_batches com a coluna `embedding`
+        
+        Returns:
+            Matriz float32 (n, dim)
+        """
+        column = batch.column("embedding")
+        dim = column.type.list_size
+        values = column.values.slice(column.offset * dim, len(column) * dim)
+        if values.null_count:
+            # Parquet grava as linhas nulas com valores nulos (exige cópia)
+            values = values.fill_null(0.0)
+        return values.to_numpy(zero_copy_only=False).reshape(len(column), dim)
+    
+    def close(self):
+        """Libera o mapeamento"""
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+    
+    def __enter__(self) -> "MemoryExportReader":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
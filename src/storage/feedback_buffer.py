@@ -0,0 +1,349 @@
+"""
+Write-behind feedback buffer
+Batches feedback writes off the request path with a durable on-disk journal
+"""
+
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable
+import numpy as np
+
+from src.utils.logging import get_logger
+
+
+class FeedbackWriteBuffer:
+    """
+    Buffer write-behind de feedback
+    
+    add() grava o feedback em um journal JSONL (append + fsync) e o enfileira
+    em memória; uma thread grava os pendentes no PostgreSQL em lote
+    (store_feedback_batch) ao atingir `batch_size` ou a cada `flush_interval`
+    segundos. Os embeddings dos prompts são gerados em lote na gravação.
+    
+    Durante a gravação, o journal é renomeado para `.inflight` e novos
+    feedbacks vão para um journal novo; o `.inflight` só é removido após o
+    commit. Na inicialização, os arquivos são relidos e reenviados. Cada
+    feedback tem um `client_id`, então reenviar um lote já gravado não
+    duplica linhas.
+    
+    add() nunca grava no banco. Com `max_size` feedbacks em memória (banco
+    lento ou fora do ar), os seguintes vão só para o arquivo `.overflow`
+    (append + fsync) e são contados em `overflowed`; a gravação os traz de
+    volta para a fila, `max_size` por vez, conforme o banco aceita os lotes.
+    A memória fica limitada e nenhum feedback é descartado.
+    """
+    
+    def __init__(
+        self,
+        storage,
+        embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+        max_size: int = 1000,
+        batch_size: int = 100,
+        flush_interval: float = 2.0,
+        spill_path: str = "./data/feedback_buffer.jsonl",
+        fsync: bool = True
+    ):
+        """
+        Inicializa buffer e reenfileira feedbacks de uma execução anterior
+        
+        Args:
+            storage: Instância de PostgreSQLStorage
+            embed_fn: Função que gera embeddings (n, dim) para uma lista de textos (opcional)
+            max_size: Máximo de feedbacks pendentes em memória; acima disso os
+                novos ficam só no arquivo de overflow
+            batch_size: Número de pendentes que dispara a gravação
+            flush_interval: Intervalo máximo (segundos) entre gravações
+            spill_path: Caminho do journal em disco
+            fsync: Força o journal para o disco a cada feedback
+        """
+        self.logger = get_logger(self.__class__.__name__)
+        self.storage = storage
+        self.embed_fn = embed_fn
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        
+        self.spill_path = Path(spill_path)
+        self.inflight_path = self.spill_path.with_name(self.spill_path.name + ".inflight")
+        self.overflow_path = self.spill_path.with_name(self.spill_path.name + ".overflow")
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # _lock protege _pending e o journal; _flush_lock serializa gravações
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        
+        # Feedbacks só no arquivo de overflow (ainda fora de _pending)
+        self._overflow = 0
+        self.overflowed = 0
+        
+        self._pending: List[Dict[str, Any]] = self._recover()
+        self._spill = open(self.spill_path, "a", encoding="utf-8")
+        
+        self._thread = threading.Thread(target=self._run, name="feedback-flush", daemon=True)
+        self._thread.start()
+        
+        if self._pending:
+            recovered = len(self._pending) + self._overflow
+            self.logger.info(f"Recovered {recovered} buffered feedbacks from {self.spill_path}")
+            self._wakeup.set()
+        
+        self.logger.info("Feedback write buffer initialized")
+    
+    def __len__(self) -> int:
+        """Número de feedbacks ainda não gravados (excluindo o lote em gravação)"""
+        with self._lock:
+            return len(self._pending) + self._overflow
+    
+    def add(
+        self,
+        prompt: str,
+        response: str,
+        score: float,
+        implicit_score: Optional[float] = None,
+        emotional_score: Optional[float] = None,
+        context: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> str:
+        """
+        Enfileira feedback para gravação em lote
+        
+        Args:
+            prompt: Prompt original
+            response: Resposta gerada
+            score: Score total
+            implicit_score: Score implícito
+            emotional_score: Score emocional
+            context: Contexto (ex: 'python', 'odoo')
+            user_id: Usuário dono do feedback (opcional)
+        
+        Returns:
+            client_id do feedback
+        """
+        if self._closed:
+            raise RuntimeError("Feedback buffer is closed")
+        
+        record = {
+            "client_id": str(uuid.uuid4()),
+            "created_at": datetime.now().isoformat(),
+            "prompt": prompt,
+            "response": response,
+            "score": score,
+            "implicit_score": implicit_score,
+            "emotional_score": emotional_score,
+            "context": context,
+            "user_id": user_id
+        }
+        
+        with self._lock:
+            # Fila cheia (banco lento ou indisponível): só em disco, até a fila esvaziar
+            if self._overflow or len(self._pending) >= self.max_size:
+                self._append_journal(self.overflow_path, [record])
+                self._overflow += 1
+                self.overflowed += 1
+                if self._overflow == 1:
+                    self.logger.warning(
+                        f"Feedback buffer full ({self.max_size} pending), "
+                        f"spilling new feedbacks to {self.overflow_path}"
+                    )
+            else:
+                self._spill.write(json.dumps(record) + "\n")
+                self._spill.flush()
+                if self.fsync:
+                    os.fsync(self._spill.fileno())
+                self._pending.append(record)
+            pending = len(self._pending) + self._overflow
+        
+        if pending >= self.batch_size:
+            self._wakeup.set()
+        
+        return record["client_id"]
+    
+    def flush(self) -> int:
+        """
+        Grava os feedbacks pendentes, um lote (transação) de até `max_size`
+        por vez, até esvaziar também o overflow
+        
+        Returns:
+            Número de feedbacks inseridos
+        """
+        inserted = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    self._refill_from_overflow()
+                    if not self._pending:
+                        return inserted
+                    batch = self._pending
+                    self._pending = []
+                    self._rotate_spill()
+                
+                try:
+                    inserted += self.storage.store_feedback_batch(self._with_embeddings(batch))
+                except Exception:
+                    # Devolve o lote à fila e ao journal para a próxima tentativa
+                    with self._lock:
+                        self._pending = batch + self._pending
+                        self._restore_inflight()
+                    raise
+                
+                self.inflight_path.unlink(missing_ok=True)
+                self.logger.debug(f"Flushed {len(batch)} buffered feedbacks")
+                
+                with self._lock:
+                    if not self._overflow:
+                        return inserted
+    
+    def close(self):
+        """Para a thread de gravação e grava os pendentes"""
+        if self._closed:
+            return
+        
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=30)
+        
+        try:
+            self.flush()
+        except Exception as e:
+            self.logger.error(f"Error flushing feedback buffer on close, kept in {self.spill_path}: {e}")
+        finally:
+            with self._lock:
+                self._spill.close()
+        
+        self.logger.info("Feedback write buffer closed")
+    
+    def _run(self):
+        """Loop da thread de gravação (tamanho ou intervalo)"""
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._closed:
+                break
+            
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.warning(f"Feedback flush failed, will retry: {e}")
+    
+    def _with_embeddings(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Adiciona embeddings dos prompts ao lote (sem embeddings se o modelo falhar)"""
+        if self.embed_fn is None:
+            return batch
+        
+        try:
+            embeddings = np.asarray(
+                self.embed_fn([record["prompt"] for record in batch]),
+                dtype=np.float32
+            )
+        except Exception as e:
+            self.logger.warning(f"Error embedding buffered feedbacks, storing without embeddings: {e}")
+            return batch
+        
+        return [
+            {**record, "embedding": embedding}
+            for record, embedding in zip(batch, embeddings)
+        ]
+    
+    def _refill_from_overflow(self):
+        """Move feedbacks do overflow para a fila até `max_size` (com _lock)"""
+        room = self.max_size - len(self._pending)
+        if not self._overflow or room <= 0:
+            return
+        
+        records = self._read_journal(self.overflow_path)
+        moved, rest = records[:room], records[room:]
+        
+        # Journal antes do overflow: um crash no meio duplica, e _recover deduplica
+        self._spill.write("".join(json.dumps(record) + "\n" for record in moved))
+        self._spill.flush()
+        if self.fsync:
+            os.fsync(self._spill.fileno())
+        self._pending.extend(moved)
+        
+        if rest:
+            self._write_journal(rest, self.overflow_path)
+        else:
+            self.overflow_path.unlink(missing_ok=True)
+        self._overflow = len(rest)
+    
+    def _rotate_spill(self):
+        """Move o journal atual para `.inflight` e abre um novo (com _lock)"""
+        self._spill.close()
+        os.replace(self.spill_path, self.inflight_path)
+        self._spill = open(self.spill_path, "a", encoding="utf-8")
+    
+    def _restore_inflight(self):
+        """Junta `.inflight` de volta ao início do journal (com _lock)"""
+        self._spill.close()
+        self._write_journal(self._read_journal(self.inflight_path) + self._read_journal(self.spill_path))
+        self.inflight_path.unlink(missing_ok=True)
+        self._spill = open(self.spill_path, "a", encoding="utf-8")
+    
+    def _recover(self) -> List[Dict[str, Any]]:
+        """Relê journal, `.inflight` e overflow de uma execução anterior"""
+        records = (
+            self._read_journal(self.inflight_path)
+            + self._read_journal(self.spill_path)
+            + self._read_journal(self.overflow_path)
+        )
+        
+        # Um crash entre a reescrita do journal e a remoção do .inflight duplica linhas
+        seen = set()
+        unique = []
+        for record in records:
+            if record["client_id"] not in seen:
+                seen.add(record["client_id"])
+                unique.append(record)
+        
+        # Acima de max_size, o excedente continua só em disco
+        pending, rest = unique[:self.max_size], unique[self.max_size:]
+        if rest:
+            self._write_journal(rest, self.overflow_path)
+        else:
+            self.overflow_path.unlink(missing_ok=True)
+        self._overflow = len(rest)
+        
+        self._write_journal(pending)
+        self.inflight_path.unlink(missing_ok=True)
+        return pending
+    
+    def _read_journal(self, path: Path) -> List[Dict[str, Any]]:
+        """Lê registros JSONL, ignorando uma última linha truncada por crash"""
+        if not path.exists():
+            return []
+        
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    self.logger.warning(f"Skipping corrupt line in {path}")
+        return records
+    
+    def _append_journal(self, path: Path, records: List[Dict[str, Any]]):
+        """Acrescenta registros a um arquivo JSONL"""
+        with open(path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+    
+    def _write_journal(self, records: List[Dict[str, Any]], path: Optional[Path] = None):
+        """Reescreve o journal (ou outro arquivo JSONL) de forma atômica"""
+        path = path or self.spill_path
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
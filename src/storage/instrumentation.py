@@ -0,0 +1,347 @@
+"""
+Storage instrumentation
+Per-method latency, rows and connection pool histograms for the storage backends
+"""
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+# Limites dos buckets de latência (segundos): 10µs a ~84s, dobrando
+LATENCY_BUCKETS = tuple(1e-5 * 2 ** i for i in range(24))
+
+# Limites dos buckets de linhas retornadas: 0, 1, 2, 4, ... 2^20
+ROW_BUCKETS = (0,) + tuple(2 ** i for i in range(21))
+
+# Métodos públicos que não são medidos
+UNINSTRUMENTED = frozenset({"get_metrics", "reset_metrics", "close"})
+
+
+class Histogram:
+    """
+    Histograma de buckets fixos (contagem, soma e máximo)
+    
+    Percentis são estimados pelo limite superior do bucket onde caem, então
+    a precisão é a largura do bucket (fator 2 nos buckets padrão). Não é
+    thread-safe: quem registra deve segurar o lock do StorageMetrics.
+    """
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        """
+        Args:
+            bounds: Limites superiores dos buckets (crescentes); valores acima
+                do último caem em um bucket extra
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, value: float):
+        """Registra um valor"""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+    
+    def percentile(self, q: float) -> float:
+        """
+        Estima o percentil `q` (0 a 1)
+        
+        Returns:
+            Limite superior do bucket do percentil (máximo observado no bucket extra)
+        """
+        if not self.count:
+            return 0.0
+        
+        target = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target and bucket_count:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+    
+    def summary(self, scale: float = 1.0) -> Dict[str, float]:
+        """
+        Resumo do histograma
+        
+        Args:
+            scale: Multiplicador dos valores (ex: 1000 para segundos -> ms)
+        
+        Returns:
+            Dicionário com count, mean, max, p50, p95 e p99
+        """
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count * scale, 4) if self.count else 0.0,
+            "max": round(self.max * scale, 4),
+            "p50": round(self.percentile(0.50) * scale, 4),
+            "p95": round(self.percentile(0.95) * scale, 4),
+            "p99": round(self.percentile(0.99) * scale, 4)
+        }
+
+
+class StorageMetrics:
+    """
+    Métricas de um backend de armazenamento
+    
+    Registra, por método público, a latência (wall time) e o número de
+    linhas retornadas, e no pool de conexões o tempo de espera por uma
+    conexão e os eventos de pool esgotado. Cada registro custa duas
+    leituras de relógio, um bisect e um lock sem contenção (alguns
+    microssegundos), desprezível frente a um round trip ao banco.
+    """
+    
+    def __init__(self, enabled: bool = True):
+        """
+        Args:
+            enabled: Desligado, os métodos instrumentados não registram nada
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Zera todas as métricas"""
+        with self._lock:
+            self._latency: Dict[str, Histogram] = {}
+            self._rows: Dict[str, Histogram] = {}
+            self._errors: Dict[str, int] = {}
+            self._pool_wait = Histogram(LATENCY_BUCKETS)
+            self._pool_exhausted = 0
+            self._since = datetime.now()
+    
+    def record(self, method: str, seconds: float, rows: Optional[int] = None, error: bool = False):
+        """
+        Registra uma chamada de método
+        
+        Args:
+            method: Nome do método
+            seconds: Duração da chamada
+            rows: Linhas retornadas (None se o retorno não for uma coleção)
+            error: A chamada levantou exceção
+        """
+        with self._lock:
+            latency = self._latency.get(method)
+            if latency is None:
+                latency = self._latency[method] = Histogram(LATENCY_BUCKETS)
+                self._rows[method] = Histogram(ROW_BUCKETS)
+                self._errors[method] = 0
+            latency.observe(seconds)
+            if rows is not None:
+                self._rows[method].observe(rows)
+            if error:
+                self._errors[method] += 1
+    
+    def record_pool_wait(self, seconds: float):
+        """Registra o tempo gasto obtendo uma conexão do pool"""
+        with self._lock:
+            self._pool_wait.observe(seconds)
+    
+    def record_pool_exhausted(self):
+        """Registra uma requisição de conexão recusada por pool esgotado"""
+        with self._lock:
+            self._pool_exhausted += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Cópia das métricas desde o último reset
+        
+        Returns:
+            Dicionário com `methods` (latência em ms, linhas e erros por
+            método, do mais lento no total para o mais rápido) e `pool`
+        """
+        with self._lock:
+            methods = {
+                method: {
+                    "latency_ms": latency.summary(scale=1000),
+                    "total_ms": round(latency.total * 1000, 3),
+                    "rows": self._rows[method].summary(),
+                    "errors": self._errors[method]
+                }
+                for method, latency in sorted(self._latency.items(), key=lambda item: -item[1].total)
+            }
+            return {
+                "enabled": self.enabled,
+                "since": self._since.isoformat(),
+                "methods": methods,
+                "pool": {
+                    "wait_ms": self._pool_wait.summary(scale=1000),
+                    "exhausted": self._pool_exhausted
+                }
+            }
+
+
+def count_rows(result: Any) -> Optional[int]:
+    """
+    Número de linhas de um retorno de método de storage
+    
+    Listas contam seus itens (listas de listas, a soma, como nas buscas em
+    lote) e dicionários contam como uma linha; escalares (IDs, contagens) e
+    None não são registrados.
+    """
+    if isinstance(result, list):
+        if result and isinstance(result[0], list):
+            return sum(len(item) for item in result)
+        return len(result)
+    if isinstance(result, dict):
+        return 1
+    return None
+
+
+def instrumented(cls):
+    """
+    Decorador de classe: mede os métodos públicos em `self.metrics`
+    
+    Funções comuns, corrotinas e geradores síncronos ou assíncronos (medidos
+    do início ao fim da iteração, somando as linhas de todos os lotes) são
+    suportados. Chamadas feitas antes de `self.metrics` existir (durante o
+    __init__) não são medidas.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or name in UNINSTRUMENTED or not inspect.isfunction(method):
+            continue
+        setattr(cls, name, _instrument(name, method))
+    return cls
+
+
+def _instrument(name: str, method: Callable) -> Callable:
+    """Envolve um método conforme o tipo (função, corrotina ou gerador)"""
+    clock = time.perf_counter
+    
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator_wrapper(self, *args, **kwargs):
+            metrics = self.__dict__.get("metrics")
+            if metrics is None or not metrics.enabled:
+                yield from method(self, *args, **kwargs)
+                return
+            
+            start = clock()
+            rows = 0
+            try:
+                for batch in method(self, *args, **kwargs):
+                    rows += count_rows(batch) or 0
+                    yield batch
+            except BaseException as e:
+                metrics.record(name, clock() - start, rows, error=not isinstance(e, GeneratorExit))
+                raise
+            metrics.record(name, clock() - start, rows)
+        return generator_wrapper
+    
+    if inspect.isasyncgenfunction(method):
+        @functools.wraps(method)
+        async def async_generator_wrapper(self, *args, **kwargs):
+            metrics = self.__dict__.get("metrics")
+            if metrics is None or not metrics.enabled:
+                async for batch in method(self, *args, **kwargs):
+                    yield batch
+                return
+            
+            start = clock()
+            rows = 0
+            try:
+                async for batch in method(self, *args, **kwargs):
+                    rows += count_rows(batch) or 0
+                    yield batch
+            except BaseException as e:
+                metrics.record(name, clock() - start, rows, error=not isinstance(e, GeneratorExit))
+                raise
+            metrics.record(name, clock() - start, rows)
+        return async_generator_wrapper
+    
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def coroutine_wrapper(self, *args, **kwargs):
+            metrics = self.__dict__.get("metrics")
+            if metrics is None or not metrics.enabled:
+                return await method(self, *args, **kwargs)
+            
+            start = clock()
+            try:
+                result = await method(self, *args, **kwargs)
+            except Exception:
+                metrics.record(name, clock() - start, error=True)
+                raise
+            metrics.record(name, clock() - start, count_rows(result))
+            return result
+        return coroutine_wrapper
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.__dict__.get("metrics")
+        if metrics is None or not metrics.enabled:
+            return method(self, *args, **kwargs)
+        
+        start = clock()
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception:
+            metrics.record(name, clock() - start, error=True)
+            raise
+        metrics.record(name, clock() - start, count_rows(result))
+        return result
+    return wrapper
+
+
+class InstrumentedPool:
+    """
+    Pool de conexões que mede a espera por conexão e o esgotamento
+    
+    Envolve um pool com getconn/putconn (psycopg2 ou psycopg_pool); demais
+    atributos são repassados ao pool original.
+    """
+    
+    def __init__(self, pool, metrics: StorageMetrics, exhausted_errors: Tuple[type, ...] = ()):
+        """
+        Args:
+            pool: Pool original
+            metrics: Destino das métricas
+            exhausted_errors: Exceções de getconn que indicam pool esgotado
+        """
+        self._pool = pool
+        self._metrics = metrics
+        self._exhausted_errors = exhausted_errors
+    
+    def getconn(self, *args, **kwargs):
+        """Obtém conexão registrando o tempo de espera"""
+        if not self._metrics.enabled:
+            return self._pool.getconn(*args, **kwargs)
+        
+        start = time.perf_counter()
+        try:
+            conn = self._pool.getconn(*args, **kwargs)
+        except self._exhausted_errors:
+            self._metrics.record_pool_exhausted()
+            raise
+        self._metrics.record_pool_wait(time.perf_counter() - start)
+        return conn
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+
+class AsyncInstrumentedPool(InstrumentedPool):
+    """InstrumentedPool para pools assíncronos (getconn aguardável)"""
+    
+    async def getconn(self, *args, **kwargs):
+        """Obtém conexão registrando o tempo de espera"""
+        if not self._metrics.enabled:
+            return await self._pool.getconn(*args, **kwargs)
+        
+        start = time.perf_counter()
+        try:
+            conn = await self._pool.getconn(*args, **kwargs)
+        except self._exhausted_errors:
+            self._metrics.record_pool_exhausted()
+            raise
+        self._metrics.record_pool_wait(time.perf_counter() - start)
+        return conn
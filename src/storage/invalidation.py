@@ -0,0 +1,182 @@
+"""
+Cross-process cache invalidation
+LISTEN/NOTIFY subscriber that tells every worker when shared data changes
+"""
+
+import json
+import select
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import psycopg2
+from psycopg2 import sql
+
+from src.utils.logging import get_logger
+
+
+# Canal do NOTIFY (triggers de PostgreSQLStorage e notify_invalidation)
+INVALIDATION_CHANNEL = "npllm_invalidation"
+
+# Escopo curinga: assinantes recebem todos os eventos; também é o escopo do
+# evento emitido após uma reconexão (notificações perdidas no intervalo)
+ALL_SCOPES = "*"
+
+# Intervalo máximo (segundos) entre verificações do pedido de parada
+LISTEN_POLL_SECONDS = 1.0
+
+# Espera entre tentativas de reconexão (dobra até o máximo)
+RECONNECT_DELAY_SECONDS = 1.0
+MAX_RECONNECT_DELAY_SECONDS = 30.0
+
+
+class InvalidationListener:
+    """
+    Thread que escuta o canal de invalidação e chama os assinantes
+    
+    Cada evento tem um escopo (nome da tabela alterada, ex: `course_content`,
+    ou um escopo de aplicação como `adapters`) e um payload JSON. Os
+    callbacks rodam na thread do listener e devem ser rápidos (limpar um
+    dicionário, marcar algo como obsoleto).
+    
+    A conexão de LISTEN é dedicada (fora do pool) e reaberta se cair; como
+    notificações enviadas enquanto ela estava fora são perdidas, a
+    reconexão emite um evento ALL_SCOPES, que invalida tudo.
+    """
+    
+    def __init__(self, connect: Callable[[], Any], channel: str = INVALIDATION_CHANNEL):
+        """
+        Args:
+            connect: Função que abre uma conexão psycopg2 nova
+            channel: Canal escutado
+        """
+        self.logger = get_logger(self.__class__.__name__)
+        self._connect = connect
+        self.channel = channel
+        self._subscribers: Dict[str, List[Callable[[str, Dict[str, Any]], None]]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._listening = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn = None
+        self.events_received = 0
+    
+    def subscribe(self, scopes: Iterable[str], callback: Callable[[str, Dict[str, Any]], None]):
+        """
+        Registra um callback para escopos
+        
+        Args:
+            scopes: Escopos de interesse (ALL_SCOPES recebe todos)
+            callback: Chamado com (escopo, payload) a cada evento
+        """
+        with self._lock:
+            for scope in scopes:
+                self._subscribers[scope].append(callback)
+    
+    def start(self, wait: float = 5.0) -> bool:
+        """
+        Inicia a thread
+        
+        Args:
+            wait: Segundos esperando o LISTEN ficar ativo
+        
+        Returns:
+            True se o LISTEN ficou ativo dentro do prazo
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+            self._thread.start()
+        return self._listening.wait(wait)
+    
+    def stop(self, timeout: float = 5.0):
+        """Para a thread e fecha a conexão de LISTEN"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    @property
+    def listening(self) -> bool:
+        """LISTEN ativo"""
+        return self._listening.is_set()
+    
+    def dispatch(self, scope: str, payload: Optional[Dict[str, Any]] = None):
+        """
+        Entrega um evento aos assinantes do escopo e aos de ALL_SCOPES
+        
+        Um evento ALL_SCOPES vai para todos os assinantes.
+        
+        Args:
+            scope: Escopo do evento
+            payload: Dados do evento
+        """
+        payload = payload or {}
+        with self._lock:
+            if scope == ALL_SCOPES:
+                callbacks = [callback for callbacks in self._subscribers.values() for callback in callbacks]
+            else:
+                callbacks = self._subscribers.get(scope, []) + self._subscribers.get(ALL_SCOPES, [])
+        
+        # Um callback registrado para vários escopos roda uma vez por evento
+        for callback in dict.fromkeys(callbacks):
+            try:
+                callback(scope, payload)
+            except Exception as e:
+                self.logger.warning(f"Cache invalidation callback failed for '{scope}': {e}")
+    
+    def _run(self):
+        """Laço da thread: conecta, escuta e reconecta com backoff"""
+        delay = RECONNECT_DELAY_SECONDS
+        connected_before = False
+        
+        while not self._stop.is_set():
+            try:
+                self._conn = self._connect()
+                self._conn.autocommit = True
+                cursor = self._conn.cursor()
+                cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                cursor.close()
+                self._listening.set()
+                delay = RECONNECT_DELAY_SECONDS
+                
+                if connected_before:
+                    self.logger.info("Cache invalidation listener reconnected, invalidating all caches")
+                    self.dispatch(ALL_SCOPES, {"reason": "reconnect"})
+                connected_before = True
+                
+                self._listen()
+            
+            except (psycopg2.Error, OSError) as e:
+                self._listening.clear()
+                self.logger.warning(f"Cache invalidation listener disconnected: {e}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY_SECONDS)
+            
+            finally:
+                self._close()
+    
+    def _listen(self):
+        """Espera notificações até a parada ou um erro de conexão"""
+        while not self._stop.is_set():
+            if not select.select([self._conn], [], [], LISTEN_POLL_SECONDS)[0]:
+                continue
+            
+            self._conn.poll()
+            while self._conn.notifies:
+                notify = self._conn.notifies.pop(0)
+                self.events_received += 1
+                try:
+                    payload = json.loads(notify.payload) if notify.payload else {}
+                except ValueError:
+                    payload = {"scope": notify.payload}
+                self.dispatch(payload.get("scope", ALL_SCOPES), payload)
+    
+    def _close(self):
+        """Fecha a conexão de LISTEN"""
+        self._listening.clear()
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
@@ -0,0 +1,390 @@
+"""
+Managed connection pool
+Thread-safe psycopg2 pool with bounded fair waiting, pre-ping and recycling
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+from src.utils.logging import get_logger
+
+
+# Conexões devolvidas há menos que isso não são pingadas no checkout
+PRE_PING_IDLE_SECONDS = 1.0
+
+# Intervalo da thread de manutenção (reciclagem e aquecimento)
+MAINTENANCE_INTERVAL = 5.0
+
+
+class PoolTimeout(PoolError):
+    """Nenhuma conexão ficou livre dentro do timeout do pool"""
+
+
+class _Waiter:
+    """Requisição de conexão na fila de espera"""
+    
+    __slots__ = ("event", "conn", "open_new")
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.conn = None
+        self.open_new = False
+
+
+class ManagedConnectionPool:
+    """
+    Pool de conexões psycopg2 com fila de espera, pre-ping e reciclagem
+    
+    Substitui o ThreadedConnectionPool (que levanta PoolError na hora quando
+    esgotado e nunca valida conexões):
+    
+    - Até `pool_size` conexões persistentes e `max_overflow` extras; as
+      extras são fechadas ao serem devolvidas se ninguém estiver esperando.
+    - Esgotado, getconn entra em uma fila FIFO e espera até `timeout`
+      segundos (PoolTimeout depois disso). Conexões devolvidas e vagas
+      abertas são entregues direto ao primeiro da fila, então quem chega
+      depois não fura a fila.
+    - No checkout, conexões fechadas ou mais velhas que `recycle` segundos
+      são substituídas, e conexões paradas há mais de PRE_PING_IDLE_SECONDS
+      são testadas com `SELECT 1` (pre-ping): um restart do PostgreSQL
+      derruba só as conexões ociosas, que são reabertas sem erro na
+      aplicação.
+    - Uma thread de manutenção mantém `min_idle` conexões ociosas abertas
+      e recicla as ociosas vencidas.
+    - `configure` roda em toda conexão nova (iniciais, extras, substitutas
+      de pre-ping e recicladas), ex: register_vector do pgvector.
+    
+    A interface (getconn, putconn, closeall) é a do psycopg2.pool.
+    """
+    
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        timeout: float = 30.0,
+        min_idle: int = 1,
+        recycle: float = 1800.0,
+        pre_ping: bool = True,
+        configure: Optional[Callable[[Any], None]] = None
+    ):
+        """
+        Abre as `min_idle` conexões iniciais
+        
+        Args:
+            connect: Função que abre uma conexão nova
+            pool_size: Conexões mantidas abertas
+            max_overflow: Conexões extras permitidas sob carga
+            timeout: Espera máxima por uma conexão (segundos)
+            min_idle: Conexões ociosas mantidas prontas (limitado a pool_size)
+            recycle: Idade máxima de uma conexão (segundos, 0 = sem limite)
+            pre_ping: Testa conexões ociosas antes de entregá-las
+            configure: Chamada com cada conexão nova antes do primeiro uso
+        """
+        self.logger = get_logger(self.__class__.__name__)
+        self._connect = connect
+        self._configure = configure
+        self.pool_size = max(1, pool_size)
+        self.max_connections = self.pool_size + max(0, max_overflow)
+        self.timeout = timeout
+        self.min_idle = max(0, min(min_idle, self.pool_size))
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        
+        self._lock = threading.Lock()
+        self._idle: Deque[Any] = deque()
+        self._waiters: Deque[_Waiter] = deque()
+        # Conexão -> [criada em, devolvida em]
+        self._info: Dict[Any, list] = {}
+        # Conexões abertas ou sendo abertas (vagas reservadas)
+        self._size = 0
+        self._closed = False
+        self._stats = {"opened": 0, "discarded": 0, "timeouts": 0}
+        
+        with self._lock:
+            self._size = self.min_idle
+        for _ in range(self.min_idle):
+            self._idle.append(self._open())
+        
+        self._wake = threading.Event()
+        self._maintenance = threading.Thread(
+            target=self._maintenance_loop,
+            name="connection-pool-maintenance",
+            daemon=True
+        )
+        self._maintenance.start()
+    
+    def getconn(self, timeout: Optional[float] = None):
+        """
+        Obtém uma conexão, esperando na fila se o pool estiver esgotado
+        
+        Args:
+            timeout: Espera máxima (segundos); padrão do pool se None
+        
+        Returns:
+            Conexão psycopg2 validada
+        
+        Raises:
+            PoolTimeout: Nenhuma conexão livre dentro do timeout
+            PoolError: Pool fechado
+        """
+        conn = None
+        waiter = None
+        with self._lock:
+            if self._closed:
+                raise PoolError("connection pool is closed")
+            if self._idle and not self._waiters:
+                conn = self._idle.pop()
+            elif self._size < self.max_connections and not self._waiters:
+                self._size += 1
+            else:
+                waiter = _Waiter()
+                self._waiters.append(waiter)
+        
+        if waiter is not None:
+            conn = self._wait(waiter, self.timeout if timeout is None else timeout)
+            if conn is None and not waiter.open_new:
+                raise PoolError("connection pool is closed")
+        
+        if conn is None:
+            return self._open_reserved()
+        return self._validate(conn)
+    
+    def putconn(self, conn, close: bool = False):
+        """
+        Devolve uma conexão ao pool
+        
+        Transações abertas são desfeitas; conexões quebradas, vencidas ou de
+        overflow sem ninguém esperando são fechadas.
+        
+        Args:
+            conn: Conexão obtida com getconn
+            close: Fecha a conexão em vez de reaproveitá-la
+        """
+        if not close and not conn.closed:
+            status = conn.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    close = True
+        
+        now = time.monotonic()
+        with self._lock:
+            info = self._info.get(conn)
+            if info is None:
+                raise PoolError("trying to put unkeyed connection")
+            info[1] = now
+            
+            discard = (
+                close
+                or conn.closed
+                or self._closed
+                or self._expired(info, now)
+                or (self._size > self.pool_size and not self._waiters)
+            )
+            if not discard:
+                if self._waiters:
+                    self._handoff(conn)
+                else:
+                    self._idle.append(conn)
+                return
+            
+            self._forget(conn)
+        self._close(conn)
+    
+    def closeall(self):
+        """Fecha todas as conexões ociosas e recusa novas requisições"""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            for conn in idle:
+                self._forget(conn)
+            waiters = list(self._waiters)
+            self._waiters.clear()
+        
+        # Acorda quem espera (getconn levanta PoolError)
+        for waiter in waiters:
+            waiter.event.set()
+        self._wake.set()
+        for conn in idle:
+            self._close(conn)
+    
+    @property
+    def closed(self) -> bool:
+        """Pool fechado"""
+        return self._closed
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Estado atual do pool
+        
+        Returns:
+            Dicionário com size, idle, in_use, waiting, limites e contadores
+            (conexões abertas, descartadas e timeouts de espera)
+        """
+        with self._lock:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": len(self._waiters),
+                "pool_size": self.pool_size,
+                "max_connections": self.max_connections,
+                **self._stats
+            }
+    
+    def _wait(self, waiter: _Waiter, timeout: float):
+        """
+        Espera a vez na fila
+        
+        Returns:
+            Conexão entregue, ou None com `waiter.open_new` se foi entregue uma
+            vaga para abrir conexão nova (None sem vaga = pool fechado)
+        """
+        waiter.event.wait(timeout)
+        with self._lock:
+            if waiter.conn is not None or waiter.open_new:
+                return waiter.conn
+            if self._closed:
+                return None
+            
+            # Timeout: sai da fila (a entrega pode ter chegado junto)
+            self._waiters.remove(waiter)
+            self._stats["timeouts"] += 1
+        raise PoolTimeout(
+            f"Couldn't get a connection after {timeout:.1f}s "
+            f"({self.max_connections} connections in use)"
+        )
+    
+    def _handoff(self, conn):
+        """Entrega uma conexão (ou uma vaga, se None) ao primeiro da fila; requer o lock"""
+        waiter = self._waiters.popleft()
+        if conn is None:
+            waiter.open_new = True
+        else:
+            waiter.conn = conn
+        waiter.event.set()
+    
+    def _validate(self, conn):
+        """Substitui a conexão se estiver fechada, vencida ou não responder ao pre-ping"""
+        info = self._info[conn]
+        now = time.monotonic()
+        
+        if not conn.closed and not self._expired(info, now):
+            if not self.pre_ping or now - info[1] < PRE_PING_IDLE_SECONDS:
+                return conn
+            if self._ping(conn):
+                return conn
+            self.logger.warning("Discarding dead pooled connection (pre-ping failed)")
+        
+        # A vaga continua reservada para a conexão substituta
+        with self._lock:
+            self._forget(conn, keep_slot=True)
+        self._close(conn)
+        return self._open_reserved()
+    
+    def _ping(self, conn) -> bool:
+        """Round trip `SELECT 1` sem abrir transação"""
+        autocommit = conn.autocommit
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            conn.autocommit = autocommit
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def _open_reserved(self):
+        """Abre conexão em uma vaga já reservada (libera a vaga se falhar)"""
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                if self._waiters and not self._closed:
+                    self._size += 1
+                    self._handoff(None)
+            raise
+    
+    def _open(self):
+        """Abre e registra uma conexão nova (a vaga deve estar reservada)"""
+        conn = self._connect()
+        if self._configure is not None:
+            try:
+                self._configure(conn)
+                if not conn.autocommit:
+                    conn.commit()
+            except Exception:
+                conn.close()
+                raise
+        now = time.monotonic()
+        with self._lock:
+            self._info[conn] = [now, now]
+            self._stats["opened"] += 1
+        return conn
+    
+    def _forget(self, conn, keep_slot: bool = False):
+        """Remove a conexão das contas e repassa a vaga a quem espera; requer o lock"""
+        self._info.pop(conn, None)
+        self._stats["discarded"] += 1
+        if keep_slot:
+            return
+        self._size -= 1
+        if self._waiters and not self._closed:
+            self._size += 1
+            self._handoff(None)
+    
+    def _expired(self, info: list, now: float) -> bool:
+        """Conexão mais velha que `recycle`"""
+        return bool(self.recycle) and now - info[0] > self.recycle
+    
+    def _close(self, conn):
+        """Fecha a conexão ignorando erros (servidor pode já ter caído)"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def _maintenance_loop(self):
+        """Recicla conexões ociosas vencidas e repõe o mínimo de ociosas"""
+        while not self._wake.wait(MAINTENANCE_INTERVAL):
+            try:
+                self._maintain()
+            except Exception as e:
+                self.logger.warning(f"Connection pool maintenance failed: {e}")
+    
+    def _maintain(self):
+        """Uma rodada de manutenção"""
+        now = time.monotonic()
+        with self._lock:
+            if self._closed:
+                return
+            expired = [conn for conn in self._idle if self._expired(self._info[conn], now)]
+            for conn in expired:
+                self._idle.remove(conn)
+                self._forget(conn)
+            # Só dentro de pool_size: conexões de overflow seriam fechadas na devolução
+            missing = min(self.min_idle - len(self._idle), self.pool_size - self._size)
+            missing = max(0, missing) if not self._waiters else 0
+            self._size += missing
+        
+        for conn in expired:
+            self._close(conn)
+        
+        for _ in range(missing):
+            conn = self._open_reserved()
+            self.putconn(conn)
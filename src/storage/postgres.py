@@ -3,18 +3,409 @@ PostgreSQL + pgvector storage
 Stores feedback and context with semantic search
 """
 
-from typing import List, Dict, Any, Optional
+import functools
+import hashlib
+import re
+import threading
+import time
+import uuid
+from datetime import date
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
 import numpy as np
-from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.pool import PoolError
 from psycopg2.extras import execute_values
+from psycopg2 import sql
 import psycopg2
 from pgvector.psycopg2 import register_vector
 
 from src.utils.config import get_config
 from src.utils.logging import get_logger
+from src.utils.hashing import content_hash
+from src.storage.instrumentation import StorageMetrics, InstrumentedPool, instrumented
+from src.storage.pool import ManagedConnectionPool
+from src.storage.invalidation import INVALIDATION_CHANNEL, InvalidationListener
 
 
-class PostgreSQLStorage:
+# Dimensão dos embeddings da versão inicial (all-MiniLM-L6-v2); a coluna
+# `embedding` ativa pode ter outra dimensão após uma troca de modelo
+EMBEDDING_DIM = 384
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Tabelas com coluna `embedding` indexada por HNSW
+VECTOR_TABLES = ("feedback", "important_examples", "course_content")
+
+# Texto de origem do embedding de cada tabela (usado na re-indexação)
+EMBEDDING_SOURCES = {
+    "feedback": "prompt",
+    "important_examples": "prompt",
+    "course_content": "content"
+}
+
+# Colunas exportadas para Arrow/Parquet por tabela (ver src.storage.export);
+# "json" é exportado como texto. Tabelas de VECTOR_TABLES ganham a coluna `embedding`
+EXPORT_COLUMNS = {
+    "feedback": (
+        ("id", "int64"), ("prompt", "string"), ("response", "string"), ("score", "float64"),
+        ("implicit_score", "float64"), ("emotional_score", "float64"), ("context", "string"),
+        ("user_id", "string"), ("created_at", "timestamp")
+    ),
+    "important_examples": (
+        ("id", "int64"), ("prompt", "string"), ("response", "string"), ("score", "float64"),
+        ("context", "string"), ("created_at", "timestamp")
+    ),
+    "course_content": (
+        ("id", "int64"), ("course_id", "int64"), ("title", "string"), ("content", "string"),
+        ("chunk_index", "int64"), ("metadata", "json"), ("content_hash", "string"),
+        ("created_at", "timestamp")
+    ),
+    "learned_concepts": (
+        ("id", "int64"), ("course_id", "int64"), ("concept_name", "string"), ("description", "string"),
+        ("examples", "json"), ("patterns", "json"), ("confidence", "float64"), ("created_at", "timestamp")
+    )
+}
+
+# Modos de armazenamento do índice vetorial: sufixo do índice, definição e operator class
+# A coluna `embedding` continua float32 (usada no re-ranking exato); só o índice muda
+# A definição é um template de {column} e {dim} (ver VectorSearchMixin._index_definition)
+VECTOR_STORAGE_MODES = {
+    "vector": ("embedding_idx", "({column} vector_cosine_ops)", "vector_cosine_ops"),
+    "halfvec": (
+        "embedding_half_idx",
+        "(({column}::halfvec({dim})) halfvec_cosine_ops)",
+        "halfvec_cosine_ops"
+    ),
+    "binary": (
+        "embedding_bq_idx",
+        "((binary_quantize({column})::bit({dim})) bit_hamming_ops)",
+        "bit_hamming_ops"
+    )
+}
+
+# Nomes de versão de embedding viram sufixo de coluna/índice (limite de 63 caracteres)
+EMBEDDING_VERSION_PATTERN = re.compile(r"^[a-z][a-z0-9_]{0,23}$")
+
+# Dimensão da coluna `embedding` ativa (typmod do tipo vector)
+EMBEDDING_DIM_QUERY = """
+    SELECT atttypmod FROM pg_attribute
+    WHERE attrelid = 'course_content'::regclass AND attname = 'embedding'
+"""
+
+# Perfis de recall vs. latência (valor de hnsw.ef_search)
+RECALL_PROFILES = {
+    "fast": 40,
+    "balanced": 100,
+    "accurate": 200
+}
+
+# Manutenção no sono: índices HNSW com menos linhas que isso não têm inchaço medido
+BLOAT_MIN_ROWS = 1000
+
+# Intervalo (segundos) das esperas com polling: manutenção no sono e escritores de feedback
+MAINTENANCE_POLL_SECONDS = 0.1
+
+# Leitura para consolidação: espera máxima (segundos) pelas transações que podem ter IDs de feedback pendentes
+FEEDBACK_WRITERS_TIMEOUT_SECONDS = 5.0
+
+# A cada N feedbacks armazenados, verifica se algum contexto precisa de índice parcial
+CONTEXT_INDEX_CHECK_INTERVAL = 500
+
+# Contadores mantidos em `courses` por triggers: tabela filha -> coluna
+COURSE_COUNTERS = {
+    "course_content": "content_chunks",
+    "learned_concepts": "concepts_learned"
+}
+
+# Tabelas cujas escritas notificam os outros processos (ver InvalidationListener).
+# feedback fica de fora: é escrito a cada interação e não alimenta caches
+INVALIDATION_TABLES = ("courses", "course_content", "learned_concepts", "embedding_versions")
+
+# Colunas de feedback copiadas entre partições (content_tsv é gerada)
+FEEDBACK_COLUMNS = (
+    "id, prompt, response, score, implicit_score, emotional_score, "
+    "context, embedding, created_at, updated_at, client_id, user_id"
+)
+
+# Índices HNSW parciais de feedback por valor de coluna: coluna -> prefixo do nome
+PARTIAL_INDEX_KINDS = {
+    "context": "ctx",
+    "user_id": "usr"
+}
+
+# Expressão regular dos nomes de índices parciais (ver _partial_index_name)
+PARTIAL_INDEX_PATTERN = "^feedback_embedding_(ctx|usr)_"
+
+
+class VectorSearchMixin:
+    """
+    Montagem das consultas vetoriais (HNSW, re-ranking quantizado e busca
+    híbrida) compartilhada pelos backends síncrono e assíncrono
+    """
+    
+    def _configure_vector_search(self, config):
+        """
+        Lê os parâmetros de busca vetorial da configuração
+        
+        Args:
+            config: Configuração do sistema
+        """
+        db_config = config.database
+        
+        # Busca HNSW: recall vs. latência
+        rag_config = config.rag
+        self.ef_search = rag_config.ef_search or RECALL_PROFILES.get(
+            rag_config.recall_profile,
+            RECALL_PROFILES["balanced"]
+        )
+        self.iterative_scan = rag_config.iterative_scan
+        self.max_scan_tuples = rag_config.max_scan_tuples
+        self.context_index_threshold = rag_config.context_index_threshold
+        
+        # Busca híbrida: candidatos por ranking e constante do RRF
+        self.hybrid_candidates = rag_config.hybrid_candidates
+        self.rrf_k = rag_config.rrf_k
+        
+        # Armazenamento do índice vetorial ("vector", "halfvec" ou "binary")
+        self.vector_storage = db_config.vector_storage
+        self.rerank_factor = db_config.rerank_factor
+        
+        # Lida do banco (ver _set_embedding_dim); muda com a versão de embedding ativa
+        self.embedding_dim = EMBEDDING_DIM
+    
+    def _set_embedding_dim(self, row: Optional[tuple]):
+        """
+        Define a dimensão da coluna `embedding` a partir de EMBEDDING_DIM_QUERY
+        
+        Args:
+            row: Linha retornada (typmod); sem dimensão válida, usa EMBEDDING_DIM
+        """
+        dim = row[0] if row else None
+        self.embedding_dim = dim if isinstance(dim, int) and dim > 0 else EMBEDDING_DIM
+    
+    def _index_definition(self, column: str = "embedding", dim: Optional[int] = None) -> str:
+        """
+        Definição do índice HNSW do modo vetorial atual
+        
+        Args:
+            column: Coluna vetorial indexada
+            dim: Dimensão da coluna (padrão: a da coluna ativa)
+        
+        Returns:
+            Expressão e operator class (ex: "(embedding vector_cosine_ops)")
+        """
+        return VECTOR_STORAGE_MODES[self.vector_storage][1].format(
+            column=column,
+            dim=dim or self.embedding_dim
+        )
+    
+    def _resolve_vector_storage(self):
+        """Valida o modo vetorial conforme a versão do pgvector (fallback para "vector")"""
+        if self.vector_storage not in VECTOR_STORAGE_MODES:
+            self.logger.warning(f"Unknown vector storage '{self.vector_storage}', using 'vector'")
+            self.vector_storage = "vector"
+        
+        # halfvec e binary_quantize exigem pgvector >= 0.7
+        if self.vector_storage != "vector" and self.pgvector_version < (0, 7, 0):
+            self.logger.warning(
+                f"Vector storage '{self.vector_storage}' requires pgvector >= 0.7.0, using 'vector'"
+            )
+            self.vector_storage = "vector"
+    
+    def _search_settings(self, top_k: int) -> List[Tuple[str, tuple]]:
+        """
+        Comandos que ajustam os parâmetros HNSW da transação de uma busca filtrada
+        
+        Define hnsw.ef_search (mínimo top_k) e, no pgvector >= 0.8, habilita
+        iterative index scan para que filtros (contexto, score, curso) não
+        reduzam o número de resultados abaixo de top_k.
+        
+        Args:
+            top_k: Número de resultados desejados
+        
+        Returns:
+            Lista de (SQL, parâmetros)
+        """
+        ef_search = min(max(self.ef_search, top_k), 1000)
+        statements = [("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search),))]
+        
+        if self.iterative_scan != "off" and self.pgvector_version >= (0, 8, 0):
+            statements.append((
+                "SELECT set_config('hnsw.iterative_scan', %s, true), "
+                "set_config('hnsw.max_scan_tuples', %s, true)",
+                (self.iterative_scan, str(self.max_scan_tuples))
+            ))
+        return statements
+    
+    @staticmethod
+    def _feedback_filter(context: Optional[str], user_id: Optional[str]) -> str:
+        """
+        Condição das buscas em feedback
+        
+        Contexto e usuário entram como parâmetros nomeados (`min_score`,
+        `context`, `user_id`); com o psycopg2 viram literais no SQL, o que
+        permite ao planner escolher o índice parcial do contexto ou do usuário.
+        
+        Args:
+            context: Filtrar por contexto (opcional)
+            user_id: Restringir ao histórico do usuário (None = todos)
+        
+        Returns:
+            Condição com alias `t.`
+        """
+        where = "t.score >= %(min_score)s"
+        if context:
+            where += " AND t.context = %(context)s"
+        if user_id:
+            where += " AND t.user_id = %(user_id)s"
+        return where
+    
+    def _knn_query(self, columns: str, table: str, where: str, query: str, limit: str) -> str:
+        """
+        Monta consulta top-k por similaridade de cosseno conforme o modo vetorial
+        
+        No modo "vector" ordena direto pela distância exata. Nos modos
+        quantizados ("halfvec", "binary") busca `limit * rerank_factor`
+        candidatos pelo índice quantizado e re-ranqueia pela distância exata
+        da coluna float32.
+        
+        Args:
+            columns: Colunas retornadas, com alias `t.` (ex: "t.id, t.prompt")
+            table: Tabela consultada (recebe o alias `t`)
+            where: Condição de filtro (com alias `t.`)
+            query: Expressão SQL do vetor de consulta (ex: "%(query)s::vector")
+            limit: Expressão SQL do número de resultados
+        
+        Returns:
+            SQL que retorna `columns` seguidas de `similarity`
+        """
+        exact_distance = f"t.embedding <=> {query}"
+        
+        if self.vector_storage == "vector":
+            return f"""
+                SELECT {columns}, 1 - ({exact_distance}) AS similarity
+                FROM {table} t
+                WHERE {where}
+                ORDER BY {exact_distance}
+                LIMIT {limit}
+            """
+        
+        if self.vector_storage == "halfvec":
+            approx_distance = (
+                f"t.embedding::halfvec({self.embedding_dim}) <=> ({query})::halfvec({self.embedding_dim})"
+            )
+        else:
+            approx_distance = (
+                f"binary_quantize(t.embedding)::bit({self.embedding_dim}) <~> binary_quantize({query})"
+            )
+        
+        return f"""
+            SELECT {columns}, 1 - ({exact_distance}) AS similarity
+            FROM (
+                SELECT {columns}, t.embedding
+                FROM {table} t
+                WHERE {where}
+                ORDER BY {approx_distance}
+                LIMIT ({limit}) * {self.rerank_factor}
+            ) t
+            ORDER BY {exact_distance}
+            LIMIT {limit}
+        """
+    
+    def _hybrid_query(self, columns: str, table: str, where: str) -> str:
+        """
+        Monta consulta híbrida (full-text + vetorial) com reciprocal-rank fusion
+        
+        Os dois rankings (HNSW e `content_tsv` com ts_rank_cd) são calculados
+        no mesmo statement, cada um limitado a `%(candidates)s`, e fundidos por
+        `1 / (rrf_k + rank)`. Os termos da query são combinados com OR, para
+        que um identificador exato já conte como match lexical.
+        
+        Parâmetros esperados: `query`, `query_text`, `candidates`, `rrf_k`,
+        `top_k` e os usados em `where`.
+        
+        Args:
+            columns: Colunas retornadas, com alias `t.` (ex: "t.id, t.prompt")
+            table: Tabela consultada (recebe o alias `t`)
+            where: Condição de filtro (com alias `t.`)
+        
+        Returns:
+            SQL que retorna `columns` seguidas de `similarity` e `rrf_score`
+        """
+        knn = self._knn_query(
+            columns="t.id",
+            table=table,
+            where=f"{where} AND t.embedding IS NOT NULL",
+            query="%(query)s::vector",
+            limit="%(candidates)s"
+        )
+        return f"""
+            WITH semantic AS (
+                SELECT k.id, ROW_NUMBER() OVER (ORDER BY k.similarity DESC) AS rank
+                FROM ({knn}) k
+            ),
+            lexical AS (
+                SELECT t.id, ROW_NUMBER() OVER (
+                    ORDER BY ts_rank_cd(t.content_tsv, q.terms) DESC
+                ) AS rank
+                FROM {table} t, (
+                    SELECT replace(
+                        plainto_tsquery('simple', %(query_text)s)::text, ' & ', ' | '
+                    )::tsquery AS terms
+                ) q
+                WHERE {where} AND t.content_tsv @@ q.terms
+                ORDER BY ts_rank_cd(t.content_tsv, q.terms) DESC
+                LIMIT %(candidates)s
+            ),
+            fused AS (
+                SELECT COALESCE(s.id, l.id) AS id,
+                       COALESCE(1.0 / (%(rrf_k)s + s.rank), 0)
+                       + COALESCE(1.0 / (%(rrf_k)s + l.rank), 0) AS rrf_score
+                FROM semantic s
+                FULL OUTER JOIN lexical l ON l.id = s.id
+            )
+            SELECT {columns}, 1 - (t.embedding <=> %(query)s::vector) AS similarity, f.rrf_score
+            FROM fused f
+            JOIN {table} t ON t.id = f.id
+            ORDER BY f.rrf_score DESC, t.id
+            LIMIT %(top_k)s
+        """
+    
+    @staticmethod
+    def _as_query_batch(query_embeddings: np.ndarray) -> List[np.ndarray]:
+        """
+        Converte matriz (n, dim) de queries em lista de vetores para `vector[]`
+        
+        Args:
+            query_embeddings: Array (n, dim) ou vetor único (dim,)
+        
+        Returns:
+            Lista de vetores float32
+        """
+        matrix = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        return [row for row in matrix]
+    
+    @staticmethod
+    def _load_json(value: Any) -> Any:
+        """Metadata JSONB pode já vir como dict/list ou como string JSON"""
+        import json
+        
+        if not value:
+            return None
+        if isinstance(value, (dict, list)):
+            return value
+        return json.loads(value)
+    
+    @staticmethod
+    def _load_vector(value: Any) -> Optional[np.ndarray]:
+        """Coluna vector pode vir como ndarray ou pgvector.Vector (conforme a versão)"""
+        if value is None:
+            return None
+        if hasattr(value, "to_numpy"):
+            value = value.to_numpy()
+        return np.asarray(value, dtype=np.float32)
+
+
+@instrumented
+class PostgreSQLStorage(VectorSearchMixin):
     """
     Interface para PostgreSQL + pgvector
     Armazena feedback e contexto com busca semântica
@@ -35,21 +426,57 @@ class PostgreSQLStorage:
             "password": db_config.password
         }
         
-        # Pool de conexões
-        self.pool = ThreadedConnectionPool(
-            minconn=1,
-            maxconn=db_config.pool_size,
-            **self.connection_params
+        self._configure_vector_search(self.config)
+        
+        # Particionamento mensal de feedback e retenção
+        self.feedback_partitioning = db_config.feedback_partitioning
+        self.feedback_partitions_ahead = db_config.feedback_partitions_ahead
+        self.feedback_retention_months = db_config.feedback_retention_months
+        self.feedback_rollup_min_score = db_config.feedback_rollup_min_score
+        
+        # Manutenção no sono (ANALYZE e REINDEX de índices HNSW inchados)
+        self.maintenance_time_budget = db_config.maintenance_time_budget_seconds
+        self.analyze_threshold = db_config.analyze_threshold
+        self.reindex_bloat_ratio = db_config.reindex_bloat_ratio
+        
+        # Índices HNSW parciais por contexto
+        self._context_indexes = set()
+        self._context_index_lock = threading.Lock()
+        self._feedback_writes = 0
+        
+        # Latência por método e espera no pool
+        self.metrics = StorageMetrics(enabled=db_config.metrics)
+        
+        # Listener de invalidação de caches (start_invalidation_listener)
+        self.invalidation: Optional[InvalidationListener] = None
+        
+        # Pool de conexões: espera com timeout, pre-ping e reciclagem
+        self.pool = InstrumentedPool(
+            ManagedConnectionPool(
+                functools.partial(psycopg2.connect, **self.connection_params),
+                pool_size=db_config.pool_size,
+                max_overflow=db_config.max_overflow,
+                timeout=db_config.pool_timeout,
+                min_idle=db_config.pool_min_idle,
+                recycle=db_config.pool_recycle,
+                pre_ping=db_config.pool_pre_ping,
+                configure=register_vector
+            ),
+            self.metrics,
+            exhausted_errors=(PoolError,)
         )
         
         # Inicializa schema
         conn = self.pool.getconn()
         try:
-            register_vector(conn)
+            self.pgvector_version = self._get_pgvector_version(conn)
             self._initialize_schema(conn)
         finally:
             self.pool.putconn(conn)
         
+        # Índices parciais pendentes são criados em background (CONCURRENTLY pode demorar)
+        self._schedule_context_index_check()
+        
         self.logger.info("PostgreSQL storage initialized")
     
     def _initialize_schema(self, conn):
@@ -57,28 +484,26 @@ class PostgreSQLStorage:
         cursor = conn.cursor()
         
         # Tabela de feedback
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS feedback (
-                id SERIAL PRIMARY KEY,
-                prompt TEXT NOT NULL,
-                response TEXT NOT NULL,
-                score FLOAT NOT NULL,
-                implicit_score FLOAT,
-                emotional_score FLOAT,
-                context TEXT,
-                embedding vector(384),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Índice para busca semântica
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS feedback_embedding_idx
-            ON feedback
-            USING hnsw (embedding vector_cosine_ops)
-            WITH (m = 16, ef_construction = 64)
-        """)
+        if self.feedback_partitioning:
+            # Particionada por mês (migra a tabela antiga, se existir)
+            self._migrate_feedback_to_partitioned(cursor)
+            self._create_partitioned_feedback_table(cursor)
+            self._ensure_feedback_partitions(cursor)
+        else:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS feedback (
+                    id SERIAL PRIMARY KEY,
+                    prompt TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    score FLOAT NOT NULL,
+                    implicit_score FLOAT,
+                    emotional_score FLOAT,
+                    context TEXT,
+                    embedding vector(384),
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
         
         # Índice para score (filtragem)
         cursor.execute("""
@@ -92,6 +517,33 @@ class PostgreSQLStorage:
             ON feedback (context)
         """)
         
+        # Identificador gerado pelo cliente: torna idempotente o reenvio de lotes
+        # do buffer de escrita (ver FeedbackWriteBuffer)
+        cursor.execute("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS client_id UUID")
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS feedback_client_id_idx
+            ON feedback (client_id, created_at)
+        """)
+        
+        # Dono do feedback: buscas com user_id só veem o histórico do usuário
+        # (NULL = feedback anterior ao multiusuário, visto só em buscas sem user_id)
+        cursor.execute("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS user_id VARCHAR(255)")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS feedback_user_id_idx
+            ON feedback (user_id)
+        """)
+        
+        # Texto indexado para busca full-text (identificadores como `res.partner`
+        # são preservados pela configuração 'simple')
+        cursor.execute("""
+            ALTER TABLE feedback ADD COLUMN IF NOT EXISTS content_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('simple', prompt || ' ' || response)) STORED
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS feedback_content_tsv_idx
+            ON feedback USING gin (content_tsv)
+        """)
+        
         # Tabela de exemplos importantes (para replay)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS important_examples (
@@ -106,14 +558,6 @@ class PostgreSQLStorage:
             )
         """)
         
-        # Índice para exemplos importantes
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS important_examples_embedding_idx
-            ON important_examples
-            USING hnsw (embedding vector_cosine_ops)
-            WITH (m = 16, ef_construction = 64)
-        """)
-        
         # Tabela de cursos
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS courses (
@@ -142,20 +586,27 @@ class PostgreSQLStorage:
             )
         """)
         
-        # Índice para busca semântica de conteúdo
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS course_content_embedding_idx
-            ON course_content
-            USING hnsw (embedding vector_cosine_ops)
-            WITH (m = 16, ef_construction = 64)
-        """)
-        
         # Índice para course_id
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS course_content_course_id_idx
             ON course_content (course_id)
         """)
         
+        # Texto indexado para busca full-text
+        cursor.execute("""
+            ALTER TABLE course_content ADD COLUMN IF NOT EXISTS content_tsv tsvector
+            GENERATED ALWAYS AS (
+                to_tsvector('simple', coalesce(title, '') || ' ' || content)
+            ) STORED
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS course_content_tsv_idx
+            ON course_content USING gin (content_tsv)
+        """)
+        
+        # Hash do conteúdo: um chunk por (hash, curso), embeddings reaproveitados por hash
+        self._ensure_course_content_hash(cursor)
+        
         # Tabela de conceitos aprendidos
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS learned_concepts (
@@ -176,769 +627,3329 @@ class PostgreSQLStorage:
             ON learned_concepts (course_id)
         """)
         
+        # Contadores de chunks e conceitos por curso
+        self._ensure_course_counters(cursor)
+        
+        # Registro das versões de embedding (modelo/dimensão da coluna ativa)
+        self._ensure_embedding_versions(cursor)
+        
+        # Índices HNSW conforme o modo de armazenamento vetorial
+        self._ensure_vector_indexes(cursor)
+        
+        # Marca d'água da consolidação (último feedback consolidado)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS consolidation_state (
+                name VARCHAR(100) PRIMARY KEY,
+                last_feedback_id INTEGER NOT NULL DEFAULT 0,
+                last_created_at TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Linha de base do inchaço dos índices HNSW (bytes por linha viva)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS index_maintenance (
+                index_name VARCHAR(63) PRIMARY KEY,
+                bytes_per_row DOUBLE PRECISION NOT NULL,
+                reindexed_at TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # NOTIFY em escritas que invalidam caches de outros processos
+        self._ensure_invalidation_triggers(cursor)
+        
         conn.commit()
         cursor.close()
         self.logger.info("Database schema initialized")
     
-    def store_feedback(
-        self,
-        prompt: str,
-        response: str,
-        score: float,
-        implicit_score: Optional[float] = None,
-        emotional_score: Optional[float] = None,
-        context: Optional[str] = None,
-        embedding: Optional[np.ndarray] = None
-    ) -> int:
+    def _ensure_course_content_hash(self, cursor):
         """
-        Armazena feedback no banco
+        Adiciona `content_hash` a course_content com índice único por curso
         
-        Args:
-            prompt: Prompt original
-            response: Resposta gerada
-            score: Score total (0.7 * implícito + 0.3 * emocional)
-            implicit_score: Score implícito
-            emotional_score: Score emocional
-            context: Contexto (ex: 'python', 'odoo')
-            embedding: Embedding vetorial (opcional)
+        Na criação da coluna, calcula o hash das linhas existentes e remove
+        chunks repetidos no mesmo curso (mantendo o mais antigo) para que o
+        índice único possa ser criado.
         
-        Returns:
-            ID do feedback armazenado
+        Args:
+            cursor: Cursor da transação de inicialização do schema
         """
-        conn = self.pool.getconn()
-        try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO feedback (prompt, response, score, implicit_score, emotional_score, context, embedding)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (prompt, response, score, implicit_score, emotional_score, context, embedding))
-            
-            feedback_id = cursor.fetchone()[0]
-            conn.commit()
-            
-            self.logger.debug(f"Feedback stored with ID: {feedback_id}")
-            return feedback_id
+        cursor.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = 'course_content'
+              AND column_name = 'content_hash'
+        """)
+        backfill = not cursor.fetchall()
         
-        except Exception as e:
-            conn.rollback()
-            self.logger.error(f"Error storing feedback: {e}")
-            raise
+        cursor.execute("ALTER TABLE course_content ADD COLUMN IF NOT EXISTS content_hash CHAR(64)")
         
-        finally:
-            cursor.close()
-            self.pool.putconn(conn)
+        if backfill:
+            self.logger.info("Backfilling course content hashes")
+            cursor.execute("""
+                UPDATE course_content
+                SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+            """)
+            cursor.execute("""
+                DELETE FROM course_content a
+                USING course_content b
+                WHERE a.course_id = b.course_id
+                  AND a.content_hash = b.content_hash
+                  AND a.id > b.id
+            """)
+            if cursor.rowcount:
+                self.logger.info(f"Removed {cursor.rowcount} duplicate course content chunks")
+        
+        # (content_hash, course_id): também atende a busca de embeddings só por hash
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS course_content_hash_idx
+            ON course_content (content_hash, course_id)
+        """)
     
-    def get_all_feedbacks(self) -> List[Dict[str, Any]]:
+    def _ensure_invalidation_triggers(self, cursor):
         """
-        Retorna todos os feedbacks
+        Cria os triggers que notificam o canal de invalidação
         
-        Returns:
-            Lista de feedbacks
-        """
-        conn = self.pool.getconn()
-        try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, prompt, response, score, implicit_score, emotional_score, context, created_at
-                FROM feedback
-                ORDER BY created_at DESC
-            """)
-            
-            feedbacks = []
-            for row in cursor.fetchall():
-                feedbacks.append({
-                    "id": row[0],
-                    "prompt": row[1],
-                    "response": row[2],
-                    "score": row[3],
-                    "implicit_score": row[4],
-                    "emotional_score": row[5],
-                    "context": row[6],
-                    "created_at": row[7]
-                })
-            
-            return feedbacks
+        Triggers por comando (FOR EACH STATEMENT) em INVALIDATION_TABLES: um
+        insert em lote gera uma notificação, e o PostgreSQL descarta
+        notificações repetidas dentro da mesma transação. O payload é
+        `{"scope": <tabela>, "op": <INSERT|UPDATE|DELETE|TRUNCATE>}`, entregue
+        só no commit.
         
-        except Exception as e:
-            self.logger.error(f"Error getting feedbacks: {e}")
-            raise
+        Args:
+            cursor: Cursor da transação de inicialização do schema
+        """
+        cursor.execute(sql.SQL("""
+            CREATE OR REPLACE FUNCTION npllm_notify_invalidation() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify(
+                    {channel},
+                    json_build_object('scope', TG_TABLE_NAME, 'op', TG_OP)::text
+                );
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """).format(channel=sql.Literal(INVALIDATION_CHANNEL)))
         
-        finally:
-            cursor.close()
-            self.pool.putconn(conn)
+        cursor.execute("""
+            SELECT tgrelid::regclass::text FROM pg_trigger
+            WHERE tgname = 'npllm_invalidation' AND tgrelid::regclass::text = ANY(%s)
+        """, (list(INVALIDATION_TABLES),))
+        existing = {row[0] for row in cursor.fetchall()}
+        
+        for table in INVALIDATION_TABLES:
+            if table in existing:
+                continue
+            cursor.execute(sql.SQL("""
+                CREATE TRIGGER npllm_invalidation
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION npllm_notify_invalidation()
+            """).format(table=sql.Identifier(table)))
     
-    def get_important_examples(self, limit: int = 100) -> List[Dict[str, Any]]:
+    def _ensure_course_counters(self, cursor):
         """
-        Retorna exemplos importantes para replay
+        Mantém `content_chunks` e `concepts_learned` em courses
         
-        Args:
-            limit: Número máximo de exemplos
+        Triggers por statement (com transition tables) somam as linhas
+        inseridas/removidas por curso, de modo que uma ingestão em lote faz
+        um único UPDATE por curso. Na criação das colunas, os contadores são
+        preenchidos a partir das tabelas existentes.
         
-        Returns:
-            Lista de exemplos importantes
+        Args:
+            cursor: Cursor da transação de inicialização do schema
         """
-        conn = self.pool.getconn()
-        try:
-            cursor = conn.cursor()
+        cursor.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = 'courses'
+              AND column_name = ANY(%s)
+        """, (list(COURSE_COUNTERS.values()),))
+        existing_columns = {row[0] for row in cursor.fetchall()}
+        backfill = not set(COURSE_COUNTERS.values()) <= existing_columns
+        
+        for column in COURSE_COUNTERS.values():
+            cursor.execute(
+                f"ALTER TABLE courses ADD COLUMN IF NOT EXISTS {column} INTEGER NOT NULL DEFAULT 0"
+            )
+        
+        # TG_ARGV[0]: coluna do contador; changed_rows: linhas do statement
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION courses_update_counter() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                EXECUTE format(
+                    'UPDATE courses c SET %1$I = c.%1$I + d.n * %2$s '
+                    'FROM (SELECT course_id, COUNT(*) AS n FROM changed_rows GROUP BY course_id) d '
+                    'WHERE c.id = d.course_id',
+                    TG_ARGV[0],
+                    CASE TG_OP WHEN 'INSERT' THEN 1 ELSE -1 END
+                );
+                RETURN NULL;
+            END
+            $$
+        """)
+        
+        triggers = {
+            f"{table}_{operation.lower()}_count_trg": (table, column, operation, transition)
+            for table, column in COURSE_COUNTERS.items()
+            for operation, transition in (("INSERT", "NEW"), ("DELETE", "OLD"))
+        }
+        cursor.execute(
+            "SELECT tgname FROM pg_trigger WHERE tgname = ANY(%s)",
+            (list(triggers),)
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        
+        for trigger_name, (table, column, operation, transition) in triggers.items():
+            if trigger_name not in existing:
+                cursor.execute(f"""
+                    CREATE TRIGGER {trigger_name}
+                    AFTER {operation} ON {table}
+                    REFERENCING {transition} TABLE AS changed_rows
+                    FOR EACH STATEMENT
+                    EXECUTE FUNCTION courses_update_counter('{column}')
+                """)
+        
+        if backfill:
+            self.logger.info("Backfilling course counters")
+            cursor.execute("""
+                UPDATE courses c SET
+                    content_chunks = (SELECT COUNT(*) FROM course_content cc WHERE cc.course_id = c.id),
+                    concepts_learned = (SELECT COUNT(*) FROM learned_concepts lc WHERE lc.course_id = c.id)
+            """)
+    
+    def _create_partitioned_feedback_table(self, cursor):
+        """
+        Cria a tabela de feedback particionada por mês (created_at)
+        
+        A chave primária inclui created_at (exigência do particionamento);
+        índices criados na tabela-mãe (score, contexto, GIN, HNSW) são
+        replicados em cada partição.
+        
+        Args:
+            cursor: Cursor da transação de inicialização do schema
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS feedback (
+                id SERIAL,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                score FLOAT NOT NULL,
+                implicit_score FLOAT,
+                emotional_score FLOAT,
+                context TEXT,
+                embedding vector(384),
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                client_id UUID,
+                user_id VARCHAR(255),
+                content_tsv tsvector GENERATED ALWAYS AS (
+                    to_tsvector('simple', prompt || ' ' || response)
+                ) STORED,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
+        """)
+        # Tabela criada antes do multiusuário (FEEDBACK_COLUMNS inclui user_id)
+        cursor.execute("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS user_id VARCHAR(255)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS feedback_default
+            PARTITION OF feedback DEFAULT
+        """)
+    
+    def _migrate_feedback_to_partitioned(self, cursor) -> int:
+        """
+        Migra a tabela de feedback não particionada para partições mensais
+        
+        Executa na transação de inicialização: renomeia a tabela antiga,
+        cria a particionada com uma partição por mês presente nos dados,
+        copia as linhas preservando IDs e a sequência, e remove a antiga.
+        Não faz nada se feedback não existir ou já for particionada.
+        
+        Args:
+            cursor: Cursor da transação de inicialização do schema
+        
+        Returns:
+            Número de feedbacks migrados
+        """
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('feedback')")
+        row = cursor.fetchone()
+        if not row or row[0] != 'r':
+            return 0
+        
+        self.logger.info("Migrating feedback table to monthly partitions")
+        cursor.execute("LOCK TABLE feedback IN ACCESS EXCLUSIVE MODE")
+        cursor.execute("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS client_id UUID")
+        cursor.execute("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS user_id VARCHAR(255)")
+        cursor.execute("ALTER TABLE feedback RENAME TO feedback_unpartitioned")
+        cursor.execute(
+            "ALTER SEQUENCE IF EXISTS feedback_id_seq RENAME TO feedback_unpartitioned_id_seq"
+        )
+        
+        # Libera nomes da chave primária e dos índices para a nova tabela
+        cursor.execute("""
+            DO $$
+            DECLARE
+                r record;
+            BEGIN
+                ALTER TABLE feedback_unpartitioned DROP CONSTRAINT IF EXISTS feedback_pkey;
+                FOR r IN
+                    SELECT indexname FROM pg_indexes
+                    WHERE tablename = 'feedback_unpartitioned'
+                LOOP
+                    EXECUTE format('DROP INDEX IF EXISTS %I', r.indexname);
+                END LOOP;
+            END $$
+        """)
+        
+        self._create_partitioned_feedback_table(cursor)
+        cursor.execute("""
+            SELECT DISTINCT date_trunc('month', COALESCE(created_at, CURRENT_TIMESTAMP))::date
+            FROM feedback_unpartitioned
+        """)
+        self._ensure_feedback_partitions(cursor, months=[row[0] for row in cursor.fetchall()])
+        
+        cursor.execute(f"""
+            INSERT INTO feedback ({FEEDBACK_COLUMNS})
+            SELECT id, prompt, response, score, implicit_score, emotional_score,
+                   context, embedding, COALESCE(created_at, CURRENT_TIMESTAMP), updated_at,
+                   client_id, user_id
+            FROM feedback_unpartitioned
+        """)
+        migrated = cursor.rowcount
+        cursor.execute("""
+            SELECT setval(
+                pg_get_serial_sequence('feedback', 'id'),
+                COALESCE((SELECT MAX(id) FROM feedback), 0) + 1,
+                false
+            )
+        """)
+        cursor.execute("DROP TABLE feedback_unpartitioned")
+        
+        self.logger.info(f"Migrated {migrated} feedbacks to partitioned table")
+        return migrated
+    
+    @staticmethod
+    def _add_months(month: date, months: int) -> date:
+        """Primeiro dia do mês `months` meses após `month`"""
+        index = month.year * 12 + month.month - 1 + months
+        return date(index // 12, index % 12 + 1, 1)
+    
+    def _ensure_feedback_partitions(self, cursor, months: Optional[List[date]] = None) -> List[str]:
+        """
+        Cria partições mensais de feedback que ainda não existem
+        
+        Linhas que caíram na partição default para um mês que ganha
+        partição própria são movidas para ela.
+        
+        Args:
+            cursor: Cursor da transação atual
+            months: Meses (primeiro dia) a garantir (padrão: mês atual e
+                `feedback_partitions_ahead` seguintes)
+        
+        Returns:
+            Nomes das partições criadas
+        """
+        if months is None:
+            current = date.today().replace(day=1)
+            months = [
+                self._add_months(current, offset)
+                for offset in range(self.feedback_partitions_ahead + 1)
+            ]
+        
+        created = []
+        for month in sorted(set(months)):
+            partition = f"feedback_p{month:%Y%m}"
+            cursor.execute("SELECT to_regclass(%s)", (partition,))
+            if cursor.fetchone()[0]:
+                continue
+            
+            upper = self._add_months(month, 1)
+            cursor.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM feedback_default
+                    WHERE created_at >= %s AND created_at < %s
+                )
+            """, (month, upper))
+            move_from_default = cursor.fetchone()[0]
+            
+            # Partição nova não pode ser criada com linhas do seu intervalo na default
+            if move_from_default:
+                cursor.execute("ALTER TABLE feedback DETACH PARTITION feedback_default")
+            
+            cursor.execute(sql.SQL("""
+                CREATE TABLE {} PARTITION OF feedback
+                FOR VALUES FROM ({}) TO ({})
+            """).format(sql.Identifier(partition), sql.Literal(month), sql.Literal(upper)))
+            
+            if move_from_default:
+                cursor.execute(f"""
+                    WITH moved AS (
+                        DELETE FROM feedback_default
+                        WHERE created_at >= %s AND created_at < %s
+                        RETURNING {FEEDBACK_COLUMNS}
+                    )
+                    INSERT INTO feedback ({FEEDBACK_COLUMNS})
+                    SELECT {FEEDBACK_COLUMNS} FROM moved
+                """, (month, upper))
+                cursor.execute("ALTER TABLE feedback ATTACH PARTITION feedback_default DEFAULT")
+            
+            created.append(partition)
+            self.logger.info(f"Created feedback partition {partition}")
+        
+        return created
+    
+    def maintain_feedback_partitions(self, retention_months: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Cria partições futuras e aplica a retenção de feedback
+        
+        Partições inteiramente anteriores ao corte (mês atual menos
+        `retention_months`) são removidas; antes disso, seus feedbacks
+        positivos (score >= feedback_rollup_min_score) são copiados para
+        important_examples, preservando-os para o replay.
+        
+        Args:
+            retention_months: Meses de feedback mantidos (padrão: config; 0 = sem retenção)
+        
+        Returns:
+            Partições criadas e removidas e número de exemplos consolidados
+        """
+        result = {"partitions_created": [], "partitions_dropped": [], "rows_rolled_up": 0}
+        if not self.feedback_partitioning:
+            return result
+        
+        if retention_months is None:
+            retention_months = self.feedback_retention_months
+        
+        rollup_sql = """
+            INSERT INTO important_examples (prompt, response, score, context, embedding, created_at)
+            SELECT prompt, response, score, context, embedding, created_at
+            FROM {}
+            WHERE score >= %(min_score)s AND created_at < %(cutoff)s
+        """
+        
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            result["partitions_created"] = self._ensure_feedback_partitions(cursor)
+            conn.commit()
+            
+            if retention_months and retention_months > 0:
+                cutoff = self._add_months(date.today().replace(day=1), -retention_months)
+                params = {"min_score": self.feedback_rollup_min_score, "cutoff": cutoff}
+                
+                cursor.execute("""
+                    SELECT c.relname
+                    FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = 'feedback'::regclass
+                    ORDER BY c.relname
+                """)
+                expired = []
+                for row in cursor.fetchall():
+                    match = re.fullmatch(r'feedback_p(\d{4})(\d{2})', row[0])
+                    if match:
+                        month = date(int(match.group(1)), int(match.group(2)), 1)
+                        if self._add_months(month, 1) <= cutoff:
+                            expired.append(row[0])
+                
+                # Uma transação por partição: rollup + DROP
+                for partition in expired:
+                    cursor.execute(sql.SQL(rollup_sql).format(sql.Identifier(partition)), params)
+                    result["rows_rolled_up"] += cursor.rowcount
+                    cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(partition)))
+                    conn.commit()
+                    result["partitions_dropped"].append(partition)
+                    self.logger.info(f"Dropped expired feedback partition {partition}")
+                
+                # Linhas antigas que caíram na partição default
+                cursor.execute(sql.SQL(rollup_sql).format(sql.Identifier("feedback_default")), params)
+                result["rows_rolled_up"] += cursor.rowcount
+                cursor.execute(
+                    "DELETE FROM feedback_default WHERE created_at < %(cutoff)s",
+                    params
+                )
+                conn.commit()
+            
+            return result
+        
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error maintaining feedback partitions: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def run_maintenance(
+        self,
+        time_budget_seconds: Optional[float] = None,
+        should_abort: Optional[Callable[[], bool]] = None
+    ) -> Dict[str, Any]:
+        """
+        Manutenção do banco: ANALYZE e REINDEX dos índices HNSW inchados
+        
+        Tabelas com mais de `analyze_threshold` das linhas alteradas desde o
+        último ANALYZE (ou nunca analisadas) são analisadas, junto com a
+        tabela-mãe das partições analisadas (o autovacuum não analisa
+        tabelas particionadas). O inchaço de cada índice HNSW é o número de
+        bytes por linha viva dividido pelo menor valor já medido (tabela
+        index_maintenance); acima de `reindex_bloat_ratio`, o índice é
+        reconstruído com REINDEX CONCURRENTLY, sem bloquear buscas e escritas.
+        
+        Uma thread de vigia cancela o comando em execução quando o tempo
+        acaba ou `should_abort` retorna True. Um REINDEX cancelado deixa um
+        índice inválido (`_ccnew`), removido em seguida.
+        
+        Args:
+            time_budget_seconds: Tempo máximo da manutenção (padrão: config)
+            should_abort: Consultada periodicamente; True interrompe a manutenção
+        
+        Returns:
+            Tabelas analisadas, índices reconstruídos, inchaço por índice,
+            interrupção (aborted/timed_out) e duração
+        """
+        if time_budget_seconds is None:
+            time_budget_seconds = self.maintenance_time_budget
+        
+        started = time.monotonic()
+        result = {"analyzed": [], "reindexed": [], "index_bloat": {}}
+        state = {"aborted": False, "timed_out": False}
+        stop = threading.Event()
+        conn = self.pool.getconn()
+        watcher = threading.Thread(
+            target=self._watch_maintenance,
+            args=(conn, started + time_budget_seconds, should_abort, state, stop),
+            name="db-maintenance-watcher",
+            daemon=True
+        )
+        
+        def interrupted() -> bool:
+            return state["aborted"] or state["timed_out"]
+        
+        # ANALYZE e REINDEX CONCURRENTLY não rodam dentro de transação
+        conn.autocommit = True
+        cursor = conn.cursor()
+        try:
+            self._drop_reindex_leftovers(cursor)
+            watcher.start()
+            
+            for table in self._tables_to_analyze(cursor):
+                if interrupted():
+                    break
+                cursor.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table)))
+                result["analyzed"].append(table)
+            
+            if not interrupted():
+                result["index_bloat"] = self._measure_index_bloat(cursor)
+            
+            bloated = sorted(
+                (ratio, index) for index, ratio in result["index_bloat"].items()
+                if ratio >= self.reindex_bloat_ratio
+            )
+            for ratio, index in reversed(bloated):
+                if interrupted():
+                    break
+                self.logger.info(f"Reindexing {index} (bloat ratio {ratio:.2f})")
+                cursor.execute(sql.SQL("REINDEX INDEX CONCURRENTLY {}").format(sql.Identifier(index)))
+                self._reset_index_baseline(cursor, index)
+                result["reindexed"].append(index)
+        
+        except psycopg2.extensions.QueryCanceledError:
+            if not interrupted():
+                raise
+            # Cancelado pela vigia: para a vigia antes de limpar o REINDEX interrompido
+            stop.set()
+            if watcher.is_alive():
+                watcher.join()
+            self._drop_reindex_leftovers(cursor)
+        
+        except Exception as e:
+            self.logger.error(f"Error running database maintenance: {e}")
+            raise
+        
+        finally:
+            stop.set()
+            if watcher.is_alive():
+                watcher.join()
+            cursor.close()
+            conn.autocommit = False
+            self.pool.putconn(conn)
+        
+        result.update(state)
+        result["elapsed_seconds"] = round(time.monotonic() - started, 3)
+        if interrupted():
+            reason = "user activity" if state["aborted"] else "time budget"
+            self.logger.info(f"Database maintenance interrupted by {reason}")
+        return result
+    
+    def _watch_maintenance(
+        self,
+        conn,
+        deadline: float,
+        should_abort: Optional[Callable[[], bool]],
+        state: Dict[str, bool],
+        stop: threading.Event
+    ):
+        """
+        Vigia da manutenção: cancela o comando em execução ao interromper
+        
+        Depois de interromper, continua cancelando a cada verificação, para
+        pegar um comando iniciado logo antes de a interrupção ser vista.
+        """
+        while not stop.wait(MAINTENANCE_POLL_SECONDS):
+            if not (state["aborted"] or state["timed_out"]):
+                if should_abort is not None and should_abort():
+                    state["aborted"] = True
+                elif time.monotonic() >= deadline:
+                    state["timed_out"] = True
+                else:
+                    continue
+            conn.cancel()
+    
+    def _tables_to_analyze(self, cursor) -> List[str]:
+        """
+        Tabelas com estatísticas do planejador desatualizadas
+        
+        Args:
+            cursor: Cursor em modo autocommit
+        
+        Returns:
+            Tabelas (mais alteradas primeiro), seguidas das tabelas-mãe das
+            partições da lista
+        """
+        cursor.execute("""
+            SELECT s.relname, i.inhparent::regclass::text
+            FROM pg_stat_user_tables s
+            LEFT JOIN pg_inherits i ON i.inhrelid = s.relid
+            WHERE s.schemaname = current_schema()
+              AND s.n_mod_since_analyze > 0
+              AND (
+                  COALESCE(s.last_analyze, s.last_autoanalyze) IS NULL
+                  OR s.n_mod_since_analyze >= %s * GREATEST(s.n_live_tup, 1)
+              )
+            ORDER BY s.n_mod_since_analyze DESC
+        """, (self.analyze_threshold,))
+        
+        tables, parents = [], []
+        for table, parent in cursor.fetchall():
+            tables.append(table)
+            if parent and parent not in parents:
+                parents.append(parent)
+        return tables + parents
+    
+    def _measure_index_bloat(self, cursor) -> Dict[str, float]:
+        """
+        Inchaço dos índices HNSW (bytes por linha viva / linha de base)
+        
+        A linha de base de cada índice é o menor valor já medido; índices de
+        tabelas com menos de BLOAT_MIN_ROWS linhas são ignorados.
+        
+        Args:
+            cursor: Cursor em modo autocommit
+        
+        Returns:
+            Nome do índice -> razão de inchaço (1.0 = sem inchaço)
+        """
+        cursor.execute("""
+            SELECT i.relname, pg_relation_size(i.oid)::float8 / s.n_live_tup
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            JOIN pg_am a ON a.oid = i.relam
+            JOIN pg_stat_user_tables s ON s.relid = x.indrelid
+            WHERE a.amname = 'hnsw'
+              AND i.relkind = 'i'
+              AND x.indisvalid
+              AND s.schemaname = current_schema()
+              AND s.n_live_tup >= %s
+        """, (BLOAT_MIN_ROWS,))
+        current = cursor.fetchall()
+        if not current:
+            return {}
+        
+        # fetch=True: execute_values envia páginas de 100 linhas e cursor.fetchall() só veria a última
+        baselines = dict(execute_values(cursor, """
+            INSERT INTO index_maintenance (index_name, bytes_per_row)
+            VALUES %s
+            ON CONFLICT (index_name) DO UPDATE SET
+                bytes_per_row = LEAST(index_maintenance.bytes_per_row, EXCLUDED.bytes_per_row),
+                updated_at = CURRENT_TIMESTAMP
+            RETURNING index_name, bytes_per_row
+        """, current, fetch=True))
+        
+        return {
+            index: round(bytes_per_row / baselines[index], 3)
+            for index, bytes_per_row in current
+        }
+    
+    def _reset_index_baseline(self, cursor, index: str):
+        """Registra os bytes por linha do índice recém-reconstruído como linha de base"""
+        cursor.execute("""
+            UPDATE index_maintenance m
+            SET bytes_per_row = pg_relation_size(i.oid)::float8 / GREATEST(s.n_live_tup, 1),
+                reindexed_at = CURRENT_TIMESTAMP,
+                updated_at = CURRENT_TIMESTAMP
+            FROM pg_class i
+            JOIN pg_index x ON x.indexrelid = i.oid
+            JOIN pg_stat_user_tables s ON s.relid = x.indrelid
+            WHERE m.index_name = %s
+              AND i.relname = %s
+              AND i.relnamespace = current_schema()::regnamespace
+        """, (index, index))
+    
+    def _drop_reindex_leftovers(self, cursor):
+        """Remove índices inválidos deixados por REINDEX CONCURRENTLY interrompido"""
+        cursor.execute("""
+            SELECT i.relname
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE NOT x.indisvalid
+              AND i.relnamespace = current_schema()::regnamespace
+              AND i.relname ~ '_cc(new|old)[0-9]*$'
+        """)
+        for (index,) in cursor.fetchall():
+            self.logger.warning(f"Dropping invalid index {index} left by an interrupted reindex")
+            cursor.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(index)))
+    
+    def _ensure_embedding_versions(self, cursor):
+        """
+        Cria o registro de versões de embedding e lê a dimensão ativa
+        
+        A versão ativa sempre ocupa a coluna `embedding`; versões em
+        construção ou aposentadas ficam em `embedding_<versão>`. Em um banco
+        sem registro, a coluna atual é registrada como versão `v1`.
+        
+        Args:
+            cursor: Cursor da transação de inicialização do schema
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_versions (
+                name VARCHAR(24) PRIMARY KEY,
+                model VARCHAR(255) NOT NULL,
+                dim INTEGER NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'building',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                activated_at TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS embedding_versions_active_idx
+            ON embedding_versions (status) WHERE status = 'active'
+        """)
+        
+        # Checkpoint da re-indexação: último ID processado por tabela
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_reindex_progress (
+                version VARCHAR(24) NOT NULL REFERENCES embedding_versions(name) ON DELETE CASCADE,
+                table_name VARCHAR(63) NOT NULL,
+                last_id INTEGER NOT NULL DEFAULT 0,
+                rows_done INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (version, table_name)
+            )
+        """)
+        
+        cursor.execute(EMBEDDING_DIM_QUERY)
+        self._set_embedding_dim(cursor.fetchone())
+        
+        cursor.execute("""
+            INSERT INTO embedding_versions (name, model, dim, status, activated_at)
+            SELECT 'v1', %s, %s, 'active', CURRENT_TIMESTAMP
+            WHERE NOT EXISTS (SELECT 1 FROM embedding_versions)
+        """, (self.config.get("embeddings.model", EMBEDDING_MODEL), self.embedding_dim))
+        
+        # Checkpoint para toda versão (inclusive v1), para que possa ser re-indexada ao ser reativada
+        cursor.execute("""
+            INSERT INTO embedding_reindex_progress (version, table_name)
+            SELECT v.name, t.table_name
+            FROM embedding_versions v
+            CROSS JOIN unnest(%s::text[]) AS t(table_name)
+            ON CONFLICT (version, table_name) DO NOTHING
+        """, (list(VECTOR_TABLES),))
+    
+    def _ensure_vector_indexes(self, cursor):
+        """
+        Cria os índices HNSW do modo configurado e remove os dos outros modos
+        
+        Serve também de migração: ao trocar `database.vector_storage`, o novo
+        índice é construído a partir da coluna float32 existente antes de o
+        antigo ser removido. Índices parciais (por contexto ou usuário) de
+        outro modo são descartados e recriados por ensure_context_indexes().
+        
+        Args:
+            cursor: Cursor da transação de inicialização do schema
+        """
+        self._resolve_vector_storage()
+        
+        suffix, _, opclass = VECTOR_STORAGE_MODES[self.vector_storage]
+        definition = self._index_definition()
+        for table in VECTOR_TABLES:
+            cursor.execute("""
+                SELECT 1 FROM pg_indexes WHERE tablename = %s AND indexname = %s
+            """, (table, f"{table}_{suffix}"))
+            if not cursor.fetchone():
+                self.logger.info(f"Building {self.vector_storage} HNSW index on {table}")
+            
+            cursor.execute(f"""
+                CREATE INDEX IF NOT EXISTS {table}_{suffix}
+                ON {table}
+                USING hnsw {definition}
+                WITH (m = 16, ef_construction = 64)
+            """)
+            
+            for mode, (other_suffix, _, _) in VECTOR_STORAGE_MODES.items():
+                if mode != self.vector_storage:
+                    cursor.execute(f"DROP INDEX IF EXISTS {table}_{other_suffix}")
+        
+        cursor.execute(f"""
+            DO $$
+            DECLARE r record;
+            BEGIN
+                FOR r IN
+                    SELECT indexname FROM pg_indexes
+                    WHERE tablename = 'feedback'
+                      AND indexname ~ '{PARTIAL_INDEX_PATTERN}'
+                      AND indexdef NOT LIKE '%{opclass}%'
+                LOOP
+                    EXECUTE format('DROP INDEX IF EXISTS %I', r.indexname);
+                END LOOP;
+            END $$
+        """)
+    
+    def _get_pgvector_version(self, conn) -> Tuple[int, ...]:
+        """
+        Obtém versão da extensão pgvector instalada
+        
+        Args:
+            conn: Conexão com o banco
+        
+        Returns:
+            Versão como tupla (ex: (0, 8, 0)); (0,) se não detectada
+        """
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = cursor.fetchone()
+            return tuple(int(part) for part in str(row[0]).split("."))
+        except Exception:
+            return (0,)
+        finally:
+            cursor.close()
+            conn.rollback()
+    
+    def _apply_search_settings(self, cursor, top_k: int):
+        """
+        Ajusta parâmetros HNSW da transação atual para uma busca filtrada
+        
+        Args:
+            cursor: Cursor da transação da busca
+            top_k: Número de resultados desejados
+        """
+        for statement, params in self._search_settings(top_k):
+            cursor.execute(statement, params)
+    
+    @staticmethod
+    def _partial_index_name(column: str, value: str) -> str:
+        """
+        Nome do índice HNSW parcial de um valor de coluna (limite de 63 caracteres)
+        
+        Args:
+            column: Coluna de PARTIAL_INDEX_KINDS
+            value: Valor filtrado pelo índice
+        """
+        slug = re.sub(r'[^a-z0-9]+', '_', value.lower()).strip('_')[:24]
+        digest = hashlib.md5(value.encode('utf-8')).hexdigest()[:8]
+        return f"feedback_embedding_{PARTIAL_INDEX_KINDS[column]}_{slug}_{digest}_idx"
+    
+    @classmethod
+    def _context_index_name(cls, context: str) -> str:
+        """Nome do índice HNSW parcial de um contexto"""
+        return cls._partial_index_name("context", context)
+    
+    @classmethod
+    def _user_index_name(cls, user_id: str) -> str:
+        """Nome do índice HNSW parcial do histórico de um usuário"""
+        return cls._partial_index_name("user_id", user_id)
+    
+    def ensure_context_indexes(self, threshold: Optional[int] = None) -> List[str]:
+        """
+        Cria índices HNSW parciais para contextos e usuários com muitos feedbacks
+        
+        O pgvector pós-filtra candidatos do índice global, então contextos
+        seletivos retornam menos que top_k. Um índice parcial por contexto
+        (WHERE context = ...) resolve o filtro dentro do próprio índice.
+        
+        O mesmo vale por usuário (WHERE user_id = ...): a busca de um usuário
+        percorre só o grafo do seu histórico, e o custo não cresce com o
+        número de usuários. Usuários abaixo do limite são resolvidos pelo
+        índice B-tree de user_id seguido de distância exata sobre poucas linhas.
+        
+        Args:
+            threshold: Número mínimo de feedbacks do contexto ou usuário (padrão: config)
+        
+        Returns:
+            Nomes dos índices criados
+        """
+        if not self._context_index_lock.acquire(blocking=False):
+            return []
+        
+        if threshold is None:
+            threshold = self.context_index_threshold
+        created = []
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT indexname FROM pg_indexes
+                WHERE tablename = 'feedback' AND indexname ~ %s
+            """, (PARTIAL_INDEX_PATTERN,))
+            self._context_indexes = {row[0] for row in cursor.fetchall()}
+            
+            targets = []
+            for column in PARTIAL_INDEX_KINDS:
+                cursor.execute(sql.SQL("""
+                    SELECT {column} FROM feedback
+                    WHERE {column} IS NOT NULL
+                    GROUP BY {column}
+                    HAVING COUNT(*) >= %s
+                """).format(column=sql.Identifier(column)), (threshold,))
+                targets.extend((column, row[0]) for row in cursor.fetchall())
+            conn.rollback()
+            
+            # CREATE INDEX CONCURRENTLY não roda dentro de transação
+            conn.autocommit = True
+            for column, value in targets:
+                index_name = self._partial_index_name(column, value)
+                if index_name in self._context_indexes:
+                    continue
+                
+                try:
+                    self._create_context_index(cursor, index_name, value, column=column)
+                except Exception as e:
+                    # Build concorrente que falha deixa índice inválido
+                    self.logger.warning(f"Error creating index for {column} '{value}': {e}")
+                    self._drop_context_index(cursor, index_name)
+                    continue
+                
+                self._context_indexes.add(index_name)
+                created.append(index_name)
+                self.logger.info(f"Created partial HNSW index {index_name} for {column} '{value}'")
+            
+            cursor.close()
+            return created
+        
+        except Exception as e:
+            self.logger.warning(f"Error ensuring context indexes: {e}")
+            return created
+        
+        finally:
+            conn.autocommit = False
+            self.pool.putconn(conn)
+            self._context_index_lock.release()
+    
+    def _create_context_index(self, cursor, index_name: str, context: str, column: str = "context"):
+        """
+        Cria índice HNSW parcial de um contexto (ou usuário) sem bloquear escritas
+        
+        Em tabela particionada, CREATE INDEX CONCURRENTLY não é aceito na
+        tabela-mãe: cria o índice só na mãe (ON ONLY), constrói cada partição
+        concorrentemente e anexa os índices das partições.
+        
+        Args:
+            cursor: Cursor em modo autocommit
+            index_name: Nome do índice (ver _partial_index_name)
+            context: Valor filtrado pelo índice
+            column: Coluna filtrada ("context" ou "user_id")
+        """
+        index_sql = sql.SQL("""
+            CREATE INDEX {concurrently} IF NOT EXISTS {name}
+            ON {only} {table}
+            USING hnsw {definition}
+            WITH (m = 16, ef_construction = 64)
+            WHERE {column} = {context}
+        """)
+        params = {
+            "definition": sql.SQL(self._index_definition()),
+            "column": sql.Identifier(column),
+            "context": sql.Literal(context)
+        }
+        
+        if not self.feedback_partitioning:
+            cursor.execute(index_sql.format(
+                concurrently=sql.SQL("CONCURRENTLY"),
+                name=sql.Identifier(index_name),
+                only=sql.SQL(""),
+                table=sql.Identifier("feedback"),
+                **params
+            ))
+            return
+        
+        cursor.execute(index_sql.format(
+            concurrently=sql.SQL(""),
+            name=sql.Identifier(index_name),
+            only=sql.SQL("ONLY"),
+            table=sql.Identifier("feedback"),
+            **params
+        ))
+        for partition, partition_index in self._context_partition_indexes(cursor, index_name):
+            cursor.execute(index_sql.format(
+                concurrently=sql.SQL("CONCURRENTLY"),
+                name=sql.Identifier(partition_index),
+                only=sql.SQL(""),
+                table=sql.Identifier(partition),
+                **params
+            ))
+            cursor.execute(sql.SQL("ALTER INDEX {} ATTACH PARTITION {}").format(
+                sql.Identifier(index_name),
+                sql.Identifier(partition_index)
+            ))
+    
+    def _list_feedback_partitions(self, cursor) -> List[str]:
+        """Nomes das partições de feedback"""
+        cursor.execute("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'feedback'::regclass
+        """)
+        return [row[0] for row in cursor.fetchall()]
+    
+    def _context_partition_indexes(self, cursor, index_name: str) -> List[Tuple[str, str]]:
+        """Pares (partição, nome do índice parcial na partição)"""
+        kind = index_name[len("feedback_embedding_"):].split("_", 1)[0]
+        digest = index_name[-12:-4]
+        return [
+            (partition, f"{partition}_{kind}_{digest}_idx")
+            for partition in self._list_feedback_partitions(cursor)
+        ]
+    
+    def _drop_context_index(self, cursor, index_name: str):
+        """Remove índice parcial (e os das partições) após build com falha"""
+        if not self.feedback_partitioning:
+            cursor.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(
+                sql.Identifier(index_name)
+            ))
+            return
+        
+        cursor.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(index_name)))
+        for _, partition_index in self._context_partition_indexes(cursor, index_name):
+            cursor.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(
+                sql.Identifier(partition_index)
+            ))
+    
+    def _schedule_context_index_check(self):
+        """Verifica índices por contexto em background (fora do caminho da requisição)"""
+        if self._context_index_lock.locked():
+            return
+        
+        threading.Thread(
+            target=self.ensure_context_indexes,
+            name="context-index-check",
+            daemon=True
+        ).start()
+    
+    def store_feedback(
+        self,
+        prompt: str,
+        response: str,
+        score: float,
+        implicit_score: Optional[float] = None,
+        emotional_score: Optional[float] = None,
+        context: Optional[str] = None,
+        embedding: Optional[np.ndarray] = None,
+        user_id: Optional[str] = None
+    ) -> int:
+        """
+        Armazena feedback no banco
+        
+        Args:
+            prompt: Prompt original
+            response: Resposta gerada
+            score: Score total (0.7 * implícito + 0.3 * emocional)
+            implicit_score: Score implícito
+            emotional_score: Score emocional
+            context: Contexto (ex: 'python', 'odoo')
+            embedding: Embedding vetorial (opcional)
+            user_id: Usuário dono do feedback (opcional)
+        
+        Returns:
+            ID do feedback armazenado
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO feedback (
+                    prompt, response, score, implicit_score, emotional_score, context, embedding, user_id
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (prompt, response, score, implicit_score, emotional_score, context, embedding, user_id))
+            
+            feedback_id = cursor.fetchone()[0]
+            conn.commit()
+            
+            self.logger.debug(f"Feedback stored with ID: {feedback_id}")
+            
+            self._feedback_writes += 1
+            if (context or user_id) and self._feedback_writes % CONTEXT_INDEX_CHECK_INTERVAL == 0:
+                self._schedule_context_index_check()
+            
+            return feedback_id
+        
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error storing feedback: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def store_feedback_batch(
+        self,
+        feedbacks: List[Dict[str, Any]],
+        page_size: int = 500
+    ) -> int:
+        """
+        Armazena vários feedbacks em uma única transação (INSERT multi-linha)
+        
+        Feedbacks com `client_id` já armazenado são ignorados, de modo que
+        reenviar um lote após falha não duplica linhas.
+        
+        Args:
+            feedbacks: Dicionários com prompt, response, score e opcionalmente
+                implicit_score, emotional_score, context, embedding,
+                created_at, client_id e user_id
+            page_size: Número de linhas por INSERT
+        
+        Returns:
+            Número de feedbacks inseridos
+        """
+        if not feedbacks:
+            return 0
+        
+        rows = [
+            (
+                fb['prompt'],
+                fb['response'],
+                fb['score'],
+                fb.get('implicit_score'),
+                fb.get('emotional_score'),
+                fb.get('context'),
+                fb.get('embedding'),
+                fb.get('created_at'),
+                fb.get('client_id'),
+                fb.get('user_id')
+            )
+            for fb in feedbacks
+        ]
+        
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            result = execute_values(
+                cursor,
+                """
+                INSERT INTO feedback (
+                    prompt, response, score, implicit_score, emotional_score,
+                    context, embedding, created_at, client_id, user_id
+                )
+                VALUES %s
+                ON CONFLICT (client_id, created_at) DO NOTHING
+                RETURNING id
+                """,
+                rows,
+                template="(%s, %s, %s, %s, %s, %s, %s, COALESCE(%s::timestamp, CURRENT_TIMESTAMP), %s::uuid, %s)",
+                page_size=page_size,
+                fetch=True
+            )
+            conn.commit()
+            
+            inserted = len(result)
+            self.logger.debug(f"Stored {inserted} of {len(feedbacks)} feedbacks in batch")
+            
+            self._feedback_writes += inserted
+            if inserted and self._feedback_writes % CONTEXT_INDEX_CHECK_INTERVAL < inserted:
+                self._schedule_context_index_check()
+            
+            return inserted
+        
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error storing feedback batch: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def get_all_feedbacks(self) -> List[Dict[str, Any]]:
+        """
+        Retorna todos os feedbacks
+        
+        Returns:
+            Lista de feedbacks
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, prompt, response, score, implicit_score, emotional_score, context, created_at
+                FROM feedback
+                ORDER BY created_at DESC
+            """)
+            
+            feedbacks = []
+            for row in cursor.fetchall():
+                feedbacks.append({
+                    "id": row[0],
+                    "prompt": row[1],
+                    "response": row[2],
+                    "score": row[3],
+                    "implicit_score": row[4],
+                    "emotional_score": row[5],
+                    "context": row[6],
+                    "created_at": row[7]
+                })
+            
+            return feedbacks
+        
+        except Exception as e:
+            self.logger.error(f"Error getting feedbacks: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def iter_feedback_batches(
+        self,
+        score_threshold: float = 0.7,
+        after_id: int = 0,
+        batch_size: int = 1000
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Itera feedbacks em lotes usando cursor no servidor (named cursor)
+        
+        O filtro de score é aplicado no SQL e a leitura retoma a partir de
+        `after_id`, então apenas feedbacks novos e positivos são carregados.
+        A leitura para no teto de IDs já resolvidos (ver
+        _committed_feedback_ceiling), de modo que a marca d'água nunca passe
+        de um ID ainda não commitado por um escritor concorrente.
+        
+        Args:
+            score_threshold: Score mínimo (exclusivo)
+            after_id: Retorna apenas feedbacks com ID maior que este
+            batch_size: Número de linhas por lote
+        
+        Yields:
+            Lotes de feedbacks ordenados por ID
+        """
+        conn = self.pool.getconn()
+        cursor = None
+        try:
+            with conn.cursor() as ceiling_cursor:
+                ceiling = self._committed_feedback_ceiling(ceiling_cursor)
+            if ceiling is None:
+                return
+            
+            # Cursor nomeado: linhas ficam no servidor até o fetchmany
+            cursor = conn.cursor(name=f"feedback_stream_{uuid.uuid4().hex[:12]}")
+            cursor.itersize = batch_size
+            cursor.execute("""
+                SELECT id, prompt, response, score, implicit_score, emotional_score, context, created_at
+                FROM feedback
+                WHERE id > %s AND id <= %s AND score > %s
+                ORDER BY id ASC
+            """, (after_id, ceiling, score_threshold))
+            
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                
+                yield [
+                    {
+                        "id": row[0],
+                        "prompt": row[1],
+                        "response": row[2],
+                        "score": row[3],
+                        "implicit_score": row[4],
+                        "emotional_score": row[5],
+                        "context": row[6],
+                        "created_at": row[7]
+                    }
+                    for row in rows
+                ]
+        
+        except Exception as e:
+            self.logger.error(f"Error streaming feedbacks: {e}")
+            raise
+        
+        finally:
+            if cursor is not None:
+                cursor.close()
+            # Encerra a transação de leitura antes de devolver a conexão
+            conn.rollback()
+            self.pool.putconn(conn)
+    
+    def _committed_feedback_ceiling(self, cursor) -> Optional[int]:
+        """
+        Maior ID de feedback abaixo do qual não há mais inserções em andamento
+        
+        IDs de SERIAL são alocados antes do commit, então um escritor pode
+        commitar um ID menor depois de outro maior já visível. Lê o último
+        valor da sequência e espera terminarem todas as transações abertas
+        naquele momento (como o CREATE INDEX CONCURRENTLY). Usa os locks de
+        virtualxid porque nextval() não atribui xid, e um snapshot
+        (pg_snapshot_xmin) não enxergaria esse escritor.
+        
+        Args:
+            cursor: Cursor da conexão que fará a leitura (sem escrita pendente)
+        
+        Returns:
+            ID teto, ou None se os escritores não terminaram em
+            FEEDBACK_WRITERS_TIMEOUT_SECONDS
+        """
+        cursor.execute("""
+            SELECT COALESCE(pg_sequence_last_value(pg_get_serial_sequence('feedback', 'id')::regclass), 0)
+        """)
+        ceiling = cursor.fetchone()[0]
+        
+        # Lido depois da sequência: todo dono de um ID <= teto ainda aberto está nesta lista
+        cursor.execute("""
+            SELECT COALESCE(array_agg(virtualxid), '{}')
+            FROM pg_locks
+            WHERE locktype = 'virtualxid' AND pid <> pg_backend_pid()
+        """)
+        writers = cursor.fetchone()[0]
+        
+        deadline = time.monotonic() + FEEDBACK_WRITERS_TIMEOUT_SECONDS
+        while writers:
+            cursor.execute("""
+                SELECT COALESCE(array_agg(virtualxid), '{}')
+                FROM pg_locks
+                WHERE locktype = 'virtualxid' AND virtualxid = ANY(%s)
+            """, (writers,))
+            writers = cursor.fetchone()[0]
+            if not writers:
+                break
+            if time.monotonic() >= deadline:
+                self.logger.warning(
+                    f"{len(writers)} transactions still open after "
+                    f"{FEEDBACK_WRITERS_TIMEOUT_SECONDS}s, deferring feedback consolidation"
+                )
+                return None
+            time.sleep(MAINTENANCE_POLL_SECONDS)
+        
+        return ceiling
+    
+    def iter_export_batches(
+        self,
+        table: str,
+        batch_size: int = 10000
+    ) -> Iterator[Tuple[Dict[str, list], Optional[np.ndarray], Optional[np.ndarray]]]:
+        """
+        Itera uma tabela em lotes colunares para exportação (ver src.storage.export)
+        
+        Usa cursor no servidor; os embeddings vêm no formato binário do
+        pgvector (vector_send) e são decodificados direto para NumPy, sem
+        criar um float Python por dimensão.
+        
+        Args:
+            table: Tabela de EXPORT_COLUMNS
+            batch_size: Número de linhas por lote
+        
+        Yields:
+            (colunas, embeddings, válidos): listas por coluna, matriz float32
+            (n, dim) com zeros nas linhas sem embedding e máscara dessas
+            linhas; os dois últimos são None em tabelas sem embedding
+        """
+        if table not in EXPORT_COLUMNS:
+            raise ValueError(f"Unknown export table: {table}")
+        
+        names = [name for name, _ in EXPORT_COLUMNS[table]]
+        select = [
+            sql.SQL("{}::text").format(sql.Identifier(name)) if kind == "json" else sql.Identifier(name)
+            for name, kind in EXPORT_COLUMNS[table]
+        ]
+        with_embedding = table in VECTOR_TABLES
+        if with_embedding:
+            select.append(sql.SQL("vector_send(embedding)"))
+        
+        conn = self.pool.getconn()
+        cursor = None
+        try:
+            cursor = conn.cursor(name=f"{table}_export_{uuid.uuid4().hex[:12]}")
+            cursor.itersize = batch_size
+            cursor.execute(sql.SQL("SELECT {} FROM {} ORDER BY id").format(
+                sql.SQL(", ").join(select), sql.Identifier(table)
+            ))
+            
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                
+                values = list(zip(*rows))
+                columns = dict(zip(names, values))
+                if not with_embedding:
+                    yield columns, None, None
+                    continue
+                
+                embeddings, valid = self._decode_vectors(values[-1])
+                yield columns, embeddings, valid
+        
+        except Exception as e:
+            self.logger.error(f"Error exporting {table}: {e}")
+            raise
+        
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.rollback()
+            self.pool.putconn(conn)
+    
+    def _decode_vectors(self, raw: Tuple[Optional[memoryview], ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decodifica vetores no formato binário do pgvector
+        
+        Cada valor tem 4 bytes de cabeçalho (dimensão e reservado) seguidos
+        dos floats em big-endian.
+        
+        Returns:
+            Matriz float32 (n, dim) com zeros nos nulos e máscara dos não nulos
+        """
+        valid = np.fromiter((value is not None for value in raw), dtype=bool, count=len(raw))
+        embeddings = np.zeros((len(raw), self.embedding_dim), dtype=np.float32)
+        if valid.any():
+            buffer = np.frombuffer(b"".join(value for value in raw if value is not None), dtype=np.uint8)
+            payload = np.ascontiguousarray(buffer.reshape(int(valid.sum()), -1)[:, 4:])
+            embeddings[valid] = payload.view(">f4")
+        return embeddings, valid
+    
+    def get_consolidation_watermark(self, name: str = "sleep") -> Dict[str, Any]:
+        """
+        Obtém a marca d'água da última consolidação bem-sucedida
+        
+        Args:
+            name: Nome do processo de consolidação
+        
+        Returns:
+            Dicionário com last_feedback_id e last_created_at
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT last_feedback_id, last_created_at
+                FROM consolidation_state
+                WHERE name = %s
+            """, (name,))
+            
+            row = cursor.fetchone()
+            if not row:
+                return {"last_feedback_id": 0, "last_created_at": None}
+            
+            return {
+                "last_feedback_id": row[0],
+                "last_created_at": row[1]
+            }
+        
+        except Exception as e:
+            self.logger.error(f"Error getting consolidation watermark: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def update_consolidation_watermark(
+        self,
+        last_feedback_id: int,
+        last_created_at: Optional[Any] = None,
+        name: str = "sleep"
+    ):
+        """
+        Persiste a marca d'água após uma consolidação bem-sucedida
+        
+        Args:
+            last_feedback_id: ID do último feedback consolidado
+            last_created_at: Timestamp do último feedback consolidado
+            name: Nome do processo de consolidação
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO consolidation_state (name, last_feedback_id, last_created_at)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (name) DO UPDATE
+                SET last_feedback_id = EXCLUDED.last_feedback_id,
+                    last_created_at = EXCLUDED.last_created_at,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE consolidation_state.last_feedback_id <= EXCLUDED.last_feedback_id
+            """, (name, last_feedback_id, last_created_at))
+            
+            conn.commit()
+            self.logger.debug(f"Consolidation watermark '{name}' set to feedback {last_feedback_id}")
+        
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error updating consolidation watermark: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def get_important_examples(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Retorna exemplos importantes para replay
+        
+        Args:
+            limit: Número máximo de exemplos
+        
+        Returns:
+            Lista de exemplos importantes
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, prompt, response, score, context, created_at
+                FROM important_examples
+                ORDER BY score DESC, created_at DESC
+                LIMIT %s
+            """, (limit,))
+            
+            examples = []
+            for row in cursor.fetchall():
+                examples.append({
+                    "id": row[0],
+                    "prompt": row[1],
+                    "response": row[2],
+                    "score": row[3],
+                    "context": row[4],
+                    "created_at": row[5]
+                })
+            
+            return examples
+        
+        except Exception as e:
+            self.logger.error(f"Error getting important examples: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def add_important_example(
+        self,
+        prompt: str,
+        response: str,
+        score: float,
+        context: Optional[str] = None,
+        embedding: Optional[np.ndarray] = None
+    ):
+        """
+        Adiciona exemplo importante para replay
+        
+        Args:
+            prompt: Prompt original
+            response: Resposta gerada
+            score: Score do exemplo
+            context: Contexto
+            embedding: Embedding vetorial
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO important_examples (prompt, response, score, context, embedding)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (prompt, response, score, context, embedding))
+            
+            conn.commit()
+            self.logger.debug("Important example added")
+        
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error adding important example: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def search_similar(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        context: Optional[str] = None,
+        min_score: float = 0.7,
+        user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca feedbacks similares por embedding
+        
+        Args:
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+            context: Filtrar por contexto (opcional)
+            min_score: Score mínimo
+            user_id: Buscar só no histórico do usuário (None = todos)
+        
+        Returns:
+            Lista de feedbacks similares
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            self._apply_search_settings(cursor, top_k)
+            
+            cursor.execute(self._knn_query(
+                columns="t.id, t.prompt, t.response, t.score, t.context",
+                table="feedback",
+                where=self._feedback_filter(context, user_id),
+                query="%(query)s::vector",
+                limit="%(top_k)s"
+            ), {
+                "query": np.asarray(query_embedding, dtype=np.float32),
+                "min_score": min_score,
+                "context": context,
+                "user_id": user_id,
+                "top_k": top_k
+            })
+            
+            results = []
+            for row in cursor.fetchall():
+                results.append({
+                    "id": row[0],
+                    "prompt": row[1],
+                    "response": row[2],
+                    "score": row[3],
+                    "context": row[4],
+                    "similarity": float(row[5])
+                })
+            
+            # Encerra a transação (descarta SET LOCAL da busca)
+            conn.commit()
+            
+            # Iterative scan "relaxed_order" pode retornar fora de ordem
+            results.sort(key=lambda r: r["similarity"], reverse=True)
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"Error searching similar: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def search_similar_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 5,
+        context: Optional[str] = None,
+        min_score: float = 0.7,
+        user_id: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Busca feedbacks similares para várias queries em um único statement
+        
+        Cada query é resolvida por um LATERAL join contra o índice HNSW.
+        
+        Args:
+            query_embeddings: Array (n, 384) com embeddings das queries
+            top_k: Número de resultados por query
+            context: Filtrar por contexto (opcional)
+            min_score: Score mínimo
+            user_id: Buscar só no histórico do usuário (None = todos)
+        
+        Returns:
+            Lista com n listas de feedbacks similares (na ordem das queries)
+        """
+        queries = self._as_query_batch(query_embeddings)
+        if not queries:
+            return []
+        
+        where = self._feedback_filter(context, user_id)
+        
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            self._apply_search_settings(cursor, top_k)
+            knn = self._knn_query(
+                columns="t.id, t.prompt, t.response, t.score, t.context",
+                table="feedback",
+                where=where,
+                query="q.embedding",
+                limit="%(top_k)s"
+            )
+            cursor.execute(f"""
+                SELECT q.ord, r.id, r.prompt, r.response, r.score, r.context, r.similarity
+                FROM unnest(%(queries)s::vector[]) WITH ORDINALITY AS q(embedding, ord)
+                CROSS JOIN LATERAL ({knn}) r
+                ORDER BY q.ord, r.similarity DESC
+            """, {
+                "queries": queries,
+                "min_score": min_score,
+                "context": context,
+                "user_id": user_id,
+                "top_k": top_k
+            })
+            
+            results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+            for row in cursor.fetchall():
+                results[row[0] - 1].append({
+                    "id": row[1],
+                    "prompt": row[2],
+                    "response": row[3],
+                    "score": row[4],
+                    "context": row[5],
+                    "similarity": float(row[6])
+                })
+            
+            conn.commit()
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"Error in batch similar search: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def search_similar_hybrid(
+        self,
+        query_text: str,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        context: Optional[str] = None,
+        min_score: float = 0.7,
+        user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca feedbacks combinando full-text e similaridade semântica (RRF)
+        
+        Args:
+            query_text: Texto da query (para o ranking lexical)
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+            context: Filtrar por contexto (opcional)
+            min_score: Score mínimo
+            user_id: Buscar só no histórico do usuário (None = todos)
+        
+        Returns:
+            Lista de feedbacks ordenada por `rrf_score`
+        """
+        where = self._feedback_filter(context, user_id)
+        candidates = max(self.hybrid_candidates, top_k)
+        
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            self._apply_search_settings(cursor, candidates)
+            cursor.execute(self._hybrid_query(
+                columns="t.id, t.prompt, t.response, t.score, t.context",
+                table="feedback",
+                where=where
+            ), {
+                "query": np.asarray(query_embedding, dtype=np.float32),
+                "query_text": query_text,
+                "min_score": min_score,
+                "context": context,
+                "user_id": user_id,
+                "candidates": candidates,
+                "rrf_k": self.rrf_k,
+                "top_k": top_k
+            })
+            
+            results = []
+            for row in cursor.fetchall():
+                results.append({
+                    "id": row[0],
+                    "prompt": row[1],
+                    "response": row[2],
+                    "score": row[3],
+                    "context": row[4],
+                    "similarity": float(row[5]) if row[5] is not None else 0.0,
+                    "rrf_score": float(row[6])
+                })
+            
+            conn.commit()
+            return results
+        
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error in hybrid similar search: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def store_course(
+        self,
+        name: str,
+        description: str,
+        source_type: str,
+        source_path: str
+    ) -> int:
+        """
+        Armazena um novo curso
+        
+        Args:
+            name: Nome do curso
+            description: Descrição do curso
+            source_type: Tipo de fonte ('url', 'file', 'directory', 'text')
+            source_path: Caminho/URL da fonte
+        
+        Returns:
+            ID do curso criado
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO courses (name, description, source_type, source_path)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+            """, (name, description, source_type, source_path))
+            
+            course_id = cursor.fetchone()[0]
+            conn.commit()
+            
+            self.logger.debug(f"Course stored with ID: {course_id}")
+            return course_id
+        
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error storing course: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def get_course(self, course_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Obtém um curso por ID
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Dicionário com informações do curso ou None
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, name, description, source_type, source_path, status, created_at, updated_at
+                FROM courses
+                WHERE id = %s
+            """, (course_id,))
+            
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            # Converter datetime para string ISO
+            created_at = row[6]
+            if hasattr(created_at, 'isoformat'):
+                created_at = created_at.isoformat()
+            updated_at = row[7] if row[7] else None
+            if updated_at and hasattr(updated_at, 'isoformat'):
+                updated_at = updated_at.isoformat()
+            
+            return {
+                "id": row[0],
+                "name": row[1],
+                "description": row[2],
+                "source_type": row[3],
+                "source_path": row[4],
+                "status": row[5],
+                "created_at": created_at,
+                "updated_at": updated_at
+            }
+        
+        except Exception as e:
+            self.logger.error(f"Error getting course: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def get_all_courses(self) -> List[Dict[str, Any]]:
+        """
+        Retorna todos os cursos
+        
+        Returns:
+            Lista de cursos
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, name, description, source_type, source_path, status, created_at, updated_at,
+                       content_chunks, concepts_learned
+                FROM courses
+                ORDER BY created_at DESC
+            """)
+            
+            courses = []
+            for row in cursor.fetchall():
+                # Converter datetime para string ISO
+                created_at = row[6]
+                if hasattr(created_at, 'isoformat'):
+                    created_at = created_at.isoformat()
+                updated_at = row[7] if row[7] else None
+                if updated_at and hasattr(updated_at, 'isoformat'):
+                    updated_at = updated_at.isoformat()
+                
+                courses.append({
+                    "id": row[0],
+                    "name": row[1],
+                    "description": row[2],
+                    "source_type": row[3],
+                    "source_path": row[4],
+                    "status": row[5],
+                    "created_at": created_at,
+                    "updated_at": updated_at,
+                    "content_chunks": row[8],
+                    "concepts_learned": row[9]
+                })
+            
+            return courses
+        
+        except Exception as e:
+            self.logger.error(f"Error getting all courses: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def get_course_status(self, course_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Obtém status de um curso com contadores de chunks e conceitos
+        
+        Lê os contadores mantidos em courses (uma linha, sem COUNT).
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Dicionário com status do curso ou None
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, name, status, content_chunks, concepts_learned, created_at, updated_at
+                FROM courses
+                WHERE id = %s
+            """, (course_id,))
+            
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            created_at = row[5]
+            if hasattr(created_at, 'isoformat'):
+                created_at = created_at.isoformat()
+            updated_at = row[6] if row[6] else None
+            if updated_at and hasattr(updated_at, 'isoformat'):
+                updated_at = updated_at.isoformat()
+            
+            return {
+                "id": row[0],
+                "name": row[1],
+                "status": row[2],
+                "content_chunks": row[3],
+                "concepts_learned": row[4],
+                "created_at": created_at,
+                "updated_at": updated_at
+            }
+        
+        except Exception as e:
+            self.logger.error(f"Error getting course status: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def update_course_status(self, course_id: int, status: str):
+        """
+        Atualiza status de um curso
+        
+        Args:
+            course_id: ID do curso
+            status: Novo status
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE courses
+                SET status = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (status, course_id))
+            
+            conn.commit()
+            self.logger.debug(f"Course {course_id} status updated to {status}")
+        
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error updating course status: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def store_course_content(
+        self,
+        course_id: int,
+        title: str,
+        content: str,
+        chunk_index: int,
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding: Optional[np.ndarray] = None
+    ) -> int:
+        """
+        Armazena conteúdo de um curso
+        
+        Args:
+            course_id: ID do curso
+            title: Título do chunk
+            content: Conteúdo do chunk
+            chunk_index: Índice do chunk
+            metadata: Metadados adicionais (JSON)
+            embedding: Embedding vetorial
+        
+        Returns:
+            ID do conteúdo armazenado (ou do chunk idêntico já existente no curso)
+        """
+        import json
+        
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            metadata_json = json.dumps(metadata) if metadata else None
+            chunk_hash = content_hash(content)
+            
+            cursor.execute("""
+                WITH inserted AS (
+                    INSERT INTO course_content (
+                        course_id, title, content, chunk_index, metadata, embedding, content_hash
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (content_hash, course_id) DO NOTHING
+                    RETURNING id
+                )
+                SELECT id FROM inserted
+                UNION ALL
+                SELECT id FROM course_content WHERE content_hash = %s AND course_id = %s
+                LIMIT 1
+            """, (
+                course_id, title, content, chunk_index, metadata_json, embedding, chunk_hash,
+                chunk_hash, course_id
+            ))
+            
+            content_id = cursor.fetchone()[0]
+            conn.commit()
+            
+            self.logger.debug(f"Course content stored with ID: {content_id}")
+            return content_id
+        
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error storing course content: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def store_course_content_bulk(
+        self,
+        course_id: int,
+        chunks: List[Dict[str, Any]],
+        page_size: int = 500
+    ) -> List[int]:
+        """
+        Armazena vários chunks de um curso em uma única transação
+        
+        Usa execute_values (INSERT multi-linha) em páginas de `page_size`,
+        evitando um round trip e um commit por chunk. Chunks cujo conteúdo já
+        existe no curso não são inseridos de novo; o ID existente é retornado.
+        
+        Args:
+            course_id: ID do curso
+            chunks: Chunks processados (content, chunk_index, metadata, embedding
+                e opcionalmente title e content_hash; sem title, usa metadata['title'])
+            page_size: Número de linhas por INSERT
+        
+        Returns:
+            IDs dos conteúdos (na ordem dos chunks)
+        """
+        import json
+        
+        if not chunks:
+            return []
+        
+        rows = []
+        hashes = []
+        for chunk in chunks:
+            metadata = chunk.get('metadata')
+            title = chunk.get('title')
+            if title is None:
+                title = (metadata or {}).get('title', '')
+            chunk_hash = chunk.get('content_hash') or content_hash(chunk['content'])
+            hashes.append(chunk_hash)
+            rows.append((
+                course_id,
+                title,
+                chunk['content'],
+                chunk['chunk_index'],
+                json.dumps(metadata) if metadata else None,
+                chunk.get('embedding'),
+                chunk_hash
+            ))
+        
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            result = execute_values(
+                cursor,
+                """
+                INSERT INTO course_content (
+                    course_id, title, content, chunk_index, metadata, embedding, content_hash
+                )
+                VALUES %s
+                ON CONFLICT (content_hash, course_id) DO NOTHING
+                RETURNING content_hash, id
+                """,
+                rows,
+                page_size=page_size,
+                fetch=True
+            )
+            ids_by_hash = {row[0]: row[1] for row in result}
+            inserted = len(ids_by_hash)
+            
+            # Chunks já existentes no curso: referencia a linha atual
+            existing = list(set(hashes) - set(ids_by_hash))
+            if existing:
+                cursor.execute("""
+                    SELECT content_hash, id FROM course_content
+                    WHERE content_hash = ANY(%s) AND course_id = %s
+                """, (existing, course_id))
+                ids_by_hash.update({row[0]: row[1] for row in cursor.fetchall()})
+            conn.commit()
+            
+            content_ids = [ids_by_hash[chunk_hash] for chunk_hash in hashes]
+            self.logger.debug(
+                f"Stored {inserted} course content chunks for course {course_id} "
+                f"({len(chunks) - inserted} already stored)"
+            )
+            return content_ids
+        
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error storing course content in bulk: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def get_embeddings_by_hash(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Obtém embeddings já armazenados para hashes de conteúdo (de qualquer curso)
+        
+        Args:
+            hashes: Hashes de conteúdo (content_hash)
+        
+        Returns:
+            Dicionário hash -> embedding (apenas hashes encontrados)
+        """
+        if not hashes:
+            return {}
+        
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
             cursor.execute("""
-                SELECT id, prompt, response, score, context, created_at
-                FROM important_examples
-                ORDER BY score DESC, created_at DESC
-                LIMIT %s
-            """, (limit,))
+                SELECT DISTINCT ON (content_hash) content_hash, embedding
+                FROM course_content
+                WHERE content_hash = ANY(%s) AND embedding IS NOT NULL
+            """, (list(hashes),))
             
-            examples = []
+            return {row[0]: self._load_vector(row[1]) for row in cursor.fetchall()}
+        
+        except Exception as e:
+            self.logger.error(f"Error getting embeddings by hash: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def get_course_content(self, course_id: int) -> List[Dict[str, Any]]:
+        """
+        Obtém todo o conteúdo de um curso
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Lista de chunks de conteúdo
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, title, content, chunk_index, metadata, created_at
+                FROM course_content
+                WHERE course_id = %s
+                ORDER BY chunk_index ASC
+            """, (course_id,))
+            
+            content = []
             for row in cursor.fetchall():
-                examples.append({
+                import json
+                # Metadata pode já ser dict (se veio de processamento) ou string JSON
+                if row[4]:
+                    if isinstance(row[4], dict):
+                        metadata = row[4]
+                    else:
+                        metadata = json.loads(row[4])
+                else:
+                    metadata = None
+                content.append({
                     "id": row[0],
-                    "prompt": row[1],
-                    "response": row[2],
-                    "score": row[3],
-                    "context": row[4],
+                    "title": row[1],
+                    "content": row[2],
+                    "chunk_index": row[3],
+                    "metadata": metadata,
                     "created_at": row[5]
                 })
             
-            return examples
+            return content
         
         except Exception as e:
-            self.logger.error(f"Error getting important examples: {e}")
+            self.logger.error(f"Error getting course content: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def add_important_example(
+    def get_course_content_count(self, course_id: int) -> int:
+        """
+        Conta número de chunks de conteúdo de um curso
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Número de chunks
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*) FROM course_content
+                WHERE course_id = %s
+            """, (course_id,))
+            
+            return cursor.fetchone()[0]
+        
+        except Exception as e:
+            self.logger.error(f"Error counting course content: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def search_course_content(
         self,
-        prompt: str,
-        response: str,
-        score: float,
-        context: Optional[str] = None,
-        embedding: Optional[np.ndarray] = None
-    ):
+        course_id: int,
+        query_embedding: np.ndarray,
+        top_k: int = 5
+    ) -> List[Dict[str, Any]]:
         """
-        Adiciona exemplo importante para replay
+        Busca conteúdo de curso por similaridade semântica
         
         Args:
-            prompt: Prompt original
-            response: Resposta gerada
-            score: Score do exemplo
-            context: Contexto
-            embedding: Embedding vetorial
+            course_id: ID do curso
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+        
+        Returns:
+            Lista de chunks similares
+        """
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            self._apply_search_settings(cursor, top_k)
+            cursor.execute(self._knn_query(
+                columns="t.id, t.title, t.content, t.chunk_index, t.metadata",
+                table="course_content",
+                where="t.course_id = %(course_id)s AND t.embedding IS NOT NULL",
+                query="%(query)s::vector",
+                limit="%(top_k)s"
+            ), {
+                "query": np.asarray(query_embedding, dtype=np.float32),
+                "course_id": course_id,
+                "top_k": top_k
+            })
+            
+            results = []
+            for row in cursor.fetchall():
+                import json
+                # Metadata pode já ser dict (se veio de processamento) ou string JSON
+                if row[4]:
+                    if isinstance(row[4], (dict, list)):
+                        metadata = row[4]
+                    else:
+                        metadata = json.loads(row[4])
+                else:
+                    metadata = None
+                results.append({
+                    "id": row[0],
+                    "title": row[1],
+                    "content": row[2],
+                    "chunk_index": row[3],
+                    "metadata": metadata,
+                    "similarity": float(row[5])
+                })
+            
+            conn.commit()
+            results.sort(key=lambda r: r["similarity"], reverse=True)
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"Error searching course content: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def search_course_content_batch(
+        self,
+        course_id: int,
+        query_embeddings: np.ndarray,
+        top_k: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Busca conteúdo de curso para várias queries em um único statement
+        
+        Args:
+            course_id: ID do curso
+            query_embeddings: Array (n, 384) com embeddings das queries
+            top_k: Número de resultados por query
+        
+        Returns:
+            Lista com n listas de chunks similares (na ordem das queries)
+        """
+        queries = self._as_query_batch(query_embeddings)
+        if not queries:
+            return []
+        
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            self._apply_search_settings(cursor, top_k)
+            knn = self._knn_query(
+                columns="t.id, t.title, t.content, t.chunk_index, t.metadata",
+                table="course_content",
+                where="t.course_id = %(course_id)s AND t.embedding IS NOT NULL",
+                query="q.embedding",
+                limit="%(top_k)s"
+            )
+            cursor.execute(f"""
+                SELECT q.ord, r.id, r.title, r.content, r.chunk_index, r.metadata, r.similarity
+                FROM unnest(%(queries)s::vector[]) WITH ORDINALITY AS q(embedding, ord)
+                CROSS JOIN LATERAL ({knn}) r
+                ORDER BY q.ord, r.similarity DESC
+            """, {
+                "queries": queries,
+                "course_id": course_id,
+                "top_k": top_k
+            })
+            
+            results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+            for row in cursor.fetchall():
+                results[row[0] - 1].append({
+                    "id": row[1],
+                    "title": row[2],
+                    "content": row[3],
+                    "chunk_index": row[4],
+                    "metadata": self._load_json(row[5]),
+                    "similarity": float(row[6])
+                })
+            
+            conn.commit()
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"Error in batch course content search: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def search_course_content_hybrid(
+        self,
+        course_id: int,
+        query_text: str,
+        query_embedding: np.ndarray,
+        top_k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca conteúdo de curso combinando full-text e similaridade semântica (RRF)
+        
+        Chunks que citam identificadores exatos da query (ex: `_inherit`,
+        `res.partner`) sobem no ranking mesmo quando o embedding os aproxima
+        de outros chunks.
+        
+        Args:
+            course_id: ID do curso
+            query_text: Texto da query (para o ranking lexical)
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+        
+        Returns:
+            Lista de chunks ordenada por `rrf_score`
+        """
+        candidates = max(self.hybrid_candidates, top_k)
+        
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            self._apply_search_settings(cursor, candidates)
+            cursor.execute(self._hybrid_query(
+                columns="t.id, t.title, t.content, t.chunk_index, t.metadata",
+                table="course_content",
+                where="t.course_id = %(course_id)s"
+            ), {
+                "query": np.asarray(query_embedding, dtype=np.float32),
+                "query_text": query_text,
+                "course_id": course_id,
+                "candidates": candidates,
+                "rrf_k": self.rrf_k,
+                "top_k": top_k
+            })
+            
+            results = []
+            for row in cursor.fetchall():
+                results.append({
+                    "id": row[0],
+                    "title": row[1],
+                    "content": row[2],
+                    "chunk_index": row[3],
+                    "metadata": self._load_json(row[4]),
+                    "similarity": float(row[5]) if row[5] is not None else 0.0,
+                    "rrf_score": float(row[6])
+                })
+            
+            conn.commit()
+            return results
+        
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error in hybrid course content search: {e}")
+            raise
+        
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
+    
+    def store_learned_concept(
+        self,
+        course_id: int,
+        concept_name: str,
+        description: str,
+        examples: Optional[List[Dict[str, Any]]] = None,
+        patterns: Optional[List[Dict[str, Any]]] = None,
+        confidence: float = 0.5
+    ) -> int:
+        """
+        Armazena um conceito aprendido de um curso
+        
+        Args:
+            course_id: ID do curso
+            concept_name: Nome do conceito
+            description: Descrição do conceito
+            examples: Lista de exemplos
+            patterns: Lista de padrões
+            confidence: Confiança no conceito (0.0 a 1.0)
+        
+        Returns:
+            ID do conceito armazenado
         """
+        import json
+        
         conn = self.pool.getconn()
         try:
             cursor = conn.cursor()
+            examples_json = json.dumps(examples) if examples else None
+            patterns_json = json.dumps(patterns) if patterns else None
+            
             cursor.execute("""
-                INSERT INTO important_examples (prompt, response, score, context, embedding)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (prompt, response, score, context, embedding))
+                INSERT INTO learned_concepts (course_id, concept_name, description, examples, patterns, confidence)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (course_id, concept_name, description, examples_json, patterns_json, confidence))
             
+            concept_id = cursor.fetchone()[0]
             conn.commit()
-            self.logger.debug("Important example added")
+            
+            self.logger.debug(f"Learned concept stored with ID: {concept_id}")
+            return concept_id
         
         except Exception as e:
             conn.rollback()
-            self.logger.error(f"Error adding important example: {e}")
+            self.logger.error(f"Error storing learned concept: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def search_similar(
-        self,
-        query_embedding: np.ndarray,
-        top_k: int = 5,
-        context: Optional[str] = None,
-        min_score: float = 0.7
-    ) -> List[Dict[str, Any]]:
+    def get_learned_concepts(self, course_id: int) -> List[Dict[str, Any]]:
         """
-        Busca feedbacks similares por embedding
+        Obtém todos os conceitos aprendidos de um curso
         
         Args:
-            query_embedding: Embedding da query
-            top_k: Número de resultados
-            context: Filtrar por contexto (opcional)
-            min_score: Score mínimo
+            course_id: ID do curso
         
         Returns:
-            Lista de feedbacks similares
+            Lista de conceitos aprendidos
         """
         conn = self.pool.getconn()
         try:
             cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, concept_name, description, examples, patterns, confidence, created_at
+                FROM learned_concepts
+                WHERE course_id = %s
+                ORDER BY confidence DESC, created_at DESC
+            """, (course_id,))
             
-            if context:
-                cursor.execute("""
-                    SELECT id, prompt, response, score, context,
-                           1 - (embedding <=> %s::vector) as similarity
-                    FROM feedback
-                    WHERE context = %s AND score >= %s
-                    ORDER BY embedding <=> %s::vector
-                    LIMIT %s
-                """, (query_embedding.tolist(), context, min_score, query_embedding.tolist(), top_k))
-            else:
-                cursor.execute("""
-                    SELECT id, prompt, response, score, context,
-                           1 - (embedding <=> %s::vector) as similarity
-                    FROM feedback
-                    WHERE score >= %s
-                    ORDER BY embedding <=> %s::vector
-                    LIMIT %s
-                """, (query_embedding.tolist(), min_score, query_embedding.tolist(), top_k))
-            
-            results = []
+            concepts = []
             for row in cursor.fetchall():
-                results.append({
+                import json
+                # Examples e patterns podem já ser list/dict (psycopg2 retorna JSON como Python types) ou string JSON
+                if row[3]:
+                    if isinstance(row[3], (dict, list)):
+                        examples = row[3]
+                    else:
+                        examples = json.loads(row[3])
+                else:
+                    examples = None
+                
+                if row[4]:
+                    if isinstance(row[4], (dict, list)):
+                        patterns = row[4]
+                    else:
+                        patterns = json.loads(row[4])
+                else:
+                    patterns = None
+                
+                concepts.append({
                     "id": row[0],
-                    "prompt": row[1],
-                    "response": row[2],
-                    "score": row[3],
-                    "context": row[4],
-                    "similarity": float(row[5])
+                    "concept_name": row[1],
+                    "description": row[2],
+                    "examples": examples,
+                    "patterns": patterns,
+                    "confidence": row[5],
+                    "created_at": row[6]
                 })
             
-            return results
+            return concepts
         
         except Exception as e:
-            self.logger.error(f"Error searching similar: {e}")
+            self.logger.error(f"Error getting learned concepts: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def store_course(
-        self,
-        name: str,
-        description: str,
-        source_type: str,
-        source_path: str
-    ) -> int:
+    def get_learned_concepts_count(self, course_id: int) -> int:
         """
-        Armazena um novo curso
+        Conta número de conceitos aprendidos de um curso
         
         Args:
-            name: Nome do curso
-            description: Descrição do curso
-            source_type: Tipo de fonte ('url', 'file', 'directory', 'text')
-            source_path: Caminho/URL da fonte
+            course_id: ID do curso
         
         Returns:
-            ID do curso criado
+            Número de conceitos
         """
         conn = self.pool.getconn()
         try:
             cursor = conn.cursor()
             cursor.execute("""
-                INSERT INTO courses (name, description, source_type, source_path)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id
-            """, (name, description, source_type, source_path))
-            
-            course_id = cursor.fetchone()[0]
-            conn.commit()
+                SELECT COUNT(*) FROM learned_concepts
+                WHERE course_id = %s
+            """, (course_id,))
             
-            self.logger.debug(f"Course stored with ID: {course_id}")
-            return course_id
+            return cursor.fetchone()[0]
         
         except Exception as e:
-            conn.rollback()
-            self.logger.error(f"Error storing course: {e}")
+            self.logger.error(f"Error counting learned concepts: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def get_course(self, course_id: int) -> Optional[Dict[str, Any]]:
+    def get_course_examples_for_replay(
+        self,
+        course_id: int,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
         """
-        Obtém um curso por ID
+        Obtém exemplos de um curso para uso no replay buffer
         
         Args:
             course_id: ID do curso
+            limit: Número máximo de exemplos
         
         Returns:
-            Dicionário com informações do curso ou None
+            Lista de exemplos formatados para replay
         """
-        conn = self.pool.getconn()
-        try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, name, description, source_type, source_path, status, created_at, updated_at
-                FROM courses
-                WHERE id = %s
-            """, (course_id,))
-            
-            row = cursor.fetchone()
-            if not row:
-                return None
-            
-            # Converter datetime para string ISO
-            created_at = row[6]
-            if hasattr(created_at, 'isoformat'):
-                created_at = created_at.isoformat()
-            updated_at = row[7] if row[7] else None
-            if updated_at and hasattr(updated_at, 'isoformat'):
-                updated_at = updated_at.isoformat()
-            
-            return {
-                "id": row[0],
-                "name": row[1],
-                "description": row[2],
-                "source_type": row[3],
-                "source_path": row[4],
-                "status": row[5],
-                "created_at": created_at,
-                "updated_at": updated_at
-            }
+        concepts = self.get_learned_concepts(course_id)
+        examples = []
         
-        except Exception as e:
-            self.logger.error(f"Error getting course: {e}")
-            raise
+        for concept in concepts[:limit]:
+            if concept.get("examples"):
+                for example in concept["examples"]:
+                    examples.append({
+                        "prompt": example.get("prompt", ""),
+                        "response": example.get("response", ""),
+                        "score": concept.get("confidence", 0.5),
+                        "context": f"course_{course_id}"
+                    })
         
-        finally:
-            cursor.close()
-            self.pool.putconn(conn)
+        return examples
     
-    def get_all_courses(self) -> List[Dict[str, Any]]:
+    def get_validated_course_examples(self, limit: int = 50) -> List[Dict[str, Any]]:
         """
-        Retorna todos os cursos
+        Obtém exemplos de replay de todos os cursos validados em uma consulta
+        
+        Os exemplos são expandidos no banco (jsonb_array_elements) e cada curso
+        recebe uma cota de `limit // cursos validados` exemplos (mínimo 1),
+        priorizando conceitos de maior confiança.
+        
+        Args:
+            limit: Número máximo de exemplos
         
         Returns:
-            Lista de cursos
+            Lista de exemplos formatados para replay
         """
         conn = self.pool.getconn()
         try:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT id, name, description, source_type, source_path, status, created_at, updated_at
-                FROM courses
-                ORDER BY created_at DESC
-            """)
-            
-            courses = []
-            for row in cursor.fetchall():
-                # Converter datetime para string ISO
-                created_at = row[6]
-                if hasattr(created_at, 'isoformat'):
-                    created_at = created_at.isoformat()
-                updated_at = row[7] if row[7] else None
-                if updated_at and hasattr(updated_at, 'isoformat'):
-                    updated_at = updated_at.isoformat()
-                
-                courses.append({
-                    "id": row[0],
-                    "name": row[1],
-                    "description": row[2],
-                    "source_type": row[3],
-                    "source_path": row[4],
-                    "status": row[5],
-                    "created_at": created_at,
-                    "updated_at": updated_at
-                })
+                WITH validated AS (
+                    SELECT id FROM courses WHERE status = 'validated'
+                ),
+                quota AS (
+                    SELECT GREATEST(%(limit)s / NULLIF(COUNT(*), 0), 1) AS per_course
+                    FROM validated
+                ),
+                ranked AS (
+                    SELECT
+                        lc.course_id,
+                        ex.value->>'prompt' AS prompt,
+                        ex.value->>'response' AS response,
+                        lc.confidence,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY lc.course_id
+                            ORDER BY lc.confidence DESC, lc.created_at DESC, lc.id, ex.ordinality
+                        ) AS rn
+                    FROM learned_concepts lc
+                    JOIN validated v ON v.id = lc.course_id
+                    CROSS JOIN LATERAL jsonb_array_elements(
+                        CASE WHEN jsonb_typeof(lc.examples) = 'array' THEN lc.examples ELSE '[]'::jsonb END
+                    ) WITH ORDINALITY AS ex(value, ordinality)
+                )
+                SELECT r.course_id, r.prompt, r.response, r.confidence
+                FROM ranked r, quota q
+                WHERE r.rn <= q.per_course
+                ORDER BY r.course_id, r.rn
+                LIMIT %(limit)s
+            """, {"limit": limit})
             
-            return courses
+            return [
+                {
+                    "prompt": row[1] or "",
+                    "response": row[2] or "",
+                    "score": row[3] if row[3] is not None else 0.5,
+                    "context": f"course_{row[0]}"
+                }
+                for row in cursor.fetchall()
+            ]
         
         except Exception as e:
-            self.logger.error(f"Error getting all courses: {e}")
+            self.logger.error(f"Error getting validated course examples: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def update_course_status(self, course_id: int, status: str):
+    def _check_embedding_version(self, cursor, version: str) -> Dict[str, Any]:
         """
-        Atualiza status de um curso
+        Valida e bloqueia uma versão de embedding não ativa
         
         Args:
-            course_id: ID do curso
-            status: Novo status
+            cursor: Cursor da transação
+            version: Nome da versão
+        
+        Returns:
+            Dicionário com name, model, dim e status
+        """
+        if not EMBEDDING_VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid embedding version name: {version}")
+        
+        cursor.execute("""
+            SELECT name, model, dim, status FROM embedding_versions
+            WHERE name = %s
+            FOR UPDATE
+        """, (version,))
+        row = cursor.fetchone()
+        if not row:
+            raise ValueError(f"Embedding version {version} not found")
+        if row[3] == "active":
+            raise ValueError(f"Embedding version {version} is already active")
+        
+        return {"name": row[0], "model": row[1], "dim": row[2], "status": row[3]}
+    
+    def _reembed_rows(
+        self,
+        cursor,
+        table: str,
+        version: str,
+        rows: List[Tuple[int, str]],
+        embed_fn: Callable[[List[str]], np.ndarray]
+    ):
+        """Grava embeddings do novo modelo na coluna da versão"""
+        embeddings = np.asarray(embed_fn([row[1] or "" for row in rows]), dtype=np.float32)
+        cursor.execute(sql.SQL("""
+            UPDATE {table} t SET {column} = u.embedding
+            FROM unnest(%s::int[], %s::vector[]) AS u(id, embedding)
+            WHERE t.id = u.id
+        """).format(
+            table=sql.Identifier(table),
+            column=sql.Identifier(f"embedding_{version}")
+        ), ([row[0] for row in rows], list(embeddings)))
+    
+    def create_embedding_version(self, version: str, model: str, dim: int) -> Dict[str, Any]:
         """
+        Registra uma nova versão de embedding (blue-green)
+        
+        Adiciona a coluna `embedding_<versão>` vector(dim) em cada tabela
+        vetorial (alteração só de catálogo). A coluna é preenchida por
+        reembed_batch() e passa a ser lida após activate_embedding_version().
+        
+        Args:
+            version: Nome da versão (minúsculas, dígitos e _; até 24 caracteres)
+            model: Modelo de embedding da versão
+            dim: Dimensão dos embeddings do modelo
+        
+        Returns:
+            Dicionário com name, model, dim e status
+        """
+        if not EMBEDDING_VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid embedding version name: {version}")
+        if dim <= 0:
+            raise ValueError(f"Invalid embedding dimension: {dim}")
+        
         conn = self.pool.getconn()
         try:
             cursor = conn.cursor()
             cursor.execute("""
-                UPDATE courses
-                SET status = %s, updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """, (status, course_id))
+                INSERT INTO embedding_versions (name, model, dim)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (name) DO NOTHING
+            """, (version, model, dim))
+            if cursor.rowcount == 0:
+                raise ValueError(f"Embedding version {version} already exists")
             
+            for table in VECTOR_TABLES:
+                cursor.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} vector({})").format(
+                    sql.Identifier(table),
+                    sql.Identifier(f"embedding_{version}"),
+                    sql.Literal(dim)
+                ))
+                cursor.execute("""
+                    INSERT INTO embedding_reindex_progress (version, table_name)
+                    VALUES (%s, %s)
+                """, (version, table))
             conn.commit()
-            self.logger.debug(f"Course {course_id} status updated to {status}")
+            
+            self.logger.info(f"Created embedding version {version} ({model}, dim={dim})")
+            return {"name": version, "model": model, "dim": dim, "status": "building"}
         
         except Exception as e:
             conn.rollback()
-            self.logger.error(f"Error updating course status: {e}")
+            self.logger.error(f"Error creating embedding version: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def store_course_content(
+    def reembed_batch(
         self,
-        course_id: int,
-        title: str,
-        content: str,
-        chunk_index: int,
-        metadata: Optional[Dict[str, Any]] = None,
-        embedding: Optional[np.ndarray] = None
+        version: str,
+        table: str,
+        embed_fn: Callable[[List[str]], np.ndarray],
+        batch_size: int = 256
     ) -> int:
         """
-        Armazena conteúdo de um curso
+        Re-gera um lote de embeddings de uma tabela com o modelo da versão
+        
+        Processa linhas com embedding após o checkpoint (ordem de ID) que
+        ainda não têm o da versão e avança o checkpoint na mesma transação;
+        pode ser interrompido e retomado a qualquer momento. Linhas inseridas
+        durante a re-indexação são alcançadas por chamadas seguintes. Em uma
+        versão aposentada (checkpoint zerado na aposentadoria), só as linhas
+        que chegaram depois dela são re-geradas.
         
         Args:
-            course_id: ID do curso
-            title: Título do chunk
-            content: Conteúdo do chunk
-            chunk_index: Índice do chunk
-            metadata: Metadados adicionais (JSON)
-            embedding: Embedding vetorial
+            version: Versão em construção
+            table: Tabela vetorial (ver VECTOR_TABLES)
+            embed_fn: Função que gera embeddings (n, dim) para uma lista de textos
+            batch_size: Linhas por lote
         
         Returns:
-            ID do conteúdo armazenado
+            Número de linhas processadas (0 quando a tabela está em dia)
         """
-        import json
+        if table not in EMBEDDING_SOURCES:
+            raise ValueError(f"Unknown vector table: {table}")
         
         conn = self.pool.getconn()
         try:
             cursor = conn.cursor()
-            metadata_json = json.dumps(metadata) if metadata else None
+            self._check_embedding_version(cursor, version)
             
+            # FOR UPDATE: dois workers não processam o mesmo lote
             cursor.execute("""
-                INSERT INTO course_content (course_id, title, content, chunk_index, metadata, embedding)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (course_id, title, content, chunk_index, metadata_json, embedding))
+                SELECT last_id FROM embedding_reindex_progress
+                WHERE version = %s AND table_name = %s
+                FOR UPDATE
+            """, (version, table))
+            row = cursor.fetchone()
+            if not row:
+                raise ValueError(f"Embedding version {version} has no re-index progress for {table}")
+            last_id = row[0]
             
-            content_id = cursor.fetchone()[0]
+            cursor.execute(sql.SQL("""
+                SELECT id, {source} FROM {table}
+                WHERE id > %s AND embedding IS NOT NULL AND {column} IS NULL
+                ORDER BY id
+                LIMIT %s
+            """).format(
+                source=sql.Identifier(EMBEDDING_SOURCES[table]),
+                table=sql.Identifier(table),
+                column=sql.Identifier(f"embedding_{version}")
+            ), (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                conn.rollback()
+                return 0
+            
+            self._reembed_rows(cursor, table, version, rows, embed_fn)
+            cursor.execute("""
+                UPDATE embedding_reindex_progress
+                SET last_id = %s, rows_done = rows_done + %s, updated_at = CURRENT_TIMESTAMP
+                WHERE version = %s AND table_name = %s
+            """, (rows[-1][0], len(rows), version, table))
             conn.commit()
             
-            self.logger.debug(f"Course content stored with ID: {content_id}")
-            return content_id
+            return len(rows)
         
         except Exception as e:
             conn.rollback()
-            self.logger.error(f"Error storing course content: {e}")
+            self.logger.error(f"Error re-embedding {table} for version {version}: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def get_course_content(self, course_id: int) -> List[Dict[str, Any]]:
+    def build_embedding_version_indexes(self, version: str) -> List[str]:
         """
-        Obtém todo o conteúdo de um curso
+        Constrói os índices HNSW da versão sem bloquear escritas
+        
+        Usa CREATE INDEX CONCURRENTLY (por partição em feedback particionado).
+        Deve rodar depois de a re-indexação alcançar as tabelas: o HNSW é
+        mais rápido de construir com a coluna já preenchida.
         
         Args:
-            course_id: ID do curso
+            version: Versão em construção
         
         Returns:
-            Lista de chunks de conteúdo
+            Nomes dos índices criados
         """
         conn = self.pool.getconn()
+        created = []
         try:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, title, content, chunk_index, metadata, created_at
-                FROM course_content
-                WHERE course_id = %s
-                ORDER BY chunk_index ASC
-            """, (course_id,))
+            info = self._check_embedding_version(cursor, version)
+            conn.rollback()
             
-            content = []
-            for row in cursor.fetchall():
-                import json
-                # Metadata pode já ser dict (se veio de processamento) ou string JSON
-                if row[4]:
-                    if isinstance(row[4], dict):
-                        metadata = row[4]
-                    else:
-                        metadata = json.loads(row[4])
-                else:
-                    metadata = None
-                content.append({
-                    "id": row[0],
-                    "title": row[1],
-                    "content": row[2],
-                    "chunk_index": row[3],
-                    "metadata": metadata,
-                    "created_at": row[5]
-                })
+            definition = sql.SQL(self._index_definition(column=f"embedding_{version}", dim=info["dim"]))
+            index_sql = sql.SQL("""
+                CREATE INDEX {concurrently} IF NOT EXISTS {name}
+                ON {only} {table}
+                USING hnsw {definition}
+                WITH (m = 16, ef_construction = 64)
+            """)
             
-            return content
+            # CREATE INDEX CONCURRENTLY não roda dentro de transação
+            conn.autocommit = True
+            for table in VECTOR_TABLES:
+                index_name = f"{table}_embedding_{version}_idx"
+                partitioned = table == "feedback" and self.feedback_partitioning
+                self.logger.info(f"Building HNSW index {index_name}")
+                try:
+                    cursor.execute(index_sql.format(
+                        concurrently=sql.SQL("" if partitioned else "CONCURRENTLY"),
+                        name=sql.Identifier(index_name),
+                        only=sql.SQL("ONLY" if partitioned else ""),
+                        table=sql.Identifier(table),
+                        definition=definition
+                    ))
+                    if partitioned:
+                        for partition in self._list_feedback_partitions(cursor):
+                            partition_index = f"{partition}_emb_{version}_idx"
+                            cursor.execute(index_sql.format(
+                                concurrently=sql.SQL("CONCURRENTLY"),
+                                name=sql.Identifier(partition_index),
+                                only=sql.SQL(""),
+                                table=sql.Identifier(partition),
+                                definition=definition
+                            ))
+                            cursor.execute(sql.SQL("ALTER INDEX {} ATTACH PARTITION {}").format(
+                                sql.Identifier(index_name),
+                                sql.Identifier(partition_index)
+                            ))
+                except Exception:
+                    # Build concorrente que falha deixa índice inválido
+                    cursor.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(index_name)))
+                    raise
+                created.append(index_name)
+            
+            cursor.close()
+            return created
         
         except Exception as e:
-            self.logger.error(f"Error getting course content: {e}")
+            self.logger.error(f"Error building indexes for embedding version {version}: {e}")
             raise
         
         finally:
-            cursor.close()
+            conn.autocommit = False
             self.pool.putconn(conn)
     
-    def get_course_content_count(self, course_id: int) -> int:
+    def activate_embedding_version(
+        self,
+        version: str,
+        embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+        batch_size: int = 256
+    ) -> Dict[str, Any]:
         """
-        Conta número de chunks de conteúdo de um curso
+        Troca atomicamente a versão de embedding lida e escrita
+        
+        Antes do lock, re-gera as linhas pendentes em lotes com commit
+        (reembed_batch e, depois, as que ficaram para trás do checkpoint),
+        até sobrar menos de um lote por tabela. Então, em uma transação:
+        bloqueia escritas nas tabelas vetoriais, re-gera o restante em lotes
+        de `batch_size`, renomeia `embedding` -> `embedding_<antiga>` e
+        `embedding_<nova>` -> `embedding` e troca os índices HNSW. Consultas
+        e inserts existentes continuam usando a coluna `embedding`, agora com
+        o novo modelo. A versão antiga fica aposentada, com o checkpoint
+        zerado: pode ser removida ou reativada pelo mesmo caminho de uma
+        versão nova (reembed_batch, que preenche só as linhas inseridas
+        depois da aposentadoria, build_embedding_version_indexes e
+        activate_embedding_version).
         
         Args:
-            course_id: ID do curso
+            version: Versão com índices construídos
+            embed_fn: Função do novo modelo para linhas pendentes (sem ela, falha
+                se houver linhas pendentes)
+            batch_size: Linhas por chamada a `embed_fn`
         
         Returns:
-            Número de chunks
+            Dicionário com active, retired, dim e rows_caught_up
         """
+        suffix = VECTOR_STORAGE_MODES[self.vector_storage][0]
+        
         conn = self.pool.getconn()
         try:
             cursor = conn.cursor()
+            self._check_embedding_version(cursor, version)
+            
+            index_names = [f"{table}_embedding_{version}_idx" for table in VECTOR_TABLES]
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE indexname = ANY(%s)", (index_names,))
+            missing = set(index_names) - {row[0] for row in cursor.fetchall()}
+            if missing:
+                raise ValueError(f"Embedding version {version} indexes not built: {sorted(missing)}")
+            conn.rollback()
+            
+            # Sem lock: reduz as pendências a menos de um lote por tabela
+            caught_up = 0
+            if embed_fn is not None:
+                for table in VECTOR_TABLES:
+                    while True:
+                        rows = self.reembed_batch(version, table, embed_fn, batch_size=batch_size)
+                        caught_up += rows
+                        if rows:
+                            continue
+                        rows = self._catch_up_embedding_version(
+                            conn, cursor, table, version, embed_fn, batch_size, commit=True
+                        )
+                        caught_up += rows
+                        if rows < batch_size:
+                            break
+            
+            info = self._check_embedding_version(cursor, version)
+            cursor.execute("SELECT name FROM embedding_versions WHERE status = 'active' FOR UPDATE")
+            row = cursor.fetchone()
+            previous = row[0] if row else "v1"
+            
+            # Bloqueia escritas (leituras continuam) enquanto alcança as últimas linhas
+            cursor.execute(sql.SQL("LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE").format(
+                sql.SQL(", ").join(sql.Identifier(table) for table in VECTOR_TABLES)
+            ))
+            
+            for table in VECTOR_TABLES:
+                caught_up += self._catch_up_embedding_version(conn, cursor, table, version, embed_fn, batch_size)
+            
+            for table in VECTOR_TABLES:
+                cursor.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(f"{table}_{suffix}")))
+                cursor.execute(sql.SQL("ALTER TABLE {} RENAME COLUMN embedding TO {}").format(
+                    sql.Identifier(table),
+                    sql.Identifier(f"embedding_{previous}")
+                ))
+                cursor.execute(sql.SQL("ALTER TABLE {} RENAME COLUMN {} TO embedding").format(
+                    sql.Identifier(table),
+                    sql.Identifier(f"embedding_{version}")
+                ))
+                cursor.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                    sql.Identifier(f"{table}_embedding_{version}_idx"),
+                    sql.Identifier(f"{table}_{suffix}")
+                ))
+            
+            # Índices parciais (contexto, usuário) ficaram na coluna antiga; recriados abaixo
             cursor.execute("""
-                SELECT COUNT(*) FROM course_content
-                WHERE course_id = %s
-            """, (course_id,))
+                SELECT indexname FROM pg_indexes
+                WHERE tablename = 'feedback' AND indexname ~ %s
+            """, (PARTIAL_INDEX_PATTERN,))
+            for (index_name,) in cursor.fetchall():
+                cursor.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(index_name)))
             
-            return cursor.fetchone()[0]
+            cursor.execute("""
+                UPDATE embedding_versions SET status = 'retired' WHERE name = %s
+            """, (previous,))
+            # Linhas inseridas a partir de agora não terão a coluna da versão aposentada
+            cursor.execute("""
+                UPDATE embedding_reindex_progress
+                SET last_id = 0, rows_done = 0, updated_at = CURRENT_TIMESTAMP
+                WHERE version = %s
+            """, (previous,))
+            cursor.execute("""
+                UPDATE embedding_versions
+                SET status = 'active', activated_at = CURRENT_TIMESTAMP
+                WHERE name = %s
+            """, (version,))
+            conn.commit()
+            
+            self.embedding_dim = info["dim"]
+            self._context_indexes = set()
+            self._schedule_context_index_check()
+            
+            self.logger.info(
+                f"Activated embedding version {version} ({info['model']}), "
+                f"retired {previous}, caught up {caught_up} rows"
+            )
+            return {
+                "active": version,
+                "retired": previous,
+                "dim": info["dim"],
+                "rows_caught_up": caught_up
+            }
         
         except Exception as e:
-            self.logger.error(f"Error counting course content: {e}")
+            conn.rollback()
+            self.logger.error(f"Error activating embedding version {version}: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def search_course_content(
+    def _catch_up_embedding_version(
         self,
-        course_id: int,
-        query_embedding: np.ndarray,
-        top_k: int = 5
-    ) -> List[Dict[str, Any]]:
+        conn,
+        cursor,
+        table: str,
+        version: str,
+        embed_fn: Optional[Callable[[List[str]], np.ndarray]],
+        batch_size: int,
+        commit: bool = False
+    ) -> int:
         """
-        Busca conteúdo de curso por similaridade semântica
+        Re-gera as linhas com embedding e sem o da versão
+        
+        Alcança também linhas anteriores ao checkpoint de reembed_batch (ex:
+        embedding preenchido depois do insert). Percorre a tabela por ID em
+        lotes de `batch_size`.
         
         Args:
-            course_id: ID do curso
-            query_embedding: Embedding da query
-            top_k: Número de resultados
+            conn: Conexão do cursor
+            cursor: Cursor da transação atual
+            table: Tabela vetorial
+            version: Versão em construção
+            embed_fn: Função do novo modelo (sem ela, falha se houver pendentes)
+            batch_size: Linhas por lote
+            commit: Commit a cada lote (fora do lock da ativação)
         
         Returns:
-            Lista de chunks similares
+            Número de linhas re-geradas
+        """
+        query = sql.SQL("""
+            SELECT id, {source} FROM {table}
+            WHERE id > %s AND embedding IS NOT NULL AND {column} IS NULL
+            ORDER BY id
+            LIMIT %s
+        """).format(
+            source=sql.Identifier(EMBEDDING_SOURCES[table]),
+            table=sql.Identifier(table),
+            column=sql.Identifier(f"embedding_{version}")
+        )
+        
+        done = 0
+        last_id = 0
+        while True:
+            cursor.execute(query, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return done
+            if embed_fn is None:
+                raise ValueError(f"Rows of {table} not re-embedded for version {version}")
+            
+            self._reembed_rows(cursor, table, version, rows, embed_fn)
+            if commit:
+                conn.commit()
+            done += len(rows)
+            last_id = rows[-1][0]
+            if len(rows) < batch_size:
+                return done
+    
+    def drop_embedding_version(self, version: str):
+        """
+        Remove uma versão de embedding não ativa (colunas, índices e checkpoint)
+        
+        Args:
+            version: Versão em construção ou aposentada
         """
         conn = self.pool.getconn()
         try:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, title, content, chunk_index, metadata,
-                       1 - (embedding <=> %s::vector) as similarity
-                FROM course_content
-                WHERE course_id = %s AND embedding IS NOT NULL
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s
-            """, (query_embedding.tolist(), course_id, query_embedding.tolist(), top_k))
+            self._check_embedding_version(cursor, version)
             
-            results = []
-            for row in cursor.fetchall():
-                import json
-                # Metadata pode já ser dict (se veio de processamento) ou string JSON
-                if row[4]:
-                    if isinstance(row[4], (dict, list)):
-                        metadata = row[4]
-                    else:
-                        metadata = json.loads(row[4])
-                else:
-                    metadata = None
-                results.append({
-                    "id": row[0],
-                    "title": row[1],
-                    "content": row[2],
-                    "chunk_index": row[3],
-                    "metadata": metadata,
-                    "similarity": float(row[5])
-                })
+            for table in VECTOR_TABLES:
+                cursor.execute(sql.SQL("ALTER TABLE {} DROP COLUMN IF EXISTS {}").format(
+                    sql.Identifier(table),
+                    sql.Identifier(f"embedding_{version}")
+                ))
+            cursor.execute("DELETE FROM embedding_versions WHERE name = %s", (version,))
+            conn.commit()
             
-            return results
+            self.logger.info(f"Dropped embedding version {version}")
         
         except Exception as e:
-            self.logger.error(f"Error searching course content: {e}")
+            conn.rollback()
+            self.logger.error(f"Error dropping embedding version {version}: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def store_learned_concept(
-        self,
-        course_id: int,
-        concept_name: str,
-        description: str,
-        examples: Optional[List[Dict[str, Any]]] = None,
-        patterns: Optional[List[Dict[str, Any]]] = None,
-        confidence: float = 0.5
-    ) -> int:
+    def get_embedding_versions(self) -> List[Dict[str, Any]]:
         """
-        Armazena um conceito aprendido de um curso
-        
-        Args:
-            course_id: ID do curso
-            concept_name: Nome do conceito
-            description: Descrição do conceito
-            examples: Lista de exemplos
-            patterns: Lista de padrões
-            confidence: Confiança no conceito (0.0 a 1.0)
+        Lista versões de embedding com o progresso da re-indexação
         
         Returns:
-            ID do conceito armazenado
+            Lista de versões (name, model, dim, status, datas e progress por tabela)
         """
-        import json
-        
         conn = self.pool.getconn()
         try:
             cursor = conn.cursor()
-            examples_json = json.dumps(examples) if examples else None
-            patterns_json = json.dumps(patterns) if patterns else None
-            
             cursor.execute("""
-                INSERT INTO learned_concepts (course_id, concept_name, description, examples, patterns, confidence)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (course_id, concept_name, description, examples_json, patterns_json, confidence))
-            
-            concept_id = cursor.fetchone()[0]
-            conn.commit()
+                SELECT v.name, v.model, v.dim, v.status, v.created_at, v.activated_at,
+                       COALESCE(
+                           jsonb_object_agg(p.table_name, p.rows_done) FILTER (WHERE p.table_name IS NOT NULL),
+                           '{}'::jsonb
+                       )
+                FROM embedding_versions v
+                LEFT JOIN embedding_reindex_progress p ON p.version = v.name
+                GROUP BY v.name
+                ORDER BY v.created_at
+            """)
             
-            self.logger.debug(f"Learned concept stored with ID: {concept_id}")
-            return concept_id
+            return [
+                {
+                    "name": row[0],
+                    "model": row[1],
+                    "dim": row[2],
+                    "status": row[3],
+                    "created_at": row[4].isoformat() if row[4] else None,
+                    "activated_at": row[5].isoformat() if row[5] else None,
+                    "progress": self._load_json(row[6]) or {}
+                }
+                for row in cursor.fetchall()
+            ]
         
         except Exception as e:
-            conn.rollback()
-            self.logger.error(f"Error storing learned concept: {e}")
+            self.logger.error(f"Error getting embedding versions: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def get_learned_concepts(self, course_id: int) -> List[Dict[str, Any]]:
+    def get_active_embedding_version(self) -> Optional[Dict[str, Any]]:
         """
-        Obtém todos os conceitos aprendidos de um curso
-        
-        Args:
-            course_id: ID do curso
+        Obtém a versão de embedding ativa (modelo que deve gerar as queries)
         
         Returns:
-            Lista de conceitos aprendidos
+            Dicionário com name, model e dim, ou None
         """
         conn = self.pool.getconn()
         try:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT id, concept_name, description, examples, patterns, confidence, created_at
-                FROM learned_concepts
-                WHERE course_id = %s
-                ORDER BY confidence DESC, created_at DESC
-            """, (course_id,))
-            
-            concepts = []
-            for row in cursor.fetchall():
-                import json
-                # Examples e patterns podem já ser list/dict (psycopg2 retorna JSON como Python types) ou string JSON
-                if row[3]:
-                    if isinstance(row[3], (dict, list)):
-                        examples = row[3]
-                    else:
-                        examples = json.loads(row[3])
-                else:
-                    examples = None
-                
-                if row[4]:
-                    if isinstance(row[4], (dict, list)):
-                        patterns = row[4]
-                    else:
-                        patterns = json.loads(row[4])
-                else:
-                    patterns = None
-                
-                concepts.append({
-                    "id": row[0],
-                    "concept_name": row[1],
-                    "description": row[2],
-                    "examples": examples,
-                    "patterns": patterns,
-                    "confidence": row[5],
-                    "created_at": row[6]
-                })
+                SELECT name, model, dim FROM embedding_versions
+                WHERE status = 'active'
+            """)
+            row = cursor.fetchone()
+            if not row:
+                return None
             
-            return concepts
+            return {"name": row[0], "model": row[1], "dim": row[2]}
         
         except Exception as e:
-            self.logger.error(f"Error getting learned concepts: {e}")
+            self.logger.error(f"Error getting active embedding version: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def get_learned_concepts_count(self, course_id: int) -> int:
+    def get_metrics(self) -> Dict[str, Any]:
         """
-        Conta número de conceitos aprendidos de um curso
-        
-        Args:
-            course_id: ID do curso
+        Métricas de latência por método e do pool de conexões
         
         Returns:
-            Número de conceitos
+            Snapshot de StorageMetrics, com o estado atual do pool em `pool`
+        """
+        snapshot = self.metrics.snapshot()
+        snapshot["pool"].update(self.pool.stats())
+        return snapshot
+    
+    def reset_metrics(self):
+        """Zera as métricas"""
+        self.metrics.reset()
+    
+    def notify_invalidation(self, scope: str, **payload):
         """
+        Avisa os outros processos que dados de um escopo mudaram
+        
+        Para mudanças fora do banco (ex: adapters gravados em disco pelo
+        sono); escritas em INVALIDATION_TABLES já notificam por trigger.
+        
+        Args:
+            scope: Escopo do evento (ex: "adapters")
+            **payload: Dados extras do evento (serializáveis em JSON)
+        """
+        import json
+        
         conn = self.pool.getconn()
         try:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) FROM learned_concepts
-                WHERE course_id = %s
-            """, (course_id,))
-            
-            return cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)",
+                (INVALIDATION_CHANNEL, json.dumps({"scope": scope, **payload}))
+            )
+            conn.commit()
         
         except Exception as e:
-            self.logger.error(f"Error counting learned concepts: {e}")
+            conn.rollback()
+            self.logger.error(f"Error notifying invalidation of {scope}: {e}")
             raise
         
         finally:
             cursor.close()
             self.pool.putconn(conn)
     
-    def get_course_examples_for_replay(
-        self,
-        course_id: int,
-        limit: int = 50
-    ) -> List[Dict[str, Any]]:
+    def start_invalidation_listener(self) -> InvalidationListener:
         """
-        Obtém exemplos de um curso para uso no replay buffer
+        Inicia (uma vez) o listener de invalidação deste processo
         
-        Args:
-            course_id: ID do curso
-            limit: Número máximo de exemplos
+        O próprio storage assina `embedding_versions` para reler a dimensão
+        ativa quando outro processo troca a versão de embedding; os demais
+        caches são assinados por quem os mantém (listener.subscribe).
         
         Returns:
-            Lista de exemplos formatados para replay
+            InvalidationListener em execução
         """
-        concepts = self.get_learned_concepts(course_id)
-        examples = []
-        
-        for concept in concepts[:limit]:
-            if concept.get("examples"):
-                for example in concept["examples"]:
-                    examples.append({
-                        "prompt": example.get("prompt", ""),
-                        "response": example.get("response", ""),
-                        "score": concept.get("confidence", 0.5),
-                        "context": f"course_{course_id}"
-                    })
+        if self.invalidation is None:
+            self.invalidation = InvalidationListener(
+                functools.partial(psycopg2.connect, **self.connection_params)
+            )
+            self.invalidation.subscribe(["embedding_versions"], self._on_embedding_version_changed)
+            if not self.invalidation.start():
+                self.logger.warning("Cache invalidation listener not connected yet, retrying in background")
+        return self.invalidation
+    
+    def _on_embedding_version_changed(self, scope: str, payload: Dict[str, Any]):
+        """Relê a dimensão da coluna ativa e esquece os índices por contexto"""
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(EMBEDDING_DIM_QUERY)
+            self._set_embedding_dim(cursor.fetchone())
+            conn.commit()
+        finally:
+            cursor.close()
+            self.pool.putconn(conn)
         
-        return examples
+        # Os índices por contexto da coluna antiga foram removidos por quem ativou
+        self._context_indexes = set()
     
     def close(self):
-        """Fecha pool de conexões"""
+        """Fecha listener de invalidação e pool de conexões"""
+        if getattr(self, 'invalidation', None) is not None:
+            self.invalidation.stop()
         if hasattr(self, 'pool'):
             self.pool.closeall()
             self.logger.info("PostgreSQL storage closed")
@@ -0,0 +1,143 @@
+"""
+Blue-green embedding re-index job
+Re-embeds stored rows with a new model in the background and switches over atomically
+"""
+
+import threading
+from typing import List, Dict, Any, Optional, Callable
+import numpy as np
+
+from src.storage.postgres import VECTOR_TABLES
+from src.utils.logging import get_logger
+
+
+class EmbeddingReindexJob:
+    """
+    Re-indexação de embeddings para troca de modelo sem downtime
+    
+    Etapas (todas retomáveis, o checkpoint fica no banco):
+    1. Re-gera os embeddings de cada tabela em lotes (reembed_batch)
+    2. Constrói os índices HNSW da nova coluna concorrentemente
+    3. Alcança as linhas inseridas durante o build
+    4. Ativa a versão (troca atômica das colunas) e chama `on_activated`
+    
+    Enquanto isso, buscas e escritas continuam na versão ativa.
+    """
+    
+    def __init__(
+        self,
+        storage,
+        version: str,
+        embed_fn: Callable[[List[str]], np.ndarray],
+        batch_size: int = 256,
+        on_activated: Optional[Callable[[], None]] = None
+    ):
+        """
+        Inicializa job de re-indexação
+        
+        Args:
+            storage: Instância de PostgreSQLStorage
+            version: Versão criada com create_embedding_version()
+            embed_fn: Função do novo modelo que gera embeddings (n, dim)
+            batch_size: Linhas por lote (um commit por lote)
+            on_activated: Chamada após a ativação (ex: trocar o modelo das queries)
+        """
+        self.logger = get_logger(self.__class__.__name__)
+        self.storage = storage
+        self.version = version
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size
+        self.on_activated = on_activated
+        
+        self.state = "pending"
+        self.rows_processed = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        Executa a re-indexação até a ativação (ou até stop())
+        
+        Returns:
+            Status do job (ver get_status)
+        """
+        try:
+            self.state = "embedding"
+            if not self._catch_up():
+                return self.get_status()
+            
+            self.state = "indexing"
+            self.storage.build_embedding_version_indexes(self.version)
+            
+            # Linhas que chegaram durante o build dos índices
+            if not self._catch_up():
+                return self.get_status()
+            
+            self.state = "activating"
+            self.result = self.storage.activate_embedding_version(self.version, embed_fn=self.embed_fn)
+            if self.on_activated:
+                self.on_activated()
+            
+            self.state = "completed"
+            self.logger.info(f"Embedding re-index {self.version} completed ({self.rows_processed} rows)")
+        
+        except Exception as e:
+            self.state = "error"
+            self.error = str(e)
+            self.logger.error(f"Embedding re-index {self.version} failed: {e}")
+        
+        return self.get_status()
+    
+    def start(self) -> threading.Thread:
+        """Executa run() em uma thread daemon"""
+        self._thread = threading.Thread(
+            target=self.run,
+            name=f"embedding-reindex-{self.version}",
+            daemon=True
+        )
+        self._thread.start()
+        return self._thread
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Interrompe após o lote atual (retomável com um novo job)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Retorna status do job
+        
+        Returns:
+            Dicionário com version, state, rows_processed, result e error
+        """
+        return {
+            "version": self.version,
+            "state": self.state,
+            "rows_processed": self.rows_processed,
+            "result": self.result,
+            "error": self.error
+        }
+    
+    def _catch_up(self) -> bool:
+        """Processa lotes até todas as tabelas estarem em dia; False se interrompido"""
+        for table in VECTOR_TABLES:
+            while True:
+                if self._stop.is_set():
+                    self.state = "stopped"
+                    self.logger.info(f"Embedding re-index {self.version} stopped at {table}")
+                    return False
+                
+                processed = self.storage.reembed_batch(
+                    self.version,
+                    table,
+                    self.embed_fn,
+                    batch_size=self.batch_size
+                )
+                self.rows_processed += processed
+                if processed < self.batch_size:
+                    break
+        return True
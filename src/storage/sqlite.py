@@ -0,0 +1,2262 @@
+"""
+SQLite + memory-mapped vector storage
+Single-node backend with the same interface as PostgreSQLStorage
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
+import numpy as np
+
+from src.storage.postgres import (
+    EMBEDDING_DIM,
+    EMBEDDING_MODEL,
+    EMBEDDING_SOURCES,
+    EMBEDDING_VERSION_PATTERN,
+    EXPORT_COLUMNS,
+    VECTOR_TABLES
+)
+from src.storage.vector_index import MemmapVectorIndex
+from src.storage.instrumentation import StorageMetrics, instrumented
+from src.utils.config import get_config
+from src.utils.logging import get_logger
+from src.utils.hashing import content_hash
+
+
+# Timestamps gravados como texto ISO e lidos como datetime (colunas TIMESTAMP)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+# Horário local, como os timestamps gerados pelo buffer de feedback
+NOW = "(datetime('now', 'localtime'))"
+
+# Tokens FTS5 preservam identificadores como `res.partner` e `_inherit`
+FTS_TOKENIZER = "unicode61 tokenchars '._'"
+
+# Conjuntos de candidatos (slots por filtro SQL) mantidos em cache
+CANDIDATE_CACHE_SIZE = 64
+
+# Linhas amostradas por índice no ANALYZE da manutenção
+ANALYSIS_LIMIT = 1000
+
+# Colunas indexadas em full-text por tabela
+FTS_COLUMNS = {
+    "feedback": ("prompt", "response"),
+    "course_content": ("title", "content")
+}
+
+
+@instrumented
+class SQLiteStorage:
+    """
+    Armazenamento local em SQLite com índice vetorial em memmap
+    
+    Mesma interface pública de PostgreSQLStorage, sem serviços externos:
+    as linhas ficam em um arquivo SQLite (WAL) e os embeddings em matrizes
+    float32 mapeadas em memória (uma por tabela vetorial e versão de
+    embedding), endereçadas pelo ID da linha. Filtros rodam em SQL; a
+    similaridade é calculada com NumPy (força bruta ou IVF, ver
+    MemmapVectorIndex). A busca full-text usa FTS5 e é fundida com a
+    vetorial por RRF, como no PostgreSQL.
+    
+    Pensado para laptops, CI e benchmarks: uma conexão compartilhada,
+    serializada por lock.
+    """
+    
+    def __init__(self):
+        """Abre o banco SQLite e os índices vetoriais"""
+        self.logger = get_logger(self.__class__.__name__)
+        self.config = get_config()
+        db_config = self.config.database
+        rag_config = self.config.rag
+        
+        self.db_path = Path(db_config.sqlite_path)
+        self.vector_path = Path(db_config.vector_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.vector_path.mkdir(parents=True, exist_ok=True)
+        
+        # Busca vetorial: IVF acima de ivf_min_rows vetores
+        self.ivf_lists = db_config.ivf_lists
+        self.ivf_min_rows = db_config.ivf_min_rows
+        self.ivf_probes = db_config.ivf_probes
+        
+        # Busca híbrida: candidatos por ranking e constante do RRF
+        self.hybrid_candidates = rag_config.hybrid_candidates
+        self.rrf_k = rag_config.rrf_k
+        
+        self.feedback_retention_months = db_config.feedback_retention_months
+        self.feedback_rollup_min_score = db_config.feedback_rollup_min_score
+        self.maintenance_time_budget = db_config.maintenance_time_budget_seconds
+        
+        # Latência por método (sem pool: uma conexão serializada pelo lock)
+        self.metrics = StorageMetrics(enabled=db_config.metrics)
+        
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(
+            str(self.db_path),
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        
+        self._initialize_schema()
+        
+        # Índices vetoriais da versão de embedding ativa (e das em construção)
+        self._version_indexes: Dict[Tuple[str, str], MemmapVectorIndex] = {}
+        
+        # (tabela, filtro, parâmetros) -> slots; invalidado a cada escrita de vetores na tabela
+        self._candidates: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        active = self.get_active_embedding_version()
+        self.active_version = active["name"]
+        self.embedding_dim = active["dim"]
+        
+        self.logger.info(f"SQLite storage initialized ({self.db_path})")
+    
+    def _initialize_schema(self):
+        """Inicializa schema do banco de dados"""
+        cursor = self.conn.cursor()
+        cursor.executescript(f"""
+            CREATE TABLE IF NOT EXISTS feedback (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                score REAL NOT NULL,
+                implicit_score REAL,
+                emotional_score REAL,
+                context TEXT,
+                has_embedding INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP NOT NULL DEFAULT {NOW},
+                updated_at TIMESTAMP DEFAULT {NOW},
+                client_id TEXT UNIQUE,
+                user_id TEXT
+            );
+            CREATE INDEX IF NOT EXISTS feedback_score_idx ON feedback (score);
+            CREATE INDEX IF NOT EXISTS feedback_context_idx ON feedback (context);
+            CREATE INDEX IF NOT EXISTS feedback_created_at_idx ON feedback (created_at);
+            
+            CREATE TABLE IF NOT EXISTS important_examples (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                score REAL NOT NULL,
+                context TEXT,
+                has_embedding INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT {NOW},
+                updated_at TIMESTAMP DEFAULT {NOW}
+            );
+            
+            CREATE TABLE IF NOT EXISTS courses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                description TEXT,
+                source_type TEXT NOT NULL,
+                source_path TEXT NOT NULL,
+                status TEXT DEFAULT 'not_started',
+                content_chunks INTEGER NOT NULL DEFAULT 0,
+                concepts_learned INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT {NOW},
+                updated_at TIMESTAMP DEFAULT {NOW}
+            );
+            
+            CREATE TABLE IF NOT EXISTS course_content (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+                title TEXT,
+                content TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                metadata TEXT,
+                content_hash TEXT NOT NULL,
+                has_embedding INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT {NOW}
+            );
+            CREATE INDEX IF NOT EXISTS course_content_course_id_idx ON course_content (course_id);
+            CREATE UNIQUE INDEX IF NOT EXISTS course_content_hash_idx
+                ON course_content (content_hash, course_id);
+            
+            CREATE TABLE IF NOT EXISTS learned_concepts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+                concept_name TEXT NOT NULL,
+                description TEXT,
+                examples TEXT,
+                patterns TEXT,
+                confidence REAL DEFAULT 0.5,
+                created_at TIMESTAMP DEFAULT {NOW}
+            );
+            CREATE INDEX IF NOT EXISTS learned_concepts_course_id_idx ON learned_concepts (course_id);
+            
+            CREATE TABLE IF NOT EXISTS consolidation_state (
+                name TEXT PRIMARY KEY,
+                last_feedback_id INTEGER NOT NULL DEFAULT 0,
+                last_created_at TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT {NOW}
+            );
+            
+            CREATE TABLE IF NOT EXISTS embedding_versions (
+                name TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'building',
+                created_at TIMESTAMP DEFAULT {NOW},
+                activated_at TIMESTAMP
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS embedding_versions_active_idx
+                ON embedding_versions (status) WHERE status = 'active';
+            
+            CREATE TABLE IF NOT EXISTS embedding_reindex_progress (
+                version TEXT NOT NULL REFERENCES embedding_versions(name) ON DELETE CASCADE,
+                table_name TEXT NOT NULL,
+                last_id INTEGER NOT NULL DEFAULT 0,
+                rows_done INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT {NOW},
+                PRIMARY KEY (version, table_name)
+            );
+        """)
+        
+        # Dono do feedback (bancos criados antes do multiusuário ganham a coluna)
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(feedback)").fetchall()}
+        if "user_id" not in columns:
+            cursor.execute("ALTER TABLE feedback ADD COLUMN user_id TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS feedback_user_id_idx ON feedback (user_id)")
+        
+        # Full-text (FTS5, external content) sincronizado por triggers
+        for table, columns in FTS_COLUMNS.items():
+            column_list = ", ".join(columns)
+            new_values = ", ".join(f"new.{column}" for column in columns)
+            old_values = ", ".join(f"old.{column}" for column in columns)
+            cursor.executescript(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+                    {column_list}, content='{table}', content_rowid='id', tokenize="{FTS_TOKENIZER}"
+                );
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {table}_fts (rowid, {column_list}) VALUES (new.id, {new_values});
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {table}_fts ({table}_fts, rowid, {column_list})
+                    VALUES ('delete', old.id, {old_values});
+                END;
+            """)
+        
+        # Contadores de chunks e conceitos por curso
+        for table, column in (("course_content", "content_chunks"), ("learned_concepts", "concepts_learned")):
+            cursor.executescript(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_insert_count_trg AFTER INSERT ON {table} BEGIN
+                    UPDATE courses SET {column} = {column} + 1 WHERE id = new.course_id;
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_delete_count_trg AFTER DELETE ON {table} BEGIN
+                    UPDATE courses SET {column} = {column} - 1 WHERE id = old.course_id;
+                END;
+            """)
+        
+        # Banco novo: registra a versão de embedding inicial
+        cursor.execute("""
+            INSERT INTO embedding_versions (name, model, dim, status, activated_at)
+            SELECT 'v1', ?, ?, 'active', datetime('now', 'localtime')
+            WHERE NOT EXISTS (SELECT 1 FROM embedding_versions)
+        """, (EMBEDDING_MODEL, EMBEDDING_DIM))
+        
+        self.conn.commit()
+        cursor.close()
+        self.logger.info("Database schema initialized")
+    
+    def _vector_index(self, table: str, version: Optional[str] = None) -> MemmapVectorIndex:
+        """
+        Índice vetorial de uma tabela em uma versão de embedding
+        
+        Args:
+            table: Tabela vetorial (ver VECTOR_TABLES)
+            version: Versão de embedding (padrão: a ativa)
+        
+        Returns:
+            Índice aberto (arquivo `<tabela>.<versão>.f32`)
+        """
+        version = version or self.active_version
+        key = (table, version)
+        if key not in self._version_indexes:
+            row = self.conn.execute(
+                "SELECT dim FROM embedding_versions WHERE name = ?", (version,)
+            ).fetchone()
+            if not row:
+                raise ValueError(f"Embedding version {version} not found")
+            self._version_indexes[key] = MemmapVectorIndex(
+                self.vector_path / f"{table}.{version}.f32",
+                dim=row[0],
+                ivf_lists=self.ivf_lists,
+                ivf_min_rows=self.ivf_min_rows,
+                ivf_probes=self.ivf_probes
+            )
+        return self._version_indexes[key]
+    
+    def _write_vectors(self, table: str, ids: List[int], embeddings: List[Any]):
+        """Grava embeddings (ignorando None) no índice da versão ativa"""
+        present = [(row_id, embedding) for row_id, embedding in zip(ids, embeddings) if embedding is not None]
+        if present:
+            self._invalidate_candidates(table)
+            self._vector_index(table).write(
+                [row_id for row_id, _ in present],
+                np.stack([np.asarray(embedding, dtype=np.float32) for _, embedding in present])
+            )
+    
+    def _vector_search(
+        self,
+        cursor,
+        table: str,
+        where: str,
+        params: tuple,
+        query_embeddings: np.ndarray,
+        top_k: int
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k por similaridade entre as linhas que passam pelo filtro SQL
+        
+        Args:
+            cursor: Cursor aberto
+            table: Tabela vetorial (recebe o alias `t`)
+            where: Condição de filtro (com alias `t.`)
+            params: Parâmetros de `where`
+            query_embeddings: Array (n, dim) ou vetor único (dim,)
+            top_k: Número de resultados por query
+        
+        Returns:
+            Para cada query, lista de (id, similarity) em ordem decrescente
+        """
+        # Ler os IDs filtrados custa mais que o produto escalar: reaproveita
+        # o conjunto enquanto a tabela não recebe vetores novos
+        key = (table, where, params)
+        slots = self._candidates.get(key)
+        if slots is None:
+            cursor.execute(f"SELECT t.id FROM {table} t WHERE t.has_embedding = 1 AND {where}", params)
+            slots = np.fromiter((row[0] for row in cursor.fetchall()), dtype=np.int64)
+            self._candidates[key] = slots
+            if len(self._candidates) > CANDIDATE_CACHE_SIZE:
+                self._candidates.popitem(last=False)
+        else:
+            self._candidates.move_to_end(key)
+        
+        return [
+            list(zip(ids.tolist(), similarities.tolist()))
+            for ids, similarities in self._vector_index(table).search(query_embeddings, slots, top_k)
+        ]
+    
+    def _invalidate_candidates(self, table: Optional[str] = None):
+        """Descarta conjuntos de candidatos de uma tabela (ou de todas)"""
+        for key in [key for key in self._candidates if table is None or key[0] == table]:
+            del self._candidates[key]
+    
+    @staticmethod
+    def _feedback_filter(
+        context: Optional[str],
+        user_id: Optional[str],
+        min_score: float
+    ) -> Tuple[str, tuple]:
+        """
+        Condição das buscas em feedback
+        
+        Cada combinação de filtros tem seu conjunto de candidatos em cache
+        (ver _vector_search), então a busca de um usuário percorre só os
+        vetores do seu histórico.
+        
+        Args:
+            context: Filtrar por contexto (opcional)
+            user_id: Restringir ao histórico do usuário (None = todos)
+            min_score: Score mínimo
+        
+        Returns:
+            (condição com alias `t.`, parâmetros)
+        """
+        where = "t.score >= ?"
+        params: tuple = (min_score,)
+        if context:
+            where += " AND t.context = ?"
+            params += (context,)
+        if user_id:
+            where += " AND t.user_id = ?"
+            params += (user_id,)
+        return where, params
+    
+    def _fetch_by_id(self, cursor, table: str, columns: str, ids: List[int]) -> Dict[int, tuple]:
+        """Lê linhas por ID (id deve ser a primeira coluna)"""
+        if not ids:
+            return {}
+        placeholders = ", ".join("?" * len(ids))
+        cursor.execute(f"SELECT {columns} FROM {table} WHERE id IN ({placeholders})", list(ids))
+        return {row[0]: row for row in cursor.fetchall()}
+    
+    def _hybrid_search(
+        self,
+        cursor,
+        table: str,
+        columns: str,
+        where: str,
+        params: tuple,
+        query_text: str,
+        query_embedding: np.ndarray,
+        top_k: int
+    ) -> List[Tuple[tuple, float, float]]:
+        """
+        Busca híbrida (FTS5 + vetorial) com reciprocal-rank fusion
+        
+        Args:
+            cursor: Cursor aberto
+            table: Tabela com índice FTS5 (ver FTS_COLUMNS)
+            columns: Colunas retornadas (começando por id)
+            where: Condição de filtro (com alias `t.`)
+            params: Parâmetros de `where`
+            query_text: Texto da query (para o ranking lexical)
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+        
+        Returns:
+            Lista de (linha, similarity, rrf_score) ordenada por rrf_score
+        """
+        candidates = max(self.hybrid_candidates, top_k)
+        semantic = self._vector_search(cursor, table, where, params, query_embedding, candidates)[0]
+        
+        lexical = []
+        match = self._fts_query(query_text)
+        if match:
+            cursor.execute(f"""
+                SELECT t.id FROM {table}_fts f
+                JOIN {table} t ON t.id = f.rowid
+                WHERE {table}_fts MATCH ? AND {where}
+                ORDER BY bm25({table}_fts)
+                LIMIT ?
+            """, (match, *params, candidates))
+            lexical = [row[0] for row in cursor.fetchall()]
+        
+        fused: Dict[int, float] = {}
+        for rank, (row_id, _) in enumerate(semantic, start=1):
+            fused[row_id] = fused.get(row_id, 0.0) + 1.0 / (self.rrf_k + rank)
+        for rank, row_id in enumerate(lexical, start=1):
+            fused[row_id] = fused.get(row_id, 0.0) + 1.0 / (self.rrf_k + rank)
+        
+        top = sorted(fused.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        rows = self._fetch_by_id(cursor, table, f"{columns}, has_embedding", [row_id for row_id, _ in top])
+        
+        # Similaridade exata para todos os resultados (inclusive os só lexicais)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        vectors = self._vector_index(table).read([row_id for row_id, _ in top])
+        similarities = vectors @ (query / query_norm) if query_norm > 0 else np.zeros(len(top))
+        
+        return [
+            (rows[row_id][:-1], float(similarity) if rows[row_id][-1] else 0.0, rrf_score)
+            for (row_id, rrf_score), similarity in zip(top, similarities)
+            if row_id in rows
+        ]
+    
+    @staticmethod
+    def _fts_query(text: str) -> Optional[str]:
+        """Termos da query combinados com OR (sintaxe FTS5)"""
+        terms = [term.strip(".") for term in re.findall(r"[\w.]+", text.lower())]
+        return " OR ".join(f'"{term}"' for term in terms if term) or None
+    
+    @staticmethod
+    def _load_json(value: Any) -> Any:
+        """Colunas JSON são gravadas como texto"""
+        if not value:
+            return None
+        if isinstance(value, (dict, list)):
+            return value
+        return json.loads(value)
+    
+    @staticmethod
+    def _isoformat(value: Any) -> Optional[str]:
+        """Converte datetime para string ISO"""
+        if value and hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value or None
+    
+    @staticmethod
+    def _add_months(month: date, months: int) -> date:
+        """Primeiro dia do mês `months` meses após `month`"""
+        index = month.year * 12 + month.month - 1 + months
+        return date(index // 12, index % 12 + 1, 1)
+    
+    def maintain_feedback_partitions(self, retention_months: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Aplica a retenção de feedback (SQLite não tem partições)
+        
+        Feedbacks anteriores ao corte (mês atual menos `retention_months`)
+        são removidos; antes disso, os positivos (score >=
+        feedback_rollup_min_score) são copiados para important_examples.
+        
+        Args:
+            retention_months: Meses de feedback mantidos (padrão: config; 0 = sem retenção)
+        
+        Returns:
+            Mesmo formato de PostgreSQLStorage, com rows_deleted
+        """
+        result = {"partitions_created": [], "partitions_dropped": [], "rows_rolled_up": 0, "rows_deleted": 0}
+        
+        if retention_months is None:
+            retention_months = self.feedback_retention_months
+        if not retention_months or retention_months <= 0:
+            return result
+        
+        cutoff = datetime.combine(self._add_months(date.today().replace(day=1), -retention_months), datetime.min.time())
+        
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT id, prompt, response, score, context, has_embedding, created_at
+                    FROM feedback
+                    WHERE score >= ? AND created_at < ?
+                """, (self.feedback_rollup_min_score, cutoff))
+                expired = cursor.fetchall()
+                
+                vectors = self._vector_index("feedback").read([row[0] for row in expired])
+                for row, vector in zip(expired, vectors):
+                    cursor.execute("""
+                        INSERT INTO important_examples (prompt, response, score, context, has_embedding, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, row[1:])
+                    if row[5]:
+                        self._write_vectors("important_examples", [cursor.lastrowid], [vector])
+                result["rows_rolled_up"] = len(expired)
+                
+                cursor.execute("DELETE FROM feedback WHERE created_at < ?", (cutoff,))
+                result["rows_deleted"] = cursor.rowcount
+                self.conn.commit()
+                self._invalidate_candidates("feedback")
+                
+                if result["rows_deleted"]:
+                    self.logger.info(
+                        f"Feedback retention removed {result['rows_deleted']} feedbacks, "
+                        f"rolled up {result['rows_rolled_up']} examples"
+                    )
+                return result
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error applying feedback retention: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def run_maintenance(
+        self,
+        time_budget_seconds: Optional[float] = None,
+        should_abort: Optional[Callable[[], bool]] = None
+    ) -> Dict[str, Any]:
+        """
+        Manutenção do banco: ANALYZE das tabelas e `optimize` dos índices FTS5
+        
+        Equivalente ao PostgreSQLStorage: o ANALYZE é amostrado
+        (ANALYSIS_LIMIT linhas por índice) e a fusão dos segmentos FTS5 faz o
+        papel do REINDEX. A matriz de vetores não incha (slot = ID da linha).
+        O tempo e `should_abort` são verificados entre os passos.
+        
+        Args:
+            time_budget_seconds: Tempo máximo da manutenção (padrão: config)
+            should_abort: Consultada entre os passos; True interrompe a manutenção
+        
+        Returns:
+            Mesmo formato de PostgreSQLStorage.run_maintenance
+        """
+        if time_budget_seconds is None:
+            time_budget_seconds = self.maintenance_time_budget
+        
+        started = time.monotonic()
+        result = {"analyzed": [], "reindexed": [], "index_bloat": {}, "aborted": False, "timed_out": False}
+        
+        def interrupted() -> bool:
+            if should_abort is not None and should_abort():
+                result["aborted"] = True
+            elif time.monotonic() - started >= time_budget_seconds:
+                result["timed_out"] = True
+            return result["aborted"] or result["timed_out"]
+        
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT name FROM sqlite_master
+                    WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name NOT LIKE '%_fts%'
+                    ORDER BY name
+                """)
+                tables = [row[0] for row in cursor.fetchall()]
+                
+                cursor.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+                for table in tables:
+                    if interrupted():
+                        break
+                    cursor.execute(f'ANALYZE "{table}"')
+                    result["analyzed"].append(table)
+                
+                for table in FTS_COLUMNS:
+                    if interrupted():
+                        break
+                    cursor.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('optimize')")
+                    self.conn.commit()
+                    result["reindexed"].append(f"{table}_fts")
+                
+                self.conn.commit()
+                result["elapsed_seconds"] = round(time.monotonic() - started, 3)
+                return result
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error running database maintenance: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def ensure_context_indexes(self, threshold: Optional[int] = None) -> List[str]:
+        """
+        Sem efeito: o filtro de contexto é aplicado em SQL antes da busca vetorial
+        
+        Args:
+            threshold: Ignorado (compatibilidade com PostgreSQLStorage)
+        
+        Returns:
+            Lista vazia
+        """
+        return []
+    
+    def store_feedback(
+        self,
+        prompt: str,
+        response: str,
+        score: float,
+        implicit_score: Optional[float] = None,
+        emotional_score: Optional[float] = None,
+        context: Optional[str] = None,
+        embedding: Optional[np.ndarray] = None,
+        user_id: Optional[str] = None
+    ) -> int:
+        """
+        Armazena feedback no banco
+        
+        Args:
+            prompt: Prompt original
+            response: Resposta gerada
+            score: Score total (0.7 * implícito + 0.3 * emocional)
+            implicit_score: Score implícito
+            emotional_score: Score emocional
+            context: Contexto (ex: 'python', 'odoo')
+            embedding: Embedding vetorial (opcional)
+            user_id: Usuário dono do feedback (opcional)
+        
+        Returns:
+            ID do feedback armazenado
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    INSERT INTO feedback (
+                        prompt, response, score, implicit_score, emotional_score, context, has_embedding,
+                        user_id
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    prompt, response, score, implicit_score, emotional_score, context, embedding is not None,
+                    user_id
+                ))
+                
+                feedback_id = cursor.lastrowid
+                self._write_vectors("feedback", [feedback_id], [embedding])
+                self.conn.commit()
+                
+                self.logger.debug(f"Feedback stored with ID: {feedback_id}")
+                return feedback_id
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error storing feedback: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def store_feedback_batch(
+        self,
+        feedbacks: List[Dict[str, Any]],
+        page_size: int = 500
+    ) -> int:
+        """
+        Armazena vários feedbacks em uma única transação
+        
+        Feedbacks com `client_id` já armazenado são ignorados, de modo que
+        reenviar um lote após falha não duplica linhas.
+        
+        Args:
+            feedbacks: Dicionários com prompt, response, score e opcionalmente
+                implicit_score, emotional_score, context, embedding,
+                created_at, client_id e user_id
+            page_size: Ignorado (compatibilidade com PostgreSQLStorage)
+        
+        Returns:
+            Número de feedbacks inseridos
+        """
+        if not feedbacks:
+            return 0
+        
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                ids = []
+                embeddings = []
+                for fb in feedbacks:
+                    created_at = fb.get('created_at')
+                    if isinstance(created_at, str):
+                        created_at = datetime.fromisoformat(created_at)
+                    
+                    cursor.execute(f"""
+                        INSERT INTO feedback (
+                            prompt, response, score, implicit_score, emotional_score,
+                            context, has_embedding, created_at, client_id, user_id
+                        )
+                        VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, {NOW}), ?, ?)
+                        ON CONFLICT (client_id) DO NOTHING
+                        RETURNING id
+                    """, (
+                        fb['prompt'],
+                        fb['response'],
+                        fb['score'],
+                        fb.get('implicit_score'),
+                        fb.get('emotional_score'),
+                        fb.get('context'),
+                        fb.get('embedding') is not None,
+                        created_at,
+                        fb.get('client_id'),
+                        fb.get('user_id')
+                    ))
+                    row = cursor.fetchone()
+                    if row:
+                        ids.append(row[0])
+                        embeddings.append(fb.get('embedding'))
+                
+                self._write_vectors("feedback", ids, embeddings)
+                self.conn.commit()
+                
+                self.logger.debug(f"Stored {len(ids)} of {len(feedbacks)} feedbacks in batch")
+                return len(ids)
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error storing feedback batch: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_all_feedbacks(self) -> List[Dict[str, Any]]:
+        """
+        Retorna todos os feedbacks
+        
+        Returns:
+            Lista de feedbacks
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT id, prompt, response, score, implicit_score, emotional_score, context, created_at
+                    FROM feedback
+                    ORDER BY created_at DESC
+                """)
+                
+                return [self._feedback_row(row) for row in cursor.fetchall()]
+            
+            except Exception as e:
+                self.logger.error(f"Error getting feedbacks: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def iter_feedback_batches(
+        self,
+        score_threshold: float = 0.7,
+        after_id: int = 0,
+        batch_size: int = 1000
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Itera feedbacks em lotes (paginação por ID)
+        
+        Args:
+            score_threshold: Score mínimo (exclusivo)
+            after_id: Retorna apenas feedbacks com ID maior que este
+            batch_size: Número de linhas por lote
+        
+        Yields:
+            Lotes de feedbacks ordenados por ID
+        """
+        while True:
+            with self._lock:
+                cursor = self.conn.cursor()
+                try:
+                    cursor.execute("""
+                        SELECT id, prompt, response, score, implicit_score, emotional_score, context, created_at
+                        FROM feedback
+                        WHERE id > ? AND score > ?
+                        ORDER BY id ASC
+                        LIMIT ?
+                    """, (after_id, score_threshold, batch_size))
+                    rows = cursor.fetchall()
+                
+                except Exception as e:
+                    self.logger.error(f"Error streaming feedbacks: {e}")
+                    raise
+                
+                finally:
+                    cursor.close()
+            
+            if not rows:
+                break
+            
+            after_id = rows[-1][0]
+            yield [self._feedback_row(row) for row in rows]
+    
+    def iter_export_batches(
+        self,
+        table: str,
+        batch_size: int = 10000
+    ) -> Iterator[Tuple[Dict[str, list], Optional[np.ndarray], Optional[np.ndarray]]]:
+        """
+        Itera uma tabela em lotes colunares para exportação (paginação por ID)
+        
+        Args:
+            table: Tabela de EXPORT_COLUMNS
+            batch_size: Número de linhas por lote
+        
+        Yields:
+            Mesmo formato de PostgreSQLStorage.iter_export_batches
+        """
+        if table not in EXPORT_COLUMNS:
+            raise ValueError(f"Unknown export table: {table}")
+        
+        names = [name for name, _ in EXPORT_COLUMNS[table]]
+        with_embedding = table in VECTOR_TABLES
+        select = ", ".join(names + (["has_embedding"] if with_embedding else []))
+        after_id = 0
+        
+        while True:
+            with self._lock:
+                cursor = self.conn.cursor()
+                try:
+                    cursor.execute(
+                        f"SELECT {select} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                        (after_id, batch_size)
+                    )
+                    rows = cursor.fetchall()
+                    
+                    embeddings = valid = None
+                    if rows and with_embedding:
+                        ids = [row[0] for row in rows]
+                        valid = np.array([bool(row[-1]) for row in rows])
+                        embeddings = self._vector_index(table).read(ids)
+                
+                except Exception as e:
+                    self.logger.error(f"Error exporting {table}: {e}")
+                    raise
+                
+                finally:
+                    cursor.close()
+            
+            if not rows:
+                break
+            
+            after_id = rows[-1][0]
+            columns = dict(zip(names, zip(*rows)))
+            yield columns, embeddings, valid
+    
+    @staticmethod
+    def _feedback_row(row: tuple) -> Dict[str, Any]:
+        """Linha de feedback (id, prompt, response, scores, context, created_at) como dicionário"""
+        return {
+            "id": row[0],
+            "prompt": row[1],
+            "response": row[2],
+            "score": row[3],
+            "implicit_score": row[4],
+            "emotional_score": row[5],
+            "context": row[6],
+            "created_at": row[7]
+        }
+    
+    def get_consolidation_watermark(self, name: str = "sleep") -> Dict[str, Any]:
+        """
+        Obtém a marca d'água da última consolidação bem-sucedida
+        
+        Args:
+            name: Nome do processo de consolidação
+        
+        Returns:
+            Dicionário com last_feedback_id e last_created_at
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT last_feedback_id, last_created_at
+                    FROM consolidation_state
+                    WHERE name = ?
+                """, (name,))
+                
+                row = cursor.fetchone()
+                if not row:
+                    return {"last_feedback_id": 0, "last_created_at": None}
+                
+                return {
+                    "last_feedback_id": row[0],
+                    "last_created_at": row[1]
+                }
+            
+            except Exception as e:
+                self.logger.error(f"Error getting consolidation watermark: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def update_consolidation_watermark(
+        self,
+        last_feedback_id: int,
+        last_created_at: Optional[Any] = None,
+        name: str = "sleep"
+    ):
+        """
+        Persiste a marca d'água após uma consolidação bem-sucedida
+        
+        Args:
+            last_feedback_id: ID do último feedback consolidado
+            last_created_at: Timestamp do último feedback consolidado
+            name: Nome do processo de consolidação
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(f"""
+                    INSERT INTO consolidation_state (name, last_feedback_id, last_created_at)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (name) DO UPDATE
+                    SET last_feedback_id = excluded.last_feedback_id,
+                        last_created_at = excluded.last_created_at,
+                        updated_at = {NOW}
+                    WHERE consolidation_state.last_feedback_id <= excluded.last_feedback_id
+                """, (name, last_feedback_id, last_created_at))
+                
+                self.conn.commit()
+                self.logger.debug(f"Consolidation watermark '{name}' set to feedback {last_feedback_id}")
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error updating consolidation watermark: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_important_examples(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Retorna exemplos importantes para replay
+        
+        Args:
+            limit: Número máximo de exemplos
+        
+        Returns:
+            Lista de exemplos importantes
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT id, prompt, response, score, context, created_at
+                    FROM important_examples
+                    ORDER BY score DESC, created_at DESC
+                    LIMIT ?
+                """, (limit,))
+                
+                return [
+                    {
+                        "id": row[0],
+                        "prompt": row[1],
+                        "response": row[2],
+                        "score": row[3],
+                        "context": row[4],
+                        "created_at": row[5]
+                    }
+                    for row in cursor.fetchall()
+                ]
+            
+            except Exception as e:
+                self.logger.error(f"Error getting important examples: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def add_important_example(
+        self,
+        prompt: str,
+        response: str,
+        score: float,
+        context: Optional[str] = None,
+        embedding: Optional[np.ndarray] = None
+    ):
+        """
+        Adiciona exemplo importante para replay
+        
+        Args:
+            prompt: Prompt original
+            response: Resposta gerada
+            score: Score do exemplo
+            context: Contexto
+            embedding: Embedding vetorial
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    INSERT INTO important_examples (prompt, response, score, context, has_embedding)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (prompt, response, score, context, embedding is not None))
+                
+                self._write_vectors("important_examples", [cursor.lastrowid], [embedding])
+                self.conn.commit()
+                self.logger.debug("Important example added")
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error adding important example: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def search_similar(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        context: Optional[str] = None,
+        min_score: float = 0.7,
+        user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca feedbacks similares por embedding
+        
+        Args:
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+            context: Filtrar por contexto (opcional)
+            min_score: Score mínimo
+            user_id: Buscar só no histórico do usuário (None = todos)
+        
+        Returns:
+            Lista de feedbacks similares
+        """
+        return self.search_similar_batch(
+            query_embedding,
+            top_k=top_k,
+            context=context,
+            min_score=min_score,
+            user_id=user_id
+        )[0]
+    
+    def search_similar_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 5,
+        context: Optional[str] = None,
+        min_score: float = 0.7,
+        user_id: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Busca feedbacks similares para várias queries (uma multiplicação de matrizes)
+        
+        Args:
+            query_embeddings: Array (n, dim) com embeddings das queries
+            top_k: Número de resultados por query
+            context: Filtrar por contexto (opcional)
+            min_score: Score mínimo
+            user_id: Buscar só no histórico do usuário (None = todos)
+        
+        Returns:
+            Lista com n listas de feedbacks similares (na ordem das queries)
+        """
+        where, params = self._feedback_filter(context, user_id, min_score)
+        
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                matches = self._vector_search(cursor, "feedback", where, params, query_embeddings, top_k)
+                rows = self._fetch_by_id(
+                    cursor,
+                    "feedback",
+                    "id, prompt, response, score, context",
+                    sorted({row_id for result in matches for row_id, _ in result})
+                )
+                
+                return [
+                    [
+                        {
+                            "id": row_id,
+                            "prompt": rows[row_id][1],
+                            "response": rows[row_id][2],
+                            "score": rows[row_id][3],
+                            "context": rows[row_id][4],
+                            "similarity": similarity
+                        }
+                        for row_id, similarity in result
+                    ]
+                    for result in matches
+                ]
+            
+            except Exception as e:
+                self.logger.error(f"Error searching similar: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def search_similar_hybrid(
+        self,
+        query_text: str,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        context: Optional[str] = None,
+        min_score: float = 0.7,
+        user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca feedbacks combinando full-text e similaridade semântica (RRF)
+        
+        Args:
+            query_text: Texto da query (para o ranking lexical)
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+            context: Filtrar por contexto (opcional)
+            min_score: Score mínimo
+            user_id: Buscar só no histórico do usuário (None = todos)
+        
+        Returns:
+            Lista de feedbacks ordenada por `rrf_score`
+        """
+        where, params = self._feedback_filter(context, user_id, min_score)
+        
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                return [
+                    {
+                        "id": row[0],
+                        "prompt": row[1],
+                        "response": row[2],
+                        "score": row[3],
+                        "context": row[4],
+                        "similarity": similarity,
+                        "rrf_score": rrf_score
+                    }
+                    for row, similarity, rrf_score in self._hybrid_search(
+                        cursor,
+                        "feedback",
+                        "id, prompt, response, score, context",
+                        where,
+                        params,
+                        query_text,
+                        query_embedding,
+                        top_k
+                    )
+                ]
+            
+            except Exception as e:
+                self.logger.error(f"Error in hybrid similar search: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def store_course(
+        self,
+        name: str,
+        description: str,
+        source_type: str,
+        source_path: str
+    ) -> int:
+        """
+        Armazena um novo curso
+        
+        Args:
+            name: Nome do curso
+            description: Descrição do curso
+            source_type: Tipo de fonte ('url', 'file', 'directory', 'text')
+            source_path: Caminho/URL da fonte
+        
+        Returns:
+            ID do curso criado
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    INSERT INTO courses (name, description, source_type, source_path)
+                    VALUES (?, ?, ?, ?)
+                """, (name, description, source_type, source_path))
+                
+                course_id = cursor.lastrowid
+                self.conn.commit()
+                
+                self.logger.debug(f"Course stored with ID: {course_id}")
+                return course_id
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error storing course: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_course(self, course_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Obtém um curso por ID
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Dicionário com informações do curso ou None
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT id, name, description, source_type, source_path, status, created_at, updated_at
+                    FROM courses
+                    WHERE id = ?
+                """, (course_id,))
+                
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                
+                return {
+                    "id": row[0],
+                    "name": row[1],
+                    "description": row[2],
+                    "source_type": row[3],
+                    "source_path": row[4],
+                    "status": row[5],
+                    "created_at": self._isoformat(row[6]),
+                    "updated_at": self._isoformat(row[7])
+                }
+            
+            except Exception as e:
+                self.logger.error(f"Error getting course: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_all_courses(self) -> List[Dict[str, Any]]:
+        """
+        Retorna todos os cursos
+        
+        Returns:
+            Lista de cursos
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT id, name, description, source_type, source_path, status, created_at, updated_at,
+                           content_chunks, concepts_learned
+                    FROM courses
+                    ORDER BY created_at DESC, id DESC
+                """)
+                
+                return [
+                    {
+                        "id": row[0],
+                        "name": row[1],
+                        "description": row[2],
+                        "source_type": row[3],
+                        "source_path": row[4],
+                        "status": row[5],
+                        "created_at": self._isoformat(row[6]),
+                        "updated_at": self._isoformat(row[7]),
+                        "content_chunks": row[8],
+                        "concepts_learned": row[9]
+                    }
+                    for row in cursor.fetchall()
+                ]
+            
+            except Exception as e:
+                self.logger.error(f"Error getting all courses: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_course_status(self, course_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Obtém status de um curso com contadores de chunks e conceitos
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Dicionário com status do curso ou None
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT id, name, status, content_chunks, concepts_learned, created_at, updated_at
+                    FROM courses
+                    WHERE id = ?
+                """, (course_id,))
+                
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                
+                return {
+                    "id": row[0],
+                    "name": row[1],
+                    "status": row[2],
+                    "content_chunks": row[3],
+                    "concepts_learned": row[4],
+                    "created_at": self._isoformat(row[5]),
+                    "updated_at": self._isoformat(row[6])
+                }
+            
+            except Exception as e:
+                self.logger.error(f"Error getting course status: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def update_course_status(self, course_id: int, status: str):
+        """
+        Atualiza status de um curso
+        
+        Args:
+            course_id: ID do curso
+            status: Novo status
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(f"""
+                    UPDATE courses
+                    SET status = ?, updated_at = {NOW}
+                    WHERE id = ?
+                """, (status, course_id))
+                
+                self.conn.commit()
+                self.logger.debug(f"Course {course_id} status updated to {status}")
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error updating course status: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def store_course_content(
+        self,
+        course_id: int,
+        title: str,
+        content: str,
+        chunk_index: int,
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding: Optional[np.ndarray] = None
+    ) -> int:
+        """
+        Armazena conteúdo de um curso
+        
+        Args:
+            course_id: ID do curso
+            title: Título do chunk
+            content: Conteúdo do chunk
+            chunk_index: Índice do chunk
+            metadata: Metadados adicionais (JSON)
+            embedding: Embedding vetorial
+        
+        Returns:
+            ID do conteúdo armazenado (ou do chunk idêntico já existente no curso)
+        """
+        return self.store_course_content_bulk(course_id, [{
+            "title": title,
+            "content": content,
+            "chunk_index": chunk_index,
+            "metadata": metadata,
+            "embedding": embedding
+        }])[0]
+    
+    def store_course_content_bulk(
+        self,
+        course_id: int,
+        chunks: List[Dict[str, Any]],
+        page_size: int = 500
+    ) -> List[int]:
+        """
+        Armazena vários chunks de um curso em uma única transação
+        
+        Chunks cujo conteúdo já existe no curso não são inseridos de novo;
+        o ID existente é retornado.
+        
+        Args:
+            course_id: ID do curso
+            chunks: Chunks processados (content, chunk_index, metadata, embedding
+                e opcionalmente title e content_hash; sem title, usa metadata['title'])
+            page_size: Ignorado (compatibilidade com PostgreSQLStorage)
+        
+        Returns:
+            IDs dos conteúdos (na ordem dos chunks)
+        """
+        if not chunks:
+            return []
+        
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                content_ids = []
+                inserted_ids = []
+                inserted_embeddings = []
+                for chunk in chunks:
+                    metadata = chunk.get('metadata')
+                    title = chunk.get('title')
+                    if title is None:
+                        title = (metadata or {}).get('title', '')
+                    chunk_hash = chunk.get('content_hash') or content_hash(chunk['content'])
+                    
+                    cursor.execute("""
+                        INSERT INTO course_content (
+                            course_id, title, content, chunk_index, metadata, content_hash, has_embedding
+                        )
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (content_hash, course_id) DO NOTHING
+                        RETURNING id
+                    """, (
+                        course_id,
+                        title,
+                        chunk['content'],
+                        chunk['chunk_index'],
+                        json.dumps(metadata) if metadata else None,
+                        chunk_hash,
+                        chunk.get('embedding') is not None
+                    ))
+                    row = cursor.fetchone()
+                    
+                    if row:
+                        inserted_ids.append(row[0])
+                        inserted_embeddings.append(chunk.get('embedding'))
+                    else:
+                        # Chunk já existente no curso: referencia a linha atual
+                        cursor.execute("""
+                            SELECT id FROM course_content WHERE content_hash = ? AND course_id = ?
+                        """, (chunk_hash, course_id))
+                        row = cursor.fetchone()
+                    content_ids.append(row[0])
+                
+                self._write_vectors("course_content", inserted_ids, inserted_embeddings)
+                self.conn.commit()
+                
+                self.logger.debug(
+                    f"Stored {len(inserted_ids)} course content chunks for course {course_id} "
+                    f"({len(chunks) - len(inserted_ids)} already stored)"
+                )
+                return content_ids
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error storing course content in bulk: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_embeddings_by_hash(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Obtém embeddings já armazenados para hashes de conteúdo (de qualquer curso)
+        
+        Args:
+            hashes: Hashes de conteúdo (content_hash)
+        
+        Returns:
+            Dicionário hash -> embedding normalizado (apenas hashes encontrados)
+        """
+        if not hashes:
+            return {}
+        
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                placeholders = ", ".join("?" * len(hashes))
+                cursor.execute(f"""
+                    SELECT content_hash, MIN(id) FROM course_content
+                    WHERE content_hash IN ({placeholders}) AND has_embedding = 1
+                    GROUP BY content_hash
+                """, list(hashes))
+                rows = cursor.fetchall()
+                
+                vectors = self._vector_index("course_content").read([row[1] for row in rows])
+                return {row[0]: vector for row, vector in zip(rows, vectors)}
+            
+            except Exception as e:
+                self.logger.error(f"Error getting embeddings by hash: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_course_content(self, course_id: int) -> List[Dict[str, Any]]:
+        """
+        Obtém todo o conteúdo de um curso
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Lista de chunks de conteúdo
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT id, title, content, chunk_index, metadata, created_at
+                    FROM course_content
+                    WHERE course_id = ?
+                    ORDER BY chunk_index ASC
+                """, (course_id,))
+                
+                return [
+                    {
+                        "id": row[0],
+                        "title": row[1],
+                        "content": row[2],
+                        "chunk_index": row[3],
+                        "metadata": self._load_json(row[4]),
+                        "created_at": row[5]
+                    }
+                    for row in cursor.fetchall()
+                ]
+            
+            except Exception as e:
+                self.logger.error(f"Error getting course content: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_course_content_count(self, course_id: int) -> int:
+        """
+        Conta número de chunks de conteúdo de um curso
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Número de chunks
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("SELECT COUNT(*) FROM course_content WHERE course_id = ?", (course_id,))
+                return cursor.fetchone()[0]
+            
+            except Exception as e:
+                self.logger.error(f"Error counting course content: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def search_course_content(
+        self,
+        course_id: int,
+        query_embedding: np.ndarray,
+        top_k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca conteúdo de curso por similaridade semântica
+        
+        Args:
+            course_id: ID do curso
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+        
+        Returns:
+            Lista de chunks similares
+        """
+        return self.search_course_content_batch(course_id, query_embedding, top_k=top_k)[0]
+    
+    def search_course_content_batch(
+        self,
+        course_id: int,
+        query_embeddings: np.ndarray,
+        top_k: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Busca conteúdo de curso para várias queries (uma multiplicação de matrizes)
+        
+        Args:
+            course_id: ID do curso
+            query_embeddings: Array (n, dim) com embeddings das queries
+            top_k: Número de resultados por query
+        
+        Returns:
+            Lista com n listas de chunks similares (na ordem das queries)
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                matches = self._vector_search(
+                    cursor, "course_content", "t.course_id = ?", (course_id,), query_embeddings, top_k
+                )
+                rows = self._fetch_by_id(
+                    cursor,
+                    "course_content",
+                    "id, title, content, chunk_index, metadata",
+                    sorted({row_id for result in matches for row_id, _ in result})
+                )
+                
+                return [
+                    [
+                        {
+                            "id": row_id,
+                            "title": rows[row_id][1],
+                            "content": rows[row_id][2],
+                            "chunk_index": rows[row_id][3],
+                            "metadata": self._load_json(rows[row_id][4]),
+                            "similarity": similarity
+                        }
+                        for row_id, similarity in result
+                    ]
+                    for result in matches
+                ]
+            
+            except Exception as e:
+                self.logger.error(f"Error searching course content: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def search_course_content_hybrid(
+        self,
+        course_id: int,
+        query_text: str,
+        query_embedding: np.ndarray,
+        top_k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca conteúdo de curso combinando full-text e similaridade semântica (RRF)
+        
+        Args:
+            course_id: ID do curso
+            query_text: Texto da query (para o ranking lexical)
+            query_embedding: Embedding da query
+            top_k: Número de resultados
+        
+        Returns:
+            Lista de chunks ordenada por `rrf_score`
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                return [
+                    {
+                        "id": row[0],
+                        "title": row[1],
+                        "content": row[2],
+                        "chunk_index": row[3],
+                        "metadata": self._load_json(row[4]),
+                        "similarity": similarity,
+                        "rrf_score": rrf_score
+                    }
+                    for row, similarity, rrf_score in self._hybrid_search(
+                        cursor,
+                        "course_content",
+                        "id, title, content, chunk_index, metadata",
+                        "t.course_id = ?",
+                        (course_id,),
+                        query_text,
+                        query_embedding,
+                        top_k
+                    )
+                ]
+            
+            except Exception as e:
+                self.logger.error(f"Error in hybrid course content search: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def store_learned_concept(
+        self,
+        course_id: int,
+        concept_name: str,
+        description: str,
+        examples: Optional[List[Dict[str, Any]]] = None,
+        patterns: Optional[List[Dict[str, Any]]] = None,
+        confidence: float = 0.5
+    ) -> int:
+        """
+        Armazena um conceito aprendido de um curso
+        
+        Args:
+            course_id: ID do curso
+            concept_name: Nome do conceito
+            description: Descrição do conceito
+            examples: Lista de exemplos
+            patterns: Lista de padrões
+            confidence: Confiança no conceito (0.0 a 1.0)
+        
+        Returns:
+            ID do conceito armazenado
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    INSERT INTO learned_concepts (course_id, concept_name, description, examples, patterns, confidence)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (
+                    course_id,
+                    concept_name,
+                    description,
+                    json.dumps(examples) if examples else None,
+                    json.dumps(patterns) if patterns else None,
+                    confidence
+                ))
+                
+                concept_id = cursor.lastrowid
+                self.conn.commit()
+                
+                self.logger.debug(f"Learned concept stored with ID: {concept_id}")
+                return concept_id
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error storing learned concept: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_learned_concepts(self, course_id: int) -> List[Dict[str, Any]]:
+        """
+        Obtém todos os conceitos aprendidos de um curso
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Lista de conceitos aprendidos
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT id, concept_name, description, examples, patterns, confidence, created_at
+                    FROM learned_concepts
+                    WHERE course_id = ?
+                    ORDER BY confidence DESC, created_at DESC
+                """, (course_id,))
+                
+                return [
+                    {
+                        "id": row[0],
+                        "concept_name": row[1],
+                        "description": row[2],
+                        "examples": self._load_json(row[3]),
+                        "patterns": self._load_json(row[4]),
+                        "confidence": row[5],
+                        "created_at": row[6]
+                    }
+                    for row in cursor.fetchall()
+                ]
+            
+            except Exception as e:
+                self.logger.error(f"Error getting learned concepts: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_learned_concepts_count(self, course_id: int) -> int:
+        """
+        Conta número de conceitos aprendidos de um curso
+        
+        Args:
+            course_id: ID do curso
+        
+        Returns:
+            Número de conceitos
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("SELECT COUNT(*) FROM learned_concepts WHERE course_id = ?", (course_id,))
+                return cursor.fetchone()[0]
+            
+            except Exception as e:
+                self.logger.error(f"Error counting learned concepts: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_course_examples_for_replay(
+        self,
+        course_id: int,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """
+        Obtém exemplos de um curso para uso no replay buffer
+        
+        Args:
+            course_id: ID do curso
+            limit: Número máximo de exemplos
+        
+        Returns:
+            Lista de exemplos formatados para replay
+        """
+        concepts = self.get_learned_concepts(course_id)
+        examples = []
+        
+        for concept in concepts[:limit]:
+            for example in concept.get("examples") or []:
+                examples.append({
+                    "prompt": example.get("prompt", ""),
+                    "response": example.get("response", ""),
+                    "score": concept.get("confidence", 0.5),
+                    "context": f"course_{course_id}"
+                })
+        
+        return examples
+    
+    def get_validated_course_examples(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Obtém exemplos de replay de todos os cursos validados em uma consulta
+        
+        Cada curso recebe uma cota de `limit // cursos validados` exemplos
+        (mínimo 1), priorizando conceitos de maior confiança.
+        
+        Args:
+            limit: Número máximo de exemplos
+        
+        Returns:
+            Lista de exemplos formatados para replay
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    WITH validated AS (
+                        SELECT id FROM courses WHERE status = 'validated'
+                    ),
+                    quota AS (
+                        SELECT MAX(:limit / NULLIF(COUNT(*), 0), 1) AS per_course
+                        FROM validated
+                    ),
+                    ranked AS (
+                        SELECT
+                            lc.course_id,
+                            json_extract(ex.value, '$.prompt') AS prompt,
+                            json_extract(ex.value, '$.response') AS response,
+                            lc.confidence,
+                            ROW_NUMBER() OVER (
+                                PARTITION BY lc.course_id
+                                ORDER BY lc.confidence DESC, lc.created_at DESC, lc.id, ex.key
+                            ) AS rn
+                        FROM learned_concepts lc
+                        JOIN validated v ON v.id = lc.course_id
+                        CROSS JOIN json_each(
+                            CASE WHEN json_type(lc.examples) = 'array' THEN lc.examples ELSE '[]' END
+                        ) AS ex
+                    )
+                    SELECT r.course_id, r.prompt, r.response, r.confidence
+                    FROM ranked r, quota q
+                    WHERE r.rn <= q.per_course
+                    ORDER BY r.course_id, r.rn
+                    LIMIT :limit
+                """, {"limit": limit})
+                
+                return [
+                    {
+                        "prompt": row[1] or "",
+                        "response": row[2] or "",
+                        "score": row[3] if row[3] is not None else 0.5,
+                        "context": f"course_{row[0]}"
+                    }
+                    for row in cursor.fetchall()
+                ]
+            
+            except Exception as e:
+                self.logger.error(f"Error getting validated course examples: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def _check_embedding_version(self, cursor, version: str) -> Dict[str, Any]:
+        """
+        Valida uma versão de embedding não ativa
+        
+        Args:
+            cursor: Cursor aberto
+            version: Nome da versão
+        
+        Returns:
+            Dicionário com name, model, dim e status
+        """
+        if not EMBEDDING_VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid embedding version name: {version}")
+        
+        cursor.execute("SELECT name, model, dim, status FROM embedding_versions WHERE name = ?", (version,))
+        row = cursor.fetchone()
+        if not row:
+            raise ValueError(f"Embedding version {version} not found")
+        if row[3] == "active":
+            raise ValueError(f"Embedding version {version} is already active")
+        
+        return {"name": row[0], "model": row[1], "dim": row[2], "status": row[3]}
+    
+    def _pending_rows(self, cursor, version: str, table: str, limit: int = -1) -> List[Tuple[int, str]]:
+        """Linhas com embedding ainda não re-geradas na versão (após o checkpoint)"""
+        cursor.execute(f"""
+            SELECT t.id, t.{EMBEDDING_SOURCES[table]} FROM {table} t
+            WHERE t.has_embedding = 1 AND t.id > (
+                SELECT last_id FROM embedding_reindex_progress WHERE version = ? AND table_name = ?
+            )
+            ORDER BY t.id
+            LIMIT ?
+        """, (version, table, limit))
+        return cursor.fetchall()
+    
+    def _advance_checkpoint(self, cursor, version: str, table: str, rows: List[Tuple[int, str]]):
+        """Avança o checkpoint da re-indexação até a última linha de `rows`"""
+        cursor.execute(f"""
+            UPDATE embedding_reindex_progress
+            SET last_id = ?, rows_done = rows_done + ?, updated_at = {NOW}
+            WHERE version = ? AND table_name = ?
+        """, (rows[-1][0], len(rows), version, table))
+    
+    def create_embedding_version(self, version: str, model: str, dim: int) -> Dict[str, Any]:
+        """
+        Registra uma nova versão de embedding (blue-green)
+        
+        A versão ganha um arquivo de vetores próprio por tabela, preenchido
+        por reembed_batch() e lido após activate_embedding_version().
+        
+        Args:
+            version: Nome da versão (minúsculas, dígitos e _; até 24 caracteres)
+            model: Modelo de embedding da versão
+            dim: Dimensão dos embeddings do modelo
+        
+        Returns:
+            Dicionário com name, model, dim e status
+        """
+        if not EMBEDDING_VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid embedding version name: {version}")
+        if dim <= 0:
+            raise ValueError(f"Invalid embedding dimension: {dim}")
+        
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    INSERT INTO embedding_versions (name, model, dim)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (name) DO NOTHING
+                """, (version, model, dim))
+                if cursor.rowcount == 0:
+                    raise ValueError(f"Embedding version {version} already exists")
+                
+                cursor.executemany("""
+                    INSERT INTO embedding_reindex_progress (version, table_name)
+                    VALUES (?, ?)
+                """, [(version, table) for table in VECTOR_TABLES])
+                self.conn.commit()
+                
+                self.logger.info(f"Created embedding version {version} ({model}, dim={dim})")
+                return {"name": version, "model": model, "dim": dim, "status": "building"}
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error creating embedding version: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def reembed_batch(
+        self,
+        version: str,
+        table: str,
+        embed_fn: Callable[[List[str]], np.ndarray],
+        batch_size: int = 256
+    ) -> int:
+        """
+        Re-gera um lote de embeddings de uma tabela com o modelo da versão
+        
+        Args:
+            version: Versão em construção
+            table: Tabela vetorial (ver VECTOR_TABLES)
+            embed_fn: Função que gera embeddings (n, dim) para uma lista de textos
+            batch_size: Linhas por lote
+        
+        Returns:
+            Número de linhas processadas (0 quando a tabela está em dia)
+        """
+        if table not in EMBEDDING_SOURCES:
+            raise ValueError(f"Unknown vector table: {table}")
+        
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                self._check_embedding_version(cursor, version)
+                rows = self._pending_rows(cursor, version, table, batch_size)
+                if not rows:
+                    return 0
+                
+                self._vector_index(table, version).write(
+                    [row[0] for row in rows],
+                    embed_fn([row[1] or "" for row in rows])
+                )
+                self._advance_checkpoint(cursor, version, table, rows)
+                self.conn.commit()
+                
+                return len(rows)
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error re-embedding {table} for version {version}: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def build_embedding_version_indexes(self, version: str) -> List[str]:
+        """
+        Grava os vetores da versão no disco (a busca não tem índice a construir)
+        
+        Args:
+            version: Versão em construção
+        
+        Returns:
+            Lista vazia
+        """
+        with self._lock:
+            for table in VECTOR_TABLES:
+                self._vector_index(table, version).flush()
+        return []
+    
+    def activate_embedding_version(
+        self,
+        version: str,
+        embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None
+    ) -> Dict[str, Any]:
+        """
+        Troca a versão de embedding lida e escrita
+        
+        Com as escritas bloqueadas (lock do storage), re-gera as linhas que
+        chegaram depois do último lote e passa a usar os arquivos de vetores
+        da nova versão. A versão antiga fica aposentada.
+        
+        Args:
+            version: Versão re-indexada
+            embed_fn: Função do novo modelo para linhas pendentes (sem ela, falha
+                se houver linhas pendentes)
+        
+        Returns:
+            Dicionário com active, retired, dim e rows_caught_up
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                info = self._check_embedding_version(cursor, version)
+                previous = self.active_version
+                
+                caught_up = 0
+                for table in VECTOR_TABLES:
+                    pending = self._pending_rows(cursor, version, table)
+                    if not pending:
+                        continue
+                    if embed_fn is None:
+                        raise ValueError(f"{len(pending)} rows of {table} not re-embedded for version {version}")
+                    self._vector_index(table, version).write(
+                        [row[0] for row in pending],
+                        embed_fn([row[1] or "" for row in pending])
+                    )
+                    self._advance_checkpoint(cursor, version, table, pending)
+                    caught_up += len(pending)
+                
+                for table in VECTOR_TABLES:
+                    self._vector_index(table, version).flush()
+                
+                cursor.execute("UPDATE embedding_versions SET status = 'retired' WHERE name = ?", (previous,))
+                cursor.execute(f"""
+                    UPDATE embedding_versions
+                    SET status = 'active', activated_at = {NOW}
+                    WHERE name = ?
+                """, (version,))
+                self.conn.commit()
+                
+                self.active_version = version
+                self.embedding_dim = info["dim"]
+                self._invalidate_candidates()
+                
+                self.logger.info(
+                    f"Activated embedding version {version} ({info['model']}), "
+                    f"retired {previous}, caught up {caught_up} rows"
+                )
+                return {
+                    "active": version,
+                    "retired": previous,
+                    "dim": info["dim"],
+                    "rows_caught_up": caught_up
+                }
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error activating embedding version {version}: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def drop_embedding_version(self, version: str):
+        """
+        Remove uma versão de embedding não ativa (arquivos de vetores e checkpoint)
+        
+        Args:
+            version: Versão em construção ou aposentada
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                self._check_embedding_version(cursor, version)
+                cursor.execute("DELETE FROM embedding_versions WHERE name = ?", (version,))
+                self.conn.commit()
+                
+                for table in VECTOR_TABLES:
+                    index = self._version_indexes.pop((table, version), None)
+                    if index is not None:
+                        index.close()
+                    (self.vector_path / f"{table}.{version}.f32").unlink(missing_ok=True)
+                
+                self.logger.info(f"Dropped embedding version {version}")
+            
+            except Exception as e:
+                self.conn.rollback()
+                self.logger.error(f"Error dropping embedding version {version}: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_embedding_versions(self) -> List[Dict[str, Any]]:
+        """
+        Lista versões de embedding com o progresso da re-indexação
+        
+        Returns:
+            Lista de versões (name, model, dim, status, datas e progress por tabela)
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT name, model, dim, status, created_at, activated_at
+                    FROM embedding_versions
+                    ORDER BY created_at, name
+                """)
+                versions = cursor.fetchall()
+                
+                cursor.execute("SELECT version, table_name, rows_done FROM embedding_reindex_progress")
+                progress: Dict[str, Dict[str, int]] = {}
+                for row in cursor.fetchall():
+                    progress.setdefault(row[0], {})[row[1]] = row[2]
+                
+                return [
+                    {
+                        "name": row[0],
+                        "model": row[1],
+                        "dim": row[2],
+                        "status": row[3],
+                        "created_at": self._isoformat(row[4]),
+                        "activated_at": self._isoformat(row[5]),
+                        "progress": progress.get(row[0], {})
+                    }
+                    for row in versions
+                ]
+            
+            except Exception as e:
+                self.logger.error(f"Error getting embedding versions: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_active_embedding_version(self) -> Optional[Dict[str, Any]]:
+        """
+        Obtém a versão de embedding ativa (modelo que deve gerar as queries)
+        
+        Returns:
+            Dicionário com name, model e dim, ou None
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("SELECT name, model, dim FROM embedding_versions WHERE status = 'active'")
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                
+                return {"name": row[0], "model": row[1], "dim": row[2]}
+            
+            except Exception as e:
+                self.logger.error(f"Error getting active embedding version: {e}")
+                raise
+            
+            finally:
+                cursor.close()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Métricas de latência por método
+        
+        Returns:
+            Snapshot de StorageMetrics
+        """
+        return self.metrics.snapshot()
+    
+    def notify_invalidation(self, scope: str, **payload):
+        """
+        Sem efeito: o banco SQLite é de um único processo, sem caches de
+        outros processos para invalidar (ver PostgreSQLStorage.notify_invalidation)
+        """
+    
+    def reset_metrics(self):
+        """Zera as métricas"""
+        self.metrics.reset()
+    
+    def close(self):
+        """Grava os índices vetoriais e fecha o banco"""
+        with self._lock:
+            for index in self._version_indexes.values():
+                index.close()
+            self._version_indexes = {}
+            self.conn.close()
+        self.logger.info("SQLite storage closed")
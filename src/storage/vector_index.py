@@ -0,0 +1,290 @@
+"""
+Memory-mapped vector index
+Float32 embedding matrix on disk with NumPy brute-force and IVF search
+"""
+
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+
+from src.utils.logging import get_logger
+
+
+# Capacidade inicial (linhas) do arquivo; cresce dobrando
+INITIAL_CAPACITY = 1024
+
+# Iterações do k-means e amostra de treino por lista do IVF
+IVF_TRAIN_ITERATIONS = 10
+IVF_TRAIN_SAMPLES_PER_LIST = 64
+
+
+class MemmapVectorIndex:
+    """
+    Matriz float32 (capacidade, dim) mapeada em memória, endereçada por slot
+    
+    O slot de cada vetor é o ID da linha no SQLite, então a filtragem (curso,
+    contexto, score) é feita em SQL e a busca recebe apenas os slots
+    candidatos. Os vetores são gravados normalizados (norma L2 = 1): a
+    similaridade de cosseno vira um produto escalar.
+    
+    Abaixo de `ivf_min_rows` linhas a busca é exata (força bruta). Acima
+    disso, um índice IVF (k-means sobre os vetores) restringe a busca aos
+    slots das `ivf_probes` listas mais próximas da query; se a restrição
+    deixar menos que top_k candidatos, volta para a busca exata. O IVF fica
+    em memória, é treinado na primeira busca e re-treinado quando o número
+    de vetores dobra.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        dim: int,
+        ivf_lists: int = 0,
+        ivf_min_rows: int = 50000,
+        ivf_probes: int = 8
+    ):
+        """
+        Abre (ou cria) o arquivo de vetores
+        
+        Args:
+            path: Caminho do arquivo .f32
+            dim: Dimensão dos vetores
+            ivf_lists: Número de listas do IVF (0 = raiz quadrada do número de vetores)
+            ivf_min_rows: Número de vetores a partir do qual o IVF é usado
+            ivf_probes: Listas visitadas por busca
+        """
+        self.logger = get_logger(self.__class__.__name__)
+        self.path = Path(path)
+        self.dim = dim
+        self.ivf_lists = ivf_lists
+        self.ivf_min_rows = ivf_min_rows
+        self.ivf_probes = ivf_probes
+        
+        self._lock = threading.RLock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        
+        if self.path.exists() and self.path.stat().st_size:
+            capacity = self.path.stat().st_size // (4 * dim)
+        else:
+            capacity = INITIAL_CAPACITY
+        self._open(capacity)
+        
+        # Vetores gravados (aproximado: regravar um slot conta de novo)
+        self.count = len(self._present_slots())
+        
+        # IVF: centróides (listas, dim) e lista de cada slot (-1 = sem vetor)
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        self._trained_rows = 0
+        self._rows_since_training = 0
+    
+    @property
+    def capacity(self) -> int:
+        """Número de slots do arquivo"""
+        return self._matrix.shape[0]
+    
+    def write(self, slots: List[int], vectors: np.ndarray):
+        """
+        Grava vetores nos slots (normalizados)
+        
+        Args:
+            slots: Slots (IDs das linhas)
+            vectors: Array (n, dim)
+        """
+        if not len(slots):
+            return
+        
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+        
+        slots = np.asarray(slots, dtype=np.int64)
+        with self._lock:
+            self._grow(int(slots.max()) + 1)
+            normalized = self._normalize(vectors)
+            self._matrix[slots] = normalized
+            self.count += len(slots)
+            
+            if self._centroids is not None:
+                self._assignments[slots] = np.argmax(normalized @ self._centroids.T, axis=1)
+                self._rows_since_training += len(slots)
+    
+    def read(self, slots: List[int]) -> np.ndarray:
+        """
+        Lê vetores dos slots
+        
+        Args:
+            slots: Slots (IDs das linhas)
+        
+        Returns:
+            Cópia (n, dim) dos vetores normalizados
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        with self._lock:
+            result = np.zeros((len(slots), self.dim), dtype=np.float32)
+            inside = slots < self.capacity
+            result[inside] = self._matrix[slots[inside]]
+            return result
+    
+    def search(
+        self,
+        queries: np.ndarray,
+        slots: np.ndarray,
+        k: int
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top-k por similaridade de cosseno entre os slots candidatos
+        
+        Args:
+            queries: Array (n, dim) ou vetor único (dim,)
+            slots: Slots candidatos (linhas que passaram pelos filtros SQL)
+            k: Número de resultados por query
+        
+        Returns:
+            Para cada query, (slots, similaridades) em ordem decrescente
+        """
+        queries = self._normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        slots = np.asarray(slots, dtype=np.int64)
+        if not len(slots) or k <= 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+        
+        with self._lock:
+            self._maybe_train_ivf()
+            
+            if self._centroids is not None and len(slots) >= self.ivf_min_rows:
+                return [self._search_ivf(query, slots, k) for query in queries]
+            
+            return self._search_exact(queries, slots, k)
+    
+    def flush(self):
+        """Grava páginas alteradas no disco"""
+        with self._lock:
+            self._matrix.flush()
+    
+    def close(self):
+        """Grava e libera o mapeamento"""
+        with self._lock:
+            self._matrix.flush()
+            del self._matrix
+    
+    def _open(self, capacity: int):
+        """Mapeia o arquivo com `capacity` slots (estende o arquivo se preciso)"""
+        size = capacity * self.dim * 4
+        with open(self.path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+    
+    def _present_slots(self) -> np.ndarray:
+        """Slots com vetor (linhas não nulas), lidos em blocos"""
+        present = []
+        for start in range(0, self.capacity, 65536):
+            block = self._matrix[start:start + 65536]
+            present.append(np.flatnonzero(np.any(block != 0, axis=1)) + start)
+        return np.concatenate(present)
+    
+    def _grow(self, rows: int):
+        """Dobra a capacidade até comportar `rows` slots"""
+        if rows <= self.capacity:
+            return
+        
+        capacity = self.capacity
+        while capacity < rows:
+            capacity *= 2
+        
+        self._matrix.flush()
+        del self._matrix
+        self._open(capacity)
+        
+        if self._assignments is not None:
+            assignments = np.full(capacity, -1, dtype=np.int32)
+            assignments[:len(self._assignments)] = self._assignments
+            self._assignments = assignments
+    
+    def _search_exact(
+        self,
+        queries: np.ndarray,
+        slots: np.ndarray,
+        k: int
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Produto escalar contra todos os candidatos"""
+        bound = int(slots.max()) + 1
+        
+        # Muitos candidatos: uma multiplicação sequencial sobre o prefixo do
+        # arquivo sai mais barata que copiar as linhas por fancy indexing
+        if len(slots) * 4 >= bound:
+            scores = (self._matrix[:bound] @ queries.T)[slots]
+        else:
+            scores = self._matrix[slots] @ queries.T
+        
+        return [self._top_k(slots, scores[:, i], k) for i in range(len(queries))]
+    
+    def _search_ivf(
+        self,
+        query: np.ndarray,
+        slots: np.ndarray,
+        k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Busca restrita às listas mais próximas da query"""
+        probes = np.argsort(-(self._centroids @ query))[:self.ivf_probes]
+        candidates = slots[np.isin(self._assignments[slots], probes)]
+        if len(candidates) < k:
+            return self._search_exact(query[None, :], slots, k)[0]
+        
+        return self._top_k(candidates, self._matrix[candidates] @ query, k)
+    
+    def _maybe_train_ivf(self):
+        """Treina (ou re-treina) o IVF conforme o número de vetores"""
+        if self.count < self.ivf_min_rows:
+            return
+        if self._centroids is not None and self._rows_since_training < self._trained_rows:
+            return
+        
+        present = self._present_slots()
+        if len(present) < self.ivf_min_rows:
+            return
+        
+        n_lists = self.ivf_lists or int(np.sqrt(len(present)))
+        n_lists = max(1, min(n_lists, len(present)))
+        
+        rng = np.random.default_rng(0)
+        sample_size = min(len(present), n_lists * IVF_TRAIN_SAMPLES_PER_LIST)
+        sample = np.asarray(self._matrix[np.sort(rng.choice(present, sample_size, replace=False))])
+        
+        # k-means esférico: centróides normalizados, atribuição por cosseno
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(n_lists):
+                members = sample[labels == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = self._normalize(centroids)
+        
+        assignments = np.full(self.capacity, -1, dtype=np.int32)
+        for start in range(0, len(present), 65536):
+            chunk = present[start:start + 65536]
+            assignments[chunk] = np.argmax(self._matrix[chunk] @ centroids.T, axis=1)
+        
+        self._centroids = centroids
+        self._assignments = assignments
+        self._trained_rows = len(present)
+        self._rows_since_training = 0
+        self.logger.info(f"Trained IVF index for {self.path.name}: {n_lists} lists, {len(present)} vectors")
+    
+    @staticmethod
+    def _top_k(slots: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Seleciona os k maiores scores (argpartition + ordenação dos k)"""
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return slots[top], scores[top].astype(np.float32)
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """Normaliza linhas (vetores nulos continuam nulos)"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
@@ -25,12 +25,44 @@ class DatabaseConfig(BaseSettings):
     database: str = Field(default="npllm", env="DB_NAME")
     user: str = Field(default="npllm_user", env="DB_USER")
     password: str = Field(default="", env="DB_PASSWORD")
+    # Backend: "postgres" (PostgreSQL + pgvector) ou "sqlite" (arquivo local + vetores em memmap)
+    backend: str = Field(default="postgres", env="DB_BACKEND")
+    sqlite_path: str = "./data/npllm.db"
+    vector_path: str = "./data/vectors"
+    # Busca vetorial do backend sqlite: exata abaixo de ivf_min_rows vetores, IVF acima
+    ivf_lists: int = 0  # 0 = raiz quadrada do número de vetores
+    ivf_min_rows: int = 50000
+    ivf_probes: int = 8
     pool_size: int = 5
     max_overflow: int = 10
+    # Pool de conexões: espera máxima, conexões ociosas mínimas, idade máxima e teste antes do uso
+    pool_timeout: float = 30.0
+    pool_min_idle: int = 1
+    pool_recycle: int = 1800  # segundos, 0 = sem limite
+    pool_pre_ping: bool = True
     shared_buffers: str = "256MB"
     effective_cache_size: str = "1GB"
     work_mem: str = "16MB"
     maintenance_work_mem: str = "128MB"
+    # Driver do servidor da API: "psycopg" (psycopg 3 assíncrono) ou "psycopg2" (síncrono em thread pool)
+    driver: str = "psycopg"
+    # Índice vetorial: "vector" (float32), "halfvec" (float16) ou "binary" (bit + re-ranking)
+    vector_storage: str = "vector"
+    rerank_factor: int = 4
+    # Feedback particionado por mês, com retenção (opt-in: ativar migra a tabela existente)
+    feedback_partitioning: bool = False
+    feedback_partitions_ahead: int = 2
+    feedback_retention_months: int = 0  # 0 = mantém tudo
+    feedback_rollup_min_score: float = 0.7
+    # Manutenção no sono (opt-in): ANALYZE e REINDEX CONCURRENTLY de índices HNSW inchados
+    maintenance: bool = False
+    maintenance_time_budget_seconds: float = 600.0
+    analyze_threshold: float = 0.1  # Fração de linhas alteradas desde o último ANALYZE
+    reindex_bloat_ratio: float = 2.0  # Bytes por linha do índice vs. o menor valor medido
+    # Histogramas de latência por método e de espera no pool (ver StorageMetrics)
+    metrics: bool = True
+    # Invalidação de caches entre processos via LISTEN/NOTIFY (só backend postgres)
+    invalidation: bool = True
 
 
 class ModelConfig(BaseSettings):
@@ -44,6 +76,32 @@ class ModelConfig(BaseSettings):
     max_memory: str = "2GB"  # Reduzido para modelo menor
 
 
+class EmbeddingCacheConfig(BaseSettings):
+    """Embedding cache configuration"""
+    enabled: bool = True
+    memory_capacity: int = 10000  # Vetores no LRU em memória
+    disk_capacity: int = 100000  # Vetores por modelo no arquivo em disco (0 = só memória)
+    path: str = "./data/embedding_cache"
+
+
+class EmbeddingBatchingConfig(BaseSettings):
+    """Query embedding micro-batching configuration"""
+    enabled: bool = True
+    max_batch_size: int = 32  # Textos por lote
+    max_wait_ms: float = 5.0  # Espera máxima por outros textos após o primeiro
+
+
+class EmbeddingsConfig(BaseSettings):
+    """Embeddings configuration"""
+    provider: str = "sentence_transformers"  # Ou "sentence_transformers_int8" (CPU, int8)
+    model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    device: str = "cpu"
+    batch_size: int = 32  # Textos por chamada ao modelo de embeddings
+    warm_up: bool = False  # Carrega o modelo no startup em vez de no primeiro uso
+    cache: EmbeddingCacheConfig = EmbeddingCacheConfig()
+    micro_batching: EmbeddingBatchingConfig = EmbeddingBatchingConfig()
+
+
 class RAGConfig(BaseSettings):
     """RAG configuration (optimized: on-demand)"""
     enabled: bool = True
@@ -52,6 +110,34 @@ class RAGConfig(BaseSettings):
     chunk_overlap: int = 50
     top_k: int = 5
     similarity_threshold: float = 0.7
+    consolidation: Dict[str, Any] = {}
+    # Busca HNSW: compromisso recall vs. latência
+    recall_profile: str = "balanced"  # "fast", "balanced" ou "accurate"
+    ef_search: Optional[int] = None  # Sobrescreve o perfil se definido
+    iterative_scan: str = "relaxed_order"  # pgvector >= 0.8: "off", "strict_order", "relaxed_order"
+    max_scan_tuples: int = 20000
+    context_index_threshold: int = 1000
+    # Busca híbrida (full-text + vetorial) com reciprocal-rank fusion
+    hybrid_search: bool = True
+    hybrid_candidates: int = 50
+    rrf_k: int = 60
+
+
+class FeedbackBufferConfig(BaseSettings):
+    """Write-behind feedback buffer configuration"""
+    enabled: bool = True
+    max_size: int = 1000  # Feedbacks pendentes em memória; o excedente fica só em disco (.overflow)
+    batch_size: int = 100  # Grava ao atingir este número de feedbacks
+    flush_interval_seconds: float = 2.0  # Ou após este intervalo
+    spill_path: str = "./data/feedback_buffer.jsonl"
+    fsync: bool = True
+
+
+class FeedbackConfig(BaseSettings):
+    """Feedback configuration"""
+    implicit: Dict[str, Any] = {}
+    emotional: Dict[str, Any] = {}
+    buffer: FeedbackBufferConfig = FeedbackBufferConfig()
 
 
 class Config:
@@ -85,6 +171,8 @@ class Config:
     def _override_with_env(self):
         """Override config values with environment variables"""
         # Database config
+        if os.getenv("DB_BACKEND"):
+            self._config.setdefault("database", {})["backend"] = os.getenv("DB_BACKEND")
         if os.getenv("DB_HOST"):
             self._config.setdefault("database", {})["host"] = os.getenv("DB_HOST")
         if os.getenv("DB_PORT"):
@@ -125,11 +213,23 @@ class Config:
         model_config = self.get_section("model")
         return ModelConfig(**model_config)
     
+    @property
+    def embeddings(self) -> EmbeddingsConfig:
+        """Get embeddings configuration"""
+        embeddings_config = self.get_section("embeddings")
+        return EmbeddingsConfig(**embeddings_config)
+    
     @property
     def rag(self) -> RAGConfig:
         """Get RAG configuration"""
         rag_config = self.get_section("rag")
         return RAGConfig(**rag_config)
+    
+    @property
+    def feedback(self) -> FeedbackConfig:
+        """Get feedback configuration"""
+        feedback_config = self.get_section("feedback")
+        return FeedbackConfig(**feedback_config)
 
 
 # Global config instance
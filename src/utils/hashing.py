@@ -0,0 +1,20 @@
+"""
+Content hashing utilities
+"""
+
+import hashlib
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash de conteúdo usado para deduplicar chunks
+    
+    Equivale a `encode(sha256(convert_to(text, 'UTF8')), 'hex')` no PostgreSQL.
+    
+    Args:
+        text: Texto do chunk
+    
+    Returns:
+        SHA-256 hexadecimal
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
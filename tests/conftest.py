@@ -26,6 +26,45 @@ def mock_config():
     config.database.user = "test_user"
     config.database.password = "test_password"
     config.database.pool_size = 5
+    config.database.max_overflow = 10
+    config.database.pool_timeout = 30.0
+    config.database.pool_min_idle = 1
+    config.database.pool_recycle = 1800
+    config.database.pool_pre_ping = True
+    config.database.backend = "postgres"
+    config.database.sqlite_path = "./data/npllm.db"
+    config.database.vector_path = "./data/vectors"
+    config.database.ivf_lists = 0
+    config.database.ivf_min_rows = 50000
+    config.database.ivf_probes = 8
+    config.database.driver = "psycopg"
+    config.database.vector_storage = "vector"
+    config.database.rerank_factor = 4
+    config.database.feedback_partitioning = False
+    config.database.feedback_partitions_ahead = 2
+    config.database.feedback_retention_months = 0
+    config.database.feedback_rollup_min_score = 0.7
+    config.database.maintenance = False
+    config.database.maintenance_time_budget_seconds = 600.0
+    config.database.analyze_threshold = 0.1
+    config.database.reindex_bloat_ratio = 2.0
+    config.database.metrics = True
+    config.database.invalidation = True
+    config.embeddings.batch_size = 32
+    config.embeddings.device = "cpu"
+    config.embeddings.provider = "sentence_transformers"
+    config.embeddings.warm_up = False
+    config.embeddings.cache.enabled = False
+    config.embeddings.micro_batching.enabled = False
+    config.rag.recall_profile = "balanced"
+    config.rag.ef_search = None
+    config.rag.iterative_scan = "relaxed_order"
+    config.rag.max_scan_tuples = 20000
+    config.rag.context_index_threshold = 1000
+    config.rag.hybrid_search = True
+    config.rag.hybrid_candidates = 50
+    config.rag.rrf_k = 60
+    config.feedback.buffer.enabled = False
     return config
 
 
@@ -90,4 +90,18 @@ class TestAdapterManager:
                 
                 assert adapter is not None
                 assert adapter.get_context() == "python"
+    
+    def test_invalidate_forgets_cached_adapters(self, mock_config):
+        """Test invalidated adapters are reloaded from disk on next use"""
+        manager = AdapterManager(MagicMock())
+        manager._loaded_models = {"python": MagicMock(), "odoo": MagicMock()}
+        manager._current_adapter = "python"
+        
+        manager.invalidate("odoo")
+        assert set(manager._loaded_models) == {"python"}
+        assert manager._current_adapter == "python"
+        
+        manager.invalidate()
+        assert manager._loaded_models == {}
+        assert manager._current_adapter is None
 
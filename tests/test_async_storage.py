@@ -0,0 +1,86 @@
+"""
+Tests for async PostgreSQL Storage
+"""
+
+import asyncio
+import pytest
+from unittest.mock import MagicMock, AsyncMock, patch
+import numpy as np
+from src.storage.async_postgres import AsyncPostgreSQLStorage
+
+
+def _mock_connection(mock_pool, rows):
+    """Configura pool assíncrono mockado que devolve `rows`"""
+    mock_cursor = MagicMock()
+    mock_cursor.execute = AsyncMock()
+    mock_cursor.fetchall = AsyncMock(return_value=rows)
+    mock_cursor.fetchone = AsyncMock(return_value=rows[0] if rows else None)
+    mock_cursor.close = AsyncMock()
+    
+    mock_conn = MagicMock()
+    mock_conn.closed = False
+    mock_conn.cursor.return_value = mock_cursor
+    mock_conn.commit = AsyncMock()
+    mock_conn.rollback = AsyncMock()
+    
+    pool = mock_pool.return_value
+    pool.open = AsyncMock()
+    pool.close = AsyncMock()
+    pool.getconn = AsyncMock(return_value=mock_conn)
+    pool.putconn = AsyncMock()
+    return mock_conn, mock_cursor
+
+
+class TestAsyncPostgreSQLStorage:
+    """Test suite for AsyncPostgreSQLStorage"""
+    
+    def test_open_detects_pgvector_version(self, mock_config):
+        """Test pool is opened with the pgvector configure hook and version is detected"""
+        with patch('src.storage.async_postgres.get_config', return_value=mock_config):
+            with patch('src.storage.async_postgres.AsyncConnectionPool') as mock_pool:
+                _mock_connection(mock_pool, [("0.8.0",)])
+                
+                storage = AsyncPostgreSQLStorage()
+                asyncio.run(storage.open())
+                
+                assert storage.pgvector_version == (0, 8, 0)
+                assert mock_pool.call_args.kwargs["configure"] is not None
+                assert mock_pool.call_args.kwargs["open"] is False
+                mock_pool.return_value.open.assert_awaited_once()
+    
+    def test_search_course_content_hybrid(self, mock_config):
+        """Test async hybrid search returns the same shape as the sync backend"""
+        with patch('src.storage.async_postgres.get_config', return_value=mock_config):
+            with patch('src.storage.async_postgres.AsyncConnectionPool') as mock_pool:
+                mock_conn, mock_cursor = _mock_connection(mock_pool, [
+                    (10, "A", "content a", 0, {"title": "A"}, 0.9, 0.032)
+                ])
+                
+                storage = AsyncPostgreSQLStorage()
+                results = asyncio.run(storage.search_course_content_hybrid(
+                    course_id=1,
+                    query_text="res.partner",
+                    query_embedding=np.random.rand(384),
+                    top_k=1
+                ))
+                
+                assert results[0]["id"] == 10
+                assert results[0]["metadata"] == {"title": "A"}
+                assert results[0]["rrf_score"] == pytest.approx(0.032)
+                # ef_search da transação + consulta
+                assert mock_cursor.execute.await_count == 2
+                mock_pool.return_value.putconn.assert_awaited_once_with(mock_conn)
+    
+    def test_connection_released_on_error(self, mock_config):
+        """Test connection is rolled back and returned to the pool when a query fails"""
+        with patch('src.storage.async_postgres.get_config', return_value=mock_config):
+            with patch('src.storage.async_postgres.AsyncConnectionPool') as mock_pool:
+                mock_conn, mock_cursor = _mock_connection(mock_pool, [])
+                mock_cursor.execute.side_effect = RuntimeError("connection lost")
+                
+                storage = AsyncPostgreSQLStorage()
+                with pytest.raises(RuntimeError):
+                    asyncio.run(storage.store_course("c", "d", "text", "x"))
+                
+                mock_conn.rollback.assert_awaited_once()
+                mock_pool.return_value.putconn.assert_awaited_once_with(mock_conn)
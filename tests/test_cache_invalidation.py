@@ -0,0 +1,131 @@
+"""
+Tests for cross-process cache invalidation
+"""
+
+import json
+import socket
+import time
+from collections import namedtuple
+import psycopg2
+from unittest.mock import MagicMock, patch
+from src.storage.invalidation import InvalidationListener, ALL_SCOPES
+
+
+Notify = namedtuple("Notify", ["channel", "payload"])
+
+
+class FakeListenConnection:
+    """Conexão falsa de LISTEN: notify() acorda o select como o servidor faria"""
+    
+    def __init__(self):
+        self._reader, self._writer = socket.socketpair()
+        self._pending = []
+        self.notifies = []
+        self.broken = False
+        self.closed = 0
+        self.autocommit = False
+    
+    def fileno(self):
+        return self._reader.fileno()
+    
+    def cursor(self):
+        return MagicMock()
+    
+    def notify(self, payload: str):
+        self._pending.append(Notify("npllm_invalidation", payload))
+        self._writer.send(b"x")
+    
+    def drop(self):
+        self.broken = True
+        self._writer.send(b"x")
+    
+    def poll(self):
+        self._reader.recv(1024)
+        if self.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.notifies.extend(self._pending)
+        self._pending.clear()
+    
+    def close(self):
+        self.closed = 1
+        self._reader.close()
+        self._writer.close()
+
+
+def wait_for(condition, timeout=3.0):
+    """Espera a condição ficar verdadeira"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestInvalidationListener:
+    """Test suite for InvalidationListener"""
+    
+    def test_dispatch_routes_by_scope(self):
+        """Test events reach scope and wildcard subscribers, once each"""
+        listener = InvalidationListener(MagicMock())
+        courses, adapters, everything = [], [], []
+        listener.subscribe(["courses", "course_content"], lambda scope, payload: courses.append(scope))
+        listener.subscribe(["adapters"], lambda scope, payload: adapters.append(payload))
+        listener.subscribe([ALL_SCOPES], lambda scope, payload: everything.append(scope))
+        
+        listener.dispatch("course_content", {"op": "INSERT"})
+        listener.dispatch("adapters", {"adapter": "python"})
+        listener.dispatch(ALL_SCOPES)
+        
+        assert courses == ["course_content", ALL_SCOPES]
+        assert adapters == [{"adapter": "python"}, {}]
+        assert everything == ["course_content", "adapters", ALL_SCOPES]
+    
+    def test_callback_errors_do_not_stop_dispatch(self):
+        """Test a failing subscriber doesn't block the others"""
+        listener = InvalidationListener(MagicMock())
+        received = []
+        listener.subscribe(["courses"], MagicMock(side_effect=RuntimeError("boom")))
+        listener.subscribe(["courses"], lambda scope, payload: received.append(scope))
+        
+        listener.dispatch("courses", {})
+        
+        assert received == ["courses"]
+    
+    def test_notifications_are_dispatched(self):
+        """Test NOTIFY payloads are parsed and delivered by the listener thread"""
+        conn = FakeListenConnection()
+        listener = InvalidationListener(lambda: conn)
+        received = []
+        listener.subscribe(["learned_concepts"], lambda scope, payload: received.append(payload))
+        
+        assert listener.start()
+        assert conn.autocommit is True
+        conn.notify(json.dumps({"scope": "learned_concepts", "op": "DELETE"}))
+        conn.notify(json.dumps({"scope": "feedback", "op": "INSERT"}))
+        
+        assert wait_for(lambda: listener.events_received == 2)
+        listener.stop()
+        
+        assert received == [{"scope": "learned_concepts", "op": "DELETE"}]
+        assert conn.closed
+    
+    def test_reconnect_invalidates_everything(self):
+        """Test a dropped connection is reopened and every cache is invalidated"""
+        connections = [FakeListenConnection(), FakeListenConnection()]
+        connect = MagicMock(side_effect=connections)
+        listener = InvalidationListener(connect)
+        received = []
+        listener.subscribe(["adapters"], lambda scope, payload: received.append(scope))
+        
+        with patch("src.storage.invalidation.RECONNECT_DELAY_SECONDS", 0.01):
+            assert listener.start()
+            connections[0].drop()
+            assert wait_for(lambda: received == [ALL_SCOPES])
+            
+            connections[1].notify(json.dumps({"scope": "adapters"}))
+            assert wait_for(lambda: received == [ALL_SCOPES, "adapters"])
+            listener.stop()
+        
+        assert connect.call_count == 2
+        assert connections[0].closed and connections[1].closed
@@ -0,0 +1,174 @@
+"""
+Tests for the managed connection pool
+"""
+
+import threading
+import time
+import pytest
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from unittest.mock import MagicMock, patch
+from src.storage.pool import ManagedConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Conexão falsa: `alive` False simula servidor reiniciado"""
+    
+    def __init__(self):
+        self.closed = 0
+        self.alive = True
+        self.autocommit = False
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+    
+    def get_transaction_status(self):
+        return self.status
+    
+    def rollback(self):
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+    
+    def commit(self):
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+    
+    def cursor(self):
+        cursor = MagicMock()
+        if not self.alive:
+            cursor.execute.side_effect = psycopg2.OperationalError("server closed the connection")
+        return cursor
+    
+    def close(self):
+        self.closed = 1
+
+
+def _pool(**kwargs):
+    """Pool com conexões falsas e a lista de conexões abertas"""
+    opened = []
+    
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+    
+    return ManagedConnectionPool(connect, **kwargs), opened
+
+
+class TestManagedConnectionPool:
+    """Test suite for ManagedConnectionPool"""
+    
+    def test_warm_pool_and_overflow(self):
+        """Test min_idle connections are opened up front and overflow is closed on return"""
+        pool, opened = _pool(pool_size=2, max_overflow=1, min_idle=2)
+        assert pool.stats()["idle"] == 2
+        
+        conns = [pool.getconn() for _ in range(3)]
+        assert len(opened) == 3
+        for conn in conns:
+            pool.putconn(conn)
+        
+        stats = pool.stats()
+        assert stats["size"] == 2
+        assert stats["idle"] == 2
+        assert sum(conn.closed for conn in opened) == 1
+        pool.closeall()
+    
+    def test_waits_for_returned_connection_then_times_out(self):
+        """Test getconn waits in line for a returned connection and raises PoolTimeout when none comes"""
+        pool, _ = _pool(pool_size=1, max_overflow=0, timeout=0.1)
+        conn = pool.getconn()
+        
+        with pytest.raises(PoolTimeout):
+            pool.getconn()
+        
+        received = []
+        waiter = threading.Thread(target=lambda: received.append(pool.getconn(timeout=5)))
+        waiter.start()
+        time.sleep(0.05)
+        pool.putconn(conn)
+        waiter.join()
+        
+        assert received == [conn]
+        assert pool.stats()["timeouts"] == 1
+        pool.closeall()
+    
+    def test_waiters_are_served_in_order(self):
+        """Test connections are handed to waiters first come, first served"""
+        pool, _ = _pool(pool_size=1, max_overflow=0, min_idle=1)
+        conn = pool.getconn()
+        order = []
+        
+        def worker(i):
+            c = pool.getconn(timeout=5)
+            order.append(i)
+            pool.putconn(c)
+        
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        pool.putconn(conn)
+        for thread in threads:
+            thread.join()
+        
+        assert order == [0, 1, 2, 3]
+        pool.closeall()
+    
+    def test_pre_ping_replaces_dead_connection(self):
+        """Test an idle connection killed by a server restart is replaced on checkout"""
+        pool, opened = _pool(pool_size=2, min_idle=1)
+        dead = opened[0]
+        dead.alive = False
+        
+        with patch('src.storage.pool.PRE_PING_IDLE_SECONDS', 0):
+            conn = pool.getconn()
+        
+        assert conn is not dead
+        assert dead.closed
+        assert not conn.autocommit
+        pool.putconn(conn)
+        pool.closeall()
+    
+    def test_configure_runs_on_recycled_connection(self):
+        """Test every new connection is configured, including the one replacing a recycled connection"""
+        configure = MagicMock()
+        pool, opened = _pool(pool_size=1, min_idle=1, recycle=0.05, configure=configure)
+        first = opened[0]
+        configure.assert_called_once_with(first)
+        
+        time.sleep(0.1)
+        conn = pool.getconn()
+        
+        assert conn is not first
+        assert first.closed
+        assert configure.call_args_list[-1].args == (conn,)
+        assert all(call.args[0] in opened for call in configure.call_args_list)
+        pool.putconn(conn)
+        pool.closeall()
+    
+    def test_failed_configure_closes_connection(self):
+        """Test a connection whose configure step fails is closed and the error raised"""
+        pool, opened = _pool(pool_size=1, min_idle=0, configure=MagicMock(side_effect=psycopg2.ProgrammingError("type vector not found")))
+        
+        with pytest.raises(psycopg2.ProgrammingError):
+            pool.getconn()
+        
+        assert opened[0].closed
+        assert pool.stats()["size"] == 0
+        pool.closeall()
+    
+    def test_putconn_rolls_back_and_discards_broken(self):
+        """Test open transactions are rolled back and broken connections are closed"""
+        pool, _ = _pool(pool_size=2)
+        conn = pool.getconn()
+        conn.status = extensions.TRANSACTION_STATUS_INTRANS
+        pool.putconn(conn)
+        assert conn.status == extensions.TRANSACTION_STATUS_IDLE
+        assert not conn.closed
+        
+        conn = pool.getconn()
+        conn.status = extensions.TRANSACTION_STATUS_UNKNOWN
+        pool.putconn(conn)
+        assert conn.closed
+        assert pool.stats()["size"] == 0
+        
+        pool.closeall()
+        with pytest.raises(PoolError):
+            pool.getconn()
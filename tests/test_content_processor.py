@@ -0,0 +1,124 @@
+"""
+Tests for ContentProcessor
+"""
+
+import threading
+import numpy as np
+from unittest.mock import MagicMock
+from src.learning.content_processor import ContentProcessor
+from src.models.embedding_cache import EmbeddingCache
+from src.models.embedding_registry import EmbeddingModelRegistry
+from src.utils.hashing import content_hash
+
+
+DIM = 384
+
+
+def fake_encode(texts, batch_size=32):
+    """Embedding determinístico por texto (float64, como alguns modelos)"""
+    return np.array([np.full(DIM, len(text), dtype=np.float64) for text in texts])
+
+
+def make_processor(batch_size=8):
+    """ContentProcessor com modelo falso"""
+    model = MagicMock()
+    model.encode.side_effect = fake_encode
+    registry = EmbeddingModelRegistry(loader=lambda model_name, device, provider: model)
+    return ContentProcessor(embedding_model="fake-model", batch_size=batch_size, registry=registry)
+
+
+class TestContentProcessor:
+    """Test suite for ContentProcessor"""
+    
+    def test_documents_are_encoded_in_one_batched_call(self):
+        """Test chunks of every document go to the model together, in configured batches"""
+        processor = make_processor(batch_size=8)
+        documents = [
+            {"content": "first document", "metadata": {"title": "a"}},
+            {"content": "second document, longer", "metadata": {"title": "b"}},
+            {"content": "first document", "metadata": {"title": "c"}}
+        ]
+        
+        chunks = processor.process_documents(documents, course_id=1)
+        
+        encode = processor.embedding_model.encode
+        assert encode.call_count == 1
+        assert encode.call_args.args[0] == ["first document", "second document, longer"]
+        assert encode.call_args.kwargs["batch_size"] == 8
+        
+        assert [chunk["metadata"]["title"] for chunk in chunks] == ["a", "b", "c"]
+        assert all(chunk["chunk_index"] == 0 for chunk in chunks)
+        np.testing.assert_array_equal(chunks[2]["embedding"], chunks[0]["embedding"])
+    
+    def test_embeddings_share_one_contiguous_float32_matrix(self):
+        """Test each chunk embedding is a row view of a single (n, dim) float32 array"""
+        processor = make_processor()
+        
+        chunks = processor.process_documents(
+            [{"content": "alpha"}, {"content": "beta gamma"}],
+            course_id=1
+        )
+        
+        matrix = chunks[0]["embedding"].base
+        assert matrix is not None
+        assert all(chunk["embedding"].base is matrix for chunk in chunks)
+        assert matrix.shape == (2, DIM)
+        assert matrix.dtype == np.float32
+        assert matrix.flags["C_CONTIGUOUS"]
+    
+    def test_known_hashes_skip_the_model(self):
+        """Test embeddings found by hash are reused and only new chunks are encoded"""
+        processor = make_processor()
+        stored = np.full(DIM, 7.0, dtype=np.float32)
+        lookup = MagicMock(return_value={content_hash("stored chunk"): stored})
+        
+        chunks = processor.process_content("stored chunk", course_id=1, embedding_lookup=lookup)
+        chunks += processor.process_content("new chunk", course_id=1, embedding_lookup=lookup)
+        
+        processor.embedding_model.encode.assert_called_once()
+        assert processor.embedding_model.encode.call_args.args[0] == ["new chunk"]
+        np.testing.assert_array_equal(chunks[0]["embedding"], stored)
+        assert chunks[1]["embedding"][0] == len("new chunk")
+    
+    def test_empty_documents(self):
+        """Test documents without content produce no chunks and no model calls"""
+        processor = make_processor()
+        
+        assert processor.process_documents([{"content": "   "}], course_id=1) == []
+        processor.embedding_model.encode.assert_not_called()
+    
+    def test_cache_and_stored_embeddings_skip_the_model(self):
+        """Test cached texts and stored chunks are not re-encoded, and new ones are cached"""
+        processor = make_processor()
+        processor.cache = EmbeddingCache()
+        stored = np.full(DIM, 7.0, dtype=np.float32)
+        lookup = MagicMock(return_value={content_hash("stored chunk"): stored})
+        
+        first = processor.generate_embeddings(["query", "stored chunk"], embedding_lookup=lookup)
+        second = processor.generate_embedding("query")
+        
+        processor.embedding_model.encode.assert_called_once()
+        assert processor.embedding_model.encode.call_args.args[0] == ["query"]
+        np.testing.assert_array_equal(first[1], stored)
+        np.testing.assert_array_equal(second, first[0])
+        assert processor.cache.get_stats()["memory_hits"] == 1
+    
+    def test_micro_batching_groups_concurrent_queries(self):
+        """Test generate_embedding calls from concurrent threads share model calls"""
+        processor = make_processor(batch_size=32)
+        processor.enable_micro_batching(max_batch_size=32, max_wait_ms=50)
+        results = {}
+        
+        def worker(i):
+            results[i] = processor.generate_embedding("q" * i)
+        
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 11)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        processor.batcher.stop()
+        
+        assert {i: results[i][0] for i in results} == {i: float(i) for i in range(1, 11)}
+        assert all(results[i].shape == (DIM,) for i in results)
+        assert processor.embedding_model.encode.call_count < 10
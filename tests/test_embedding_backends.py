@@ -0,0 +1,114 @@
+"""
+Tests for embedding backends
+"""
+
+import numpy as np
+import pytest
+import torch
+from huggingface_hub import try_to_load_from_cache
+from transformers import BertConfig, BertModel, BertTokenizer
+from sentence_transformers import SentenceTransformer, models
+from src.models.embedding_backends import (
+    EMBEDDING_PROVIDERS,
+    QuantizedSentenceTransformerEmbedding,
+    create_embedding_model
+)
+
+
+MINILM = "sentence-transformers/all-MiniLM-L6-v2"
+WORDS = (
+    "def class return import self if else for while data model query code "
+    "function value list dict string error test cache user index vector"
+).split()
+
+
+def sample_texts(n=32, length=60, seed=0):
+    """Frases aleatórias do vocabulário"""
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, length)) for _ in range(n)]
+
+
+def cosine(a, b):
+    """Similaridade de cosseno linha a linha"""
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+@pytest.fixture(scope="module")
+def tiny_model_path(tmp_path_factory):
+    """SentenceTransformer pequeno (BERT aleatório) salvo localmente, sem download"""
+    root = tmp_path_factory.mktemp("tiny_minilm")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS
+    (root / "vocab.txt").write_text("\n".join(vocab))
+    
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        intermediate_size=256
+    )
+    BertModel(config).save_pretrained(root / "bert")
+    BertTokenizer(str(root / "vocab.txt")).save_pretrained(root / "bert")
+    
+    transformer = models.Transformer(str(root / "bert"), max_seq_length=128)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension(), "mean")
+    SentenceTransformer(modules=[transformer, pooling, models.Normalize()]).save(str(root / "model"))
+    return str(root / "model")
+
+
+def assert_parity(model_name, min_cosine):
+    """int8 concorda com float32 (cosseno por texto)"""
+    fp32 = create_embedding_model(model_name, "cpu", "sentence_transformers")
+    int8 = create_embedding_model(model_name, "cpu", "sentence_transformers_int8")
+    texts = sample_texts()
+    
+    expected = fp32.encode(texts, batch_size=8)
+    actual = int8.encode(texts, batch_size=8)
+    
+    assert actual.shape == expected.shape == (len(texts), fp32.get_embedding_dim())
+    assert actual.dtype == np.float32
+    assert cosine(expected, actual).min() > min_cosine
+
+
+class TestEmbeddingBackends:
+    """Test suite for embedding backends"""
+    
+    def test_providers_implement_the_interface(self, tiny_model_path):
+        """Test every provider returns float32 (n, dim) arrays and its metadata"""
+        for provider in EMBEDDING_PROVIDERS:
+            model = create_embedding_model(tiny_model_path, "cpu", provider)
+            embeddings = model.encode(["def foo", "class bar", "return"], batch_size=2)
+            
+            assert embeddings.shape == (3, 64)
+            assert embeddings.dtype == np.float32
+            assert embeddings.flags["C_CONTIGUOUS"]
+            assert model.get_embedding_dim() == 64
+            assert model.get_model_name() == tiny_model_path
+    
+    def test_int8_quantizes_linear_layers(self, tiny_model_path):
+        """Test the int8 backend swaps Linear layers for dynamically quantized ones"""
+        model = QuantizedSentenceTransformerEmbedding(tiny_model_path)
+        
+        modules = list(model.model.modules())
+        assert any(isinstance(module, torch.ao.nn.quantized.dynamic.Linear) for module in modules)
+        assert not any(type(module) is torch.nn.Linear for module in modules)
+    
+    def test_int8_parity_with_fp32(self, tiny_model_path):
+        """Test int8 embeddings agree with the float32 model"""
+        assert_parity(tiny_model_path, min_cosine=0.99)
+    
+    @pytest.mark.skipif(
+        not isinstance(try_to_load_from_cache(MINILM, "config.json"), str),
+        reason="all-MiniLM-L6-v2 not in the local Hugging Face cache"
+    )
+    def test_int8_parity_with_fp32_minilm(self):
+        """Test int8 MiniLM embeddings agree with the float32 MiniLM"""
+        assert_parity(MINILM, min_cosine=0.98)
+    
+    def test_unknown_provider(self):
+        """Test unsupported providers and devices are rejected"""
+        with pytest.raises(ValueError, match="Unknown embedding provider"):
+            create_embedding_model(MINILM, "cpu", "codebert")
+        with pytest.raises(ValueError, match="only runs on CPU"):
+            create_embedding_model(MINILM, "cuda", "sentence_transformers_int8")
@@ -0,0 +1,113 @@
+"""
+Tests for the embedding micro-batcher
+"""
+
+import asyncio
+import threading
+import numpy as np
+import pytest
+from src.models.embedding_batcher import EmbeddingMicroBatcher
+
+
+class RecordingEmbedder:
+    """embed_fn falso: embedding = [tamanho do texto], registra os lotes"""
+    
+    def __init__(self, error=None):
+        self.batches = []
+        self.threads = set()
+        self.error = error
+    
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.threads.add(threading.current_thread().name)
+        if self.error:
+            raise self.error
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+
+class TestEmbeddingMicroBatcher:
+    """Test suite for EmbeddingMicroBatcher"""
+    
+    def test_concurrent_texts_share_one_batch(self):
+        """Test texts submitted within the window are embedded together, each caller getting its row"""
+        embedder = RecordingEmbedder()
+        batcher = EmbeddingMicroBatcher(embedder, max_batch_size=8, max_wait_ms=500)
+        texts = ["a" * (i + 1) for i in range(5)]
+        
+        futures = [batcher.submit(text) for text in texts]
+        results = [future.result(timeout=5) for future in futures]
+        batcher.stop()
+        
+        assert embedder.batches == [texts]
+        assert [float(result[0]) for result in results] == [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert embedder.threads == {"embedding-batcher"}
+        assert batcher.get_stats()["mean_batch_size"] == 5
+    
+    def test_full_batches_do_not_wait(self):
+        """Test max_batch_size splits the queue and a full batch runs before the window ends"""
+        embedder = RecordingEmbedder()
+        batcher = EmbeddingMicroBatcher(embedder, max_batch_size=4, max_wait_ms=60000)
+        
+        futures = [batcher.submit(str(i)) for i in range(8)]
+        for future in futures:
+            future.result(timeout=5)
+        batcher.stop()
+        
+        assert [len(batch) for batch in embedder.batches] == [4, 4]
+        assert batcher.get_stats()["largest_batch"] == 4
+    
+    def test_threads_calling_embed(self):
+        """Test blocking embed() from many threads returns every caller's own vector"""
+        embedder = RecordingEmbedder()
+        batcher = EmbeddingMicroBatcher(embedder, max_batch_size=16, max_wait_ms=50)
+        results = {}
+        
+        def worker(i):
+            results[i] = float(batcher.embed("x" * i, timeout=5)[0])
+        
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 17)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.stop()
+        
+        assert results == {i: float(i) for i in range(1, 17)}
+        assert len(embedder.batches) < 16
+    
+    def test_async_callers(self):
+        """Test asyncio callers await the future without a thread pool"""
+        embedder = RecordingEmbedder()
+        batcher = EmbeddingMicroBatcher(embedder, max_batch_size=8, max_wait_ms=50)
+        
+        async def main():
+            return await asyncio.gather(*(asyncio.wrap_future(batcher.submit(t)) for t in ["ab", "abc"]))
+        
+        results = asyncio.run(main())
+        batcher.stop()
+        
+        assert [float(result[0]) for result in results] == [2.0, 3.0]
+        assert embedder.batches == [["ab", "abc"]]
+    
+    def test_errors_reach_every_caller_in_the_batch(self):
+        """Test an encoder failure is raised by each future of the batch"""
+        batcher = EmbeddingMicroBatcher(RecordingEmbedder(error=RuntimeError("boom")), max_wait_ms=100)
+        
+        futures = [batcher.submit("a"), batcher.submit("b")]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="boom"):
+                future.result(timeout=5)
+        batcher.stop()
+    
+    def test_stop_drains_queue_then_runs_inline(self):
+        """Test stop() resolves pending texts and later submissions run in the caller's thread"""
+        embedder = RecordingEmbedder()
+        batcher = EmbeddingMicroBatcher(embedder, max_wait_ms=60000)
+        
+        pending = batcher.submit("abc")
+        batcher.stop()
+        assert float(pending.result(timeout=5)[0]) == 3.0
+        
+        assert float(batcher.embed("abcd")[0]) == 4.0
+        assert embedder.batches == [["abc"], ["abcd"]]
+        assert threading.current_thread().name in embedder.threads
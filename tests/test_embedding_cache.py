@@ -0,0 +1,121 @@
+"""
+Tests for the embedding cache
+"""
+
+import multiprocessing
+import numpy as np
+import pytest
+from src.models.embedding_cache import EmbeddingCache, fcntl, text_key
+
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def vectors(n, dim=8, seed=0):
+    """Vetores float32 aleatórios"""
+    return np.random.default_rng(seed).random((n, dim), dtype=np.float32)
+
+
+def _vector_for(text):
+    """Vetor (32,) determinístico e distinto por texto"""
+    return np.frombuffer(text_key(text), dtype=np.uint8).astype(np.float32)
+
+
+def _write_disk_entries(path, worker):
+    """Processo que grava 200 entradas no arquivo compartilhado, uma a uma"""
+    cache = EmbeddingCache(memory_capacity=0, disk_path=path, disk_capacity=1000)
+    for i in range(200):
+        text = f"w{worker}-{i}"
+        cache.put(MODEL, text, _vector_for(text))
+    cache.close()
+
+
+class TestEmbeddingCache:
+    """Test suite for EmbeddingCache"""
+    
+    def test_memory_tier_is_lru(self):
+        """Test the least recently used entry is evicted and counters track lookups"""
+        cache = EmbeddingCache(memory_capacity=2)
+        v = vectors(3)
+        cache.put_many(MODEL, ["a", "b"], v[:2])
+        
+        assert cache.get(MODEL, "a") is not None
+        cache.put(MODEL, "c", v[2])
+        
+        assert cache.get_many(MODEL, ["b", "a", "c"])[0] is None
+        np.testing.assert_array_equal(cache.get(MODEL, "c"), v[2])
+        
+        stats = cache.get_stats()
+        assert stats["memory_hits"] == 4
+        assert stats["misses"] == 1
+        assert stats["memory_evictions"] == 1
+        assert stats["memory_size"] == 2
+    
+    def test_keys_use_model_and_normalized_text(self):
+        """Test whitespace differences share an entry while models don't"""
+        cache = EmbeddingCache()
+        cache.put(MODEL, "def  foo():\n    pass", vectors(1)[0])
+        
+        assert cache.get(MODEL, " def foo(): pass ") is not None
+        assert cache.get("other-model", "def foo(): pass") is None
+    
+    def test_returned_vectors_are_read_only(self):
+        """Test callers can't corrupt cached vectors in place"""
+        cache = EmbeddingCache()
+        cache.put(MODEL, "a", vectors(1)[0])
+        
+        with pytest.raises(ValueError):
+            cache.get(MODEL, "a")[0] = 1.0
+    
+    def test_disk_tier_survives_reopen(self, tmp_path):
+        """Test vectors written to disk are found by a new cache and promoted to memory"""
+        v = vectors(3)
+        cache = EmbeddingCache(memory_capacity=10, disk_path=str(tmp_path), disk_capacity=2)
+        cache.put_many(MODEL, ["a", "b", "c"], v)
+        assert cache.get_stats()["disk_evictions"] == 1
+        cache.close()
+        
+        reopened = EmbeddingCache(memory_capacity=10, disk_path=str(tmp_path), disk_capacity=2)
+        found = reopened.get_many(MODEL, ["a", "b", "c"])
+        
+        assert found[0] is None
+        np.testing.assert_array_equal(found[1], v[1])
+        np.testing.assert_array_equal(found[2], v[2])
+        
+        reopened.get(MODEL, "b")
+        stats = reopened.get_stats()
+        assert stats["disk_hits"] == 2
+        assert stats["memory_hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["disk_size"] == 2
+    
+    def test_disk_slot_overwritten_elsewhere_is_a_miss(self, tmp_path):
+        """Test a slot reused by another process isn't returned for the old text"""
+        first = EmbeddingCache(memory_capacity=0, disk_path=str(tmp_path), disk_capacity=1)
+        second = EmbeddingCache(memory_capacity=0, disk_path=str(tmp_path), disk_capacity=1)
+        v = vectors(2)
+        
+        first.put(MODEL, "a", v[0])
+        second.put(MODEL, "b", v[1])
+        
+        assert first.get(MODEL, "a") is None
+    
+    @pytest.mark.skipif(fcntl is None, reason="requires fcntl")
+    def test_disk_tier_shared_by_processes(self, tmp_path):
+        """Test concurrent writers neither mix keys and vectors nor overwrite each other's entries"""
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=_write_disk_entries, args=(str(tmp_path), worker)) for worker in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+            assert worker.exitcode == 0
+        
+        cache = EmbeddingCache(memory_capacity=0, disk_path=str(tmp_path), disk_capacity=1000)
+        texts = [f"w{worker}-{i}" for worker in range(4) for i in range(200)]
+        found = cache.get_many(MODEL, texts)
+        
+        assert all(vector is not None for vector in found)
+        for text, vector in zip(texts, found):
+            np.testing.assert_array_equal(vector, _vector_for(text))
+        assert cache.get_stats()["disk_size"] == 800
@@ -0,0 +1,75 @@
+"""
+Tests for the embedding model registry
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock
+from src.learning.content_processor import ContentProcessor
+from src.models.embedding_registry import EmbeddingModelRegistry
+
+
+def slow_loader(calls):
+    """Loader que demora, para expor carregamentos concorrentes"""
+    def load(model_name, device, provider):
+        calls.append((model_name, device))
+        time.sleep(0.05)
+        return MagicMock(name=f"{model_name}@{device}")
+    return load
+
+
+class TestEmbeddingModelRegistry:
+    """Test suite for EmbeddingModelRegistry"""
+    
+    def test_concurrent_gets_load_once(self):
+        """Test threads asking for the same model share one load"""
+        calls = []
+        registry = EmbeddingModelRegistry(loader=slow_loader(calls))
+        models = []
+        
+        threads = [
+            threading.Thread(target=lambda: models.append(registry.get("mini", "cpu")))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert calls == [("mini", "cpu")]
+        assert len(models) == 8
+        assert all(model is models[0] for model in models)
+    
+    def test_models_are_keyed_by_name_and_device(self):
+        """Test each (model, device) pair is loaded separately and can be unloaded"""
+        calls = []
+        registry = EmbeddingModelRegistry(loader=slow_loader(calls))
+        
+        registry.warm_up(["mini", "other"], "cpu")
+        registry.get("mini", "cuda")
+        registry.get("mini", "cpu")
+        
+        assert calls == [("mini", "cpu"), ("other", "cpu"), ("mini", "cuda")]
+        assert sorted(registry.loaded_models()) == [
+            ("mini", "cpu", "sentence_transformers"),
+            ("mini", "cuda", "sentence_transformers"),
+            ("other", "cpu", "sentence_transformers")
+        ]
+        
+        registry.unload("other", "cpu")
+        assert not registry.is_loaded("other", "cpu")
+        registry.get("other", "cpu")
+        assert calls[-1] == ("other", "cpu")
+    
+    def test_content_processor_loads_lazily(self):
+        """Test ContentProcessor only loads its model on first use, shared across instances"""
+        calls = []
+        registry = EmbeddingModelRegistry(loader=slow_loader(calls))
+        
+        first = ContentProcessor(embedding_model="mini", registry=registry)
+        second = ContentProcessor(embedding_model="mini", registry=registry)
+        assert calls == []
+        
+        first.warm_up()
+        assert second.embedding_model is first.embedding_model
+        assert calls == [("mini", "cpu")]
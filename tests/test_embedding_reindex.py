@@ -0,0 +1,56 @@
+"""
+Tests for blue-green embedding re-index job
+"""
+
+from unittest.mock import Mock
+import numpy as np
+from src.storage.reindex import EmbeddingReindexJob
+
+
+def _embed(texts):
+    return np.zeros((len(texts), 8))
+
+
+class TestEmbeddingReindexJob:
+    """Test suite for EmbeddingReindexJob"""
+    
+    def test_run_embeds_indexes_and_activates(self):
+        """Test job re-embeds every table, builds indexes, catches up and activates"""
+        storage = Mock()
+        # Cada tabela: um lote cheio e um parcial; depois do build, nada novo
+        storage.reembed_batch.side_effect = [2, 1, 2, 0, 1] + [0, 0, 0]
+        storage.activate_embedding_version.return_value = {"active": "v2", "retired": "v1"}
+        on_activated = Mock()
+        
+        job = EmbeddingReindexJob(storage, "v2", _embed, batch_size=2, on_activated=on_activated)
+        status = job.run()
+        
+        assert status["state"] == "completed"
+        assert status["rows_processed"] == 6
+        storage.build_embedding_version_indexes.assert_called_once_with("v2")
+        storage.activate_embedding_version.assert_called_once_with("v2", embed_fn=_embed)
+        on_activated.assert_called_once()
+    
+    def test_stop_leaves_version_inactive(self):
+        """Test a stopped job does not build indexes or switch versions"""
+        storage = Mock()
+        job = EmbeddingReindexJob(storage, "v2", _embed, batch_size=2)
+        storage.reembed_batch.side_effect = lambda *args, **kwargs: job._stop.set() or 2
+        
+        status = job.run()
+        
+        assert status["state"] == "stopped"
+        storage.build_embedding_version_indexes.assert_not_called()
+        storage.activate_embedding_version.assert_not_called()
+    
+    def test_failure_is_reported(self):
+        """Test errors end the job with an error state instead of raising"""
+        storage = Mock()
+        storage.reembed_batch.return_value = 0
+        storage.build_embedding_version_indexes.side_effect = RuntimeError("disk full")
+        
+        status = EmbeddingReindexJob(storage, "v2", _embed).run()
+        
+        assert status["state"] == "error"
+        assert "disk full" in status["error"]
+        storage.activate_embedding_version.assert_not_called()
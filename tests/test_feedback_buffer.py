@@ -0,0 +1,128 @@
+"""
+Tests for write-behind feedback buffer
+"""
+
+import json
+import pytest
+from unittest.mock import Mock
+import numpy as np
+from src.storage.feedback_buffer import FeedbackWriteBuffer
+
+
+def _make_buffer(storage, tmp_path, **kwargs):
+    """Cria buffer com thread de gravação praticamente ociosa"""
+    kwargs.setdefault("batch_size", 100)
+    kwargs.setdefault("flush_interval", 3600)
+    return FeedbackWriteBuffer(storage, spill_path=str(tmp_path / "buffer.jsonl"), **kwargs)
+
+
+class TestFeedbackWriteBuffer:
+    """Test suite for FeedbackWriteBuffer"""
+    
+    def test_flush_writes_pending_batch(self, tmp_path):
+        """Test pending feedbacks are embedded and written in a single batch"""
+        storage = Mock()
+        storage.store_feedback_batch.side_effect = lambda batch: len(batch)
+        embed_fn = Mock(side_effect=lambda texts: np.zeros((len(texts), 384)))
+        
+        buffer = _make_buffer(storage, tmp_path, embed_fn=embed_fn)
+        buffer.add("p1", "r1", 0.8, context="python")
+        buffer.add("p2", "r2", 0.3)
+        
+        assert buffer.flush() == 2
+        batch = storage.store_feedback_batch.call_args.args[0]
+        assert [fb["prompt"] for fb in batch] == ["p1", "p2"]
+        assert batch[0]["embedding"].shape == (384,)
+        embed_fn.assert_called_once_with(["p1", "p2"])
+        assert len(buffer) == 0
+        assert (tmp_path / "buffer.jsonl").read_text() == ""
+        buffer.close()
+    
+    def test_failed_flush_keeps_feedbacks(self, tmp_path):
+        """Test a failed flush keeps feedbacks queued and journaled for retry"""
+        storage = Mock()
+        storage.store_feedback_batch.side_effect = RuntimeError("database down")
+        
+        buffer = _make_buffer(storage, tmp_path)
+        buffer.add("p1", "r1", 0.8)
+        
+        with pytest.raises(RuntimeError):
+            buffer.flush()
+        
+        assert len(buffer) == 1
+        assert not (tmp_path / "buffer.jsonl.inflight").exists()
+        lines = (tmp_path / "buffer.jsonl").read_text().splitlines()
+        assert json.loads(lines[0])["prompt"] == "p1"
+        
+        storage.store_feedback_batch.side_effect = lambda batch: len(batch)
+        assert buffer.flush() == 1
+        buffer.close()
+    
+    def test_recovers_journal_after_crash(self, tmp_path):
+        """Test feedbacks journaled before a crash are replayed without duplicates"""
+        record = {
+            "client_id": "5c8b1c3e-2f64-4c53-9d0b-7a0f6b1d2e11",
+            "created_at": "2026-01-10T12:00:00",
+            "prompt": "p1", "response": "r1", "score": 0.8,
+            "implicit_score": None, "emotional_score": None, "context": None
+        }
+        line = json.dumps(record) + "\n"
+        # Crash durante o flush: lote no .inflight, duplicado no journal e última linha truncada
+        (tmp_path / "buffer.jsonl.inflight").write_text(line)
+        (tmp_path / "buffer.jsonl").write_text(line + '{"client_id": "trunc')
+        
+        storage = Mock()
+        storage.store_feedback_batch.side_effect = lambda batch: len(batch)
+        
+        buffer = _make_buffer(storage, tmp_path)
+        buffer.close()
+        
+        batch = storage.store_feedback_batch.call_args.args[0]
+        assert [fb["client_id"] for fb in batch] == [record["client_id"]]
+        assert (tmp_path / "buffer.jsonl").read_text() == ""
+    
+    def test_full_buffer_with_database_down_keeps_feedbacks(self, tmp_path):
+        """Test add() on a full buffer never raises and spills extra feedbacks to disk"""
+        storage = Mock()
+        storage.store_feedback_batch.side_effect = RuntimeError("database down")
+        
+        buffer = _make_buffer(storage, tmp_path, max_size=2)
+        client_ids = [buffer.add(f"p{i}", f"r{i}", 0.5) for i in range(5)]
+        
+        storage.store_feedback_batch.assert_not_called()
+        assert len(buffer) == 5
+        assert buffer.overflowed == 3
+        overflow = (tmp_path / "buffer.jsonl.overflow").read_text().splitlines()
+        assert [json.loads(line)["prompt"] for line in overflow] == ["p2", "p3", "p4"]
+        
+        with pytest.raises(RuntimeError):
+            buffer.flush()
+        assert len(buffer) == 5
+        
+        storage.store_feedback_batch.side_effect = lambda batch: len(batch)
+        assert buffer.flush() == 5
+        # Lotes de no máximo max_size, na ordem de chegada
+        batches = [call.args[0] for call in storage.store_feedback_batch.call_args_list[1:]]
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert [fb["client_id"] for batch in batches for fb in batch] == client_ids
+        assert not (tmp_path / "buffer.jsonl.overflow").exists()
+        buffer.close()
+    
+    def test_recovers_overflow_after_crash(self, tmp_path):
+        """Test feedbacks spilled to the overflow file are replayed on restart"""
+        storage = Mock()
+        storage.store_feedback_batch.side_effect = RuntimeError("database down")
+        
+        buffer = _make_buffer(storage, tmp_path, max_size=1)
+        buffer.add("p1", "r1", 0.5)
+        buffer.add("p2", "r2", 0.5)
+        # Crash: sem close()
+        buffer._closed = True
+        
+        storage = Mock()
+        storage.store_feedback_batch.side_effect = lambda batch: len(batch)
+        restarted = _make_buffer(storage, tmp_path, max_size=1)
+        restarted.close()
+        
+        prompts = [fb["prompt"] for call in storage.store_feedback_batch.call_args_list for fb in call.args[0]]
+        assert prompts == ["p1", "p2"]
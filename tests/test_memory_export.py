@@ -0,0 +1,64 @@
+"""
+Tests for Arrow/Parquet memory export
+"""
+
+import pytest
+from unittest.mock import patch
+import numpy as np
+from src.storage.sqlite import SQLiteStorage
+
+pytest.importorskip("pyarrow")
+from src.storage.export import export_memory, MemoryExportReader
+
+
+@pytest.fixture
+def sqlite_storage(mock_config, tmp_path):
+    """SQLiteStorage em diretório temporário"""
+    mock_config.database.sqlite_path = str(tmp_path / "npllm.db")
+    mock_config.database.vector_path = str(tmp_path / "vectors")
+    with patch('src.storage.sqlite.get_config', return_value=mock_config):
+        storage = SQLiteStorage()
+        yield storage
+        storage.close()
+
+
+class TestMemoryExport:
+    """Test suite for export_memory and MemoryExportReader"""
+    
+    @pytest.mark.parametrize("format", ["arrow", "parquet"])
+    def test_round_trip_with_embeddings(self, sqlite_storage, tmp_path, format):
+        """Test rows and fixed-size embeddings survive export, in batches, with nulls kept"""
+        course_id = sqlite_storage.store_course("Odoo", "desc", "text", "inline")
+        vectors = np.eye(384)[:5]
+        sqlite_storage.store_course_content_bulk(course_id, [
+            {
+                "content": f"chunk {i}",
+                "chunk_index": i,
+                "metadata": {"title": f"T{i}"},
+                "embedding": vectors[i] if i != 2 else None
+            }
+            for i in range(5)
+        ])
+        
+        result = export_memory(sqlite_storage, str(tmp_path / "export"), format=format, batch_size=2)
+        
+        assert result["course_content"]["rows"] == 5
+        assert result["learned_concepts"]["rows"] == 0
+        with MemoryExportReader(result["course_content"]["path"]) as reader:
+            assert reader.table == "course_content"
+            assert reader.num_rows == 5
+            
+            batches = list(reader.iter_batches(columns=["chunk_index", "metadata"], batch_size=2))
+            assert [batch.num_rows for batch in batches] == [2, 2, 1]
+            assert batches[0].column("metadata")[1].as_py() == '{"title": "T1"}'
+            
+            ids, embeddings = zip(*reader.iter_embeddings())
+            embeddings = np.concatenate(embeddings)
+            assert len(np.concatenate(ids)) == 4
+            assert embeddings.dtype == np.float32
+            np.testing.assert_allclose(embeddings, vectors[[0, 1, 3, 4]])
+    
+    def test_unknown_table_rejected(self, sqlite_storage, tmp_path):
+        """Test tables outside the export list are rejected"""
+        with pytest.raises(ValueError):
+            export_memory(sqlite_storage, str(tmp_path), tables=["courses"])
@@ -64,3 +64,176 @@ class TestSleepSystem:
         result = sleep.consolidate()
         assert result["status"] == "active"
 
+    
+    def test_consolidate_uses_watermark(self):
+        """Test consolidation reads only new feedback and advances watermark"""
+        mock_storage = Mock()
+        mock_storage.get_consolidation_watermark.return_value = {
+            "last_feedback_id": 10,
+            "last_created_at": None
+        }
+        mock_storage.iter_feedback_batches.return_value = iter([
+            [{"id": 11, "prompt": "p", "response": "r", "score": 0.9, "created_at": "t1"}],
+            [{"id": 14, "prompt": "p", "response": "r", "score": 0.8, "created_at": "t2"}]
+        ])
+        mock_storage.get_important_examples.return_value = []
+        mock_storage.get_validated_course_examples.return_value = []
+        mock_replay = Mock()
+        mock_replay.mix_examples.side_effect = lambda old, new: new
+        mock_fine_tuning = Mock()
+        mock_fine_tuning.train_incremental.return_value = {"status": "success"}
+        
+        sleep = SleepSystem(mock_storage, mock_replay, mock_fine_tuning)
+        sleep.last_activity = datetime.utcnow() - timedelta(hours=1)
+        result = sleep.consolidate()
+        
+        assert result["status"] == "success"
+        assert result["feedbacks_processed"] == 2
+        assert mock_storage.iter_feedback_batches.call_args.kwargs["after_id"] == 10
+        mock_storage.update_consolidation_watermark.assert_called_once_with(
+            last_feedback_id=14,
+            last_created_at="t2"
+        )
+    
+    def test_consolidate_trains_in_bounded_chunks(self):
+        """Test consolidation trains chunk by chunk and advances watermark per chunk"""
+        rows = [
+            {"id": i, "prompt": "p", "response": "r", "score": 0.9, "created_at": f"t{i}"}
+            for i in range(1, 6)
+        ]
+        closed = []
+        
+        def iter_feedback_batches(score_threshold, after_id, batch_size):
+            try:
+                pending = [row for row in rows if row["id"] > after_id]
+                for start in range(0, len(pending), batch_size):
+                    yield pending[start:start + batch_size]
+            finally:
+                closed.append(after_id)
+        
+        mock_storage = Mock()
+        mock_storage.get_consolidation_watermark.return_value = {
+            "last_feedback_id": 0,
+            "last_created_at": None
+        }
+        mock_storage.iter_feedback_batches.side_effect = iter_feedback_batches
+        mock_storage.get_important_examples.return_value = []
+        mock_storage.get_validated_course_examples.return_value = []
+        mock_replay = Mock()
+        mock_replay.mix_examples.side_effect = lambda old, new: new
+        mock_fine_tuning = Mock()
+        mock_fine_tuning.train_incremental.return_value = {"status": "success"}
+        
+        sleep = SleepSystem(mock_storage, mock_replay, mock_fine_tuning, max_feedbacks_per_chunk=2)
+        sleep.last_activity = datetime.utcnow() - timedelta(hours=1)
+        result = sleep.consolidate()
+        
+        assert result["status"] == "success"
+        assert result["feedbacks_processed"] == 5
+        assert result["last_feedback_id"] == 5
+        assert [len(call.args[0]) for call in mock_fine_tuning.train_incremental.call_args_list] == [2, 2, 1]
+        assert [
+            call.kwargs["last_feedback_id"]
+            for call in mock_storage.update_consolidation_watermark.call_args_list
+        ] == [2, 4, 5]
+        # Cada leitura é fechada antes do treino e o catálogo de exemplos antigos é lido uma vez
+        assert closed == [0, 2, 4]
+        mock_storage.get_important_examples.assert_called_once()
+        mock_fine_tuning.update_adapters.assert_called_once()
+    
+    def test_consolidate_stops_at_failed_chunk(self):
+        """Test a failed training chunk keeps the watermark at the previous chunk"""
+        mock_storage = Mock()
+        mock_storage.get_consolidation_watermark.return_value = {
+            "last_feedback_id": 0,
+            "last_created_at": None
+        }
+        mock_storage.iter_feedback_batches.side_effect = lambda score_threshold, after_id, batch_size: iter([
+            [{"id": after_id + 1, "prompt": "p", "response": "r", "score": 0.9, "created_at": None}]
+        ])
+        mock_storage.get_important_examples.return_value = []
+        mock_storage.get_validated_course_examples.return_value = []
+        mock_replay = Mock()
+        mock_replay.mix_examples.side_effect = lambda old, new: new
+        mock_fine_tuning = Mock()
+        mock_fine_tuning.train_incremental.side_effect = [{"status": "success"}, {"status": "error"}]
+        
+        sleep = SleepSystem(mock_storage, mock_replay, mock_fine_tuning, max_feedbacks_per_chunk=1)
+        sleep.last_activity = datetime.utcnow() - timedelta(hours=1)
+        result = sleep.consolidate()
+        
+        assert result["fine_tuning"] == {"status": "error"}
+        assert result["last_feedback_id"] == 1
+        mock_storage.update_consolidation_watermark.assert_called_once_with(
+            last_feedback_id=1,
+            last_created_at=None
+        )
+    
+    def test_consolidate_applies_feedback_retention(self):
+        """Test feedback retention runs even when there is nothing to consolidate"""
+        mock_storage = Mock()
+        mock_storage.get_consolidation_watermark.return_value = {
+            "last_feedback_id": 0,
+            "last_created_at": None
+        }
+        mock_storage.iter_feedback_batches.return_value = iter([])
+        mock_storage.maintain_feedback_partitions.return_value = {
+            "partitions_created": [],
+            "partitions_dropped": ["feedback_p202401"],
+            "rows_rolled_up": 3
+        }
+        
+        sleep = SleepSystem(mock_storage, Mock(), Mock())
+        sleep.last_activity = datetime.utcnow() - timedelta(hours=1)
+        result = sleep.consolidate()
+        
+        assert result["status"] == "no_data"
+        assert result["feedback_retention"]["rows_rolled_up"] == 3
+        mock_storage.maintain_feedback_partitions.assert_called_once()
+    
+    def test_db_maintenance_aborts_on_activity(self):
+        """Test database maintenance runs last and is told to stop once the user is back"""
+        mock_storage = Mock()
+        mock_storage.get_consolidation_watermark.return_value = {
+            "last_feedback_id": 0,
+            "last_created_at": None
+        }
+        mock_storage.iter_feedback_batches.return_value = iter([])
+        
+        sleep = SleepSystem(
+            mock_storage, Mock(), Mock(),
+            db_maintenance=True,
+            maintenance_time_budget_seconds=60
+        )
+        
+        abort_checks = []
+        
+        def run_maintenance(time_budget_seconds, should_abort):
+            abort_checks.append(should_abort())
+            sleep.record_activity()
+            abort_checks.append(should_abort())
+            return {"analyzed": ["feedback"], "reindexed": [], "aborted": True, "elapsed_seconds": 0.1}
+        
+        mock_storage.run_maintenance.side_effect = run_maintenance
+        sleep.last_activity = datetime.utcnow() - timedelta(hours=1)
+        result = sleep.consolidate()
+        
+        assert abort_checks == [False, True]
+        assert result["db_maintenance"]["aborted"] is True
+        assert mock_storage.run_maintenance.call_args.kwargs["time_budget_seconds"] == 60
+    
+    def test_db_maintenance_disabled_by_default(self):
+        """Test database maintenance only runs when enabled"""
+        mock_storage = Mock()
+        mock_storage.get_consolidation_watermark.return_value = {
+            "last_feedback_id": 0,
+            "last_created_at": None
+        }
+        mock_storage.iter_feedback_batches.return_value = iter([])
+        
+        sleep = SleepSystem(mock_storage, Mock(), Mock())
+        sleep.last_activity = datetime.utcnow() - timedelta(hours=1)
+        result = sleep.consolidate()
+        
+        assert result["db_maintenance"] is None
+        mock_storage.run_maintenance.assert_not_called()
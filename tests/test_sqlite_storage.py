@@ -0,0 +1,173 @@
+"""
+Tests for SQLite + memory-mapped vector storage
+"""
+
+import pytest
+from unittest.mock import patch
+import numpy as np
+from src.storage.sqlite import SQLiteStorage
+from src.storage.vector_index import MemmapVectorIndex
+
+
+@pytest.fixture
+def sqlite_storage(mock_config, tmp_path):
+    """SQLiteStorage em diretório temporário"""
+    mock_config.database.sqlite_path = str(tmp_path / "npllm.db")
+    mock_config.database.vector_path = str(tmp_path / "vectors")
+    with patch('src.storage.sqlite.get_config', return_value=mock_config):
+        storage = SQLiteStorage()
+        yield storage
+        storage.close()
+
+
+def _unit(dim, i):
+    """Vetor canônico i (similaridade 1 consigo, 0 com os demais)"""
+    vector = np.zeros(dim)
+    vector[i] = 1.0
+    return vector
+
+
+class TestSQLiteStorage:
+    """Test suite for SQLiteStorage"""
+    
+    def test_course_content_dedup_and_search(self, sqlite_storage):
+        """Test bulk insert deduplicates by hash and search ranks by cosine similarity"""
+        course_id = sqlite_storage.store_course("Odoo", "desc", "text", "inline")
+        chunks = [
+            {"content": f"chunk {i}", "chunk_index": i, "metadata": {"title": f"T{i}"}, "embedding": _unit(384, i)}
+            for i in range(5)
+        ]
+        
+        ids = sqlite_storage.store_course_content_bulk(course_id, chunks)
+        assert sqlite_storage.store_course_content_bulk(course_id, chunks[:2]) == ids[:2]
+        assert sqlite_storage.get_course_status(course_id)["content_chunks"] == 5
+        
+        query = _unit(384, 3) + 0.5 * _unit(384, 1)
+        results = sqlite_storage.search_course_content(course_id, query, top_k=2)
+        assert [r["id"] for r in results] == [ids[3], ids[1]]
+        assert results[0]["metadata"] == {"title": "T3"}
+        assert results[0]["similarity"] == pytest.approx(1 / np.sqrt(1.25), rel=1e-5)
+    
+    def test_hybrid_search_boosts_exact_identifier(self, sqlite_storage):
+        """Test full-text ranking lifts a chunk citing the exact identifier"""
+        course_id = sqlite_storage.store_course("Odoo", "desc", "text", "inline")
+        ids = sqlite_storage.store_course_content_bulk(course_id, [
+            {"content": "Views and menus", "chunk_index": 0, "metadata": None, "embedding": _unit(384, 0)},
+            {"content": "Extend res.partner with _inherit", "chunk_index": 1, "metadata": None,
+             "embedding": _unit(384, 1)},
+            {"content": "Reports", "chunk_index": 2, "metadata": None, "embedding": _unit(384, 2)}
+        ])
+        
+        results = sqlite_storage.search_course_content_hybrid(
+            course_id, "res.partner", _unit(384, 0), top_k=2
+        )
+        
+        assert {r["id"] for r in results} == {ids[0], ids[1]}
+        assert all(r["rrf_score"] > 0 for r in results)
+    
+    def test_feedback_batch_is_idempotent_and_filtered(self, sqlite_storage):
+        """Test client_id makes batch retries idempotent and context filters search"""
+        batch = [
+            {"prompt": "p1", "response": "r", "score": 0.9, "context": "odoo",
+             "client_id": "a", "created_at": "2026-01-01T10:00:00", "embedding": _unit(384, 0)},
+            {"prompt": "p2", "response": "r", "score": 0.9, "context": "python",
+             "client_id": "b", "embedding": _unit(384, 0)}
+        ]
+        
+        assert sqlite_storage.store_feedback_batch(batch) == 2
+        assert sqlite_storage.store_feedback_batch(batch) == 0
+        
+        results = sqlite_storage.search_similar(_unit(384, 0), top_k=5, context="python")
+        assert [r["prompt"] for r in results] == ["p2"]
+        assert [len(b) for b in sqlite_storage.iter_feedback_batches(0.5, batch_size=1)] == [1, 1]
+    
+    def test_search_is_isolated_per_user(self, sqlite_storage):
+        """Test user_id restricts retrieval to that user's history"""
+        sqlite_storage.store_feedback("alice q", "r", 0.9, embedding=_unit(384, 0), user_id="alice")
+        sqlite_storage.store_feedback_batch([
+            {"prompt": "bob q", "response": "r", "score": 0.9, "embedding": _unit(384, 0), "user_id": "bob"},
+            {"prompt": "shared q", "response": "r", "score": 0.9, "embedding": _unit(384, 0)}
+        ])
+        
+        query = _unit(384, 0)
+        assert [r["prompt"] for r in sqlite_storage.search_similar(query, user_id="alice")] == ["alice q"]
+        assert [r["prompt"] for r in sqlite_storage.search_similar_hybrid("q", query, user_id="bob")] == ["bob q"]
+        assert len(sqlite_storage.search_similar(query, top_k=5)) == 3
+    
+    def test_run_maintenance_stops_when_aborted(self, sqlite_storage):
+        """Test maintenance analyzes tables and optimizes FTS, and stops as soon as asked"""
+        sqlite_storage.store_course("Odoo", "desc", "text", "inline")
+        
+        result = sqlite_storage.run_maintenance()
+        assert "courses" in result["analyzed"]
+        assert result["reindexed"] == ["feedback_fts", "course_content_fts"]
+        assert not result["aborted"]
+        
+        result = sqlite_storage.run_maintenance(should_abort=lambda: True)
+        assert result["aborted"]
+        assert result["analyzed"] == []
+    
+    def test_embedding_version_activation_survives_reopen(self, sqlite_storage, mock_config):
+        """Test re-embedding into a new version switches searches and persists"""
+        course_id = sqlite_storage.store_course("Odoo", "desc", "text", "inline")
+        sqlite_storage.store_course_content_bulk(course_id, [
+            {"content": "a", "chunk_index": 0, "metadata": None, "embedding": _unit(384, 0)}
+        ])
+        
+        def embed(texts):
+            return np.stack([_unit(8, 2) for _ in texts])
+        
+        sqlite_storage.create_embedding_version("v2", "new-model", 8)
+        assert sqlite_storage.reembed_batch("v2", "course_content", embed) == 1
+        
+        # Linha gravada depois do lote: alcançada na ativação
+        sqlite_storage.store_course_content_bulk(course_id, [
+            {"content": "b", "chunk_index": 1, "metadata": None, "embedding": _unit(384, 1)}
+        ])
+        result = sqlite_storage.activate_embedding_version("v2", embed_fn=embed)
+        
+        assert result == {"active": "v2", "retired": "v1", "dim": 8, "rows_caught_up": 1}
+        assert len(sqlite_storage.search_course_content(course_id, _unit(8, 2))) == 2
+        
+        sqlite_storage.close()
+        with patch('src.storage.sqlite.get_config', return_value=mock_config):
+            reopened = SQLiteStorage()
+        assert reopened.embedding_dim == 8
+        assert reopened.search_course_content(course_id, _unit(8, 2))[0]["similarity"] == pytest.approx(1.0)
+        reopened.close()
+
+
+class TestMemmapVectorIndex:
+    """Test suite for MemmapVectorIndex"""
+    
+    def test_ivf_matches_exact_search_on_clustered_data(self, tmp_path):
+        """Test IVF search finds the exact top-k on well-separated clusters"""
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(20, 32))
+        data = centers[rng.integers(0, 20, 2000)] + 0.05 * rng.normal(size=(2000, 32))
+        slots = np.arange(1, 2001)
+        
+        exact = MemmapVectorIndex(str(tmp_path / "exact.f32"), 32)
+        ivf = MemmapVectorIndex(str(tmp_path / "ivf.f32"), 32, ivf_min_rows=500, ivf_probes=4)
+        exact.write(slots, data)
+        ivf.write(slots, data)
+        
+        query = data[10]
+        exact_slots, _ = exact.search(query, slots, 10)[0]
+        ivf_slots, similarities = ivf.search(query, slots, 10)[0]
+        
+        assert ivf._centroids is not None
+        assert set(ivf_slots) == set(exact_slots)
+        assert similarities[0] == pytest.approx(1.0, abs=1e-5)
+    
+    def test_reopen_keeps_vectors_and_grows(self, tmp_path):
+        """Test vectors persist in the file and capacity doubles past the end"""
+        path = str(tmp_path / "vectors.f32")
+        index = MemmapVectorIndex(path, 4)
+        index.write([3000], np.array([[3.0, 0.0, 4.0, 0.0]]))
+        index.close()
+        
+        reopened = MemmapVectorIndex(path, 4)
+        assert reopened.capacity == 4096
+        assert reopened.count == 1
+        np.testing.assert_allclose(reopened.read([3000, 5000]), [[0.6, 0.0, 0.8, 0.0], [0.0] * 4])
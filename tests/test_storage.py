@@ -3,10 +3,20 @@ Tests for PostgreSQL Storage
 TDD: Tests first
 """
 
+import json
+from datetime import date
 import pytest
 from unittest.mock import Mock, MagicMock, patch
 import numpy as np
-from src.storage.postgres import PostgreSQLStorage
+from src.storage.postgres import PostgreSQLStorage, VECTOR_TABLES
+from src.utils.hashing import content_hash
+
+
+@pytest.fixture(autouse=True)
+def no_context_index_thread():
+    """Não dispara a verificação de índices em background (concorreria com o cursor mock)"""
+    with patch.object(PostgreSQLStorage, '_schedule_context_index_check') as mock_schedule:
+        yield mock_schedule
 
 
 class TestPostgreSQLStorage:
@@ -15,7 +25,7 @@ class TestPostgreSQLStorage:
     def test_storage_initialization(self, mock_config):
         """Test storage initialization"""
         with patch('src.storage.postgres.get_config', return_value=mock_config):
-            with patch('src.storage.postgres.ThreadedConnectionPool') as mock_pool:
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
                 with patch('src.storage.postgres.register_vector') as mock_register:
                     mock_conn = MagicMock()
                     mock_pool.return_value.getconn.return_value = mock_conn
@@ -24,12 +34,54 @@ class TestPostgreSQLStorage:
                     storage = PostgreSQLStorage()
                     assert storage is not None
                     assert hasattr(storage, 'pool')
-                    mock_register.assert_called_once()
+                    # pgvector é registrado em toda conexão nova do pool
+                    assert mock_pool.call_args.kwargs["configure"] is mock_register
+    
+    def test_initial_context_index_check_runs_in_background(self, mock_config, no_context_index_thread):
+        """Test startup schedules the partial index check instead of building indexes inline"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    with patch.object(PostgreSQLStorage, 'ensure_context_indexes') as mock_ensure:
+                        PostgreSQLStorage()
+                    
+                    no_context_index_thread.assert_called_once()
+                    mock_ensure.assert_not_called()
+    
+    def test_ensure_context_indexes_accepts_zero_threshold(self, mock_config):
+        """Test an explicit threshold of 0 is used instead of the configured value"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    mock_cursor.execute.reset_mock()
+                    mock_cursor.fetchall.return_value = []
+                    
+                    storage.ensure_context_indexes(threshold=0)
+                    thresholds = [c.args[1] for c in mock_cursor.execute.call_args_list if "HAVING" in str(c.args[0])]
+                    assert thresholds and all(params == (0,) for params in thresholds)
+                    
+                    mock_cursor.execute.reset_mock()
+                    storage.ensure_context_indexes()
+                    thresholds = [c.args[1] for c in mock_cursor.execute.call_args_list if "HAVING" in str(c.args[0])]
+                    assert all(params == (1000,) for params in thresholds)
     
     def test_store_feedback(self, mock_config):
         """Test storing feedback"""
         with patch('src.storage.postgres.get_config', return_value=mock_config):
-            with patch('src.storage.postgres.ThreadedConnectionPool') as mock_pool:
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
                 with patch('src.storage.postgres.register_vector'):
                     mock_conn = MagicMock()
                     mock_cursor = MagicMock()
@@ -54,7 +106,7 @@ class TestPostgreSQLStorage:
     def test_get_all_feedbacks(self, mock_config):
         """Test getting all feedbacks"""
         with patch('src.storage.postgres.get_config', return_value=mock_config):
-            with patch('src.storage.postgres.ThreadedConnectionPool') as mock_pool:
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
                 with patch('src.storage.postgres.register_vector'):
                     mock_conn = MagicMock()
                     mock_cursor = MagicMock()
@@ -75,7 +127,7 @@ class TestPostgreSQLStorage:
     def test_get_important_examples(self, mock_config):
         """Test getting important examples"""
         with patch('src.storage.postgres.get_config', return_value=mock_config):
-            with patch('src.storage.postgres.ThreadedConnectionPool') as mock_pool:
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
                 with patch('src.storage.postgres.register_vector'):
                     mock_conn = MagicMock()
                     mock_cursor = MagicMock()
@@ -93,3 +145,697 @@ class TestPostgreSQLStorage:
                     assert len(examples) == 1
                     assert examples[0]["score"] == 0.9
 
+    
+    def test_iter_feedback_batches(self, mock_config):
+        """Test streaming feedbacks in batches with server-side cursor"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_cursor.fetchmany.side_effect = [
+                        [(1, "p1", "r1", 0.8, 0.7, 0.9, "python", "2025-01-27"),
+                         (2, "p2", "r2", 0.9, 0.9, 0.9, "python", "2025-01-27")],
+                        [(5, "p5", "r5", 0.75, 0.7, 0.8, "odoo", "2025-01-28")],
+                        []
+                    ]
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    with patch.object(PostgreSQLStorage, '_committed_feedback_ceiling', return_value=7):
+                        batches = list(storage.iter_feedback_batches(after_id=0, batch_size=2))
+                    
+                    assert [len(b) for b in batches] == [2, 1]
+                    assert batches[1][0]["id"] == 5
+                    # Cursor nomeado (server-side), limitado ao teto de IDs commitados
+                    assert "name" in mock_conn.cursor.call_args.kwargs
+                    assert mock_cursor.execute.call_args.args[1][:2] == (0, 7)
+                    mock_pool.return_value.putconn.assert_called_with(mock_conn)
+    
+    def test_committed_feedback_ceiling_waits_for_open_writers(self, mock_config):
+        """Test the feedback ID ceiling is only returned after in-flight writers finish"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool'):
+                with patch('src.storage.postgres.register_vector'):
+                    storage = PostgreSQLStorage()
+                    cursor = MagicMock()
+                    cursor.fetchone.side_effect = [(42,), (["3/10", "4/2"],), (["4/2"],), ([],)]
+                    
+                    with patch('src.storage.postgres.time.sleep') as mock_sleep:
+                        assert storage._committed_feedback_ceiling(cursor) == 42
+                    
+                    assert mock_sleep.call_count == 1
+                    # Espera apenas pelas transações abertas quando a sequência foi lida
+                    assert cursor.execute.call_args_list[2].args[1] == (["3/10", "4/2"],)
+    
+    def test_iter_feedback_batches_defers_when_writers_stay_open(self, mock_config):
+        """Test streaming yields nothing when in-flight writers outlive the timeout"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    
+                    storage = PostgreSQLStorage()
+                    mock_conn.reset_mock()
+                    mock_cursor.fetchone.side_effect = [(42,), (["3/10"],), (["3/10"],)]
+                    with patch('src.storage.postgres.FEEDBACK_WRITERS_TIMEOUT_SECONDS', 0):
+                        batches = list(storage.iter_feedback_batches(after_id=0))
+                    
+                    assert batches == []
+                    # Nenhum cursor nomeado aberto; conexão devolvida ao pool
+                    assert all("name" not in call.kwargs for call in mock_conn.cursor.call_args_list)
+                    mock_conn.rollback.assert_called_once()
+                    mock_pool.return_value.putconn.assert_called_with(mock_conn)
+    
+    def test_get_validated_course_examples(self, mock_config):
+        """Test replay examples for all validated courses come from a single query"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_cursor.fetchall.return_value = [
+                        (1, "p1", "r1", 0.9),
+                        (2, None, "r2", None)
+                    ]
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    mock_cursor.execute.reset_mock()
+                    examples = storage.get_validated_course_examples(limit=10)
+                    
+                    assert examples[0] == {"prompt": "p1", "response": "r1", "score": 0.9, "context": "course_1"}
+                    assert examples[1]["prompt"] == ""
+                    assert examples[1]["score"] == 0.5
+                    mock_cursor.execute.assert_called_once()
+                    assert "jsonb_array_elements" in mock_cursor.execute.call_args.args[0]
+    
+    def test_store_course_content_bulk(self, mock_config):
+        """Test bulk course content ingestion in a single transaction"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    with patch('src.storage.postgres.execute_values') as mock_execute_values:
+                        mock_conn = MagicMock()
+                        mock_conn.cursor.return_value = MagicMock()
+                        mock_pool.return_value.getconn.return_value = mock_conn
+                        mock_pool.return_value.putconn = Mock()
+                        mock_execute_values.return_value = [(content_hash("a"), 10), (content_hash("b"), 11)]
+                        
+                        storage = PostgreSQLStorage()
+                        mock_conn.commit.reset_mock()
+                        chunks = [
+                            {"content": "a", "chunk_index": 0, "metadata": {"title": "Intro"}, "embedding": np.zeros(384)},
+                            {"content": "b", "chunk_index": 1, "metadata": {"title": "Intro"}, "embedding": np.zeros(384)}
+                        ]
+                        ids = storage.store_course_content_bulk(course_id=1, chunks=chunks)
+                        
+                        assert ids == [10, 11]
+                        rows = mock_execute_values.call_args.args[2]
+                        assert rows[0][:4] == (1, "Intro", "a", 0)
+                        assert rows[0][6] == content_hash("a")
+                        mock_conn.commit.assert_called_once()
+    
+    def test_store_course_content_bulk_references_existing_chunks(self, mock_config):
+        """Test re-ingested chunks are not inserted again and reuse the stored row"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    with patch('src.storage.postgres.execute_values') as mock_execute_values:
+                        mock_conn = MagicMock()
+                        mock_cursor = MagicMock()
+                        mock_conn.cursor.return_value = mock_cursor
+                        mock_pool.return_value.getconn.return_value = mock_conn
+                        mock_pool.return_value.putconn = Mock()
+                        # "a" já estava no curso (ON CONFLICT DO NOTHING não o retorna)
+                        mock_execute_values.return_value = [(content_hash("b"), 11)]
+                        mock_cursor.fetchall.return_value = [(content_hash("a"), 3)]
+                        
+                        storage = PostgreSQLStorage()
+                        chunks = [
+                            {"content": "a", "chunk_index": 0, "metadata": {}, "embedding": np.zeros(384)},
+                            {"content": "b", "chunk_index": 1, "metadata": {}, "embedding": np.zeros(384)}
+                        ]
+                        ids = storage.store_course_content_bulk(course_id=1, chunks=chunks)
+                        
+                        assert ids == [3, 11]
+                        assert "ON CONFLICT (content_hash, course_id) DO NOTHING" in mock_execute_values.call_args.args[1]
+    
+    def test_store_feedback_batch(self, mock_config):
+        """Test batched feedback insert is idempotent on client_id"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    with patch('src.storage.postgres.execute_values') as mock_execute_values:
+                        mock_conn = MagicMock()
+                        mock_conn.cursor.return_value = MagicMock()
+                        mock_pool.return_value.getconn.return_value = mock_conn
+                        mock_pool.return_value.putconn = Mock()
+                        # Segundo feedback já gravado em um flush anterior
+                        mock_execute_values.return_value = [(1,)]
+                        
+                        storage = PostgreSQLStorage()
+                        mock_conn.commit.reset_mock()
+                        inserted = storage.store_feedback_batch([
+                            {"prompt": "p1", "response": "r1", "score": 0.8, "client_id": "a"},
+                            {"prompt": "p2", "response": "r2", "score": 0.4, "client_id": "b"}
+                        ])
+                        
+                        assert inserted == 1
+                        assert "ON CONFLICT (client_id, created_at) DO NOTHING" in mock_execute_values.call_args.args[1]
+                        assert len(mock_execute_values.call_args.args[2]) == 2
+                        mock_conn.commit.assert_called_once()
+    
+    def test_get_course_status(self, mock_config):
+        """Test course status reads maintained counters in a single query"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_cursor.fetchone.return_value = (1, "Odoo", "learning", 120, 8, "2025-01-27", None)
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    mock_cursor.execute.reset_mock()
+                    status = storage.get_course_status(1)
+                    
+                    assert status["content_chunks"] == 120
+                    assert status["concepts_learned"] == 8
+                    mock_cursor.execute.assert_called_once()
+                    assert "COUNT" not in mock_cursor.execute.call_args.args[0]
+    
+    def test_search_course_content_batch(self, mock_config):
+        """Test batched vector search groups results per query"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    # Tuple: ord, id, title, content, chunk_index, metadata, similarity
+                    mock_cursor.fetchall.return_value = [
+                        (1, 10, "A", "content a", 0, {"title": "A"}, 0.95),
+                        (1, 11, "B", "content b", 1, None, 0.90),
+                        (3, 12, "C", "content c", 2, '{"title": "C"}', 0.80)
+                    ]
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    results = storage.search_course_content_batch(
+                        course_id=1,
+                        query_embeddings=np.random.rand(3, 384),
+                        top_k=2
+                    )
+                    
+                    assert [len(r) for r in results] == [2, 0, 1]
+                    assert results[2][0]["metadata"] == {"title": "C"}
+                    params = mock_cursor.execute.call_args.args[1]
+                    assert len(params["queries"]) == 3
+    
+    def test_search_course_content_hybrid(self, mock_config):
+        """Test hybrid search fuses full-text and vector rankings with RRF"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    # Tuple: id, title, content, chunk_index, metadata, similarity, rrf_score
+                    mock_cursor.fetchall.return_value = [
+                        (10, "A", "_inherit = 'res.partner'", 0, None, 0.4, 0.032),
+                        (11, "B", "content b", 1, '{"title": "B"}', None, 0.016)
+                    ]
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    results = storage.search_course_content_hybrid(
+                        course_id=1,
+                        query_text="_inherit res.partner",
+                        query_embedding=np.random.rand(384),
+                        top_k=2
+                    )
+                    
+                    assert [r["id"] for r in results] == [10, 11]
+                    assert results[1]["similarity"] == 0.0
+                    assert results[1]["metadata"] == {"title": "B"}
+                    query, params = mock_cursor.execute.call_args.args
+                    assert "content_tsv @@" in query
+                    assert "FULL OUTER JOIN" in query
+                    assert params["query_text"] == "_inherit res.partner"
+                    assert params["rrf_k"] == 60
+                    assert params["candidates"] == 50
+    
+    def test_maintain_feedback_partitions_drops_expired(self, mock_config):
+        """Test retention rolls up and drops only partitions older than the cutoff"""
+        mock_config.database.feedback_partitioning = True
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_cursor.fetchall.return_value = [
+                        ("feedback_p200001",),
+                        ("feedback_default",),
+                        ("feedback_p209912",)
+                    ]
+                    mock_cursor.rowcount = 2
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    mock_cursor.execute.reset_mock()
+                    result = storage.maintain_feedback_partitions(retention_months=12)
+                    
+                    assert result["partitions_dropped"] == ["feedback_p200001"]
+                    # Partição expirada + linhas antigas da partição default
+                    assert result["rows_rolled_up"] == 4
+                    drops = [
+                        str(call.args[0]) for call in mock_cursor.execute.call_args_list
+                        if "DROP TABLE" in str(call.args[0])
+                    ]
+                    assert len(drops) == 1
+                    assert "feedback_p200001" in drops[0]
+    
+    def test_migrate_feedback_to_partitioned(self, mock_config):
+        """Test an existing plain feedback table is copied into monthly partitions and dropped"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    mock_cursor.reset_mock()
+                    # relkind 'r'; depois, por mês: partição inexistente, nada na default
+                    mock_cursor.fetchone.side_effect = [("r",), (None,), (False,), (None,), (False,)]
+                    mock_cursor.fetchall.return_value = [(date(2025, 11, 1),), (date(2026, 1, 1),)]
+                    mock_cursor.rowcount = 7
+                    
+                    assert storage._migrate_feedback_to_partitioned(mock_cursor) == 7
+                    
+                    executed = [str(c.args[0]) for c in mock_cursor.execute.call_args_list]
+                    
+                    def position(fragment):
+                        return next(i for i, query in enumerate(executed) if fragment in query)
+                    
+                    assert position("LOCK TABLE feedback") < position("RENAME TO feedback_unpartitioned")
+                    assert position("RENAME TO feedback_unpartitioned") < position("PARTITION BY RANGE")
+                    partitions = [query for query in executed if "FOR VALUES FROM" in query]
+                    assert len(partitions) == 2
+                    assert "feedback_p202511" in partitions[0] and "feedback_p202601" in partitions[1]
+                    assert position("PARTITION BY RANGE") < position("FROM feedback_unpartitioned\n")
+                    assert position("FROM feedback_unpartitioned\n") < position("setval")
+                    assert position("setval") < position("DROP TABLE feedback_unpartitioned")
+                    assert not any("DETACH PARTITION" in query for query in executed)
+    
+    def test_migrate_feedback_skips_partitioned_table(self, mock_config):
+        """Test migration does nothing when feedback is missing or already partitioned"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    mock_cursor.reset_mock()
+                    mock_cursor.fetchone.side_effect = [("p",), None]
+                    
+                    assert storage._migrate_feedback_to_partitioned(mock_cursor) == 0
+                    assert storage._migrate_feedback_to_partitioned(mock_cursor) == 0
+                    assert mock_cursor.execute.call_count == 2
+    
+    def test_ensure_feedback_partitions_moves_rows_from_default(self, mock_config):
+        """Test a new partition detaches the default one only when it holds rows for that month"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    mock_cursor.reset_mock()
+                    # 2026-01 já existe; 2026-02 tem linhas na default; 2026-03 não
+                    mock_cursor.fetchone.side_effect = [
+                        ("feedback_p202601",),
+                        (None,), (True,),
+                        (None,), (False,)
+                    ]
+                    
+                    created = storage._ensure_feedback_partitions(
+                        mock_cursor,
+                        months=[date(2026, 3, 1), date(2026, 1, 1), date(2026, 2, 1)]
+                    )
+                    
+                    assert created == ["feedback_p202602", "feedback_p202603"]
+                    executed = [str(c.args[0]).strip() for c in mock_cursor.execute.call_args_list]
+                    detach = executed.index("ALTER TABLE feedback DETACH PARTITION feedback_default")
+                    attach = executed.index("ALTER TABLE feedback ATTACH PARTITION feedback_default DEFAULT")
+                    assert "feedback_p202602" in executed[detach + 1]
+                    assert "DELETE FROM feedback_default" in executed[detach + 2]
+                    assert attach == detach + 3
+                    assert mock_cursor.execute.call_args_list[detach + 2].args[1] == (date(2026, 2, 1), date(2026, 3, 1))
+                    assert sum("DETACH PARTITION" in query for query in executed) == 1
+                    assert "feedback_p202603" in executed[-1]
+    
+    def test_search_similar_sets_ef_search(self, mock_config):
+        """Test per-query HNSW settings are applied before similarity search"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_cursor.fetchall.return_value = [
+                        (1, "p1", "r1", 0.8, "odoo", 0.7),
+                        (2, "p2", "r2", 0.9, "odoo", 0.9)
+                    ]
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    storage.pgvector_version = (0, 8, 0)
+                    mock_cursor.execute.reset_mock()
+                    results = storage.search_similar(np.zeros(384), top_k=5, context="odoo")
+                    
+                    statements = [c.args[0] for c in mock_cursor.execute.call_args_list]
+                    assert "hnsw.ef_search" in statements[0]
+                    assert "hnsw.iterative_scan" in statements[1]
+                    assert mock_cursor.execute.call_args_list[0].args[1] == ("100",)
+                    # Resultados reordenados por similaridade
+                    assert [r["id"] for r in results] == [2, 1]
+    
+    def test_activate_embedding_version_requires_indexes(self, mock_config):
+        """Test cutover is refused while the new version's HNSW indexes are missing"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    mock_cursor.fetchone.return_value = ("v2", "new-model", 768, "building")
+                    mock_cursor.fetchall.return_value = [("feedback_embedding_v2_idx",)]
+                    
+                    with pytest.raises(ValueError, match="indexes not built"):
+                        storage.activate_embedding_version("v2")
+                    
+                    executed = " ".join(str(c.args[0]) for c in mock_cursor.execute.call_args_list)
+                    assert "RENAME COLUMN" not in executed
+                    mock_conn.rollback.assert_called()
+    
+    def test_activate_embedding_version_catches_up_before_locking(self, mock_config):
+        """Test pending rows are re-embedded in batches before the write lock, leaving only the remainder"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    storage.reembed_batch = Mock(side_effect=[2, 0, 0, 0, 0])
+                    storage._check_embedding_version = Mock(return_value={"model": "new-model", "dim": 8})
+                    mock_cursor.execute.reset_mock()
+                    mock_cursor.fetchone.return_value = ("v1",)
+                    # Linhas pendentes de feedback: 3 antes do lock, 1 inserida antes do LOCK
+                    pending = [[(1, "a"), (2, "b")], [(3, "c")], [], [], [], [(4, "d")], [], []]
+                    
+                    def fetchall():
+                        query = str(mock_cursor.execute.call_args.args[0])
+                        if "ANY(%s)" in query:
+                            return [(f"{table}_embedding_v2_idx",) for table in VECTOR_TABLES]
+                        if "IS NULL" in query:
+                            return pending.pop(0)
+                        return []
+                    
+                    mock_cursor.fetchall.side_effect = fetchall
+                    
+                    def locked():
+                        return any("LOCK TABLE" in str(c.args[0]) for c in mock_cursor.execute.call_args_list)
+                    
+                    calls = []
+                    
+                    def embed(texts):
+                        calls.append((list(texts), locked()))
+                        return np.ones((len(texts), 8))
+                    
+                    result = storage.activate_embedding_version("v2", embed_fn=embed, batch_size=2)
+                    
+                    assert calls == [(["a", "b"], False), (["c"], False), (["d"], True)]
+                    assert result["rows_caught_up"] == 6
+                    assert not pending
+                    assert storage.reembed_batch.call_args.kwargs["batch_size"] == 2
+                    mock_conn.commit.assert_called()
+    
+    def test_retired_embedding_version_can_be_reactivated(self, mock_config):
+        """Test retirement resets the version checkpoint so only newer rows are re-embedded on reactivation"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    seeds = [
+                        str(c.args[0]) for c in mock_cursor.execute.call_args_list
+                        if "INSERT INTO embedding_reindex_progress" in str(c.args[0])
+                    ]
+                    assert seeds and "FROM embedding_versions" in seeds[0]
+                    
+                    storage._check_embedding_version = Mock(return_value={"model": "m", "dim": 8})
+                    
+                    def activate(version, previous):
+                        mock_cursor.reset_mock()
+                        mock_cursor.fetchone.side_effect = None
+                        mock_cursor.fetchone.return_value = (previous,)
+                        mock_cursor.fetchall.side_effect = lambda: (
+                            [(f"{table}_embedding_{version}_idx",) for table in VECTOR_TABLES]
+                            if "ANY(%s)" in str(mock_cursor.execute.call_args.args[0]) else []
+                        )
+                        storage.activate_embedding_version(version)
+                        return [(str(c.args[0]), c.args[1:]) for c in mock_cursor.execute.call_args_list]
+                    
+                    executed = activate("v2", previous="v1")
+                    resets = [params for query, params in executed if "SET last_id = 0" in query]
+                    assert resets == [(("v1",),)]
+                    
+                    # Reativação: só linhas sem embedding_v1 (inseridas depois da aposentadoria)
+                    mock_cursor.reset_mock()
+                    mock_cursor.fetchone.return_value = (0,)
+                    mock_cursor.fetchall.side_effect = None
+                    mock_cursor.fetchall.return_value = [(9, "new prompt")]
+                    embed = Mock(return_value=np.ones((1, 8)))
+                    assert storage.reembed_batch("v1", "feedback", embed) == 1
+                    select = next(
+                        str(c.args[0]) for c in mock_cursor.execute.call_args_list
+                        if "LIMIT" in str(c.args[0])
+                    )
+                    assert "embedding_v1" in select and "IS NULL" in select
+                    embed.assert_called_once_with(["new prompt"])
+                    
+                    executed = activate("v1", previous="v2")
+                    renames = [query for query, _ in executed if "RENAME COLUMN" in query]
+                    assert any("embedding_v1" in query for query in renames)
+                    assert [params for query, params in executed if "SET last_id = 0" in query] == [(("v2",),)]
+    
+    def test_reembed_batch_requires_progress_row(self, mock_config):
+        """Test a version without checkpoint rows fails with a clear error"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    storage._check_embedding_version = Mock(return_value={"model": "m", "dim": 8})
+                    mock_cursor.fetchone.return_value = None
+                    
+                    with pytest.raises(ValueError, match="no re-index progress"):
+                        storage.reembed_batch("v1", "feedback", Mock())
+                    mock_conn.rollback.assert_called()
+    
+    def test_measure_index_bloat_reads_every_page(self, mock_config):
+        """Test baselines of more than one execute_values page (100 rows) are all returned"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_pool.return_value.getconn.return_value = MagicMock()
+                    storage = PostgreSQLStorage()
+                    
+                    current = [(f"feedback_p2026{i:03d}_idx", 200.0) for i in range(250)]
+                    
+                    class PagedCursor:
+                        """Cursor que, como o servidor, só devolve o RETURNING da última página"""
+                        connection = Mock(encoding="UTF8")
+                        
+                        def __init__(self):
+                            self.page = []
+                            self.rows = []
+                            self.pages = 0
+                        
+                        def execute(self, query, params=None):
+                            if isinstance(query, bytes) and b"index_maintenance" in query:
+                                self.rows = [(name, 100.0) for name, _ in self.page]
+                                self.page = []
+                                self.pages += 1
+                            else:
+                                self.rows = current
+                        
+                        def mogrify(self, template, args):
+                            self.page.append(args)
+                            return b"(%s)" % repr(args).encode()
+                        
+                        def fetchall(self):
+                            return self.rows
+                    
+                    cursor = PagedCursor()
+                    ratios = storage._measure_index_bloat(cursor)
+                    
+                    assert cursor.pages == 3
+                    assert len(ratios) == 250
+                    assert set(ratios.values()) == {2.0}
+    
+    def test_schema_creates_invalidation_triggers(self, mock_config):
+        """Test shared tables get NOTIFY triggers and explicit notifications use the same channel"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    executed = [str(c.args[0]) for c in mock_cursor.execute.call_args_list]
+                    triggers = [query for query in executed if "CREATE TRIGGER npllm_invalidation" in query]
+                    assert len(triggers) == 4
+                    assert not any("feedback" in query for query in triggers)
+                    
+                    storage.notify_invalidation("adapters", adapter="python")
+                    query, params = mock_cursor.execute.call_args.args
+                    assert "pg_notify" in query
+                    assert params[0] == "npllm_invalidation"
+                    assert json.loads(params[1]) == {"scope": "adapters", "adapter": "python"}
+                    mock_conn.commit.assert_called()
+    
+    def test_search_similar_filters_by_user(self, mock_config):
+        """Test user_id is part of the vector search filter and feedback insert"""
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    mock_cursor.fetchall.return_value = []
+                    storage.search_similar(np.zeros(384), top_k=3, user_id="alice")
+                    query, params = mock_cursor.execute.call_args.args
+                    assert "t.user_id = %(user_id)s" in query
+                    assert params["user_id"] == "alice"
+                    
+                    storage.search_similar(np.zeros(384), top_k=3)
+                    assert "user_id" not in mock_cursor.execute.call_args.args[0]
+                    
+                    mock_cursor.fetchone.return_value = (1,)
+                    storage.store_feedback("p", "r", 0.9, user_id="alice")
+                    assert mock_cursor.execute.call_args.args[1][-1] == "alice"
+    
+    def test_user_index_name(self):
+        """Test per-user partial indexes don't collide with context indexes"""
+        assert PostgreSQLStorage._user_index_name("odoo").startswith("feedback_embedding_usr_odoo_")
+        assert PostgreSQLStorage._user_index_name("odoo") != PostgreSQLStorage._context_index_name("odoo")
+        assert len(PostgreSQLStorage._user_index_name("x" * 200)) <= 63
+    
+    def test_context_index_name(self):
+        """Test partial index names are stable and valid identifiers"""
+        name = PostgreSQLStorage._context_index_name("odoo_adapter")
+        
+        assert name == PostgreSQLStorage._context_index_name("odoo_adapter")
+        assert name != PostgreSQLStorage._context_index_name("Odoo Adapter")
+        assert name.startswith("feedback_embedding_ctx_odoo_adapter_")
+        assert len(PostgreSQLStorage._context_index_name("x" * 200)) <= 63
+    
+    def test_quantized_storage_falls_back_on_old_pgvector(self, mock_config):
+        """Test halfvec/binary storage requires pgvector >= 0.7"""
+        mock_config.database.vector_storage = "binary"
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_cursor.fetchone.return_value = ("0.6.2",)
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    
+                    assert storage.pgvector_version == (0, 6, 2)
+                    assert storage.vector_storage == "vector"
+    
+    def test_knn_query_reranks_binary_candidates(self, mock_config):
+        """Test binary mode searches Hamming candidates and re-ranks exactly"""
+        mock_config.database.vector_storage = "binary"
+        with patch('src.storage.postgres.get_config', return_value=mock_config):
+            with patch('src.storage.postgres.ManagedConnectionPool') as mock_pool:
+                with patch('src.storage.postgres.register_vector'):
+                    mock_conn = MagicMock()
+                    mock_cursor = MagicMock()
+                    mock_cursor.fetchone.return_value = ("0.8.0",)
+                    mock_conn.cursor.return_value = mock_cursor
+                    mock_pool.return_value.getconn.return_value = mock_conn
+                    mock_pool.return_value.putconn = Mock()
+                    
+                    storage = PostgreSQLStorage()
+                    query = storage._knn_query(
+                        columns="t.id",
+                        table="feedback",
+                        where="t.score >= 0.7",
+                        query="%(query)s::vector",
+                        limit="5"
+                    )
+                    
+                    assert storage.vector_storage == "binary"
+                    assert "binary_quantize(t.embedding)::bit(384) <~>" in query
+                    assert "LIMIT (5) * 4" in query
+                    assert query.rstrip().endswith("LIMIT 5")
+                    executed = " ".join(str(c.args[0]) for c in mock_cursor.execute.call_args_list)
+                    assert "feedback_embedding_bq_idx" in executed
+                    assert "DROP INDEX IF EXISTS feedback_embedding_idx" in executed
@@ -0,0 +1,125 @@
+"""
+Tests for storage instrumentation
+"""
+
+import asyncio
+import pytest
+from src.storage.instrumentation import (
+    Histogram,
+    StorageMetrics,
+    InstrumentedPool,
+    LATENCY_BUCKETS,
+    instrumented
+)
+
+
+class PoolExhausted(Exception):
+    """Erro de pool esgotado do pool falso"""
+
+
+class FakePool:
+    """Pool com uma única conexão"""
+    
+    def __init__(self):
+        self.available = 1
+    
+    def getconn(self):
+        if not self.available:
+            raise PoolExhausted("connection pool exhausted")
+        self.available -= 1
+        return object()
+    
+    def putconn(self, conn):
+        self.available += 1
+
+
+@instrumented
+class FakeStorage:
+    """Storage mínimo com métodos síncronos, geradores e corrotinas"""
+    
+    def __init__(self, enabled=True):
+        self.metrics = StorageMetrics(enabled=enabled)
+        self.pool = InstrumentedPool(FakePool(), self.metrics, exhausted_errors=(PoolExhausted,))
+    
+    def search(self, n):
+        conn = self.pool.getconn()
+        self.pool.putconn(conn)
+        return [{"id": i} for i in range(n)]
+    
+    def fail(self):
+        raise RuntimeError("boom")
+    
+    def iter_batches(self):
+        yield [1, 2]
+        yield [3]
+    
+    async def fetch(self):
+        return {"id": 1}
+    
+    def get_metrics(self):
+        return self.metrics.snapshot()
+
+
+class TestHistogram:
+    """Test suite for Histogram"""
+    
+    def test_percentiles_use_bucket_upper_bounds(self):
+        """Test percentiles are estimated from bucket bounds, capped at the max"""
+        histogram = Histogram(LATENCY_BUCKETS)
+        for _ in range(98):
+            histogram.observe(0.001)
+        histogram.observe(0.5)
+        histogram.observe(0.5)
+        
+        summary = histogram.summary(scale=1000)
+        
+        assert summary["count"] == 100
+        assert summary["p50"] == pytest.approx(1.28)  # bucket (0.64ms, 1.28ms]
+        assert summary["p99"] == pytest.approx(500.0)
+        assert summary["max"] == pytest.approx(500.0)
+
+
+class TestInstrumentedStorage:
+    """Test suite for the instrumented decorator and pool wrapper"""
+    
+    def test_records_latency_rows_and_errors(self):
+        """Test each public method gets latency, rows and error counts"""
+        storage = FakeStorage()
+        storage.search(3)
+        storage.search(5)
+        with pytest.raises(RuntimeError):
+            storage.fail()
+        assert list(storage.iter_batches()) == [[1, 2], [3]]
+        assert asyncio.run(storage.fetch()) == {"id": 1}
+        
+        methods = storage.get_metrics()["methods"]
+        
+        assert methods["search"]["latency_ms"]["count"] == 2
+        assert methods["search"]["rows"]["mean"] == 4.0
+        assert methods["fail"]["errors"] == 1
+        assert methods["iter_batches"]["rows"]["max"] == 3.0
+        assert methods["fetch"]["rows"]["count"] == 1
+        assert "get_metrics" not in methods
+    
+    def test_pool_wait_and_exhaustion(self):
+        """Test pool waits are timed and exhaustion errors are counted"""
+        storage = FakeStorage()
+        conn = storage.pool.getconn()
+        with pytest.raises(PoolExhausted):
+            storage.pool.getconn()
+        storage.pool.putconn(conn)
+        
+        pool = storage.get_metrics()["pool"]
+        
+        assert pool["wait_ms"]["count"] == 1
+        assert pool["exhausted"] == 1
+    
+    def test_disabled_metrics_record_nothing(self):
+        """Test disabled metrics leave calls untouched and the snapshot empty"""
+        storage = FakeStorage(enabled=False)
+        
+        assert storage.search(2) == [{"id": 0}, {"id": 1}]
+        
+        snapshot = storage.get_metrics()
+        assert snapshot["methods"] == {}
+        assert snapshot["pool"]["wait_ms"]["count"] == 0
@@ -42,3 +42,13 @@ def test_config_env_override():
         else:
             del os.environ["DB_HOST"]
 
+
+
+def test_destructive_database_features_are_opt_in():
+    """Test partitioning, retention and sleep maintenance are off unless enabled"""
+    from src.utils.config import DatabaseConfig
+    
+    for database in (DatabaseConfig(), Config().database):
+        assert database.feedback_partitioning is False
+        assert database.feedback_retention_months == 0
+        assert database.maintenance is False